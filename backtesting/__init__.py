@@ -4,6 +4,10 @@ Provides backtesting framework and visualization tools
 """
 
 from .backtest import SimpleBacktest
+from .vectorized import run_vectorized_backtest, simulate_signals
+from .sweep import run_parameter_sweep, run_strategy_sweep
+from .warehouse import PriceWarehouse, build_warehouse
+from .cross_section import CrossSectionEngine, parse_expression
 from .visualizer import (
     BacktestVisualizer,
     plot_backtest_results,
@@ -15,6 +19,14 @@ from .visualizer import (
 
 __all__ = [
     'SimpleBacktest',
+    'run_vectorized_backtest',
+    'simulate_signals',
+    'run_parameter_sweep',
+    'run_strategy_sweep',
+    'PriceWarehouse',
+    'build_warehouse',
+    'CrossSectionEngine',
+    'parse_expression',
     'BacktestVisualizer',
     'plot_backtest_results',
     'plot_single_strategy_analysis',
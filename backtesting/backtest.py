@@ -5,27 +5,30 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Callable
+from typing import Dict, Callable, Optional
+
+from .ledger import HISTORY_SCHEMA, ArrayLedger, TradeLedger, fifo_win_rate
 
 
 class SimpleBacktest:
     """简单回测引擎"""
     
-    def __init__(self, initial_cash: float = 100000):
+    def __init__(self, initial_cash: float = 100000, capacity: Optional[int] = None):
         """
         初始化回测引擎
         
         Args:
             initial_cash: 初始资金
+            capacity: 预分配的历史记录容量（K线数量），默认按需扩容
         """
         self.initial_cash = initial_cash
         self.cash = initial_cash
         self.position = 0  # 持仓数量
         self.total_value = initial_cash  # 总资产
         
-        # 记录历史
-        self.history = []
-        self.trades = []
+        # 记录历史（按列保存在数组中，需要时再生成DataFrame）
+        self.history = ArrayLedger(HISTORY_SCHEMA, capacity or 1024)
+        self.trades = TradeLedger()
         
         # 统计指标
         self.max_drawdown = 0
@@ -36,8 +39,8 @@ class SimpleBacktest:
         self.cash = self.initial_cash
         self.position = 0
         self.total_value = self.initial_cash
-        self.history = []
-        self.trades = []
+        self.history.clear()
+        self.trades.clear()
         self.max_drawdown = 0
         self.max_value = self.initial_cash
         
@@ -47,13 +50,7 @@ class SimpleBacktest:
         if cost <= self.cash:
             self.cash -= cost
             self.position += volume
-            self.trades.append({
-                'date': date,
-                'action': 'buy',
-                'price': price,
-                'volume': volume,
-                'cost': cost
-            })
+            self.trades.append(date, True, price, volume)
             return True
         return False
     
@@ -62,13 +59,7 @@ class SimpleBacktest:
         if volume <= self.position:
             self.cash += price * volume
             self.position -= volume
-            self.trades.append({
-                'date': date,
-                'action': 'sell',
-                'price': price,
-                'volume': volume,
-                'revenue': price * volume
-            })
+            self.trades.append(date, False, price, volume)
             return True
         return False
     
@@ -85,14 +76,7 @@ class SimpleBacktest:
             self.max_drawdown = drawdown
         
         # 记录历史
-        self.history.append({
-            'date': date,
-            'cash': self.cash,
-            'position': self.position,
-            'current_price': current_price,
-            'total_value': self.total_value,
-            'drawdown': drawdown
-        })
+        self.history.append(date, self.cash, self.position, current_price, self.total_value, drawdown)
     
     def run_backtest(self, data: pd.DataFrame, strategy: Callable):
         """
@@ -104,6 +88,7 @@ class SimpleBacktest:
                      信号可以是字符串('buy', 'sell', 'hold')或字典({'action': 'buy', 'ratio': 0.3})
         """
         print("开始回测...")
+        self.history.reserve(len(self.history) + len(data))
         
         for i, row in data.iterrows():
             # 执行策略，传递当前回测数据
@@ -142,51 +127,9 @@ class SimpleBacktest:
         if not self.history:
             return {}
         
-        history_df = pd.DataFrame(self.history)
-        trades_df = pd.DataFrame(self.trades) if self.trades else pd.DataFrame()
-        
-        # 计算收益率
-        total_return = (self.total_value - self.initial_cash) / self.initial_cash
-        
-        # 计算年化收益率（假设250个交易日）
-        days = len(history_df)
-        annual_return = (1 + total_return) ** (250 / days) - 1 if days > 0 else 0
-        
-        # 计算夏普比率
-        returns = history_df['total_value'].pct_change().dropna()
-        sharpe_ratio = returns.mean() / returns.std() * np.sqrt(250) if len(returns) > 1 else 0
-        
-        # 胜率计算
-        if len(trades_df) > 0:
-            buy_trades = trades_df[trades_df['action'] == 'buy']
-            sell_trades = trades_df[trades_df['action'] == 'sell']
-            
-            win_count = 0
-            total_trades = min(len(buy_trades), len(sell_trades))
-            
-            for i in range(total_trades):
-                if sell_trades.iloc[i]['price'] > buy_trades.iloc[i]['price']:
-                    win_count += 1
-            
-            win_rate = win_count / total_trades if total_trades > 0 else 0
-        else:
-            win_rate = 0
-            total_trades = 0
-        
-        results = {
-            'initial_cash': self.initial_cash,
-            'final_value': self.total_value,
-            'total_return': total_return,
-            'annual_return': annual_return,
-            'max_drawdown': self.max_drawdown,
-            'sharpe_ratio': sharpe_ratio,
-            'total_trades': total_trades,
-            'win_rate': win_rate,
-            'history': history_df,
-            'trades': trades_df
-        }
-        
-        return results
+        history_df = self.history.to_frame()
+        trades_df = self.trades.to_frame()
+        return build_results(self.initial_cash, self.total_value, self.max_drawdown, history_df, trades_df)
     
     def print_summary(self, results: Dict):
         """打印回测摘要"""
@@ -204,3 +147,41 @@ class SimpleBacktest:
         print("="*50)
 
 
+
+def build_results(initial_cash: float, final_value: float, max_drawdown: float,
+                  history_df: pd.DataFrame, trades_df: pd.DataFrame) -> Dict:
+    """由资产历史和交易记录汇总回测结果（逐行回测和向量化回测共用）"""
+    # 计算收益率
+    total_return = (final_value - initial_cash) / initial_cash
+    
+    # 计算年化收益率（假设250个交易日）
+    days = len(history_df)
+    annual_return = (1 + total_return) ** (250 / days) - 1 if days > 0 else 0
+    
+    # 计算夏普比率
+    returns = history_df['total_value'].pct_change().dropna()
+    sharpe_ratio = returns.mean() / returns.std() * np.sqrt(250) if len(returns) > 1 else 0
+    
+    # 胜率计算：按先进先出匹配买卖，每个匹配片段计为一次交易
+    if len(trades_df) > 0:
+        total_trades, win_rate = fifo_win_rate(trades_df['action'].to_numpy() == 'buy',
+                                               trades_df['price'].to_numpy(dtype=float),
+                                               trades_df['volume'].to_numpy())
+    else:
+        win_rate = 0
+        total_trades = 0
+    
+    results = {
+        'initial_cash': initial_cash,
+        'final_value': final_value,
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe_ratio,
+        'total_trades': total_trades,
+        'win_rate': win_rate,
+        'history': history_df,
+        'trades': trades_df
+    }
+    
+    return results
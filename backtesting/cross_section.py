@@ -0,0 +1,410 @@
+"""
+截面查询
+在价格仓库（按日期为主序的列式数组）上回答“截至某日，满足条件的股票有哪些”这类问题，例如：
+
+    engine = CrossSectionEngine(PriceWarehouse('/app/data/warehouse'))
+    engine.query('2024-06-28',
+                 where='peTTM > 0 and peTTM < 15 and momentum(20) > 0.05 and isST == 0',
+                 rank_by='momentum(20)', top=50)
+
+表达式在某个交易日的全部股票上一次性向量化求值，只读取该日期（及回看窗口）所在的几行数据。
+查询是时点的（point-in-time）：只使用不晚于查询日期的数据，查询日期不是交易日时使用之前最近的交易日。
+
+表达式可以是字符串，也可以用 field()/momentum()/mean() 等函数组合：
+    (field('peTTM') < 15) & (momentum(20) > 0.05)
+"""
+
+import ast
+import operator
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .warehouse import PriceWarehouse
+
+
+class QueryContext:
+    """表达式求值的上下文：仓库和查询日期所在的行"""
+
+    def __init__(self, warehouse: PriceWarehouse, row: int):
+        self.warehouse = warehouse
+        self.row = row
+
+    def values(self, name: str, lag: int = 0) -> np.ndarray:
+        """某字段在 lag 个交易日之前的截面（视图）"""
+        i = self.row - lag
+        if i < 0:
+            return np.full(len(self.warehouse.symbols), np.nan)
+        return self.warehouse.array(name)[i]
+
+    def window(self, name: str, window: int) -> np.ndarray:
+        """某字段最近 window 个交易日的数据，形状 (window, 股票数)，不足部分为NaN"""
+        start = self.row - window + 1
+        block = self.warehouse.array(name)[max(start, 0):self.row + 1]
+        if start < 0:
+            pad = np.full((-start, block.shape[1]), np.nan)
+            block = np.vstack([pad, block])
+        return block
+
+
+class Expr(ABC):
+    """截面表达式：对查询日期的全部股票求值，返回与 warehouse.symbols 等长的数组"""
+
+    @abstractmethod
+    def evaluate(self, ctx: QueryContext) -> np.ndarray:
+        """对查询日期求值"""
+
+    def _binary(self, other, op: Callable, symbol: str, reverse: bool = False) -> 'Expr':
+        other = other if isinstance(other, Expr) else Const(other)
+        return BinaryExpr(op, other, self, symbol) if reverse else BinaryExpr(op, self, other, symbol)
+
+    def __add__(self, other): return self._binary(other, operator.add, '+')
+    def __radd__(self, other): return self._binary(other, operator.add, '+', reverse=True)
+    def __sub__(self, other): return self._binary(other, operator.sub, '-')
+    def __rsub__(self, other): return self._binary(other, operator.sub, '-', reverse=True)
+    def __mul__(self, other): return self._binary(other, operator.mul, '*')
+    def __rmul__(self, other): return self._binary(other, operator.mul, '*', reverse=True)
+    def __truediv__(self, other): return self._binary(other, operator.truediv, '/')
+    def __rtruediv__(self, other): return self._binary(other, operator.truediv, '/', reverse=True)
+    def __pow__(self, other): return self._binary(other, operator.pow, '**')
+    def __lt__(self, other): return self._binary(other, operator.lt, '<')
+    def __le__(self, other): return self._binary(other, operator.le, '<=')
+    def __gt__(self, other): return self._binary(other, operator.gt, '>')
+    def __ge__(self, other): return self._binary(other, operator.ge, '>=')
+    def __eq__(self, other): return self._binary(other, operator.eq, '==')
+    def __ne__(self, other): return self._binary(other, operator.ne, '!=')
+    def __and__(self, other): return self._binary(other, _logical_and, '&')
+    def __or__(self, other): return self._binary(other, _logical_or, '|')
+    def __invert__(self): return UnaryExpr(_logical_not, self, '~')
+    def __neg__(self): return UnaryExpr(operator.neg, self, '-')
+    __hash__ = object.__hash__
+
+    def rank(self, ascending: bool = True) -> 'Expr':
+        """截面百分位排名（0-1），NaN不参与排名"""
+        return UnaryExpr(lambda x: _pct_rank(x, ascending), self, 'rank')
+
+    def zscore(self) -> 'Expr':
+        """截面标准化"""
+        return UnaryExpr(_zscore, self, 'zscore')
+
+
+def _logical_and(a, b):
+    return np.logical_and(_as_bool(a), _as_bool(b))
+
+
+def _logical_or(a, b):
+    return np.logical_or(_as_bool(a), _as_bool(b))
+
+
+def _logical_not(a):
+    return np.logical_not(_as_bool(a))
+
+
+def _as_bool(x):
+    """数值转布尔时NaN视为False"""
+    x = np.asarray(x)
+    if x.dtype == bool:
+        return x
+    return np.nan_to_num(x, nan=0.0) != 0
+
+
+def _pct_rank(x: np.ndarray, ascending: bool = True) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    valid = ~np.isnan(x)
+    out = np.full(x.shape, np.nan)
+    n = int(valid.sum())
+    if n:
+        ranks = pd.Series(x[valid]).rank(method='average', ascending=ascending).to_numpy()
+        out[valid] = ranks / n
+    return out
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    if np.isnan(x).all():
+        return x
+    std = np.nanstd(x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (x - np.nanmean(x)) / std if std > 0 else np.zeros_like(x)
+
+
+class Const(Expr):
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, ctx):
+        return self.value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+class Field(Expr):
+    """字段在查询日期（或 lag 个交易日之前）的值"""
+
+    def __init__(self, name: str, lag: int = 0):
+        self.name = name
+        self.lag = lag
+
+    def evaluate(self, ctx):
+        return ctx.values(self.name, self.lag)
+
+    def __repr__(self):
+        return self.name if self.lag == 0 else f'ref({self.name}, {self.lag})'
+
+
+class Momentum(Expr):
+    """window 个交易日的涨跌幅"""
+
+    def __init__(self, window: int, name: str = 'close'):
+        self.window = window
+        self.name = name
+
+    def evaluate(self, ctx):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return ctx.values(self.name) / ctx.values(self.name, self.window) - 1
+
+    def __repr__(self):
+        return f'momentum({self.window})' if self.name == 'close' else f'momentum({self.window}, {self.name})'
+
+
+ROLLING_FUNCTIONS = {
+    'mean': np.mean,
+    'std': lambda block, axis: np.std(block, axis=axis, ddof=1),
+    'sum': np.sum,
+    'max': np.max,
+    'min': np.min,
+}
+
+
+class Rolling(Expr):
+    """最近 window 个交易日的滚动统计，窗口内有缺失（停牌、未上市）时为NaN"""
+
+    def __init__(self, func: str, name: str, window: int):
+        if func not in ROLLING_FUNCTIONS:
+            raise ValueError(f"不支持的滚动函数: {func}")
+        self.func = func
+        self.name = name
+        self.window = window
+
+    def evaluate(self, ctx):
+        block = ctx.window(self.name, self.window)
+        with np.errstate(invalid='ignore'):
+            return ROLLING_FUNCTIONS[self.func](block, axis=0)
+
+    def __repr__(self):
+        return f'{self.func}({self.name}, {self.window})'
+
+
+class BinaryExpr(Expr):
+    def __init__(self, op: Callable, left: Expr, right: Expr, symbol: str):
+        self.op, self.left, self.right, self.symbol = op, left, right, symbol
+
+    def evaluate(self, ctx):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.op(self.left.evaluate(ctx), self.right.evaluate(ctx))
+
+    def __repr__(self):
+        return f'({self.left!r} {self.symbol} {self.right!r})'
+
+
+class UnaryExpr(Expr):
+    def __init__(self, op: Callable, operand: Expr, symbol: str):
+        self.op, self.operand, self.symbol = op, operand, symbol
+
+    def evaluate(self, ctx):
+        return self.op(self.operand.evaluate(ctx))
+
+    def __repr__(self):
+        return f'{self.symbol}({self.operand!r})'
+
+
+def field(name: str, lag: int = 0) -> Field:
+    return Field(name, lag)
+
+
+def momentum(window: int, name: str = 'close') -> Momentum:
+    return Momentum(window, name)
+
+
+def mean(name: str, window: int) -> Rolling:
+    return Rolling('mean', name, window)
+
+
+def std(name: str, window: int) -> Rolling:
+    return Rolling('std', name, window)
+
+
+# 字符串表达式中可用的函数
+QUERY_FUNCTIONS: Dict[str, Callable[..., Expr]] = {
+    'momentum': lambda window, name='close': Momentum(_int(window), _field_name(name)),
+    'ref': lambda name, lag: Field(_field_name(name), _int(lag)),
+    'mean': lambda name, window: Rolling('mean', _field_name(name), _int(window)),
+    'std': lambda name, window: Rolling('std', _field_name(name), _int(window)),
+    'sum': lambda name, window: Rolling('sum', _field_name(name), _int(window)),
+    'max': lambda name, window: Rolling('max', _field_name(name), _int(window)),
+    'min': lambda name, window: Rolling('min', _field_name(name), _int(window)),
+    'rank': lambda expr, ascending=True: _as_expr(expr).rank(bool(_constant(ascending))),
+    'zscore': lambda expr: _as_expr(expr).zscore(),
+    'abs': lambda expr: UnaryExpr(np.abs, _as_expr(expr), 'abs'),
+    'log': lambda expr: UnaryExpr(np.log, _as_expr(expr), 'log'),
+}
+
+_BIN_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+            ast.Div: operator.truediv, ast.Pow: operator.pow,
+            ast.BitAnd: operator.and_, ast.BitOr: operator.or_}
+_COMPARE_OPS = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt,
+                ast.GtE: operator.ge, ast.Eq: operator.eq, ast.NotEq: operator.ne}
+
+
+def _as_expr(value) -> Expr:
+    return value if isinstance(value, Expr) else Const(value)
+
+
+def _constant(value):
+    return value.value if isinstance(value, Const) else value
+
+
+def _int(value) -> int:
+    return int(_constant(value))
+
+
+def _field_name(value) -> str:
+    if isinstance(value, Field) and value.lag == 0:
+        return value.name
+    if isinstance(value, Const) and isinstance(value.value, str):
+        return value.value
+    if isinstance(value, str):
+        return value
+    raise ValueError(f"需要字段名，得到 {value!r}")
+
+
+def parse_expression(text: str) -> Expr:
+    """
+    解析字符串表达式，只允许字段名、数字、算术/比较/逻辑运算和 QUERY_FUNCTIONS 中的函数
+    and/or/not 与 &/|/~ 等价
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"表达式语法错误: {text}") from e
+    return _convert(tree.body)
+
+
+def _convert(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        return node.value if isinstance(node.value, str) else Const(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in ('True', 'False'):
+            return Const(node.id == 'True')
+        return Field(node.id)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        return _BIN_OPS[type(node.op)](_as_expr(_convert(node.left)), _convert(node.right))
+    if isinstance(node, ast.UnaryOp):
+        operand = _as_expr(_convert(node.operand))
+        if isinstance(node.op, (ast.Not, ast.Invert)):
+            return ~operand
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return operand
+    if isinstance(node, ast.BoolOp):
+        values = [_as_expr(_convert(v)) for v in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = (result & value) if isinstance(node.op, ast.And) else (result | value)
+        return result
+    if isinstance(node, ast.Compare):
+        # 链式比较 a < b < c 等价于 (a < b) & (b < c)
+        left = _as_expr(_convert(node.left))
+        result = None
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARE_OPS:
+                break
+            right = _as_expr(_convert(comparator))
+            term = _COMPARE_OPS[type(op)](left, right)
+            result = term if result is None else result & term
+            left = right
+        else:
+            return result
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in QUERY_FUNCTIONS:
+        args = [_convert(a) for a in node.args]
+        kwargs = {k.arg: _convert(k.value) for k in node.keywords}
+        return QUERY_FUNCTIONS[node.func.id](*args, **kwargs)
+    raise ValueError(f"表达式中包含不支持的语法: {ast.dump(node)}")
+
+
+def _to_expr(value: Union[str, Expr]) -> Expr:
+    return parse_expression(value) if isinstance(value, str) else _as_expr(value)
+
+
+class CrossSectionEngine:
+    """截面查询引擎"""
+
+    def __init__(self, warehouse: Union[PriceWarehouse, str]):
+        self.warehouse = warehouse if isinstance(warehouse, PriceWarehouse) else PriceWarehouse(warehouse)
+        self.symbols = np.asarray(self.warehouse.symbols)
+
+    def evaluate(self, expr: Union[str, Expr], date) -> pd.Series:
+        """在某个交易日对全部股票求值"""
+        ctx = QueryContext(self.warehouse, self.warehouse.date_index(date))
+        values = np.broadcast_to(_to_expr(expr).evaluate(ctx), self.symbols.shape)
+        return pd.Series(values, index=pd.Index(self.symbols, name='symbol'), name=str(expr))
+
+    def query(self,
+              date,
+              where: Optional[Union[str, Expr]] = None,
+              rank_by: Optional[Union[str, Expr]] = None,
+              ascending: bool = False,
+              top: Optional[int] = None,
+              columns: Optional[Union[Sequence[Union[str, Expr]], Dict[str, Union[str, Expr]]]] = None) -> pd.DataFrame:
+        """
+        截面筛选、排序和取前K只
+
+        Args:
+            date: 查询日期，非交易日时使用之前最近的交易日
+            where: 筛选条件；当日没有收盘价（停牌、未上市、已退市）的股票始终被排除
+            rank_by: 排序依据，结果包含 score 和 rank 列，score 为NaN的股票被排除
+            ascending: 是否按升序排列，默认降序（score 越大越靠前）
+            top: 只返回前K只
+            columns: 需要一并输出的表达式，列表或 {列名: 表达式}
+
+        Returns:
+            以股票代码为索引的DataFrame
+        """
+        row = self.warehouse.date_index(date)
+        ctx = QueryContext(self.warehouse, row)
+        mask = ~np.isnan(ctx.values('close'))
+        if where is not None:
+            mask &= _as_bool(np.broadcast_to(_to_expr(where).evaluate(ctx), mask.shape))
+
+        score = None
+        if rank_by is not None:
+            score = np.broadcast_to(np.asarray(_to_expr(rank_by).evaluate(ctx), dtype=float), mask.shape)
+            mask &= ~np.isnan(score)
+        selected = np.flatnonzero(mask)
+
+        if score is not None:
+            key = score[selected] if ascending else -score[selected]
+            if top is not None and top < len(selected):
+                part = np.argpartition(key, top - 1)[:top]
+                selected, key = selected[part], key[part]
+            selected = selected[np.argsort(key, kind='stable')]
+        elif top is not None:
+            selected = selected[:top]
+
+        if isinstance(columns, dict):
+            named = {name: _to_expr(expr) for name, expr in columns.items()}
+        else:
+            named = {str(c): _to_expr(c) for c in (columns or ['close'])}
+
+        result = pd.DataFrame(index=pd.Index(self.symbols[selected], name='symbol'))
+        result['date'] = pd.Timestamp(self.warehouse.dates[row])
+        for name, expr in named.items():
+            result[name] = np.broadcast_to(expr.evaluate(ctx), mask.shape)[selected]
+        if score is not None:
+            result['score'] = score[selected]
+            result['rank'] = np.arange(1, len(selected) + 1)
+        return result
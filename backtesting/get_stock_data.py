@@ -1,9 +1,46 @@
 import baostock as bs
 import os
+import sys
+import json
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from multiprocessing.util import Finalize
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.kline_store import PartitionedKLineStore
 
 
 OUTPUT = '/app/data/stockdata/'
+DATASET_OUTPUT = '/app/data/stockdata_dataset/'
+
+BAOSTOCK_FIELDS = "date,code,open,high,low,close,volume,amount," \
+                  "adjustflag,turn,tradestatus,pctChg,peTTM," \
+                  "pbMRQ,psTTM,pcfNcfTTM,isST"
+
+# 列式数据集中的列及类型（baostock返回的都是字符串）
+BAOSTOCK_COLUMNS = {
+    'date': 'string',
+    'code': 'string',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+    'amount': 'float64',
+    'adjustflag': 'string',
+    'turn': 'float64',
+    'tradestatus': 'int64',
+    'pctChg': 'float64',
+    'peTTM': 'float64',
+    'pbMRQ': 'float64',
+    'psTTM': 'float64',
+    'pcfNcfTTM': 'float64',
+    'isST': 'int64',
+}
+DATASET_KLINE_TYPE = 'd'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_SAVE_EVERY = 50
 
 
 def mkdir(directory):
@@ -22,9 +59,7 @@ class Downloader(object):
         self.date_start = date_start
         self.date_end = date_end
         self.output_dir = output_dir
-        self.fields = "date,code,open,high,low,close,volume,amount," \
-                      "adjustflag,turn,tradestatus,pctChg,peTTM," \
-                      "pbMRQ,psTTM,pcfNcfTTM,isST"
+        self.fields = BAOSTOCK_FIELDS
         self.stock_code = stock_code
 
     def exit(self):
@@ -64,15 +99,205 @@ class Downloader(object):
         self.exit()
 
 
+class BaostockSource(object):
+    """baostock数据源，每个进程使用各自的登录会话"""
+
+    def login(self):
+        result = bs.login()
+        if result.error_code != '0':
+            raise RuntimeError(f"baostock登录失败: {result.error_msg}")
+
+    def logout(self):
+        bs.logout()
+
+    def query_all_stock(self, date):
+        return bs.query_all_stock(date).get_data()
+
+    def query_history(self, code, fields, start_date, end_date):
+        result = bs.query_history_k_data_plus(code, fields, start_date=start_date, end_date=end_date)
+        if result.error_code != '0':
+            raise RuntimeError(result.error_msg)
+        return result.get_data()
+
+
+class DownloadManifest(object):
+    """记录每只股票已下载到的最后日期，用于断点续传和增量更新"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('codes', {})
+            except Exception as e:
+                print(f"⚠️ 读取下载清单失败，将重新下载: {e}")
+
+    def last_date(self, code):
+        return self.entries.get(code, {}).get('last_date')
+
+    def update(self, code, last_date, rows):
+        entry = self.entries.setdefault(code, {'last_date': None, 'rows': 0})
+        if last_date:
+            entry['last_date'] = max(last_date, entry['last_date'] or last_date)
+        entry['rows'] += rows
+        entry['checked_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'codes': self.entries},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+# 下载进程内的数据源和存储，由 _init_download_worker 设置
+_WORKER = {}
+
+
+def _init_download_worker(source_factory, dataset_dir):
+    """下载进程初始化：建立独立的登录会话，进程退出时登出"""
+    source = source_factory()
+    source.login()
+    Finalize(source, source.logout, exitpriority=10)
+    _WORKER['source'] = source
+    _WORKER['store'] = PartitionedKLineStore(dataset_dir, columns=BAOSTOCK_COLUMNS, date_col='date')
+
+
+def _download_code(code, start_date, end_date):
+    """下载单只股票的一段日期并追加到数据集，返回 (代码, 最后日期, 行数)"""
+    df = _WORKER['source'].query_history(code, BAOSTOCK_FIELDS, start_date, end_date)
+    if df is None or df.empty:
+        return code, None, 0
+    _WORKER['store'].append(DATASET_KLINE_TYPE, code, df)
+    return code, str(df['date'].max()), len(df)
+
+
+class BulkDownloader(object):
+    """
+    可断点续传的全市场批量下载
+    - 下载清单记录每只股票的最后日期，重新运行时只下载之后的新数据
+    - 多个下载进程各自登录，并发下载不同股票
+    - 数据按股票代码分区写入列式数据集（parquet），而不是每只股票一个CSV
+    """
+
+    def __init__(self,
+                 dataset_dir,
+                 date_start='1990-01-01',
+                 date_end='2025-09-05',
+                 max_workers=4,
+                 source_factory=BaostockSource,
+                 stock_codes=None):
+        self.dataset_dir = dataset_dir
+        self.date_start = date_start
+        self.date_end = date_end
+        self.max_workers = max_workers
+        self.source_factory = source_factory
+        self.stock_codes = stock_codes
+        mkdir(dataset_dir)
+        self.store = PartitionedKLineStore(dataset_dir, columns=BAOSTOCK_COLUMNS, date_col='date')
+        self.manifest = DownloadManifest(os.path.join(dataset_dir, MANIFEST_FILE))
+
+    def list_codes(self):
+        """获取需要下载的股票代码"""
+        if self.stock_codes:
+            return list(self.stock_codes)
+        source = self.source_factory()
+        source.login()
+        try:
+            stock_df = source.query_all_stock(self.date_end)
+        finally:
+            source.logout()
+        return stock_df['code'].tolist()
+
+    def plan(self, codes):
+        """根据下载清单计算每只股票需要下载的日期范围"""
+        tasks = []
+        for code in codes:
+            last_date = self.manifest.last_date(code)
+            start = self.date_start
+            if last_date:
+                start = max(start, (datetime.strptime(last_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+            if start <= self.date_end:
+                tasks.append((code, start, self.date_end))
+        return tasks
+
+    def read(self, code):
+        """读取数据集中单只股票的数据"""
+        return self.store.read(DATASET_KLINE_TYPE, code)
+
+    def run(self):
+        """执行下载，返回统计信息"""
+        codes = self.list_codes()
+        tasks = self.plan(codes)
+        print(f"📥 共 {len(codes)} 只股票，需要下载 {len(tasks)} 只，已是最新 {len(codes) - len(tasks)} 只")
+
+        stats = {'total': len(codes), 'downloaded': 0, 'skipped': len(codes) - len(tasks), 'rows': 0, 'failed': {}}
+        completed = 0
+        try:
+            for code, result, error in self._execute(tasks):
+                completed += 1
+                if error is not None:
+                    stats['failed'][code] = error
+                    print(f"❌ {code} 下载失败: {error}")
+                else:
+                    _, last_date, rows = result
+                    self.manifest.update(code, last_date, rows)
+                    stats['downloaded'] += 1
+                    stats['rows'] += rows
+                if completed % MANIFEST_SAVE_EVERY == 0:
+                    self.manifest.save()
+                    print(f"   进度 {completed}/{len(tasks)}")
+        finally:
+            self.manifest.save()
+
+        print(f"✅ 下载完成: {stats['downloaded']} 只, {stats['rows']} 行, 失败 {len(stats['failed'])} 只")
+        return stats
+
+    def _execute(self, tasks):
+        """逐个产出 (代码, 结果, 错误信息)"""
+        if not tasks:
+            return
+        if self.max_workers <= 1:
+            _init_download_worker(self.source_factory, self.dataset_dir)
+            try:
+                for task in tasks:
+                    try:
+                        yield task[0], _download_code(*task), None
+                    except Exception as e:
+                        yield task[0], None, str(e)
+            finally:
+                _WORKER['source'].logout()
+                _WORKER.clear()
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_download_worker,
+                                 initargs=(self.source_factory, self.dataset_dir)) as executor:
+            futures = {executor.submit(_download_code, *task): task[0] for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, str(e)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Download stock data')
     parser.add_argument('--stock_code', type=str, default=None, help='指定股票代码，如 sh.600036')
     parser.add_argument('--date_start', type=str, default='1990-01-01', help='开始日期')
     parser.add_argument('--date_end', type=str, default='2025-09-05', help='结束日期') # 注意必须为开盘日
     parser.add_argument('--output_dir', type=str, default=OUTPUT, help='输出目录')
+    parser.add_argument('--bulk', action='store_true', help='批量下载到列式数据集（支持断点续传和增量更新）')
+    parser.add_argument('--dataset_dir', type=str, default=DATASET_OUTPUT, help='批量下载的数据集目录')
+    parser.add_argument('--workers', type=int, default=4, help='批量下载的进程数')
     args = parser.parse_args()
 
-    mkdir(args.output_dir)
-    downloader = Downloader(args.output_dir, date_start=args.date_start, date_end=args.date_end, stock_code=args.stock_code)
-    downloader.run()
+    if args.bulk:
+        codes = [args.stock_code] if args.stock_code else None
+        BulkDownloader(args.dataset_dir, date_start=args.date_start, date_end=args.date_end,
+                       max_workers=args.workers, stock_codes=codes).run()
+    else:
+        mkdir(args.output_dir)
+        downloader = Downloader(args.output_dir, date_start=args.date_start, date_end=args.date_end, stock_code=args.stock_code)
+        downloader.run()
 
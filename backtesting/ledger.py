@@ -0,0 +1,178 @@
+"""
+回测记录表
+资产历史和成交记录按列保存在预分配的NumPy数组中（容量不足时倍增），
+只有在需要时才生成DataFrame，长周期或分钟级回测不再为每根K线创建字典。
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+HISTORY_SCHEMA = {
+    'date': object,
+    'cash': np.float64,
+    'position': np.int64,
+    'current_price': np.float64,
+    'total_value': np.float64,
+    'drawdown': np.float64,
+}
+
+TRADE_SCHEMA = {
+    'date': object,
+    'is_buy': np.bool_,
+    'price': np.float64,
+    'volume': np.int64,
+}
+
+
+class ArrayLedger:
+    """预分配的列式记录表"""
+
+    def __init__(self, schema: Dict[str, Any], capacity: int = 1024):
+        self._schema = schema
+        self._names = tuple(schema.keys())
+        self._columns = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in schema.items()}
+        self._size = 0
+        self._frame: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """按位置取一条记录（字典形式，兼容原来的列表记录）"""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("记录索引超出范围")
+        record = {}
+        for name in self._names:
+            value = self._columns[name][index]
+            record[name] = value.item() if isinstance(value, np.generic) else value
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self[i]
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns[self._names[0]])
+
+    def reserve(self, capacity: int):
+        """预留容量，避免回测过程中反复扩容"""
+        if capacity <= self.capacity:
+            return
+        for name, arr in self._columns.items():
+            grown = np.empty(capacity, dtype=arr.dtype)
+            grown[:self._size] = arr[:self._size]
+            self._columns[name] = grown
+
+    def append(self, *values):
+        """按 schema 的列顺序追加一条记录"""
+        if self._size == self.capacity:
+            self.reserve(self.capacity * 2)
+        i = self._size
+        for name, value in zip(self._names, values):
+            self._columns[name][i] = value
+        self._size += 1
+        self._frame = None
+
+    def column(self, name: str) -> np.ndarray:
+        """某一列的有效部分（视图）"""
+        return self._columns[name][:self._size]
+
+    def clear(self):
+        self._size = 0
+        self._frame = None
+
+    def to_frame(self) -> pd.DataFrame:
+        """生成DataFrame（结果缓存，追加新记录后重新生成）"""
+        if self._frame is None:
+            self._frame = self._build_frame()
+        return self._frame
+
+    def _build_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: self.column(name).copy() for name in self._names})
+
+
+class TradeLedger(ArrayLedger):
+    """成交记录表，DataFrame 与原来的逐笔字典记录结构一致"""
+
+    def __init__(self, capacity: int = 256):
+        super().__init__(TRADE_SCHEMA, capacity)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        record = super().__getitem__(index)
+        is_buy = record.pop('is_buy')
+        amount = record['price'] * record['volume']
+        return {'date': record['date'], 'action': 'buy' if is_buy else 'sell', 'price': record['price'],
+                'volume': record['volume'], ('cost' if is_buy else 'revenue'): amount}
+
+    def _build_frame(self) -> pd.DataFrame:
+        return trades_frame(self.column('date'), self.column('is_buy'), self.column('price'), self.column('volume'))
+
+
+def trades_frame(dates, is_buy: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> pd.DataFrame:
+    """
+    由成交数组构建交易记录DataFrame：date, action, price, volume, cost/revenue
+    cost/revenue 列按首次出现的顺序排列，与字典列表构建的结果一致
+    """
+    if len(prices) == 0:
+        return pd.DataFrame()
+    is_buy = np.asarray(is_buy, dtype=bool)
+    amount = prices * volumes
+    trades = pd.DataFrame({
+        'date': np.asarray(dates, dtype=object),
+        'action': np.where(is_buy, 'buy', 'sell').astype(object),
+        'price': np.asarray(prices, dtype=float),
+        'volume': np.asarray(volumes, dtype=np.int64),
+    })
+    money_columns = {'cost': np.where(is_buy, amount, np.nan), 'revenue': np.where(is_buy, np.nan, amount)}
+    order = ['cost', 'revenue'] if is_buy[0] else ['revenue', 'cost']
+    for column in order:
+        if (column == 'cost' and is_buy.any()) or (column == 'revenue' and (~is_buy).any()):
+            trades[column] = money_columns[column]
+    return trades
+
+
+def match_trades_fifo(is_buy: np.ndarray, prices: np.ndarray,
+                      volumes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    先进先出匹配买入和卖出，返回每个匹配片段的 (买入价, 卖出价, 数量)
+
+    把买入和卖出分别按累计成交量排成两条数轴，两者的分界点合并后，
+    每一段只对应一笔买入和一笔卖出，因此整个匹配过程不需要逐笔循环。
+    """
+    is_buy = np.asarray(is_buy, dtype=bool)
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=np.int64)
+    buy_cum = np.cumsum(volumes[is_buy])
+    sell_cum = np.cumsum(volumes[~is_buy])
+    if len(buy_cum) == 0 or len(sell_cum) == 0:
+        empty = np.empty(0)
+        return empty, empty, np.empty(0, dtype=np.int64)
+
+    matched = min(buy_cum[-1], sell_cum[-1])
+    bounds = np.unique(np.concatenate([[0], buy_cum, sell_cum]))
+    bounds = bounds[bounds <= matched]
+    starts, quantities = bounds[:-1], np.diff(bounds)
+    buy_idx = np.searchsorted(buy_cum, starts, side='right')
+    sell_idx = np.searchsorted(sell_cum, starts, side='right')
+    return prices[is_buy][buy_idx], prices[~is_buy][sell_idx], quantities
+
+
+def fifo_win_rate(is_buy: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> Tuple[int, float]:
+    """
+    先进先出匹配后的交易次数和胜率
+
+    Returns:
+        (匹配的买卖片段数, 卖出价高于买入价的片段占比)
+    """
+    buy_prices, sell_prices, _ = match_trades_fifo(is_buy, prices, volumes)
+    total_trades = len(buy_prices)
+    win_rate = float((sell_prices > buy_prices).sum()) / total_trades if total_trades > 0 else 0
+    return total_trades, win_rate
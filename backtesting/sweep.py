@@ -0,0 +1,207 @@
+"""
+参数扫描与多策略回测
+价格数据只加载一次，放入共享内存供进程池中的所有工作进程直接读取，
+每个任务（策略 × 参数组合 × 股票）运行一次向量化回测，结果以紧凑的汇总表返回。
+
+信号函数需要定义在模块顶层（可被pickle），签名为：
+    signal_fn(bars: Dict[str, np.ndarray], **params) -> signals 或 (signals, ratios)
+bars 为单只股票的字段数组（close/high/low/...），长度为该股票的K线数量。
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .vectorized import simulate_signals, summarize_simulation
+
+SUMMARY_COLUMNS = ['strategy', 'symbol', 'params', 'total_return', 'annual_return', 'sharpe_ratio',
+                   'max_drawdown', 'total_trades', 'win_rate']
+
+# 工作进程中共享内存的映射，由 _init_worker 设置
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def expand_param_grid(param_grid: Optional[Dict[str, Sequence]]) -> List[Dict[str, Any]]:
+    """把参数网格展开为参数组合列表，例如 {'short': [5, 10], 'long': [20]} -> 2个组合"""
+    if not param_grid:
+        return [{}]
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+class SharedPriceArrays:
+    """
+    以共享内存保存的多股票价格数组，形状 (字段数, 股票数, K线数)，每只股票左对齐
+    """
+
+    def __init__(self, data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                 fields: Sequence[str] = ('close',), symbol_col: str = 'symbol', date_col: str = 'date'):
+        """
+        Args:
+            data: 长格式K线（含 symbol_col 列）或 {股票代码: K线DataFrame}
+            fields: 需要共享的价格字段
+        """
+        if isinstance(data, dict):
+            data = pd.concat([df.assign(**{symbol_col: symbol}) for symbol, df in data.items()], ignore_index=True)
+        if date_col not in data.columns:
+            data = data.assign(**{date_col: data.groupby(symbol_col).cumcount()})
+
+        ordered = data.sort_values([symbol_col, date_col], kind='stable')
+        codes, symbols = pd.factorize(ordered[symbol_col], sort=True)
+        positions = ordered.groupby(codes, sort=False).cumcount().to_numpy()
+        self.symbols = [str(s) for s in symbols]
+        self.lengths = np.bincount(codes, minlength=len(symbols)).astype(np.int64)
+        self.fields = list(fields)
+        self.shape = (len(self.fields), len(self.symbols), int(self.lengths.max()) if len(self.lengths) else 0)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(self.shape)) * 8, 1))
+        self.array = np.ndarray(self.shape, dtype=np.float64, buffer=self._shm.buf)
+        self.array[:] = np.nan
+        for k, name in enumerate(self.fields):
+            self.array[k, codes, positions] = ordered[name].to_numpy(dtype=float)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def bars(self, symbol_index: int) -> Dict[str, np.ndarray]:
+        return _symbol_bars(self.array, self.fields, self.lengths, symbol_index)
+
+    def close(self):
+        """释放共享内存"""
+        if self._shm is None:
+            return
+        self.array = None
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _symbol_bars(array: np.ndarray, fields: List[str], lengths: np.ndarray, symbol_index: int) -> Dict[str, np.ndarray]:
+    n = int(lengths[symbol_index])
+    return {name: array[k, symbol_index, :n] for k, name in enumerate(fields)}
+
+
+def _init_worker(shm_name: str, shape: Tuple[int, ...], fields: List[str], lengths: np.ndarray):
+    """工作进程初始化：挂载共享内存，不复制价格数据"""
+    # 工作进程与主进程共用 resource_tracker，共享内存由主进程在扫描结束时释放
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _WORKER_STATE.update(shm=shm, array=np.ndarray(shape, dtype=np.float64, buffer=shm.buf),
+                         fields=fields, lengths=lengths)
+
+
+def _run_task(task: Tuple, bars: Dict[str, np.ndarray], initial_cash: float) -> Dict[str, Any]:
+    strategy_name, signal_fn, symbol, params = task
+    row = {'strategy': strategy_name, 'symbol': symbol, 'params': params}
+    try:
+        signals = signal_fn(bars, **params)
+        ratios = None
+        if isinstance(signals, tuple):
+            signals, ratios = signals
+        sim = simulate_signals(bars['close'], signals, ratios, initial_cash)
+        row.update(summarize_simulation(sim, initial_cash))
+    except Exception as e:
+        row['error'] = str(e)
+    return row
+
+
+def _run_worker_task(task: Tuple, symbol_index: int, initial_cash: float) -> Dict[str, Any]:
+    bars = _symbol_bars(_WORKER_STATE['array'], _WORKER_STATE['fields'], _WORKER_STATE['lengths'], symbol_index)
+    return _run_task(task, bars, initial_cash)
+
+
+def iter_strategy_sweep(data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                        strategies: Dict[str, Tuple[Callable, Optional[Dict[str, Sequence]]]],
+                        symbols: Optional[Iterable[str]] = None,
+                        fields: Sequence[str] = ('close',),
+                        initial_cash: float = 100000,
+                        max_workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐个产出回测汇总结果（按完成顺序）
+
+    Args:
+        data: 长格式K线（含 symbol 列）或 {股票代码: K线DataFrame}
+        strategies: {策略名: (信号函数, 参数网格)}
+        symbols: 参与回测的股票，默认全部
+        fields: 信号函数需要的价格字段，必须包含 close
+        initial_cash: 初始资金
+        max_workers: 工作进程数，1 表示在当前进程中顺序执行
+    """
+    fields = list(dict.fromkeys(['close', *fields]))
+    with SharedPriceArrays(data, fields=fields) as prices:
+        index_of = {s: i for i, s in enumerate(prices.symbols)}
+        selected = prices.symbols if symbols is None else [str(s) for s in symbols if str(s) in index_of]
+        tasks = [((name, fn, symbol, params), index_of[symbol])
+                 for name, (fn, grid) in strategies.items()
+                 for params in expand_param_grid(grid)
+                 for symbol in selected]
+
+        workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+        if workers <= 1 or len(tasks) <= 1:
+            for task, symbol_index in tasks:
+                yield _run_task(task, prices.bars(symbol_index), initial_cash)
+            return
+
+        print(f"🚀 并行回测: {len(tasks)} 个任务, {workers} 个进程")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(prices.name, prices.shape, prices.fields, prices.lengths)) as executor:
+            futures = [executor.submit(_run_worker_task, task, symbol_index, initial_cash)
+                       for task, symbol_index in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+
+
+def run_strategy_sweep(data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                       strategies: Dict[str, Tuple[Callable, Optional[Dict[str, Sequence]]]],
+                       symbols: Optional[Iterable[str]] = None,
+                       fields: Sequence[str] = ('close',),
+                       initial_cash: float = 100000,
+                       max_workers: Optional[int] = None,
+                       on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> pd.DataFrame:
+    """
+    多策略 × 参数网格 × 股票的批量回测，返回汇总表
+
+    Args:
+        on_result: 每个任务完成时的回调，可用于实时展示进度
+
+    Returns:
+        每个任务一行：strategy, symbol, params, total_return, annual_return, sharpe_ratio,
+        max_drawdown, total_trades, win_rate（失败的任务带 error 列）
+    """
+    rows = []
+    for row in iter_strategy_sweep(data, strategies, symbols, fields, initial_cash, max_workers):
+        rows.append(row)
+        if on_result is not None:
+            on_result(row)
+
+    summary = pd.DataFrame(rows)
+    if summary.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    columns = SUMMARY_COLUMNS + [c for c in summary.columns if c not in SUMMARY_COLUMNS]
+    summary = summary.reindex(columns=columns)
+    summary['params'] = summary['params'].map(lambda p: ', '.join(f'{k}={v}' for k, v in p.items()))
+    return summary.sort_values(['strategy', 'symbol', 'params'], kind='stable').reset_index(drop=True)
+
+
+def run_parameter_sweep(data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                        signal_fn: Callable,
+                        param_grid: Optional[Dict[str, Sequence]] = None,
+                        symbols: Optional[Iterable[str]] = None,
+                        **kwargs) -> pd.DataFrame:
+    """单个策略的参数扫描，参数见 run_strategy_sweep"""
+    return run_strategy_sweep(data, {getattr(signal_fn, '__name__', 'strategy'): (signal_fn, param_grid)},
+                              symbols=symbols, **kwargs)
@@ -0,0 +1,176 @@
+"""
+向量化回测
+输入预先计算好的交易信号数组，用NumPy模拟资金、持仓、成交和资产曲线，
+结果结构与 SimpleBacktest.get_results() 一致
+
+交易规则与 SimpleBacktest.run_backtest 相同：
+- 买入信号：用 现金 × 比例 按收盘价买入整数股
+- 卖出信号：卖出 持仓 × 比例 的整数股
+资金和持仓只在有信号的K线上变化，因此只遍历信号所在的K线，
+其余K线的状态由前一次成交后的状态向前填充，资产、回撤按整个数组计算。
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .backtest import build_results
+from .ledger import fifo_win_rate, trades_frame
+
+SIGNAL_BUY = 1
+SIGNAL_HOLD = 0
+SIGNAL_SELL = -1
+
+
+def normalize_signals(signals) -> np.ndarray:
+    """
+    把信号统一为整数数组：1 买入、-1 卖出、0 持有
+
+    Args:
+        signals: 字符串数组（'buy'/'sell'/'hold'）或数值数组（>0 买入、<0 卖出、0或NaN 持有）
+    """
+    arr = np.asarray(signals)
+    if arr.dtype.kind in 'OUS':
+        return np.select([arr == 'buy', arr == 'sell'], [SIGNAL_BUY, SIGNAL_SELL], SIGNAL_HOLD).astype(np.int8)
+    return np.sign(np.nan_to_num(arr.astype(float))).astype(np.int8)
+
+
+def simulate_signals(close: np.ndarray,
+                     signals,
+                     ratios: Optional[Union[float, np.ndarray]] = None,
+                     initial_cash: float = 100000) -> Dict[str, np.ndarray]:
+    """
+    按信号模拟交易，返回逐K线的资金、持仓、资产、回撤数组和成交记录数组
+
+    Args:
+        close: 收盘价数组
+        signals: 信号数组，见 normalize_signals
+        ratios: 每根K线的买卖比例（标量或数组，NaN视为1.0），默认全仓
+        initial_cash: 初始资金
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    codes = normalize_signals(signals)
+    if len(codes) != n:
+        raise ValueError(f"信号长度({len(codes)})与价格长度({n})不一致")
+    if ratios is None:
+        ratios = np.ones(n)
+    ratios = np.nan_to_num(np.broadcast_to(np.asarray(ratios, dtype=float), (n,)), nan=1.0)
+
+    cash, position = float(initial_cash), 0
+    trade_bars, trade_actions, trade_prices, trade_volumes = [], [], [], []
+    cash_after, position_after = [], []
+
+    idx = np.flatnonzero(codes)
+    for i, code, price, ratio in zip(idx.tolist(), codes[idx].tolist(), close[idx].tolist(), ratios[idx].tolist()):
+        if code > 0:
+            if cash <= 0:
+                continue
+            volume = int(cash * ratio / price)
+            cost = price * volume
+            if volume <= 0 or cost > cash:
+                continue
+            cash -= cost
+            position += volume
+        else:
+            if position <= 0:
+                continue
+            volume = int(position * ratio)
+            if volume <= 0:
+                continue
+            cash += price * volume
+            position -= volume
+        trade_bars.append(i)
+        trade_actions.append(code)
+        trade_prices.append(price)
+        trade_volumes.append(volume)
+        cash_after.append(cash)
+        position_after.append(position)
+
+    trade_bars = np.asarray(trade_bars, dtype=np.int64)
+    # 每根K线对应的最近一次成交（没有成交时为-1，使用初始状态）
+    last_trade = np.searchsorted(trade_bars, np.arange(n), side='right') - 1
+    cash_arr = np.append(np.asarray(cash_after, dtype=float), float(initial_cash))[last_trade]
+    position_arr = np.append(np.asarray(position_after, dtype=np.int64), 0)[last_trade]
+
+    total_value = cash_arr + position_arr * close
+    max_value = np.maximum.accumulate(np.maximum(total_value, initial_cash)) if n else total_value
+    drawdown = (max_value - total_value) / max_value
+
+    return {
+        'cash': cash_arr,
+        'position': position_arr,
+        'total_value': total_value,
+        'drawdown': drawdown,
+        'max_drawdown': max(0.0, float(drawdown.max())) if n else 0.0,
+        'trade_bars': trade_bars,
+        'trade_actions': np.asarray(trade_actions, dtype=np.int8),
+        'trade_prices': np.asarray(trade_prices, dtype=float),
+        'trade_volumes': np.asarray(trade_volumes, dtype=np.int64),
+    }
+
+
+def summarize_simulation(sim: Dict[str, np.ndarray], initial_cash: float = 100000) -> Dict[str, float]:
+    """
+    由 simulate_signals 的结果直接计算核心绩效指标（不构建DataFrame），
+    口径与 build_results 一致
+    """
+    total_value = sim['total_value']
+    days = len(total_value)
+    if days == 0:
+        return {}
+    total_return = (float(total_value[-1]) - initial_cash) / initial_cash
+    annual_return = (1 + total_return) ** (250 / days) - 1
+
+    returns = total_value[1:] / total_value[:-1] - 1
+    returns = returns[~np.isnan(returns)]
+    sharpe_ratio = returns.mean() / returns.std(ddof=1) * np.sqrt(250) if len(returns) > 1 else 0
+
+    total_trades, win_rate = fifo_win_rate(sim['trade_actions'] > 0, sim['trade_prices'], sim['trade_volumes'])
+
+    return {
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'sharpe_ratio': float(sharpe_ratio),
+        'max_drawdown': sim['max_drawdown'],
+        'total_trades': total_trades,
+        'win_rate': win_rate,
+    }
+
+
+def run_vectorized_backtest(data: pd.DataFrame,
+                            signals,
+                            ratios: Optional[Union[float, np.ndarray]] = None,
+                            initial_cash: float = 100000,
+                            price_col: str = 'close',
+                            date_col: str = 'date') -> Dict:
+    """
+    向量化回测
+
+    Args:
+        data: 包含日期和价格的DataFrame
+        signals: 与 data 等长的信号数组（'buy'/'sell'/'hold' 或 1/-1/0）
+        ratios: 买卖比例（标量或与 data 等长的数组），默认全仓
+        initial_cash: 初始资金
+
+    Returns:
+        与 SimpleBacktest.get_results() 结构相同的结果字典
+    """
+    if len(data) == 0:
+        return {}
+
+    sim = simulate_signals(data[price_col].to_numpy(dtype=float), signals, ratios, initial_cash)
+    dates = [str(d) for d in data[date_col]]
+
+    history_df = pd.DataFrame({
+        'date': dates,
+        'cash': sim['cash'],
+        'position': sim['position'],
+        'current_price': data[price_col].to_numpy(dtype=float),
+        'total_value': sim['total_value'],
+        'drawdown': sim['drawdown'],
+    })
+    trades_df = trades_frame([dates[i] for i in sim['trade_bars'].tolist()], sim['trade_actions'] > 0,
+                             sim['trade_prices'], sim['trade_volumes'])
+    return build_results(initial_cash, float(sim['total_value'][-1]), sim['max_drawdown'], history_df, trades_df)
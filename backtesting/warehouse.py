@@ -0,0 +1,301 @@
+"""
+本地价格仓库
+把 get_stock_data.py 下载的逐股票CSV（或批量下载的列式数据集）打包成固定类型的内存映射数组：
+每个字段一个 (交易日数, 股票数) 的 .npy 文件，按日期为主序存储，缺失值为NaN，
+另有日期索引和股票代码索引。
+
+打开仓库只读取索引，字段数组按需以 mmap 方式映射，启动几乎没有开销；
+任意股票的历史（一列）和任意日期的截面（一行）都是数组视图，不复制数据。
+
+目录结构：
+    warehouse/
+        meta.json        # 字段、类型、形状、股票代码
+        dates.npy        # datetime64[D] 交易日
+        fields/close.npy # (交易日数, 股票数)
+"""
+
+import glob
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+WAREHOUSE_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount', 'turn', 'pctChg',
+                    'peTTM', 'pbMRQ', 'psTTM', 'tradestatus', 'isST')
+META_FILE = 'meta.json'
+DATES_FILE = 'dates.npy'
+FIELDS_DIR = 'fields'
+
+
+def _read_csv_source(csv_dir: str, columns: Sequence[str]) -> Iterable[Tuple[str, pd.DataFrame]]:
+    """逐个读取 get_stock_data.Downloader 输出的 {代码}.{名称}.csv，只解析需要的列"""
+    for path in sorted(glob.glob(os.path.join(csv_dir, '*.csv'))):
+        try:
+            header = pd.read_csv(path, nrows=0).columns
+            usecols = [c for c in ('code', *columns) if c in header]
+            df = pd.read_csv(path, usecols=usecols, dtype={'code': str, 'date': str})
+        except Exception as e:
+            print(f"⚠️ 读取 {path} 失败: {e}")
+            continue
+        if df.empty or 'date' not in df.columns:
+            continue
+        name = os.path.basename(path)
+        code = str(df['code'].iloc[0]) if 'code' in df.columns else '.'.join(name.split('.')[:2])
+        yield code, df
+
+
+def _read_dataset_source(dataset_dir: str, columns: Sequence[str]) -> Iterable[Tuple[str, pd.DataFrame]]:
+    """逐个读取 BulkDownloader 输出的分区数据集"""
+    from backtesting.get_stock_data import BAOSTOCK_COLUMNS, DATASET_KLINE_TYPE
+    from utils.kline_store import PartitionedKLineStore
+
+    store = PartitionedKLineStore(dataset_dir, columns=BAOSTOCK_COLUMNS, date_col='date')
+    for code in store.list_symbols(DATASET_KLINE_TYPE):
+        df = store.read(DATASET_KLINE_TYPE, code)
+        if not df.empty:
+            yield code, df
+
+
+def _parse_dates(df: pd.DataFrame) -> np.ndarray:
+    return pd.to_datetime(df['date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+def _swap_in(tmp_dir: str, output_dir: str):
+    """
+    用新生成的目录替换旧仓库
+
+    先把旧仓库改名到 .old，再把新目录改名为仓库目录，最后删除旧仓库。
+    两次改名之间仓库目录短暂不存在；如果在此期间中断，下次生成时会先从 .old 恢复旧仓库。
+    """
+    old_dir = f"{output_dir.rstrip(os.sep)}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _restore_previous(output_dir: str):
+    """上次替换在两次改名之间中断时，把 .old 中的旧仓库恢复回来"""
+    old_dir = f"{output_dir.rstrip(os.sep)}.old"
+    if not os.path.exists(output_dir) and os.path.isdir(old_dir):
+        os.replace(old_dir, output_dir)
+
+
+def build_warehouse(output_dir: str,
+                    csv_dir: Optional[str] = None,
+                    dataset_dir: Optional[str] = None,
+                    frames: Optional[Dict[str, pd.DataFrame]] = None,
+                    fields: Sequence[str] = WAREHOUSE_FIELDS,
+                    dtype: str = 'float64') -> 'PriceWarehouse':
+    """
+    把逐股票数据打包成价格仓库（整体重建，完成后替换旧仓库）
+    数据源读取两遍：第一遍只取日期确定数组形状，第二遍逐只股票写入，内存占用与单只股票的数据量相当
+
+    Args:
+        output_dir: 仓库目录
+        csv_dir: get_stock_data.Downloader 的CSV输出目录
+        dataset_dir: BulkDownloader 的数据集目录
+        frames: 直接提供的 {股票代码: DataFrame}，需包含 date 列
+        fields: 需要打包的字段
+        dtype: 数组类型，数据量大时可用 float32 减半占用
+    """
+    if frames is not None:
+        read_source = lambda columns: iter(frames.items())
+    elif dataset_dir is not None:
+        read_source = lambda columns: _read_dataset_source(dataset_dir, columns)
+    elif csv_dir is not None:
+        read_source = lambda columns: _read_csv_source(csv_dir, columns)
+    else:
+        raise ValueError("需要提供 csv_dir、dataset_dir 或 frames 之一")
+
+    # 第一遍：收集股票代码和全部交易日
+    all_dates = []
+    codes = set()
+    for code, df in read_source(['date']):
+        codes.add(str(code))
+        all_dates.append(np.unique(_parse_dates(df)))
+    symbols = sorted(codes)
+    symbol_index = {s: j for j, s in enumerate(symbols)}
+    dates = np.unique(np.concatenate(all_dates)) if all_dates else np.empty(0, dtype='datetime64[D]')
+    dates = dates[~np.isnat(dates)]
+    shape = (len(dates), len(symbols))
+
+    # 第二遍：按股票写入各字段的内存映射数组
+    _restore_previous(output_dir)
+    tmp_dir = f"{output_dir.rstrip(os.sep)}.building"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, FIELDS_DIR))
+    np.save(os.path.join(tmp_dir, DATES_FILE), dates)
+    arrays = {}
+    for name in fields:
+        arr = np.lib.format.open_memmap(os.path.join(tmp_dir, FIELDS_DIR, f'{name}.npy'), mode='w+',
+                                        dtype=dtype, shape=shape)
+        arr[:] = np.nan
+        arrays[name] = arr
+    for code, df in read_source(['date', *fields]):
+        code_dates = _parse_dates(df)
+        valid = ~np.isnat(code_dates)
+        rows = np.searchsorted(dates, code_dates[valid])
+        j = symbol_index[str(code)]
+        for name in fields:
+            if name in df.columns:
+                arrays[name][rows, j] = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)[valid]
+    for arr in arrays.values():
+        arr.flush()
+    del arrays
+
+    meta = {
+        'fields': list(fields),
+        'dtype': str(np.dtype(dtype)),
+        'shape': list(shape),
+        'symbols': symbols,
+        'built_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    _swap_in(tmp_dir, output_dir)
+    print(f"✅ 价格仓库已生成: {len(symbols)} 只股票 × {len(dates)} 个交易日, {len(fields)} 个字段")
+    return PriceWarehouse(output_dir)
+
+
+class PriceWarehouse:
+    """内存映射的价格仓库（只读）"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        with open(os.path.join(root_dir, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.fields: List[str] = self.meta['fields']
+        self.symbols: List[str] = self.meta['symbols']
+        self.dates: np.ndarray = np.load(os.path.join(root_dir, DATES_FILE))
+        self._symbol_index = {s: j for j, s in enumerate(self.symbols)}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.dates), len(self.symbols)
+
+    def array(self, field: str) -> np.ndarray:
+        """字段的 (交易日数, 股票数) 内存映射数组"""
+        if field not in self._arrays:
+            if field not in self.fields:
+                raise KeyError(f"仓库中没有字段 '{field}'")
+            self._arrays[field] = np.load(os.path.join(self.root_dir, FIELDS_DIR, f'{field}.npy'), mmap_mode='r')
+        return self._arrays[field]
+
+    def symbol_index(self, symbol: str) -> int:
+        if symbol not in self._symbol_index:
+            raise KeyError(f"仓库中没有股票 '{symbol}'")
+        return self._symbol_index[symbol]
+
+    def date_index(self, date, asof: bool = True) -> int:
+        """
+        日期在仓库中的位置
+
+        Args:
+            asof: True 时返回不晚于该日期的最近交易日（时点查询），False 时要求精确匹配
+        """
+        day = np.datetime64(pd.Timestamp(date).date(), 'D')
+        pos = int(np.searchsorted(self.dates, day, side='right')) - 1
+        if pos < 0 or (not asof and self.dates[pos] != day):
+            raise KeyError(f"仓库中没有日期 {date} 的数据")
+        return pos
+
+    def _date_slice(self, start=None, end=None) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start).date(), 'D')))
+        hi = len(self.dates) if end is None else int(np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(end).date(), 'D'), side='right'))
+        return slice(lo, hi)
+
+    def history(self, symbol: str, fields: Optional[Sequence[str]] = None,
+                start=None, end=None) -> Dict[str, np.ndarray]:
+        """
+        单只股票的历史数据（数组视图，不复制），包含 'date' 和各字段
+        只保留该股票第一条到最后一条有效收盘价之间的日期
+        """
+        j = self.symbol_index(symbol)
+        window = self._date_slice(start, end)
+        close = self.array('close')[window, j]
+        valid = np.flatnonzero(~np.isnan(close))
+        if len(valid) == 0:
+            window = slice(window.start, window.start)
+        else:
+            window = slice(window.start + valid[0], window.start + valid[-1] + 1)
+        out = {'date': self.dates[window]}
+        for name in fields or self.fields:
+            out[name] = self.array(name)[window, j]
+        return out
+
+    def cross_section(self, date, fields: Optional[Sequence[str]] = None, asof: bool = True) -> Dict[str, np.ndarray]:
+        """某个交易日全部股票的截面数据（数组视图，不复制），顺序与 self.symbols 一致"""
+        i = self.date_index(date, asof=asof)
+        return {name: self.array(name)[i] for name in fields or self.fields}
+
+    def frame(self, symbol: str, fields: Optional[Sequence[str]] = None, start=None, end=None,
+              dropna: bool = True) -> pd.DataFrame:
+        """
+        单只股票的DataFrame，列为 date 和各字段，可直接用于 SimpleBacktest.run_backtest、
+        run_vectorized_backtest 和 get_indicators
+
+        Args:
+            dropna: 是否去掉收盘价缺失（停牌等）的日期
+        """
+        data = self.history(symbol, fields, start, end)
+        df = pd.DataFrame({name: np.asarray(values) for name, values in data.items()})
+        df['date'] = pd.to_datetime(df['date'])
+        if dropna and 'close' in df.columns:
+            df = df[df['close'].notna()].reset_index(drop=True)
+        return df
+
+    def panel(self, symbols: Optional[Sequence[str]] = None, end=None, bars: Optional[int] = None):
+        """
+        多只股票截至 end 的数据，整理成 indicator_panel.KLinePanel（每只股票去掉缺失后左对齐），
+        用于 compute_panel 批量计算技术指标和风险指标
+
+        Args:
+            bars: 每只股票最多保留的最近K线数量
+        """
+        from utils.indicator_panel import KLinePanel
+
+        symbols = list(symbols) if symbols is not None else self.symbols
+        columns = [self.symbol_index(s) for s in symbols]
+        window = self._date_slice(None, end)
+        if bars is not None:
+            window = slice(max(window.stop - bars, 0), window.stop)
+
+        fields = [f for f in ('open', 'high', 'low', 'close', 'volume', 'amount') if f in self.fields]
+        close = np.asarray(self.array('close')[window][:, columns], dtype=float).T
+        # 去掉缺失的日期后左对齐：有效值排在前面，保持时间顺序
+        order = np.argsort(np.isnan(close), axis=1, kind='stable')
+        lengths = (~np.isnan(close)).sum(axis=1)
+        arrays = {name: np.take_along_axis(np.asarray(self.array(name)[window][:, columns], dtype=float).T,
+                                           order, axis=1)
+                  for name in fields}
+        dates = self.dates[window]
+        last_dates = np.full(len(symbols), np.datetime64('NaT'), dtype='datetime64[D]')
+        has_data = lengths > 0
+        if has_data.any():
+            last_idx = order[np.flatnonzero(has_data), lengths[has_data] - 1]
+            last_dates[has_data] = dates[last_idx]
+        return KLinePanel(symbols=np.asarray(symbols), lengths=lengths, fields=arrays,
+                          last_dates=pd.to_datetime(last_dates).to_numpy())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='打包本地价格仓库')
+    parser.add_argument('--csv_dir', type=str, default=None, help='get_stock_data.py 的CSV输出目录')
+    parser.add_argument('--dataset_dir', type=str, default=None, help='批量下载的数据集目录')
+    parser.add_argument('--output_dir', type=str, default='/app/data/warehouse/', help='仓库目录')
+    parser.add_argument('--dtype', type=str, default='float64', help='数组类型（float64/float32）')
+    args = parser.parse_args()
+
+    build_warehouse(args.output_dir, csv_dir=args.csv_dir or (None if args.dataset_dir else '/app/data/stockdata/'),
+                    dataset_dir=args.dataset_dir, dtype=args.dtype)
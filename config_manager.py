@@ -43,6 +43,7 @@ class ConfigManager:
                 'BASE_URL': 'https://api.deepseek.com',
                 'TIMEOUT': 60,
                 'MAX_RETRIES': 3,
+                'MAX_CONCURRENCY': 5,
                 'DEFAULT_MODEL': 'deepseek-chat',
                 'INFERENCE_MODEL': 'deepseek-chat',
                 'DEFAULT_TEMPERATURE': 0.7
@@ -54,10 +55,14 @@ class ConfigManager:
             },
             'LLM_CACHE': {
                 'ENABLE_CACHE': False,
-                'CACHE_TTL': 3600
+                'CACHE_TTL': 3600,
+                'CACHE_DIR': 'data/cache/llm_responses',
+                'MAX_SIZE_MB': 200
             },
             'MARKET': {
-                'ENABLE_NEWS': True
+                'ENABLE_NEWS': True,
+                'REFRESH_WORKERS': 6,
+                'REFRESH_TIMEOUT': 60
             }
         }
     
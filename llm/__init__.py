@@ -3,12 +3,22 @@ LLM模块 - 大语言模型相关功能
 包含OpenAI客户端、使用记录等功能
 """
 
-from .openai_client import OpenAIClient
+from .openai_client import OpenAIClient, AsyncOpenAIClient
 from .usage_logger import UsageLogger
+from .response_cache import ResponseCache
+from .token_budget import TokenBudgetPacker, PromptSection, count_tokens
+from .prompt_layout import build_messages, prefix_fingerprint
 
 __all__ = [
     'OpenAIClient',
-    'UsageLogger'
+    'AsyncOpenAIClient',
+    'UsageLogger',
+    'ResponseCache',
+    'TokenBudgetPacker',
+    'PromptSection',
+    'count_tokens',
+    'build_messages',
+    'prefix_fingerprint'
 ]
 
 # 版本信息
@@ -1,20 +1,25 @@
 """
 OpenAI API 增强封装
-包含 token 使用记录、配置管理、错误处理等功能
+包含 token 使用记录、配置管理、错误处理等功能，以及支持并发请求的异步客户端
 """
+import asyncio
 import time
 import logging
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
-from openai import OpenAI
+from typing import List, Dict, Any, Iterator, Optional, Union
+from openai import AsyncOpenAI, BadRequestError, OpenAI
 from openai.types.chat import ChatCompletion
 
 # 添加项目根目录到路径，以便导入配置管理器
 sys.path.append(str(Path(__file__).parent.parent))
 from config_manager import config
-from .usage_logger import UsageLogger
+from .usage_logger import UsageLogger, get_cached_tokens
+from .response_cache import ResponseCache
+from .prompt_layout import prefix_fingerprint
+from .token_budget import count_tokens
 
 # 配置日志
 logging.basicConfig(
@@ -23,16 +28,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class OpenAIClient:
-    """增强的 OpenAI API 客户端"""
+class BaseLLMClient:
+    """
+    OpenAI API 客户端的公共部分
+    
+    配置读取、响应缓存、请求构建和使用记录由同步客户端 OpenAIClient 与异步客户端
+    AsyncOpenAIClient 共用，两者各自实现 ask/chat（同步方法与协程的接口不同）。
+    """
     
-    def __init__(self, api_key: Optional[str] = None, usage_logger: Optional[UsageLogger] = None):
+    def __init__(self, api_key: Optional[str] = None, usage_logger: Optional[UsageLogger] = None,
+                 response_cache: Optional[ResponseCache] = None, base_url: Optional[str] = None):
         """
-        初始化 OpenAI 客户端
+        初始化配置、使用记录器和响应缓存
         
         Args:
             api_key: API 密钥，如果为空则从配置文件读取
             usage_logger: 使用记录器，如果为空则自动创建
+            response_cache: 响应缓存，如果为空则按 LLM_CACHE 配置创建（未启用时不缓存）
+            base_url: API 地址，如果为空则从配置文件读取
         """
         # 从配置获取API密钥
         self.api_key = api_key or config.get('LLM_OPENAI.API_KEY')
@@ -41,16 +54,14 @@ class OpenAIClient:
         
         # 获取其他配置
         openai_config = config.get_openai_config()
-        base_url = openai_config.get('BASE_URL')
+        base_url = base_url or openai_config.get('BASE_URL')
         timeout = openai_config.get('TIMEOUT', 60)
         max_retries = openai_config.get('MAX_RETRIES', 3)
         
-        # 初始化 OpenAI 客户端
-        kwargs = {'api_key': self.api_key, 'timeout': timeout, 'max_retries': max_retries}
+        # OpenAI 客户端参数，由子类创建对应的同步或异步客户端
+        self._client_kwargs = {'api_key': self.api_key, 'timeout': timeout, 'max_retries': max_retries}
         if base_url:
-            kwargs['base_url'] = base_url
-        
-        self.client = OpenAI(**kwargs)
+            self._client_kwargs['base_url'] = base_url
         
         # 初始化使用记录器
         if config.get('LLM_LOGGING.ENABLE_LOGGING', True):
@@ -62,11 +73,207 @@ class OpenAIClient:
         else:
             self.usage_logger = None
         
+        # 初始化响应缓存
+        if response_cache is not None:
+            self.response_cache = response_cache
+        elif config.get('LLM_CACHE.ENABLE_CACHE', False):
+            cache_dir = Path(config.get('LLM_CACHE.CACHE_DIR', 'data/cache/llm_responses'))
+            if not cache_dir.is_absolute():
+                cache_dir = Path(__file__).parent.parent / cache_dir
+            self.response_cache = ResponseCache(
+                str(cache_dir),
+                ttl=config.get('LLM_CACHE.CACHE_TTL', 3600),
+                max_size_mb=config.get('LLM_CACHE.MAX_SIZE_MB', 200)
+            )
+        else:
+            self.response_cache = None
+        
         # 默认参数
         self.default_model = openai_config.get('DEFAULT_MODEL', 'deepseek-chat')
         self.inference_model = openai_config.get('INFERENCE_MODEL', 'deepseek-chat')
         self.default_temperature = openai_config.get('DEFAULT_TEMPERATURE', 0.7)
+    
+    def _resolve_model(self, model: Optional[str], model_type: Optional[str],
+                       temperature: Optional[float]):
+        """根据model_type选择默认模型，未指定温度时使用默认温度"""
+        if model is None:
+            if model_type == "inference":
+                model = self.inference_model
+            else:
+                model = self.default_model
+        return model, temperature or self.default_temperature
+    
+    def _build_request(self, prompt: str, model: str, temperature: float, max_tokens: Optional[int],
+                       system_message: Optional[str], messages: Optional[List[Dict[str, str]]],
+                       json_mode: bool):
+        """构建消息列表和请求参数"""
+        # 构建消息列表
+        if messages is None:
+            messages = []
+            if system_message:
+                messages.append({"role": "system", "content": system_message})
+            messages.append({"role": "user", "content": prompt})
+        
+        # 构建请求参数
+        kwargs = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature
+        }
+        if max_tokens:
+            kwargs['max_tokens'] = max_tokens
+        
+        # 如果启用了JSON模式，设置response_format
+        if json_mode:
+            kwargs['response_format'] = {"type": "json_object"}
+            # 在JSON模式下，确保系统消息中包含JSON指令
+            if not any(msg.get('role') == 'system' for msg in messages):
+                messages.insert(0, {"role": "system", "content": "You must respond with valid JSON."})
+            elif not any('json' in msg.get('content', '').lower() for msg in messages if msg.get('role') == 'system'):
+                # 如果已有系统消息但不包含JSON指令，则追加
+                for msg in messages:
+                    if msg.get('role') == 'system':
+                        msg['content'] += " You must respond with valid JSON."
+                        break
+        return messages, kwargs
+    
+    def _handle_response(self, response: ChatCompletion, cache_key: Optional[str], model: str, prompt: str,
+                         messages: List[Dict[str, str]], temperature: float, start_time: float, debug: bool) -> str:
+        """提取回复内容，写入缓存并记录使用情况"""
+        # 获取回复内容
+        content = response.choices[0].message.content
+        usage_data = response.usage.model_dump() if response.usage else {}
+        return self._record_success(content, usage_data, cache_key, model, prompt, messages,
+                                    temperature, start_time, debug)
+    
+    def _record_success(self, content: str, usage_data: Dict[str, Any], cache_key: Optional[str], model: str,
+                        prompt: str, messages: List[Dict[str, str]], temperature: float,
+                        start_time: float, debug: bool) -> str:
+        """写入缓存并记录一次成功的请求"""
+        # 计算响应时间
+        response_time = time.time() - start_time
+        
+        if cache_key is not None and content:
+            self.response_cache.set(cache_key, content, usage_data, model)
+        
+        # 记录使用情况
+        if self.usage_logger:
+            input_text = prompt if not messages else str(messages)
+            
+            self.usage_logger.log_usage(
+                model=model,
+                usage_data=usage_data,
+                input_text=input_text,
+                output_text=content,
+                response_time=response_time,
+                temperature=temperature,
+                success=True,
+                prompt_fingerprint=prefix_fingerprint(messages)
+            )
+        
+        # 调试输出
+        if debug:
+            print(f"模型: {model}")
+            print(f"输入: {prompt}")
+            print(f"输出: {content}")
+            print(f"Token使用: {usage_data or 'N/A'}")
+            print(f"响应时间: {response_time:.2f}秒")
+        
+        logger.info(f"API调用成功，模型: {model}, tokens: {usage_data.get('total_tokens', 'N/A')}, "
+                    f"命中提示词缓存: {get_cached_tokens(usage_data)}")
+        
+        return content
+    
+    def _log_failure(self, model: str, prompt: str, messages: Optional[List[Dict[str, str]]],
+                     temperature: float, start_time: float, error_message: str):
+        """记录失败的请求"""
+        response_time = time.time() - start_time
+        
+        # 记录错误
+        if self.usage_logger:
+            input_text = prompt if not messages else str(messages)
+            self.usage_logger.log_usage(
+                model=model,
+                usage_data={},
+                input_text=input_text,
+                output_text="",
+                response_time=response_time,
+                temperature=temperature,
+                success=False,
+                error_message=error_message,
+                prompt_fingerprint=prefix_fingerprint(messages)
+            )
         
+        logger.error(f"API调用失败: {error_message}")
+    
+    def _cached_reply(self, cached: Dict[str, Any], model: str, prompt: str, messages: List[Dict[str, str]],
+                      temperature: float, start_time: float, debug: bool) -> str:
+        """返回缓存的回复，并记录为一次缓存命中"""
+        content = cached['content']
+        response_time = time.time() - start_time
+        if self.usage_logger:
+            self.usage_logger.log_usage(
+                model=model,
+                usage_data=cached.get('usage', {}),
+                input_text=prompt if not messages else str(messages),
+                output_text=content,
+                response_time=response_time,
+                temperature=temperature,
+                success=True,
+                cache_hit=True,
+                prompt_fingerprint=prefix_fingerprint(messages)
+            )
+        if debug:
+            print(f"模型: {model}（命中缓存）")
+            print(f"输入: {prompt}")
+            print(f"输出: {content}")
+        logger.info(f"命中响应缓存，模型: {model}, 节省tokens: {cached.get('usage', {}).get('total_tokens', 'N/A')}")
+        return content
+    
+    def get_usage_stats(self, days: int = 30) -> Dict[str, Any]:
+        """
+        获取使用统计
+        
+        Args:
+            days: 统计天数
+            
+        Returns:
+            统计信息
+        """
+        if self.usage_logger:
+            return self.usage_logger.get_usage_stats(days)
+        return {}
+    
+    def export_usage_report(self, output_file: str = "reports/usage_report.html"):
+        """
+        导出使用报告
+        
+        Args:
+            output_file: 输出文件路径
+        """
+        if self.usage_logger:
+            self.usage_logger.export_usage_report(output_file)
+
+
+class OpenAIClient(BaseLLMClient):
+    """增强的 OpenAI API 客户端"""
+    
+    def __init__(self, api_key: Optional[str] = None, usage_logger: Optional[UsageLogger] = None,
+                 response_cache: Optional[ResponseCache] = None, base_url: Optional[str] = None):
+        """
+        初始化 OpenAI 客户端
+        
+        Args:
+            api_key: API 密钥，如果为空则从配置文件读取
+            usage_logger: 使用记录器，如果为空则自动创建
+            response_cache: 响应缓存，如果为空则按 LLM_CACHE 配置创建（未启用时不缓存）
+            base_url: API 地址，如果为空则从配置文件读取
+        """
+        super().__init__(api_key=api_key, usage_logger=usage_logger,
+                         response_cache=response_cache, base_url=base_url)
+        self.client = OpenAI(**self._client_kwargs)
+        # 部分 OpenAI 兼容服务不支持流式请求的 stream_options，首次被拒绝后不再发送
+        self.stream_usage_supported = True
         logger.info("OpenAI 客户端初始化完成")
     
     def ask(self, 
@@ -78,7 +285,9 @@ class OpenAIClient:
             system_message: Optional[str] = None,
             messages: Optional[List[Dict[str, str]]] = None,
             json_mode: bool = False,
-            debug: bool = False) -> str:
+            debug: bool = False,
+            use_cache: bool = True,
+            stream: bool = False) -> Union[str, Iterator[str]]:
         """
         发送聊天请求
         
@@ -92,108 +301,122 @@ class OpenAIClient:
             messages: 完整的消息列表（如果提供，将覆盖prompt和system_message）
             json_mode: 是否强制返回JSON格式
             debug: 是否打印调试信息
+            use_cache: 是否使用响应缓存（启用缓存时有效），输入完全相同的请求直接返回缓存结果
+            stream: 是否流式输出，为True时返回逐段产出回复文本的生成器（见 _stream）
             
         Returns:
-            AI回复内容
+            AI回复内容；流式输出时为回复片段的生成器
         """
-        start_time = time.time()
+        if stream:
+            return self._stream(prompt, model, model_type, temperature, max_tokens, system_message,
+                                messages, json_mode, debug, use_cache)
         
-        # 根据model_type选择默认模型
-        if model is None:
-            if model_type == "inference":
-                model = self.inference_model
-            else:
-                model = self.default_model
-                
-        # 使用默认温度
-        temperature = temperature or self.default_temperature
+        start_time = time.time()
+        model, temperature = self._resolve_model(model, model_type, temperature)
         
         try:
-            # 构建消息列表
-            if messages is None:
-                messages = []
-                if system_message:
-                    messages.append({"role": "system", "content": system_message})
-                messages.append({"role": "user", "content": prompt})
+            messages, kwargs = self._build_request(prompt, model, temperature, max_tokens,
+                                                   system_message, messages, json_mode)
             
-            # 构建请求参数
-            kwargs = {
-                'model': model,
-                'messages': messages,
-                'temperature': temperature
-            }
-            if max_tokens:
-                kwargs['max_tokens'] = max_tokens
-            
-            # 如果启用了JSON模式，设置response_format
-            if json_mode:
-                kwargs['response_format'] = {"type": "json_object"}
-                # 在JSON模式下，确保系统消息中包含JSON指令
-                if not any(msg.get('role') == 'system' for msg in messages):
-                    messages.insert(0, {"role": "system", "content": "You must respond with valid JSON."})
-                elif not any('json' in msg.get('content', '').lower() for msg in messages if msg.get('role') == 'system'):
-                    # 如果已有系统消息但不包含JSON指令，则追加
-                    for msg in messages:
-                        if msg.get('role') == 'system':
-                            msg['content'] += " You must respond with valid JSON."
-                            break
+            # 查询响应缓存
+            cache_key = None
+            if self.response_cache is not None and use_cache:
+                cache_key = ResponseCache.make_key(model, messages, temperature, json_mode, max_tokens)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return self._cached_reply(cached, model, prompt, messages, temperature, start_time, debug)
             
             # 发送请求
             response: ChatCompletion = self.client.chat.completions.create(**kwargs)
-            
-            # 计算响应时间
-            response_time = time.time() - start_time
-            
-            # 获取回复内容
-            content = response.choices[0].message.content
-            
-            # 记录使用情况
-            if self.usage_logger:
-                usage_data = response.usage.model_dump() if response.usage else {}
-                input_text = prompt if not messages else str(messages)
-                
-                self.usage_logger.log_usage(
-                    model=model,
-                    usage_data=usage_data,
-                    input_text=input_text,
-                    output_text=content,
-                    response_time=response_time,
-                    temperature=temperature,
-                    success=True
-                )
-            
-            # 调试输出
-            if debug:
-                print(f"模型: {model}")
-                print(f"输入: {prompt}")
-                print(f"输出: {content}")
-                print(f"Token使用: {response.usage.model_dump() if response.usage else 'N/A'}")
-                print(f"响应时间: {response_time:.2f}秒")
-            
-            logger.info(f"API调用成功，模型: {model}, tokens: {response.usage.total_tokens if response.usage else 'N/A'}")
-            
-            return content
+            return self._handle_response(response, cache_key, model, prompt, messages, temperature, start_time, debug)
             
         except Exception as e:
-            response_time = time.time() - start_time
-            error_message = str(e)
+            self._log_failure(model, prompt, messages, temperature, start_time, str(e))
+            raise
+    
+    def _stream(self, prompt: str, model: Optional[str], model_type: Optional[str],
+                temperature: Optional[float], max_tokens: Optional[int], system_message: Optional[str],
+                messages: Optional[List[Dict[str, str]]], json_mode: bool, debug: bool,
+                use_cache: bool) -> Iterator[str]:
+        """
+        流式请求：边接收边产出回复片段
+        
+        请求在开始迭代时才发出；全部接收完成后写入缓存并按服务端返回的用量记录使用情况
+        （服务端不支持 stream_options 或未返回用量时按token数估算），
+        命中缓存时一次性产出缓存的回复。迭代中途停止或出错时关闭连接并记为失败。
+        """
+        start_time = time.time()
+        model, temperature = self._resolve_model(model, model_type, temperature)
+        response_stream = None
+        
+        try:
+            messages, kwargs = self._build_request(prompt, model, temperature, max_tokens,
+                                                   system_message, messages, json_mode)
             
-            # 记录错误
-            if self.usage_logger:
-                input_text = prompt if not messages else str(messages)
-                self.usage_logger.log_usage(
-                    model=model,
-                    usage_data={},
-                    input_text=input_text,
-                    output_text="",
-                    response_time=response_time,
-                    temperature=temperature,
-                    success=False,
-                    error_message=error_message
-                )
+            cache_key = None
+            cached = None
+            if self.response_cache is not None and use_cache:
+                cache_key = ResponseCache.make_key(model, messages, temperature, json_mode, max_tokens)
+                cached = self.response_cache.get(cache_key)
+        except Exception as e:
+            self._log_failure(model, prompt, messages, temperature, start_time, str(e))
+            raise
+        
+        if cached is not None:
+            yield self._cached_reply(cached, model, prompt, messages, temperature, start_time, debug)
+            return
+        
+        try:
+            response_stream = self._create_stream(kwargs)
+            parts = []
+            usage_data = {}
+            for chunk in response_stream:
+                if chunk.usage:
+                    usage_data = chunk.usage.model_dump()
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
             
-            logger.error(f"API调用失败: {error_message}")
+            content = ''.join(parts)
+            if not usage_data:
+                usage_data = self._estimate_usage(messages, content, model)
+            self._record_success(content, usage_data, cache_key, model, prompt, messages,
+                                 temperature, start_time, debug)
+        
+        except GeneratorExit:
+            self._log_failure(model, prompt, messages, temperature, start_time, "流式输出被中断")
+            raise
+        except Exception as e:
+            self._log_failure(model, prompt, messages, temperature, start_time, str(e))
             raise
+        finally:
+            if response_stream is not None:
+                response_stream.close()
+    
+    def _create_stream(self, kwargs: Dict[str, Any]):
+        """发出流式请求；服务端拒绝 stream_options 时去掉该参数重试"""
+        if self.stream_usage_supported:
+            try:
+                # include_usage 让服务端在最后一个数据块中返回本次请求的token用量
+                return self.client.chat.completions.create(
+                    stream=True, stream_options={"include_usage": True}, **kwargs)
+            except BadRequestError as e:
+                logger.warning(f"服务端不支持 stream_options，改为不带该参数的流式请求，token用量按估算记录: {e}")
+                self.stream_usage_supported = False
+        return self.client.chat.completions.create(stream=True, **kwargs)
+    
+    @staticmethod
+    def _estimate_usage(messages: List[Dict[str, str]], content: str, model: str) -> Dict[str, Any]:
+        """服务端未返回用量时按token数估算"""
+        prompt_tokens = sum(count_tokens(m.get('content', ''), model) for m in messages)
+        completion_tokens = count_tokens(content, model)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
     
     def chat(self, 
              messages: List[Dict[str, str]], 
@@ -202,7 +425,9 @@ class OpenAIClient:
              temperature: Optional[float] = None,
              max_tokens: Optional[int] = None,
              json_mode: bool = False,
-             debug: bool = False) -> str:
+             debug: bool = False,
+             use_cache: bool = True,
+             stream: bool = False) -> Union[str, Iterator[str]]:
         """
         多轮对话
         
@@ -214,9 +439,11 @@ class OpenAIClient:
             max_tokens: 最大token数
             json_mode: 是否强制返回JSON格式
             debug: 是否打印调试信息
+            use_cache: 是否使用响应缓存
+            stream: 是否流式输出
             
         Returns:
-            AI回复内容
+            AI回复内容；流式输出时为回复片段的生成器
         """
         return self.ask(
             prompt="",  # 这里prompt为空，因为使用messages
@@ -226,32 +453,184 @@ class OpenAIClient:
             max_tokens=max_tokens,
             messages=messages,
             json_mode=json_mode,
-            debug=debug
+            debug=debug,
+            use_cache=use_cache,
+            stream=stream
         )
+
+
+class AsyncOpenAIClient(BaseLLMClient):
+    """
+    异步 OpenAI API 客户端
     
-    def get_usage_stats(self, days: int = 30) -> Dict[str, Any]:
+    配置、响应缓存和使用记录与 OpenAIClient 相同（见 BaseLLMClient），ask/chat 为协程；
+    ask_many 同时发出多个请求，并发数由信号量限制（LLM_OPENAI.MAX_CONCURRENCY），
+    每个请求可单独设置超时，超时或被取消的请求会中断对应的HTTP连接并记为失败。
+    同步代码中使用 gather 一次性执行多个请求。
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, usage_logger: Optional[UsageLogger] = None,
+                 response_cache: Optional[ResponseCache] = None, base_url: Optional[str] = None,
+                 max_concurrency: Optional[int] = None, request_timeout: Optional[float] = None):
         """
-        获取使用统计
+        初始化异步客户端
         
         Args:
-            days: 统计天数
-            
-        Returns:
-            统计信息
+            max_concurrency: 同时进行的最大请求数，如果为空则从配置读取（默认5）
+            request_timeout: 单个请求的默认超时时间（秒，从取得并发名额开始计时，不含排队等待），为空表示不限制
+            其余参数同 OpenAIClient
         """
-        if self.usage_logger:
-            return self.usage_logger.get_usage_stats(days)
-        return {}
+        super().__init__(api_key=api_key, usage_logger=usage_logger,
+                         response_cache=response_cache, base_url=base_url)
+        self.client: Optional[AsyncOpenAI] = None
+        self.max_concurrency = max(1, int(max_concurrency or config.get('LLM_OPENAI.MAX_CONCURRENCY', 5)))
+        self.request_timeout = request_timeout
+        # 底层客户端和信号量都绑定事件循环，按当前事件循环创建
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        logger.info("异步 OpenAI 客户端初始化完成")
     
-    def export_usage_report(self, output_file: str = "reports/usage_report.html"):
+    def _bind_loop(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self.client = AsyncOpenAI(**self._client_kwargs)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.client
+    
+    async def ask(self, 
+                  prompt: str, 
+                  model: Optional[str] = None, 
+                  model_type: Optional[str] = "default",
+                  temperature: Optional[float] = None, 
+                  max_tokens: Optional[int] = None,
+                  system_message: Optional[str] = None,
+                  messages: Optional[List[Dict[str, str]]] = None,
+                  json_mode: bool = False,
+                  debug: bool = False,
+                  use_cache: bool = True,
+                  timeout: Optional[float] = None) -> str:
         """
-        导出使用报告
+        发送聊天请求（协程），参数同 OpenAIClient.ask
         
         Args:
-            output_file: 输出文件路径
+            timeout: 超时时间（秒，不含排队等待），为空时使用 request_timeout
+        
+        Raises:
+            asyncio.TimeoutError: 请求超时
         """
-        if self.usage_logger:
-            self.usage_logger.export_usage_report(output_file)
+        start_time = time.time()
+        model, temperature = self._resolve_model(model, model_type, temperature)
+        timeout = timeout if timeout is not None else self.request_timeout
+        client = self._bind_loop()
+        semaphore = self._semaphore
+        
+        try:
+            messages, kwargs = self._build_request(prompt, model, temperature, max_tokens,
+                                                   system_message, messages, json_mode)
+            
+            cache_key = None
+            if self.response_cache is not None and use_cache:
+                cache_key = ResponseCache.make_key(model, messages, temperature, json_mode, max_tokens)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return self._cached_reply(cached, model, prompt, messages, temperature, start_time, debug)
+            
+            # 先取得并发名额再计时，超时只限制请求本身，排队等待的时间不计入
+            async with semaphore:
+                response: ChatCompletion = await asyncio.wait_for(client.chat.completions.create(**kwargs), timeout)
+            return self._handle_response(response, cache_key, model, prompt, messages, temperature, start_time, debug)
+        
+        except asyncio.TimeoutError:
+            self._log_failure(model, prompt, messages, temperature, start_time, f"请求超时（{timeout}秒）")
+            raise
+        except asyncio.CancelledError:
+            self._log_failure(model, prompt, messages, temperature, start_time, "请求已取消")
+            raise
+        except Exception as e:
+            self._log_failure(model, prompt, messages, temperature, start_time, str(e))
+            raise
+    
+    async def chat(self, 
+                   messages: List[Dict[str, str]], 
+                   model: Optional[str] = None,
+                   model_type: Optional[str] = "default",
+                   temperature: Optional[float] = None,
+                   max_tokens: Optional[int] = None,
+                   json_mode: bool = False,
+                   debug: bool = False,
+                   use_cache: bool = True,
+                   timeout: Optional[float] = None) -> str:
+        """多轮对话（协程），参数同 OpenAIClient.chat"""
+        return await self.ask(
+            prompt="",
+            model=model,
+            model_type=model_type,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            messages=messages,
+            json_mode=json_mode,
+            debug=debug,
+            use_cache=use_cache,
+            timeout=timeout
+        )
+    
+    async def ask_many(self, requests: List[Dict[str, Any]], timeout: Optional[float] = None,
+                       return_exceptions: bool = True) -> List[Union[str, BaseException]]:
+        """
+        同时发出多个请求，最多 max_concurrency 个同时进行
+        
+        Args:
+            requests: 请求参数列表，每项为 ask 的关键字参数，例如
+                {'messages': [...], 'temperature': 0.5, 'model_type': 'inference'}
+            timeout: 每个请求的超时时间（秒，不含排队等待），请求参数中的 timeout 优先
+            return_exceptions: True 时失败的请求在结果中以异常对象返回，不影响其他请求；
+                False 时任一请求失败即取消其余请求并抛出异常
+        
+        Returns:
+            与 requests 顺序一致的回复内容（或异常）
+        """
+        tasks = []
+        for request in requests:
+            request = dict(request)
+            request.setdefault('prompt', "")
+            request.setdefault('timeout', timeout)
+            tasks.append(asyncio.ensure_future(self.ask(**request)))
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    def gather(self, requests: List[Dict[str, Any]], timeout: Optional[float] = None,
+               return_exceptions: bool = True) -> List[Union[str, BaseException]]:
+        """
+        在同步代码中执行 ask_many（新建事件循环，执行完毕后关闭连接）
+        当前线程已有运行中的事件循环时，在单独的线程中执行
+        """
+        async def run():
+            try:
+                return await self.ask_many(requests, timeout=timeout, return_exceptions=return_exceptions)
+            finally:
+                await self.aclose()
+        
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(run())
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-gather") as executor:
+            return executor.submit(asyncio.run, run()).result()
+    
+    async def aclose(self):
+        """关闭当前事件循环上的HTTP连接"""
+        if self.client is not None:
+            await self.client.close()
+        self.client = None
+        self._loop = None
+        self._semaphore = None
+
 
 # 示例和测试
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+"""
+提示词布局
+服务商的提示词缓存（如 DeepSeek 上下文硬盘缓存、OpenAI Prompt Caching）按请求前缀匹配，
+前缀完全相同的部分才能命中。因此提示词统一组织为：
+  固定前缀（system：角色、核心原则、分析重点、输出格式）+ 可变数据（user：股票信息、行情、新闻等）
+固定前缀中不能出现股票名称、日期等可变内容。
+
+前缀指纹用于在使用记录中区分不同的提示词前缀，便于按前缀统计缓存命中情况。
+"""
+import hashlib
+from typing import Dict, List, Optional
+
+
+def build_messages(prefix: str, content: str) -> List[Dict[str, str]]:
+    """
+    按固定前缀 + 可变数据构建消息列表
+
+    Args:
+        prefix: 固定前缀（系统消息），同一类分析每次请求都应完全相同
+        content: 可变数据（用户消息）
+    """
+    return [
+        {"role": "system", "content": prefix},
+        {"role": "user", "content": content}
+    ]
+
+
+def prefix_fingerprint(messages: Optional[List[Dict[str, str]]]) -> str:
+    """提示词前缀指纹：开头连续的系统消息内容的SHA-256前12位，没有系统消息时为空"""
+    prefix = []
+    for message in messages or []:
+        if message.get('role') != 'system':
+            break
+        prefix.append(message.get('content', ''))
+    if not prefix:
+        return ""
+    return hashlib.sha256("\n".join(prefix).encode('utf-8')).hexdigest()[:12]
@@ -0,0 +1,160 @@
+"""
+LLM 响应缓存
+以请求内容的哈希（模型、消息、温度、JSON模式、最大token数）为键持久化保存回复，
+输入完全相同的请求直接返回缓存结果，不再调用API。
+
+每条缓存一个JSON文件，按键的前两位分目录存放；
+过期按写入时间判断，超出容量时按最近访问时间（文件修改时间）淘汰最旧的条目。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """按请求内容寻址的LLM响应缓存"""
+
+    def __init__(self, cache_dir: str = "data/cache/llm_responses", ttl: float = 3600,
+                 max_size_mb: float = 200):
+        """
+        初始化响应缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl: 缓存有效期（秒），0 表示永不过期
+            max_size_mb: 缓存总大小上限（MB），超出时淘汰最久未访问的条目
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float,
+                 json_mode: bool = False, max_tokens: Optional[int] = None) -> str:
+        """由请求参数生成缓存键（SHA-256）"""
+        payload = json.dumps({
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'json_mode': json_mode,
+            'max_tokens': max_tokens,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        Returns:
+            {'content', 'usage', 'model', 'created_at'}，未命中或已过期时返回 None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取响应缓存失败: {e}")
+            return None
+
+        if self.ttl and time.time() - entry.get('created_at', 0) > self.ttl:
+            self._remove(path)
+            return None
+        try:
+            # 修改时间记录最近访问，容量淘汰时据此判断
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def set(self, key: str, content: str, usage: Optional[Dict[str, Any]] = None, model: str = ""):
+        """写入缓存（先写临时文件再替换，避免读到不完整的内容）"""
+        path = self._path(key)
+        entry = {'content': content, 'usage': usage or {}, 'model': model, 'created_at': time.time()}
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"写入响应缓存失败: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - old_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _entries(self) -> List[Tuple[Path, os.stat_result]]:
+        entries = []
+        for path in self.cache_dir.glob('*/*.json'):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict(self):
+        """按最近访问时间从旧到新删除，直到总大小降到上限的90%"""
+        entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        target = self.max_size * 0.9
+        removed = 0
+        for path, stat in entries:
+            if size <= target:
+                break
+            if self._remove(path):
+                size -= stat.st_size
+                removed += 1
+        self._size = size
+        logger.info(f"响应缓存超出容量，淘汰 {removed} 条")
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"删除响应缓存失败: {e}")
+            return False
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for path, _ in self._entries():
+                self._remove(path)
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存条目数和占用空间"""
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'size_mb': sum(stat.st_size for _, stat in entries) / 1024 / 1024,
+            'max_size_mb': self.max_size / 1024 / 1024,
+            'ttl': self.ttl,
+        }
@@ -0,0 +1,204 @@
+"""
+提示词 token 预算
+用 tiktoken 计算提示词各部分的token数，按优先级分配预算：
+各部分先压到自身上限以内，总量仍超出预算时从优先级最低的部分开始压缩（先提炼摘要，再截断），
+使每次请求的提示词长度、耗时和成本可预期。
+
+tiktoken 不可用（未安装或编码文件无法下载）时按字符数估算token数。
+"""
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+TRUNCATION_MARK = "\n…（内容过长，已截断）"
+
+_encodings = {}
+_encoding_lock = threading.Lock()
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+
+def _get_encoding(model: Optional[str] = None):
+    """获取模型对应的编码，未知模型使用 cl100k_base；加载失败时返回 None（结果会被缓存）"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    key = model or DEFAULT_ENCODING
+    with _encoding_lock:
+        if key not in _encodings:
+            encoding = None
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+                except KeyError:
+                    encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            except Exception as e:
+                logger.warning(f"加载tiktoken编码失败，按字符数估算token: {e}")
+            _encodings[key] = encoding
+        return _encodings[key]
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符估算token数：中日韩字符约1个token，其他字符约4个字符1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """计算文本的token数"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class PromptSection:
+    """提示词中的一个部分"""
+    name: str
+    text: str
+    priority: int = 0  # 数值越大越重要，预算不足时先压缩优先级低的部分
+    max_tokens: Optional[int] = None  # 该部分的token上限，为空表示不单独限制
+    min_tokens: int = 0  # 总量超出预算时至少保留的token数（不超过该部分上限）
+
+
+@dataclass
+class PackResult:
+    """预算分配结果"""
+    texts: Dict[str, str]
+    tokens_before: Dict[str, int]
+    tokens_after: Dict[str, int]
+    budget: int
+
+    @property
+    def total_before(self) -> int:
+        return sum(self.tokens_before.values())
+
+    @property
+    def total_after(self) -> int:
+        return sum(self.tokens_after.values())
+
+
+class TokenBudgetPacker:
+    """按优先级把提示词各部分压缩到总token预算以内"""
+
+    def __init__(self, budget: int, model: Optional[str] = None):
+        """
+        Args:
+            budget: 各部分合计的token预算，0 表示不限制总量（仍按各部分上限压缩）
+            model: 模型名称，用于选择tiktoken编码
+        """
+        self.budget = budget
+        self.model = model
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def pack(self, sections: List[PromptSection]) -> PackResult:
+        """
+        分配预算并压缩各部分
+
+        Returns:
+            PackResult，texts 为压缩后的各部分文本
+        """
+        before = {s.name: self.count(s.text) for s in sections}
+
+        # 1. 各部分先压到自身上限以内
+        allocation = {}
+        for s in sections:
+            allocation[s.name] = before[s.name] if s.max_tokens is None else min(before[s.name], s.max_tokens)
+
+        # 2. 总量仍超出预算时，从优先级最低的一组开始，按各部分可压缩的量等比例压缩
+        excess = sum(allocation.values()) - self.budget if self.budget else 0
+        for priority in sorted({s.priority for s in sections}):
+            if excess <= 0:
+                break
+            group = [s for s in sections if s.priority == priority]
+            reducible = {s.name: max(0, allocation[s.name] - s.min_tokens) for s in group}
+            total_reducible = sum(reducible.values())
+            if total_reducible <= 0:
+                continue
+            cut = min(excess, total_reducible)
+            for s in group:
+                reduction = -(-cut * reducible[s.name] // total_reducible)  # 向上取整
+                reduction = min(reduction, reducible[s.name])
+                allocation[s.name] -= reduction
+            excess = sum(allocation.values()) - self.budget
+
+        texts = {}
+        after = {}
+        for s in sections:
+            if allocation[s.name] >= before[s.name]:
+                texts[s.name] = s.text
+            else:
+                texts[s.name] = self.shrink(s.text, allocation[s.name])
+            after[s.name] = self.count(texts[s.name])
+
+        return PackResult(texts=texts, tokens_before=before, tokens_after=after, budget=self.budget)
+
+    def shrink(self, text: str, max_tokens: int) -> str:
+        """
+        把文本压缩到 max_tokens 以内
+
+        预算不到原文一半时先提炼摘要（保留标题和每段首句），仍超出再截断
+        """
+        if max_tokens <= 0:
+            return ""
+        tokens = self.count(text)
+        if tokens <= max_tokens:
+            return text
+        if max_tokens * 2 < tokens:
+            condensed = self.condense(text)
+            if self.count(condensed) <= max_tokens:
+                return condensed
+            text = condensed
+        return self.truncate(text, max_tokens)
+
+    @staticmethod
+    def condense(text: str) -> str:
+        """抽取式摘要：保留标题行，其余每段只保留首句"""
+        lines = []
+        for paragraph in re.split(r'\n\s*\n', text.strip()):
+            for line in paragraph.splitlines():
+                stripped = line.strip()
+                if not stripped:
+                    continue
+                if stripped.startswith('#'):
+                    lines.append(stripped)
+                    continue
+                sentence = re.split(r'(?<=[。！？；!?;])|(?<=\.)\s', stripped, maxsplit=1)[0]
+                lines.append(sentence)
+                break
+        return "\n".join(lines)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断到 max_tokens 以内（含截断标记），尽量在换行处截断"""
+        available = max_tokens - self.count(TRUNCATION_MARK)
+        if available <= 0:
+            return ""
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count(text[:mid]) <= available:
+                low = mid
+            else:
+                high = mid - 1
+        prefix = text[:low]
+        newline = prefix.rfind('\n')
+        if newline >= len(prefix) * 0.8:
+            prefix = prefix[:newline]
+        return prefix.rstrip() + TRUNCATION_MARK
@@ -1,12 +1,55 @@
 """
 OpenAI API 使用记录管理器
 """
+import threading
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any
 import logging
 
+# 并发调用（如报告并行生成）时保证CSV逐行追加
+_write_lock = threading.Lock()
+
+LOG_COLUMNS = [
+    'timestamp',
+    'model',
+    'prompt_tokens',
+    'completion_tokens',
+    'total_tokens',
+    'cost_estimate',
+    'temperature',
+    'input_text',
+    'output_text',
+    'response_time',
+    'success',
+    'error_message',
+    'cache_hit',
+    'saved_tokens',
+    'cached_tokens',
+    'prompt_fingerprint'
+]
+
+# 旧版日志文件缺少的列及其默认值
+_COLUMN_DEFAULTS = {
+    'cache_hit': False,
+    'saved_tokens': 0,
+    'cached_tokens': 0,
+    'prompt_fingerprint': ''
+}
+
+
+def get_cached_tokens(usage_data: Dict[str, Any]) -> int:
+    """
+    从用量数据中取出命中服务商提示词缓存的输入token数
+    OpenAI 为 prompt_tokens_details.cached_tokens，DeepSeek 为 prompt_cache_hit_tokens
+    """
+    details = usage_data.get('prompt_tokens_details') or {}
+    cached = details.get('cached_tokens') if isinstance(details, dict) else None
+    if cached is None:
+        cached = usage_data.get('prompt_cache_hit_tokens')
+    return int(cached or 0)
+
 class UsageLogger:
     """OpenAI API 使用记录器"""
     
@@ -20,28 +63,32 @@ class UsageLogger:
         self.log_file = Path(log_file)
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
         
-        # 初始化CSV文件（如果不存在）
+        # 初始化CSV文件（如果不存在），旧版文件补齐新增的列
         if not self.log_file.exists():
             self._init_csv()
+        else:
+            self._upgrade_csv()
     
     def _init_csv(self):
         """初始化CSV文件，创建列标题"""
-        df = pd.DataFrame(columns=[
-            'timestamp',
-            'model',
-            'prompt_tokens',
-            'completion_tokens', 
-            'total_tokens',
-            'cost_estimate',
-            'temperature',
-            'input_text',
-            'output_text',
-            'response_time',
-            'success',
-            'error_message'
-        ])
+        df = pd.DataFrame(columns=LOG_COLUMNS)
         df.to_csv(self.log_file, index=False)
     
+    def _upgrade_csv(self):
+        """旧版日志缺少缓存相关的列时补齐，保证追加的记录与列标题对齐"""
+        try:
+            header = pd.read_csv(self.log_file, nrows=0).columns
+            missing = [c for c in LOG_COLUMNS if c not in header]
+            if not missing:
+                return
+            with _write_lock:
+                df = pd.read_csv(self.log_file)
+                for column in missing:
+                    df[column] = _COLUMN_DEFAULTS.get(column, '')
+                df[LOG_COLUMNS].to_csv(self.log_file, index=False)
+        except Exception as e:
+            logging.error(f"升级使用记录文件失败: {e}")
+    
     def log_usage(self, 
                   model: str,
                   usage_data: Dict[str, Any],
@@ -50,10 +97,14 @@ class UsageLogger:
                   response_time: float,
                   temperature: float = 0.7,
                   success: bool = True,
-                  error_message: str = ""):
+                  error_message: str = "",
+                  cache_hit: bool = False,
+                  prompt_fingerprint: str = ""):
         """
         记录API使用情况
         
+        命中响应缓存的请求不消耗token，usage_data 为缓存时原请求的用量，记入 saved_tokens
+        
         Args:
             model: 使用的模型名称
             usage_data: 使用数据（token信息）
@@ -63,7 +114,13 @@ class UsageLogger:
             temperature: 温度参数
             success: 是否成功
             error_message: 错误信息
+            cache_hit: 是否命中响应缓存
+            prompt_fingerprint: 提示词前缀指纹（见 llm.prompt_layout），用于按前缀统计服务商缓存命中
         """
+        saved_tokens = usage_data.get('total_tokens', 0) if cache_hit else 0
+        if cache_hit:
+            usage_data = {}
+        
         # 估算成本（基于OpenAI定价，仅供参考）
         cost_estimate = self._estimate_cost(model, usage_data)
         
@@ -80,14 +137,22 @@ class UsageLogger:
             'output_text': self._truncate_text(output_text, 500),
             'response_time': response_time,
             'success': success,
-            'error_message': error_message
+            'error_message': error_message,
+            'cache_hit': cache_hit,
+            'saved_tokens': saved_tokens,
+            'cached_tokens': get_cached_tokens(usage_data),
+            'prompt_fingerprint': prompt_fingerprint
         }
         
         # 追加到CSV文件
-        df = pd.DataFrame([record])
-        df.to_csv(self.log_file, mode='a', header=False, index=False)
+        df = pd.DataFrame([record], columns=LOG_COLUMNS)
+        with _write_lock:
+            df.to_csv(self.log_file, mode='a', header=False, index=False)
         
-        logging.info(f"记录API使用: {model}, tokens: {usage_data.get('total_tokens', 0)}, 成本: ${cost_estimate:.4f}")
+        if cache_hit:
+            logging.info(f"记录缓存命中: {model}, 节省tokens: {saved_tokens}")
+        else:
+            logging.info(f"记录API使用: {model}, tokens: {usage_data.get('total_tokens', 0)}, 成本: ${cost_estimate:.4f}")
     
     def _estimate_cost(self, model: str, usage_data: Dict[str, Any]) -> float:
         """
@@ -145,6 +210,8 @@ class UsageLogger:
             if recent_df.empty:
                 return {}
             
+            cache_hits = recent_df['cache_hit'].astype(str).str.lower() == 'true'
+            
             stats = {
                 'total_requests': len(recent_df),
                 'total_tokens': recent_df['total_tokens'].sum(),
@@ -152,7 +219,33 @@ class UsageLogger:
                 'avg_response_time': recent_df['response_time'].mean(),
                 'success_rate': recent_df['success'].mean(),
                 'model_distribution': recent_df['model'].value_counts().to_dict(),
-                'daily_usage': recent_df.groupby(recent_df['timestamp'].dt.date)['total_tokens'].sum().to_dict()
+                'daily_usage': recent_df.groupby(recent_df['timestamp'].dt.date)['total_tokens'].sum().to_dict(),
+                'cache_hits': int(cache_hits.sum()),
+                'cache_hit_rate': float(cache_hits.mean()),
+                'tokens_saved': int(recent_df['saved_tokens'].fillna(0).sum())
+            }
+            
+            # 服务商提示词缓存：命中缓存的输入token占比，按前缀指纹分别统计
+            cached_tokens = recent_df['cached_tokens'].fillna(0)
+            prompt_tokens = recent_df['prompt_tokens'].fillna(0)
+            stats['cached_tokens'] = int(cached_tokens.sum())
+            stats['prompt_cache_rate'] = float(cached_tokens.sum() / prompt_tokens.sum()) if prompt_tokens.sum() else 0.0
+            fingerprints = recent_df['prompt_fingerprint'].fillna('').astype(str)
+            by_prefix = pd.DataFrame({
+                'fingerprint': fingerprints, 'prompt_tokens': prompt_tokens, 'cached_tokens': cached_tokens
+            })[(fingerprints != '') & (prompt_tokens > 0)].groupby('fingerprint').agg(
+                requests=('prompt_tokens', 'size'),
+                prompt_tokens=('prompt_tokens', 'sum'),
+                cached_tokens=('cached_tokens', 'sum')
+            )
+            stats['prefix_cache_stats'] = {
+                fingerprint: {
+                    'requests': int(row.requests),
+                    'prompt_tokens': int(row.prompt_tokens),
+                    'cached_tokens': int(row.cached_tokens),
+                    'cache_rate': float(row.cached_tokens / row.prompt_tokens)
+                }
+                for fingerprint, row in by_prefix.iterrows()
             }
             
             return stats
@@ -17,7 +17,7 @@ if PROJECT_ROOT not in sys.path:
 warnings.filterwarnings('ignore')
 
 from ui.config import INDEX_SYMBOL_MAPPING
-from utils.kline_cache import cache_manager, KLineData
+from utils.kline_cache import cache_manager, KLineData, KLineType
 
 
 class KLineDataManager:
@@ -27,28 +27,37 @@ class KLineDataManager:
         """初始化K线数据管理器"""
         self.index_mapping = INDEX_SYMBOL_MAPPING
     
-    def fetch_index_kline_raw(self, index_name: str, period: int = 250) -> pd.DataFrame:
+    def fetch_index_kline_raw(self, index_name: str, period: int = 250,
+                              start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
         """
         从akshare获取原始K线数据
         
         Args:
             index_name: 指数名称
-            period: 获取的数据条数
+            period: 获取的数据条数（未指定日期范围时使用）
+            start_date: 开始日期 'YYYY-MM-DD'，指定时只请求该日期范围
+            end_date: 结束日期 'YYYY-MM-DD'
             
         Returns:
-            pd.DataFrame: 原始K线数据
+            pd.DataFrame: 原始K线数据（指定日期范围且无新数据时为空）
         """
         if index_name not in self.index_mapping:
             raise ValueError(f"不支持的指数名称: {index_name}")
         
         symbol = self.index_mapping[index_name]
-        df_raw = ak.stock_zh_index_daily(symbol=symbol)
-        
-        if df_raw.empty:
-            raise ValueError(f"无法获取{index_name}数据")
         
-        # 取最近的数据
-        df_raw = df_raw.tail(period).copy()
+        if start_date or end_date:
+            df_raw = self._fetch_index_kline_range(symbol, start_date, end_date)
+            if df_raw.empty:
+                return df_raw
+        else:
+            df_raw = ak.stock_zh_index_daily(symbol=symbol)
+            
+            if df_raw.empty:
+                raise ValueError(f"无法获取{index_name}数据")
+            
+            # 取最近的数据
+            df_raw = df_raw.tail(period).copy()
         
         # 数据类型转换
         numeric_columns = ['open', 'high', 'low', 'close', 'volume']
@@ -62,6 +71,52 @@ class KLineDataManager:
         
         return df_raw
     
+    def _fetch_index_kline_range(self, symbol: str, start_date: Optional[str], end_date: Optional[str]) -> pd.DataFrame:
+        """按日期范围获取指数日线，东方财富接口不可用时退回新浪全量数据再按日期截取"""
+        start = (start_date or '1990-01-01')[:10]
+        end = (end_date or '2050-01-01')[:10]
+        columns = ['date', 'open', 'high', 'low', 'close', 'volume']
+        
+        try:
+            df_raw = ak.stock_zh_index_daily_em(symbol=symbol, start_date=start.replace('-', ''), end_date=end.replace('-', ''))
+        except Exception as e:
+            print(f"⚠️  按日期范围获取{symbol}失败，改为全量获取: {e}")
+            df_raw = ak.stock_zh_index_daily(symbol=symbol)
+            if not df_raw.empty:
+                dates = pd.to_datetime(df_raw['date']).dt.strftime('%Y-%m-%d')
+                df_raw = df_raw[(dates >= start) & (dates <= end)]
+        
+        if df_raw is None or df_raw.empty:
+            return pd.DataFrame(columns=columns)
+        return df_raw[[c for c in columns if c in df_raw.columns]].reset_index(drop=True)
+    
+    def fetch_index_kline_incremental(self, index_name: str, period: int = 250) -> int:
+        """
+        增量更新指数K线缓存：只请求缓存中缺失的日期范围，合并到已有缓存
+        
+        Returns:
+            int: 新获取的K线条数
+        """
+        missing_ranges = cache_manager.analyze_missing_ranges(index_name, KLineType.INDEX_DAY, period)
+        if missing_ranges is None:
+            # 无法判断缺失范围时按无缓存处理，重新拉取完整窗口
+            missing_ranges = [cache_manager.full_window_range(KLineType.INDEX_DAY, period)]
+        
+        frames = []
+        for start_date, end_date in missing_ranges:
+            df_raw = self.fetch_index_kline_raw(index_name, period, start_date=start_date, end_date=end_date)
+            if not df_raw.empty:
+                frames.append(df_raw)
+        
+        if not frames:
+            return 0
+        
+        df_new = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        cache_manager.update_kline_frame(index_name, KLineType.INDEX_DAY, self.convert_to_cache_frame(df_new, index_name))
+        ranges_text = ", ".join(f"{start}~{end}" for start, end in missing_ranges)
+        print(f"🔄 增量获取{index_name}K线数据: {len(df_new)}条 [{ranges_text}]")
+        return len(df_new)
+    
     def convert_to_kline_data_list(self, df: pd.DataFrame, index_name: str) -> List[KLineData]:
         """
         将DataFrame转换为KLineData列表
@@ -149,6 +204,66 @@ class KLineDataManager:
         
         return df
     
+    def convert_to_cache_frame(self, df: pd.DataFrame, index_name: str) -> pd.DataFrame:
+        """
+        将akshare原始K线DataFrame整体转换为缓存格式（列与KLineData字段一致）
+        
+        Args:
+            df: K线数据DataFrame
+            index_name: 指数名称
+            
+        Returns:
+            pd.DataFrame: 缓存格式的K线数据
+        """
+        if 'date' in df.columns:
+            dates = pd.to_datetime(df['date'], errors='coerce')
+            date_str = dates.dt.strftime('%Y-%m-%d').fillna(datetime.now().strftime('%Y-%m-%d'))
+        else:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+        
+        return pd.DataFrame({
+            'symbol': index_name,
+            'datetime': date_str,
+            'open': df['open'].astype(float),
+            'high': df['high'].astype(float),
+            'low': df['low'].astype(float),
+            'close': df['close'].astype(float),
+            'volume': df['volume'].astype('int64'),
+            'amount': None,
+            'fetch_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'data_type': 'index',
+        })
+    
+    def convert_from_cache_frame(self, cached_df: pd.DataFrame,
+                                 for_technical_analysis: bool = False) -> pd.DataFrame:
+        """
+        将缓存读出的K线DataFrame转换为与convert_from_kline_data_list一致的格式
+        
+        Args:
+            cached_df: 缓存中的K线数据
+            for_technical_analysis: 是否用于技术分析（影响索引设置）
+            
+        Returns:
+            pd.DataFrame: K线数据DataFrame
+        """
+        df = pd.DataFrame({
+            'date': pd.to_datetime(cached_df['datetime'].str.split().str[0]),
+            'datetime': cached_df['datetime'],
+            'open': cached_df['open'],
+            'high': cached_df['high'],
+            'low': cached_df['low'],
+            'close': cached_df['close'],
+            'volume': cached_df['volume'],
+        })
+        if cached_df['amount'].notna().any():
+            df['amount'] = cached_df['amount']
+        
+        # 如果是用于技术分析，设置date为索引
+        if for_technical_analysis:
+            df = df.set_index('date')
+        
+        return df
+    
     def get_index_kline_data(self, index_name: str, period: int = 250, 
                            use_cache: bool = True, force_refresh: bool = False,
                            for_technical_analysis: bool = False) -> Tuple[pd.DataFrame, bool]:
@@ -169,23 +284,33 @@ class KLineDataManager:
         
         # 尝试从缓存获取
         if use_cache and not force_refresh:
-            cached_data = cache_manager.get_cached_index_kline(index_name, period)
-            if cached_data and len(cached_data) >= min(period, 30):
-                print(f"📋 使用缓存的K线数据: {index_name} ({len(cached_data)}条)")
-                df = self.convert_from_kline_data_list(cached_data, for_technical_analysis)
+            cached_df = cache_manager.get_cached_kline_frame(index_name, KLineType.INDEX_DAY, period)
+            if cached_df is not None and len(cached_df) >= min(period, 30):
+                print(f"📋 使用缓存的K线数据: {index_name} ({len(cached_df)}条)")
+                df = self.convert_from_cache_frame(cached_df, for_technical_analysis)
                 # 确保数据量符合要求
                 df = df.tail(period)
                 from_cache = True
                 return df, from_cache
         
+        # 有缓存时只增量获取缺失的日期范围
+        if use_cache and not force_refresh:
+            try:
+                self.fetch_index_kline_incremental(index_name, period)
+                cached_df = cache_manager.get_cached_kline_frame(index_name, KLineType.INDEX_DAY, period)
+                if cached_df is not None and len(cached_df) >= min(period, 30):
+                    df = self.convert_from_cache_frame(cached_df, for_technical_analysis)
+                    return df.tail(period), from_cache
+            except Exception as e:
+                print(f"⚠️  增量获取{index_name}K线数据失败，改为全量获取: {e}")
+        
         # 从网络获取最新数据
         print(f"📡 获取最新K线数据: {index_name}")
         df_raw = self.fetch_index_kline_raw(index_name, period * 2)  # 多取一些数据以备缓存
         
         # 转换为KLineData列表并缓存
         if use_cache:
-            kline_data_list = self.convert_to_kline_data_list(df_raw, index_name)
-            cache_manager.cache_index_kline(index_name, kline_data_list)
+            cache_manager.cache_kline_frame(index_name, KLineType.INDEX_DAY, self.convert_to_cache_frame(df_raw, index_name))
         
         # 准备返回的DataFrame
         df = df_raw.tail(period).copy()
@@ -213,16 +338,10 @@ class KLineDataManager:
         try:
             print(f"🔄 更新{index_name}缓存数据...")
             
-            # 获取原始数据
-            df_raw = self.fetch_index_kline_raw(index_name, period)
-            
-            # 转换为KLineData列表
-            kline_data_list = self.convert_to_kline_data_list(df_raw, index_name)
-            
-            # 更新缓存（智能合并）
-            cache_manager.update_index_kline(index_name, kline_data_list)
+            # 只获取缓存中缺失的日期范围并合并
+            new_count = self.fetch_index_kline_incremental(index_name, period)
             
-            print(f"   ✓ 成功更新{index_name}缓存数据: {len(kline_data_list)}条")
+            print(f"   ✓ 成功更新{index_name}缓存数据: 新增{new_count}条")
             return True
             
         except Exception as e:
@@ -1,5 +1,6 @@
-from typing import Dict, Any, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from llm.openai_client import OpenAIClient
+from llm.prompt_layout import build_messages
 import datetime
 import sys
 import os
@@ -11,14 +12,18 @@ if project_dir not in sys.path:
 from market.market_formatters import MarketTextFormatter
 from config_manager import config
 
-def generate_index_analysis_report(
+# 指数分析使用的模型参数
+INDEX_ANALYSIS_TEMPERATURE = 0.3  # 降低温度，确保输出更简洁一致
+INDEX_ANALYSIS_MODEL_TYPE = "inference"
+
+
+def build_index_analysis_messages(
     stock_code: str,
     stock_name: str,
     market_report_data: Dict[str, Any],
     user_opinion: str = ''
-) -> Tuple[str, str]:
-    """生成指数AI分析报告"""
-    client = OpenAIClient()
+) -> List[Dict[str, str]]:
+    """构建指数AI分析请求消息，市场数据格式化失败时抛出 ValueError"""
     core_data = market_report_data
     
     # 使用统一的格式化函数
@@ -27,8 +32,7 @@ def generate_index_analysis_report(
             core_data, stock_name
         )
     except Exception as e:
-        error_msg = f"格式化市场数据失败: {str(e)}"
-        return False, error_msg, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        raise ValueError(f"格式化市场数据失败: {str(e)}") from e
     
     # 根据新闻功能是否启用调整系统消息
     news_enabled = config.is_market_news_enabled()
@@ -56,7 +60,8 @@ def generate_index_analysis_report(
 2. **用户观点整合**
 - 如有用户观点，简要评价其合理性与风险点"""
     
-    system_message = f"""你是一位资深的投资顾问和市场分析师。请基于{data_sources}，对{stock_name}（{stock_code}）提供精炼的投资决策分析。
+    # 系统消息只包含固定内容（不含指数名称等可变数据），各指数共用同一前缀以命中服务商的提示词缓存
+    system_message = f"""你是一位资深的投资顾问和市场分析师。请基于{data_sources}，对用户指定的指数提供精炼的投资决策分析。
 
 请严格按照以下结构输出，内容务必简洁、聚焦决策：
 
@@ -97,19 +102,37 @@ def generate_index_analysis_report(
         f.write(system_message + "\n\n")
         f.write(user_message)
     print(f'req length {len(user_message)}')
-    # return False, user_message, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # 注释掉调试返回 
+
+    return build_messages(system_message, user_message)
+
+
+def generate_index_analysis_report(
+    stock_code: str,
+    stock_name: str,
+    market_report_data: Dict[str, Any],
+    user_opinion: str = '',
+    on_delta: Optional[Callable[[str], None]] = None
+) -> Tuple[bool, str, str]:
+    """生成指数AI分析报告，返回 (是否成功, 报告或错误信息, 时间)；提供 on_delta 时流式输出"""
+    client = OpenAIClient()
+    try:
+        messages = build_index_analysis_messages(stock_code, stock_name, market_report_data, user_opinion)
+    except ValueError as e:
+        return False, str(e), datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     try:
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ]
-        
         response = client.chat(
             messages=messages,
-            temperature=0.3,  # 降低温度，确保输出更简洁一致
-            model_type="inference"
+            temperature=INDEX_ANALYSIS_TEMPERATURE,
+            model_type=INDEX_ANALYSIS_MODEL_TYPE,
+            stream=on_delta is not None
         )
+        if on_delta is not None:
+            parts = []
+            for delta in response:
+                parts.append(delta)
+                on_delta(delta)
+            response = ''.join(parts)
         
         now = datetime.datetime.now()
         timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
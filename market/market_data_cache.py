@@ -7,16 +7,21 @@
 3. 资金流向指标缓存
 4. 融资融券详细数据缓存
 
-支持不同数据类型的差异化过期策略
+支持不同数据类型的差异化过期策略；行情类数据（session_bound）在休市期间
+（收盘后、周末、节假日）按交易日历判断，收盘数据更新后获取的缓存在下次开盘前一直有效
 """
 
 import json
 import os
+import threading
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, date, time
 from typing import Dict, Optional, Any
 
+from utils.memory_cache import get_memory_cache
+from utils.trading_calendar import get_trading_calendar
+
 
 class NumpyJSONEncoder(json.JSONEncoder):
     """自定义JSON编码器，处理numpy、pandas和datetime数据类型"""
@@ -128,21 +133,27 @@ class MarketDataCache:
         
         os.makedirs(cache_dir, exist_ok=True)
         
+        # 并行刷新时多个数据源同时写入，读-改-写需串行执行，避免互相覆盖
+        self._write_lock = threading.RLock()
+        
         # 缓存配置
         self.cache_configs = {
-            'market_sentiment': {'expire_minutes': 15, 'description': '市场情绪指标', 'index_specific': False},
-            'comprehensive_sentiment': {'expire_minutes': 15, 'description': '综合市场情绪分析', 'index_specific': False},
-            'valuation_indicators': {'expire_minutes': 1440, 'description': '估值指标', 'index_specific': False},
-            'money_flow_indicators': {'expire_minutes': 43200, 'description': '资金流向指标', 'index_specific': False},
+            'market_sentiment': {'expire_minutes': 15, 'description': '市场情绪指标', 'index_specific': False, 'session_bound': True},
+            'comprehensive_sentiment': {'expire_minutes': 15, 'description': '综合市场情绪分析', 'index_specific': False, 'session_bound': True},
+            'valuation_indicators': {'expire_minutes': 1440, 'description': '估值指标', 'index_specific': False, 'session_bound': True},
+            'money_flow_indicators': {'expire_minutes': 43200, 'description': '资金流向指标', 'index_specific': False, 'session_bound': True},
             'margin_detail': {'expire_minutes': 60, 'description': '融资融券数据', 'index_specific': False},
-            'current_indices': {'expire_minutes': 5, 'description': '当前指数实时数据', 'index_specific': False},
+            'current_indices': {'expire_minutes': 5, 'description': '当前指数实时数据', 'index_specific': False, 'session_bound': True},
             'market_news': {'expire_minutes': 30, 'description': '市场新闻数据', 'index_specific': False},
             'ai_analysis': {'expire_minutes': 180, 'description': 'AI大盘分析', 'index_specific': True},
-            'technical_indicators': {'expire_minutes': 60, 'description': '技术指标数据', 'index_specific': True}
+            'technical_indicators': {'expire_minutes': 60, 'description': '技术指标数据', 'index_specific': True, 'session_bound': True}
         }
     
     def load_cache(self) -> Dict:
-        """加载缓存文件"""
+        """加载缓存文件（文件未变化时直接使用内存中的解析结果）"""
+        return dict(get_memory_cache().get(self.cache_file, self._read_cache_file))
+    
+    def _read_cache_file(self) -> Dict:
         try:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'r', encoding='utf-8') as f:
@@ -170,12 +181,17 @@ class MarketDataCache:
         try:
             # 预清理数据，确保所有NaN和无穷大值都被处理
             cleaned_data = NumpyJSONEncoder.clean_data(cache_data)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
+            # 先写临时文件再替换，并行读取时不会读到写了一半的文件
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(cleaned_data, f, ensure_ascii=False, indent=2, cls=NumpyJSONEncoder, allow_nan=False)
+            os.replace(tmp_file, self.cache_file)
         except Exception as e:
             import traceback
             traceback.print_exc()
             print(f"❌ 保存缓存失败: {e}")
+        finally:
+            get_memory_cache().invalidate(self.cache_file)
     
     def _get_cache_key(self, data_type: str, index_name: str = None) -> str:
         """生成缓存键名"""
@@ -199,10 +215,15 @@ class MarketDataCache:
             
             cache_meta = cache_data[cache_key].get('cache_meta', {})
             cache_time = datetime.fromisoformat(cache_meta['timestamp'])
-            expire_minutes = self.cache_configs[data_type]['expire_minutes']
-            expire_time = cache_time + timedelta(minutes=expire_minutes)
+            config = self.cache_configs[data_type]
+            expire_time = cache_time + timedelta(minutes=config['expire_minutes'])
             
-            return datetime.now() < expire_time
+            now = datetime.now()
+            if now < expire_time:
+                return True
+            
+            # 行情类数据：休市期间没有新的交易，收盘后获取的数据在下次开盘前仍然有效
+            return bool(config.get('session_bound')) and get_trading_calendar().data_unchanged_since(cache_time, now)
         except Exception:
             return False
     
@@ -211,7 +232,9 @@ class MarketDataCache:
         try:
             cache_key = self._get_cache_key(data_type, index_name)
             cache_data = self.load_cache()
-            return cache_data.get(cache_key, {}).get('data', {})
+            # 内存层中的对象是共享的，返回浅拷贝，调用方可直接补充字段
+            data = cache_data.get(cache_key, {}).get('data', {})
+            return dict(data) if isinstance(data, dict) else data
         except Exception:
             return {}
     
@@ -219,23 +242,24 @@ class MarketDataCache:
         """保存数据到缓存"""
         try:
             cache_key = self._get_cache_key(data_type, index_name)
-            cache_data = self.load_cache()
-            
-            cache_meta = {
-                'timestamp': datetime.now().isoformat(),
-                'data_type': data_type,
-                'expire_minutes': self.cache_configs[data_type]['expire_minutes']
-            }
-            
-            # 如果是指数相关数据，记录指数名称
-            if index_name and self.cache_configs[data_type].get('index_specific', False):
-                cache_meta['index_name'] = index_name
-            
-            cache_data[cache_key] = {
-                'cache_meta': cache_meta,
-                'data': data
-            }
-            self.save_cache(cache_data)
+            with self._write_lock:
+                cache_data = self.load_cache()
+                
+                cache_meta = {
+                    'timestamp': datetime.now().isoformat(),
+                    'data_type': data_type,
+                    'expire_minutes': self.cache_configs[data_type]['expire_minutes']
+                }
+                
+                # 如果是指数相关数据，记录指数名称
+                if index_name and self.cache_configs[data_type].get('index_specific', False):
+                    cache_meta['index_name'] = index_name
+                
+                cache_data[cache_key] = {
+                    'cache_meta': cache_meta,
+                    'data': data
+                }
+                self.save_cache(cache_data)
             description = self.cache_configs.get(data_type, {}).get('description', data_type)
             if index_name and self.cache_configs[data_type].get('index_specific', False):
                 print(f"💾 {description}({index_name})已缓存")
@@ -246,6 +270,10 @@ class MarketDataCache:
     
     def clear_cache(self, data_type: Optional[str] = None, index_name: str = None):
         """清理缓存"""
+        with self._write_lock:
+            self._clear_cache(data_type, index_name)
+    
+    def _clear_cache(self, data_type: Optional[str] = None, index_name: str = None):
         if data_type:
             if data_type not in self.cache_configs:
                 print(f"❌ 未知的数据类型: {data_type}")
@@ -287,6 +315,7 @@ class MarketDataCache:
             try:
                 if os.path.exists(self.cache_file):
                     os.remove(self.cache_file)
+                    get_memory_cache().invalidate(self.cache_file)
                     print("✅ 已清理所有缓存数据")
                 else:
                     print("ℹ️ 缓存文件不存在")
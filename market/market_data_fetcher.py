@@ -20,6 +20,7 @@ import akshare as ak
 from stock.stock_utils import get_indicators
 from ui.config import FOCUS_INDICES, INDEX_SYMBOL_MAPPING
 from market.kline_data_manager import get_kline_manager
+from utils.kline_cache import KLineType
 
 def fetch_market_sentiment() -> tuple:
     """获取市场情绪数据 - 优化版本，避免频繁请求导致IP被封"""
@@ -584,7 +585,7 @@ def fetch_index_technical_indicators(index_name: str = '上证指数', period: i
         )
         
         # 计算技术指标
-        indicators = get_indicators(df)
+        indicators = get_indicators(df, state_key=(index_name, KLineType.INDEX_DAY))
         
         # 风险指标计算
         risk_metrics = {}
@@ -4,7 +4,7 @@ import os
 import sys
 import warnings
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
@@ -22,8 +22,10 @@ from market.market_data_fetcher import (
     fetch_index_technical_indicators
 )
 from market.market_data_cache import get_cache_manager
+from market.refresh_executor import RefreshExecutor, RefreshReport, DEFAULT_MAX_WORKERS, DEFAULT_SOURCE_TIMEOUT
 from market.market_formatters import MarketTextFormatter
 from utils.news_tools import get_market_news_caixin
+from utils.single_flight import get_single_flight
 from config_manager import config
 
 
@@ -35,6 +37,18 @@ class MarketTools:
         self.cache_manager = get_cache_manager()
         self.cache_file = self.cache_manager.cache_file
         self.cache_configs = self.cache_manager.cache_configs
+        # 多个会话同时获取同一数据时只发出一次请求
+        self.single_flight = get_single_flight()
+    
+    def _fetch_and_cache(self, data_type: str, fetch_func, use_cache: bool, index_name: str = None) -> Dict:
+        """获取数据并写入缓存，并发的相同请求合并为一次"""
+        def fetch():
+            ret, data = fetch_func()
+            if use_cache and ret:
+                self.cache_manager.save_cached_data(data_type, data, index_name)
+            return data
+        
+        return self.single_flight.do((data_type, index_name or ''), fetch)
     
     def get_market_sentiment(self, use_cache: bool = True, force_refresh: bool = False, comprehensive: bool = False) -> Dict:
         """获取市场情绪指标
@@ -52,14 +66,8 @@ class MarketTools:
         
         print(f"📡 获取{'综合市场情绪分析' if comprehensive else '基础市场情绪'}...")
         try:
-            if comprehensive:
-                ret, data = fetch_comprehensive_market_sentiment()
-            else:
-                ret, data = fetch_market_sentiment()
-                
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data)
-            return data
+            fetch_func = fetch_comprehensive_market_sentiment if comprehensive else fetch_market_sentiment
+            return self._fetch_and_cache(data_type, fetch_func, use_cache)
         except Exception as e:
             print(f"❌ 获取市场情绪失败: {e}")
             return self.cache_manager.get_cached_data(data_type) if use_cache else {}
@@ -74,10 +82,7 @@ class MarketTools:
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
-            ret, data = fetch_valuation_data()
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data)
-            return data
+            return self._fetch_and_cache(data_type, fetch_valuation_data, use_cache)
         except Exception as e:
             print(f"❌ 获取估值数据失败: {e}")
             return self.cache_manager.get_cached_data(data_type) if use_cache else {}
@@ -203,10 +208,7 @@ class MarketTools:
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
-            ret, data = fetch_money_flow_data(debug=debug)
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data)
-            return data
+            return self._fetch_and_cache(data_type, lambda: fetch_money_flow_data(debug=debug), use_cache)
         except Exception as e:
             print(f"❌ 获取资金流向失败: {e}")
             return self.cache_manager.get_cached_data(data_type) if use_cache else {}
@@ -221,10 +223,7 @@ class MarketTools:
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
-            ret, data = fetch_margin_data_unified(include_historical=True)
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data)
-            return data
+            return self._fetch_and_cache(data_type, lambda: fetch_margin_data_unified(include_historical=True), use_cache)
         except Exception as e:
             print(f"❌ 获取融资融券失败: {e}")
             return self.cache_manager.get_cached_data(data_type) if use_cache else {}
@@ -239,10 +238,7 @@ class MarketTools:
         
         print(f"📡 获取{self.cache_configs[data_type]['description']}...")
         try:
-            ret, data = fetch_current_indices()
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data)
-            return data
+            return self._fetch_and_cache(data_type, fetch_current_indices, use_cache)
         except Exception as e:
             print(f"❌ 获取当前指数数据失败: {e}")
             return self.cache_manager.get_cached_data(data_type) if use_cache else {}
@@ -262,10 +258,7 @@ class MarketTools:
         
         print(f"📡 获取市场新闻数据...")
         try:
-            ret, data = get_market_news_caixin(debug=debug)
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data)
-            return data
+            return self._fetch_and_cache(data_type, lambda: get_market_news_caixin(debug=debug), use_cache)
         except Exception as e:
             print(f"❌ 获取市场新闻失败: {e}")
             return self.cache_manager.get_cached_data(data_type) if use_cache else {'error': str(e)}
@@ -290,14 +283,15 @@ class MarketTools:
         
         print(f"📡 获取技术指标: {index_name}...")
         try:
-            ret, data = fetch_index_technical_indicators(index_name)
-            print(f"📊 技术指标数据:")
-            # 转换numpy类型为Python原生类型以便JSON序列化
-            if data:
-                data = self._convert_numpy_types(data)
-            if use_cache and ret:
-                self.cache_manager.save_cached_data(data_type, data, index_name)
-            return data
+            def fetch_func():
+                ret, data = fetch_index_technical_indicators(index_name)
+                print(f"📊 技术指标数据:")
+                # 转换numpy类型为Python原生类型以便JSON序列化
+                if data:
+                    data = self._convert_numpy_types(data)
+                return ret, data
+            
+            return self._fetch_and_cache(data_type, fetch_func, use_cache, index_name)
         except Exception as e:
             print(f"❌ 获取技术指标失败: {e}")
             import traceback
@@ -321,13 +315,17 @@ class MarketTools:
             from market.kline_data_manager import get_kline_manager
             
             manager = get_kline_manager()
-            df, from_cache = manager.get_index_kline_data(
-                index_name, 
-                period=period, 
-                use_cache=use_cache, 
-                force_refresh=force_refresh,
-                for_technical_analysis=False
+            df, from_cache = self.single_flight.do(
+                ('index_kline', f"{index_name}:{period}"),
+                lambda: manager.get_index_kline_data(
+                    index_name, 
+                    period=period, 
+                    use_cache=use_cache, 
+                    force_refresh=force_refresh,
+                    for_technical_analysis=False
+                )
             )
+            df = df.copy()
             
             # 添加均线
             df = manager.add_moving_averages(df)
@@ -376,8 +374,9 @@ class MarketTools:
         else:
             return data
 
-    def get_ai_analysis(self, use_cache: bool = True, index_name: str = '上证指数', force_regenerate: bool = False, user_opinion: str = '') -> Dict:
-        """获取AI分析数据"""
+    def get_ai_analysis(self, use_cache: bool = True, index_name: str = '上证指数', force_regenerate: bool = False, user_opinion: str = '',
+                        on_delta: Optional[Callable[[str], None]] = None) -> Dict:
+        """获取AI分析数据（提供 on_delta 时新生成的报告流式输出）"""
         data_type = 'ai_analysis'
         
         # 检查缓存是否有效且不需要强制重新生成
@@ -394,7 +393,7 @@ class MarketTools:
                 print(f"🔄 用户观点已变化，重新生成AI分析: {index_name}")
                 print(f"   缓存观点: '{cached_user_opinion}' -> 当前观点: '{user_opinion}'")
         
-        return self._generate_ai_analysis(index_name, user_opinion)
+        return self._generate_ai_analysis(index_name, user_opinion, on_delta=on_delta)
         
     def clear_cache(self, data_type: Optional[str] = None, index_name: str = None):
         self.cache_manager.clear_cache(data_type, index_name)
@@ -405,21 +404,36 @@ class MarketTools:
     def print_cache_status(self):
         self.cache_manager.print_cache_status()
     
-    def refresh_all_cache(self):
+    def _get_refresh_executor(self, max_workers: Optional[int] = None, timeout: Optional[float] = None) -> RefreshExecutor:
+        """创建并行刷新执行器，未指定参数时读取配置 MARKET.REFRESH_WORKERS / MARKET.REFRESH_TIMEOUT"""
+        if max_workers is None:
+            max_workers = config.get('MARKET.REFRESH_WORKERS', DEFAULT_MAX_WORKERS)
+        if timeout is None:
+            timeout = config.get('MARKET.REFRESH_TIMEOUT', DEFAULT_SOURCE_TIMEOUT)
+        return RefreshExecutor(max_workers=max_workers, timeout=timeout)
+    
+    def refresh_all_cache(self, max_workers: Optional[int] = None, timeout: Optional[float] = None) -> RefreshReport:
+        """并行刷新所有市场数据缓存，返回各数据源的耗时和成功情况"""
         print("🔄 开始刷新所有缓存数据...")
         
-        self.get_market_sentiment(use_cache=True, force_refresh=True)
-        self.get_valuation_data(use_cache=True, force_refresh=True)
-        self.get_money_flow_data(use_cache=True, force_refresh=True)
-        self.get_margin_data(use_cache=True, force_refresh=True)
-        self.get_current_indices(use_cache=True, force_refresh=True)
-        self.get_market_news_data(use_cache=True, force_refresh=True)
+        sources = [
+            ('market_sentiment', lambda: self.get_market_sentiment(use_cache=True, force_refresh=True)),
+            ('valuation_indicators', lambda: self.get_valuation_data(use_cache=True, force_refresh=True)),
+            ('money_flow_indicators', lambda: self.get_money_flow_data(use_cache=True, force_refresh=True)),
+            ('margin_detail', lambda: self.get_margin_data(use_cache=True, force_refresh=True)),
+            ('current_indices', lambda: self.get_current_indices(use_cache=True, force_refresh=True)),
+            ('market_news', lambda: self.get_market_news_data(use_cache=True, force_refresh=True)),
+        ]
+        refresh_report = self._get_refresh_executor(max_workers, timeout).run(sources)
+        refresh_report.print_summary()
         
         print("✅ 所有缓存数据刷新完成!")
         self.print_cache_status()
+        return refresh_report
     
-    def get_comprehensive_market_report(self, use_cache: bool = True, index_name: str = '上证指数') -> Dict:
-        """获取综合市场报告"""
+    def get_comprehensive_market_report(self, use_cache: bool = True, index_name: str = '上证指数',
+                                        max_workers: Optional[int] = None, timeout: Optional[float] = None) -> Dict:
+        """获取综合市场报告（各数据源并行获取）"""
         print(f"📋 生成{index_name}综合市场报告...")
         print("=" * 60)
         
@@ -436,17 +450,24 @@ class MarketTools:
             'market_summary': {}
         }
         
-        report['technical_indicators'] = self.get_index_technical_indicators(index_name, use_cache=use_cache)
-        report['sentiment_indicators'] = self.get_market_sentiment(use_cache=use_cache, comprehensive=True)
-        report['valuation_indicators'] = self.get_valuation_data(use_cache)
-        report['money_flow_indicators'] = self.get_money_flow_data(use_cache)
-        report['margin_detail'] = self.get_margin_data(use_cache)
-        
+        sources = [
+            ('technical_indicators', lambda: self.get_index_technical_indicators(index_name, use_cache=use_cache)),
+            ('sentiment_indicators', lambda: self.get_market_sentiment(use_cache=use_cache, comprehensive=True)),
+            ('valuation_indicators', lambda: self.get_valuation_data(use_cache)),
+            ('money_flow_indicators', lambda: self.get_money_flow_data(use_cache)),
+            ('margin_detail', lambda: self.get_margin_data(use_cache)),
+        ]
         # 检查是否启用市场新闻功能
-        if config.is_market_news_enabled():
-            report['market_news_data'] = self.get_market_news_data(use_cache)
-        else:
+        news_enabled = config.is_market_news_enabled()
+        if news_enabled:
+            sources.append(('market_news_data', lambda: self.get_market_news_data(use_cache)))
+        
+        refresh_report = self._get_refresh_executor(max_workers, timeout).run(sources)
+        for name, _ in sources:
+            report[name] = refresh_report.get_data(name, {})
+        if not news_enabled:
             report['market_news_data'] = {'disabled': True}
+        refresh_report.print_summary()
         
         print("=" * 60)
         print("✅ 综合市场报告生成完成!")
@@ -454,7 +475,8 @@ class MarketTools:
         return report
 
     
-    def _generate_ai_analysis(self, index_name: str, user_opinion: str = '') -> Dict:
+    def _generate_ai_analysis(self, index_name: str, user_opinion: str = '',
+                              on_delta: Optional[Callable[[str], None]] = None) -> Dict:
         """生成AI分析数据"""
         try:
             from market.market_ai_analysis import generate_index_analysis_report
@@ -467,7 +489,8 @@ class MarketTools:
                 index_name,
                 index_name, 
                 market_report_data,
-                user_opinion
+                user_opinion,
+                on_delta=on_delta
             )
                         
             ai_data = {
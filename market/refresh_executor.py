@@ -0,0 +1,124 @@
+"""
+市场数据并行刷新执行器
+
+多个数据源（情绪、估值、资金流向、融资融券、指数、新闻等）互不依赖，
+使用线程池同时获取，总耗时接近最慢的数据源而不是所有数据源之和。
+每个数据源单独记录耗时和是否成功，超时的数据源不阻塞其他结果。
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.task_runner import run_tasks
+
+
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_SOURCE_TIMEOUT = 60  # 单个数据源超时时间（秒）
+
+
+@dataclass
+class SourceResult:
+    """单个数据源的刷新结果"""
+    name: str
+    success: bool = False
+    latency: float = 0.0
+    data: Any = None
+    error: str = ""
+
+
+@dataclass
+class RefreshReport:
+    """一次并行刷新的汇总"""
+    results: Dict[str, SourceResult] = field(default_factory=dict)
+    total_time: float = 0.0
+
+    @property
+    def succeeded(self) -> List[str]:
+        return [name for name, r in self.results.items() if r.success]
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, r in self.results.items() if not r.success]
+
+    def get_data(self, name: str, default: Any = None) -> Any:
+        result = self.results.get(name)
+        return result.data if result is not None and result.data is not None else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_time': round(self.total_time, 3),
+            'sources': {
+                name: {'success': r.success, 'latency': round(r.latency, 3), 'error': r.error}
+                for name, r in self.results.items()
+            }
+        }
+
+    def print_summary(self):
+        print("-" * 60)
+        print(f"⏱️  并行刷新完成，总耗时 {self.total_time:.2f} 秒")
+        for name, r in self.results.items():
+            icon = "✅" if r.success else "❌"
+            suffix = f" | {r.error}" if r.error else ""
+            print(f"{icon} {name:<24} {r.latency:>6.2f}s{suffix}")
+        print("-" * 60)
+
+
+def _default_success(data: Any) -> bool:
+    """数据源返回非空且不含error时视为成功"""
+    if isinstance(data, dict):
+        return bool(data) and 'error' not in data
+    return data is not None
+
+
+class RefreshExecutor:
+    """并行执行多个数据源的获取任务"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = DEFAULT_SOURCE_TIMEOUT,
+                 is_success: Optional[Callable[[Any], bool]] = None):
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.is_success = is_success or _default_success
+
+    def _timed_call(self, name: str, fetch: Callable[[], Any]) -> SourceResult:
+        start = time.perf_counter()
+        try:
+            data = fetch()
+            return SourceResult(name=name, success=self.is_success(data),
+                                latency=time.perf_counter() - start, data=data)
+        except Exception as e:
+            return SourceResult(name=name, success=False, latency=time.perf_counter() - start, error=str(e))
+
+    def run(self, sources: List[Tuple[str, Callable[[], Any]]]) -> RefreshReport:
+        """
+        并行执行数据源任务
+
+        Args:
+            sources: [(数据源名称, 获取函数), ...]，结果按此顺序排列
+
+        Returns:
+            RefreshReport: 各数据源的数据、耗时和成功情况
+        """
+        report = RefreshReport()
+        start = time.perf_counter()
+
+        if self.max_workers == 1 or len(sources) <= 1:
+            for name, fetch in sources:
+                report.results[name] = self._timed_call(name, fetch)
+            report.total_time = time.perf_counter() - start
+            return report
+
+        # 每个数据源从开始执行起单独计时；超时的数据源在后台继续执行，完成后仍会写入缓存
+        outcomes = run_tasks([(name, lambda name=name, fetch=fetch: self._timed_call(name, fetch))
+                              for name, fetch in sources],
+                             max_workers=self.max_workers, timeout=self.timeout,
+                             thread_name_prefix="market-refresh")
+        for name, outcome in outcomes.items():
+            if outcome.done:
+                report.results[name] = outcome.result
+            else:
+                report.results[name] = SourceResult(name=name, success=False, latency=outcome.elapsed,
+                                                    error=outcome.error)
+
+        report.total_time = time.perf_counter() - start
+        return report
@@ -14,6 +14,9 @@ xystock 数据获取模块
     quote = data_manager.get_realtime_quote("ETF")
     quote = data_manager.get_realtime_quote("沪深A股")
     
+    # 批量获取实时行情（一次拉取全市场快照）
+    quotes = data_manager.get_realtime_quotes(["600519", "000001"])
+    
     # 获取K线数据
     kline = data_manager.get_kline_data("600519", KLineType.DAY, 30)
     
@@ -7,6 +7,8 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 
+from utils.memory_cache import get_memory_cache
+
 
 class ChipDataCache:
     """筹码数据专用缓存管理器"""
@@ -47,7 +49,10 @@ class ChipDataCache:
             return obj
     
     def load_cache(self) -> Dict:
-        """加载筹码缓存文件"""
+        """加载筹码缓存文件（文件未变化时直接使用内存中的解析结果）"""
+        return dict(get_memory_cache().get(self.cache_file, self._read_cache_file))
+    
+    def _read_cache_file(self) -> Dict:
         try:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'r', encoding='utf-8') as f:
@@ -65,6 +70,8 @@ class ChipDataCache:
                 json.dump(safe_cache_data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"❌ 保存筹码缓存文件失败: {e}")
+        finally:
+            get_memory_cache().invalidate(self.cache_file)
     
     def is_cache_valid(self, stock_code: str) -> bool:
         """检查筹码缓存是否有效"""
@@ -91,7 +98,8 @@ class ChipDataCache:
                 return None
             
             cache_data = self.load_cache()
-            return cache_data.get(stock_code, {}).get('raw_data')
+            raw_data = cache_data.get(stock_code, {}).get('raw_data')
+            return list(raw_data) if isinstance(raw_data, list) else raw_data
         except Exception:
             return None
     
@@ -129,6 +137,7 @@ class ChipDataCache:
                 # 清理所有筹码缓存
                 if os.path.exists(self.cache_file):
                     os.remove(self.cache_file)
+                    get_memory_cache().invalidate(self.cache_file)
                     print("✅ 已清理所有筹码缓存")
                 else:
                     print("ℹ️  筹码缓存文件不存在")
@@ -3,9 +3,11 @@
 提供基于LLM的股票市场分析功能、筹码分析功能、新闻分析功能和基本面分析功能
 """
 
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Callable, Dict, Any, List, Tuple, Optional, Union
 from dataclasses import dataclass
-from llm.openai_client import OpenAIClient
+from llm.openai_client import AsyncOpenAIClient, OpenAIClient
+from llm.prompt_layout import build_messages
+from llm.token_budget import PackResult, PromptSection, TokenBudgetPacker
 import datetime
 import sys
 import os
@@ -18,6 +20,22 @@ if project_dir not in sys.path:
 from utils.string_utils import remove_markdown_format
 from utils.data_formatters import get_stock_formatter
 
+# 并发生成时单个分析请求的超时时间（秒，包含排队等待）
+ANALYSIS_REQUEST_TIMEOUT = 300
+
+# 综合分析提示词的token预算（各部分合计，不含系统提示），配置项 AI_ANALYSIS.COMPREHENSIVE.TOKEN_BUDGET
+DEFAULT_COMPREHENSIVE_TOKEN_BUDGET = 8000
+
+# 综合分析提示词各部分：{部分: (优先级, 上限配置项, 默认上限, 至少保留)}
+# 优先级数值越大越重要，总量超出预算时先压缩优先级低的部分；用户观点和持仓不参与压缩
+COMPREHENSIVE_SECTION_BUDGETS = {
+    'basic_info': (4, 'BASIC_INFO_TOKENS', 1500, 300),
+    'user_profile': (3, 'USER_PROFILE_TOKENS', 800, 200),
+    'historical': (2, 'HISTORY_TOKENS', 4000, 400),
+    'market_ai': (1, 'MARKET_AI_TOKENS', 1000, 200),
+    'market_report': (0, 'MARKET_REPORT_TOKENS', 1500, 200),
+}
+
 
 @dataclass
 class AnalysisResult:
@@ -307,57 +325,118 @@ class BaseAnalysisGenerator:
         self.client = OpenAIClient()
         self.config_manager = AnalysisConfig()
     
-    def generate_analysis(self, analysis_type: str, messages: List[Dict], stock_code: str = "") -> AnalysisResult:
-        """通用的分析生成方法"""
-        config = self.config_manager.get_analysis_config(analysis_type)
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def generate_analysis(self, analysis_type: str, messages: List[Dict], stock_code: str = "",
+                          on_delta: Optional[Callable[[str], None]] = None) -> AnalysisResult:
+        """
+        通用的分析生成方法
         
-        if len(messages) > 1:
-            _save_request_to_cache(messages[0]['content'] + "\n\n" + "@@@@@@@@" + "\n\n"  + messages[1]['content'], config['cache_filename'])
+        Args:
+            on_delta: 流式输出回调，提供时以流式方式请求，每收到一段回复文本即调用一次，
+                便于界面逐步显示；返回的结果仍包含完整报告
+        """
+        config = self._prepare_request(analysis_type, messages)
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
         try:
-            response = self.client.chat(
-                messages=messages,
-                temperature=config['temperature'],
-                model_type=config['model_type']
-            )
-            
-            return AnalysisResult(
-                success=True,
-                report=response,
-                timestamp=timestamp,
-                analysis_type=analysis_type,
-                stock_code=stock_code
-            )
+            if on_delta is None:
+                response = self.client.chat(
+                    messages=messages,
+                    temperature=config['temperature'],
+                    model_type=config['model_type']
+                )
+            else:
+                parts = []
+                for delta in self.client.chat(
+                    messages=messages,
+                    temperature=config['temperature'],
+                    model_type=config['model_type'],
+                    stream=True
+                ):
+                    parts.append(delta)
+                    on_delta(delta)
+                response = ''.join(parts)
+            return self._build_result(analysis_type, stock_code, timestamp, response)
             
         except Exception as e:
-            error_msg = f"生成{analysis_type}分析报告失败: {str(e)}"
-            print(error_msg)
+            result = self._build_result(analysis_type, stock_code, timestamp, e)
             traceback.print_exc()
-            
+            return result
+    
+    def generate_many(self, requests: Dict[str, List[Dict]], stock_code: str = "",
+                      client: Optional[AsyncOpenAIClient] = None) -> Dict[str, AnalysisResult]:
+        """
+        同时生成多个分析：所有请求一次性发出，并发数和超时由异步客户端控制
+        
+        Args:
+            requests: {分析类型: 消息列表}
+            client: 异步客户端，为空时按配置创建
+        
+        Returns:
+            {分析类型: 分析结果}，单个分析失败不影响其他分析
+        """
+        if not requests:
+            return {}
+        client = client or AsyncOpenAIClient(request_timeout=ANALYSIS_REQUEST_TIMEOUT)
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        analysis_types = list(requests)
+        calls = []
+        for analysis_type in analysis_types:
+            config = self._prepare_request(analysis_type, requests[analysis_type])
+            calls.append({
+                'messages': requests[analysis_type],
+                'temperature': config['temperature'],
+                'model_type': config['model_type']
+            })
+        
+        print(f"🚀 并发生成 {len(calls)} 项AI分析: {', '.join(analysis_types)}")
+        responses = client.gather(calls)
+        return {analysis_type: self._build_result(analysis_type, stock_code, timestamp, response)
+                for analysis_type, response in zip(analysis_types, responses)}
+    
+    def _prepare_request(self, analysis_type: str, messages: List[Dict]) -> Dict[str, Any]:
+        """读取分析配置，并保存请求内容便于排查"""
+        config = self.config_manager.get_analysis_config(analysis_type)
+        if len(messages) > 1:
+            _save_request_to_cache(messages[0]['content'] + "\n\n" + "@@@@@@@@" + "\n\n"  + messages[1]['content'], config['cache_filename'])
+        return config
+    
+    def _build_result(self, analysis_type: str, stock_code: str, timestamp: str,
+                      response: Union[str, BaseException]) -> AnalysisResult:
+        if not isinstance(response, BaseException):
             return AnalysisResult(
-                success=False,
-                report=error_msg,
+                success=True,
+                report=response,
                 timestamp=timestamp,
-                error_message=str(e),
                 analysis_type=analysis_type,
                 stock_code=stock_code
             )
+        
+        error = str(response) or type(response).__name__
+        error_msg = f"生成{analysis_type}分析报告失败: {error}"
+        print(error_msg)
+        
+        return AnalysisResult(
+            success=False,
+            report=error_msg,
+            timestamp=timestamp,
+            error_message=error,
+            analysis_type=analysis_type,
+            stock_code=stock_code
+        )
 
 def get_stock_info(stock_identity):
     from stock.stock_data_tools import get_stock_tools
     stock_tools = get_stock_tools()
     return stock_tools.get_basic_info(stock_identity, use_cache=True)
 
-def generate_tech_analysis_report(
+def build_tech_analysis_messages(
     stock_identity: Dict[str, Any],
     kline_info: Dict[str, Any] = None,
-) -> AnalysisResult:
-    """生成股票技术分析报告"""
+) -> List[Dict]:
+    """构建股票技术分析请求消息"""
     stock_code = stock_identity['code']
     stock_name = stock_identity.get('name', '')
 
-    generator = BaseAnalysisGenerator()
     formatter = get_stock_formatter()
     basic_info_section = formatter.format_stock_overview(stock_identity, get_stock_info(stock_identity))
     kline_text = formatter.format_kline_data(kline_info)
@@ -393,32 +472,36 @@ def generate_tech_analysis_report(
 
 {kline_text}"""
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_message}
-    ]
+    return build_messages(system_message, user_message)
+
 
-    return generator.generate_analysis("technical", messages, stock_code)
+def generate_tech_analysis_report(
+    stock_identity: Dict[str, Any],
+    kline_info: Dict[str, Any] = None,
+    on_delta: Optional[Callable[[str], None]] = None
+) -> AnalysisResult:
+    """生成股票技术分析报告"""
+    messages = build_tech_analysis_messages(stock_identity, kline_info)
+    return BaseAnalysisGenerator().generate_analysis("technical", messages, stock_identity['code'], on_delta=on_delta)
 
 
-def generate_company_analysis_report(
+def build_company_analysis_messages(
     stock_identity: Dict[str, Any],
     fundamental_data: Dict[str, Any] = None
-) -> AnalysisResult:
-    """生成公司分析报告
+) -> List[Dict]:
+    """构建公司分析请求消息
     
     Args:
         stock_identity: 股票身份信息
         fundamental_data: 基本面数据（可选）
     
     Returns:
-        AnalysisResult: 分析结果
+        List[Dict]: 发送给模型的消息列表
     """
     stock_code = stock_identity['code']
     stock_name = stock_identity.get('name', '')
     market_name = stock_identity.get('market_name', 'A股')
 
-    generator = BaseAnalysisGenerator()
     formatter = get_stock_formatter()
     
     # 获取基本信息
@@ -456,7 +539,10 @@ def generate_company_analysis_report(
 - 用中文撰写，内容控制在300字左右
 - 每个要点简明扼要，突出核心信息
 - 基于真实信息分析，不得编造
-- 使用专业但易懂的语言"""
+- 使用专业但易懂的语言
+
+请严格按照以下要点进行分析：
+产品功能、投资价值、产品优势、市场地位、替代产品、费用收益、投资风险"""
     else:
         system_message = """你是一位专业的公司研究分析师，专精于上市公司的商业模式和竞争力分析。你的任务是基于公司基本信息，按照指定要点简要分析该公司。
 
@@ -473,7 +559,10 @@ def generate_company_analysis_report(
 - 用中文撰写，内容控制在300字左右
 - 每个要点简明扼要，突出核心信息
 - 基于真实信息分析，避免过度推测
-- 使用专业但易懂的语言"""
+- 使用专业但易懂的语言
+
+请严格按照以下要点进行分析：
+主营业务、市场需求、核心优势、产业地位、竞争格局、盈利模式、风险挑战"""
 
     # 构建用户消息
     product_type = "ETF" if is_etf else "公司"
@@ -482,28 +571,29 @@ def generate_company_analysis_report(
 **{product_type}信息：**
 - 名称：{stock_name}
 - 代码：{stock_code}
-- 市场：{market_name}
+- 市场：{market_name}"""
 
-请严格按照以下要点进行分析：
-主营业务、市场需求、核心优势、产业地位、竞争格局、盈利模式、风险挑战"""
+    return build_messages(system_message, user_message)
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_message}
-    ]
 
-    return generator.generate_analysis("company", messages, stock_code)
+def generate_company_analysis_report(
+    stock_identity: Dict[str, Any],
+    fundamental_data: Dict[str, Any] = None,
+    on_delta: Optional[Callable[[str], None]] = None
+) -> AnalysisResult:
+    """生成公司分析报告"""
+    messages = build_company_analysis_messages(stock_identity, fundamental_data)
+    return BaseAnalysisGenerator().generate_analysis("company", messages, stock_identity['code'], on_delta=on_delta)
 
 
-def generate_news_analysis_report(
+def build_news_analysis_messages(
     stock_identity: Dict[str, Any],
     news_data: List[Dict]
-) -> AnalysisResult:
-    """生成股票新闻分析报告"""
+) -> List[Dict]:
+    """构建股票新闻分析请求消息"""
     stock_code = stock_identity['code']
     stock_name = stock_identity.get('name', '')
 
-    generator = BaseAnalysisGenerator()
     formatter = get_stock_formatter()
     basic_info_section = formatter.format_stock_overview(stock_identity, get_stock_info(stock_identity))
     news_text = formatter.format_stock_news_data(news_data, has_content=True)
@@ -541,23 +631,27 @@ def generate_news_analysis_report(
 
 {news_text}"""
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_message}
-    ]
-    
-    return generator.generate_analysis("news", messages, stock_code)
+    return build_messages(system_message, user_message)
+
+
+def generate_news_analysis_report(
+    stock_identity: Dict[str, Any],
+    news_data: List[Dict],
+    on_delta: Optional[Callable[[str], None]] = None
+) -> AnalysisResult:
+    """生成股票新闻分析报告"""
+    messages = build_news_analysis_messages(stock_identity, news_data)
+    return BaseAnalysisGenerator().generate_analysis("news", messages, stock_identity['code'], on_delta=on_delta)
         
         
-def generate_chip_analysis_report(
+def build_chip_analysis_messages(
     stock_identity: Dict[str, Any],
     chip_data: Dict[str, Any]
-) -> AnalysisResult:
-    """生成筹码分析报告"""
+) -> List[Dict]:
+    """构建筹码分析请求消息"""
     stock_code = stock_identity['code']
     stock_name = stock_identity.get('name', '')
 
-    generator = BaseAnalysisGenerator()
     formatter = get_stock_formatter()
     basic_info_section = formatter.format_stock_overview(stock_identity, get_stock_info(stock_identity))
     chip_text = formatter.format_chip_data(chip_data)
@@ -594,25 +688,29 @@ def generate_chip_analysis_report(
 **筹码数据：**
 {chip_text}"""
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_message}
-    ]
-    
-    return generator.generate_analysis("chip", messages, stock_code)
+    return build_messages(system_message, user_message)
 
 
-def generate_fundamental_analysis_report(
+def generate_chip_analysis_report(
     stock_identity: Dict[str, Any],
-    fundamental_data: Dict[str, Any]
+    chip_data: Dict[str, Any],
+    on_delta: Optional[Callable[[str], None]] = None
 ) -> AnalysisResult:
-    """生成股票基本面分析报告"""
+    """生成筹码分析报告"""
+    messages = build_chip_analysis_messages(stock_identity, chip_data)
+    return BaseAnalysisGenerator().generate_analysis("chip", messages, stock_identity['code'], on_delta=on_delta)
+
+
+def build_fundamental_analysis_messages(
+    stock_identity: Dict[str, Any],
+    fundamental_data: Dict[str, Any]
+) -> List[Dict]:
+    """构建股票基本面分析请求消息"""
     
     stock_code = stock_identity['code']
     stock_name = stock_identity.get('name', '')
     market_name = stock_identity.get('market_name', 'A股')
 
-    generator = BaseAnalysisGenerator()
     formatter = get_stock_formatter()
     basic_info_section = formatter.format_basic_info(fundamental_data, stock_identity)
     currency_name = stock_identity.get('currency_name', '人民币')
@@ -706,12 +804,115 @@ def generate_fundamental_analysis_report(
 **基本面数据：**
 {basic_info_section}"""
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_message}
-    ]
+    return build_messages(system_message, user_message)
+
+
+def generate_fundamental_analysis_report(
+    stock_identity: Dict[str, Any],
+    fundamental_data: Dict[str, Any],
+    on_delta: Optional[Callable[[str], None]] = None
+) -> AnalysisResult:
+    """生成股票基本面分析报告"""
+    messages = build_fundamental_analysis_messages(stock_identity, fundamental_data)
+    return BaseAnalysisGenerator().generate_analysis("fundamental", messages, stock_identity['code'], on_delta=on_delta)
+
+
+# 各专项分析的消息构建函数：{分析类型: (构建函数, 数据参数名)}
+SECTION_MESSAGE_BUILDERS = {
+    'technical': (build_tech_analysis_messages, 'kline_info'),
+    'fundamental': (build_fundamental_analysis_messages, 'fundamental_data'),
+    'company': (build_company_analysis_messages, 'fundamental_data'),
+    'news': (build_news_analysis_messages, 'news_data'),
+    'chip': (build_chip_analysis_messages, 'chip_data'),
+}
+
 
-    return generator.generate_analysis("fundamental", messages, stock_code)
+def generate_section_analysis_reports(
+    stock_identity: Dict[str, Any],
+    section_data: Dict[str, Any]
+) -> Dict[str, AnalysisResult]:
+    """
+    同时生成多个专项分析报告
+    
+    Args:
+        stock_identity: 股票身份信息
+        section_data: {分析类型: 该分析所需的数据}，分析类型见 SECTION_MESSAGE_BUILDERS
+    
+    Returns:
+        {分析类型: 分析结果}，顺序与 section_data 一致
+    """
+    stock_code = stock_identity['code']
+    generator = BaseAnalysisGenerator()
+    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    requests = {}
+    failed = {}
+    for analysis_type, data in section_data.items():
+        builder, data_arg = SECTION_MESSAGE_BUILDERS[analysis_type]
+        try:
+            requests[analysis_type] = builder(stock_identity, **{data_arg: data})
+        except Exception as e:
+            failed[analysis_type] = generator._build_result(analysis_type, stock_code, timestamp, e)
+    
+    results = generator.generate_many(requests, stock_code)
+    results.update(failed)
+    return {analysis_type: results[analysis_type] for analysis_type in section_data}
+
+
+def pack_comprehensive_sections(
+    sections: Dict[str, Union[str, Dict[str, str]]],
+    token_budget: Optional[int] = None,
+    config=None,
+    model: Optional[str] = None
+) -> Tuple[Dict[str, Union[str, Dict[str, str]]], PackResult]:
+    """
+    按token预算压缩综合分析提示词的各部分
+    
+    Args:
+        sections: {部分: 文本}，部分见 COMPREHENSIVE_SECTION_BUDGETS；
+            值为字典时（如各项历史分析）其中各项平分该部分的上限
+        token_budget: 总预算，为空时读取配置，0 表示只按各部分上限压缩
+        config: 配置管理器，读取 AI_ANALYSIS.COMPREHENSIVE 下的预算配置
+        model: 模型名称，用于选择tiktoken编码
+    
+    Returns:
+        (压缩后的各部分，结构与 sections 相同), 预算分配结果
+    """
+    def setting(key, default):
+        return config.get(f'AI_ANALYSIS.COMPREHENSIVE.{key}', default) if config else default
+    
+    if token_budget is None:
+        token_budget = setting('TOKEN_BUDGET', DEFAULT_COMPREHENSIVE_TOKEN_BUDGET)
+    
+    prompt_sections = []
+    for name, value in sections.items():
+        priority, config_key, default_limit, min_tokens = COMPREHENSIVE_SECTION_BUDGETS[name]
+        limit = setting(config_key, default_limit)
+        items = value if isinstance(value, dict) else {None: value}
+        for item, text in items.items():
+            prompt_sections.append(PromptSection(
+                name=name if item is None else f"{name}.{item}",
+                text=text or "",
+                priority=priority,
+                max_tokens=limit // len(items),
+                min_tokens=min_tokens // len(items)
+            ))
+    
+    result = TokenBudgetPacker(token_budget, model).pack(prompt_sections)
+    
+    packed = {}
+    for name, value in sections.items():
+        if isinstance(value, dict):
+            packed[name] = {item: result.texts[f"{name}.{item}"] for item in value}
+        else:
+            packed[name] = result.texts[name]
+    
+    print(f"📏 综合分析提示词token: {result.total_before} → {result.total_after}（预算 {token_budget or '不限'}）")
+    for name, before in result.tokens_before.items():
+        if result.tokens_after[name] != before:
+            print(f"   - {name}: {before} → {result.tokens_after[name]}")
+    
+    return packed, result
 
 
 def generate_comprehensive_analysis_report(
@@ -720,9 +921,16 @@ def generate_comprehensive_analysis_report(
     user_position: str = "不确定",
     stock_tools=None,
     market_tools=None,
-    truncate_data: bool = False
+    truncate_data: bool = False,
+    on_delta: Optional[Callable[[str], None]] = None,
+    token_budget: Optional[int] = None
 ) -> AnalysisResult:
-    """生成综合分析报告"""
+    """
+    生成综合分析报告（提供 on_delta 时流式输出）
+    
+    提示词中的行情、历史分析、市场环境和用户画像按token预算压缩（见 pack_comprehensive_sections），
+    token_budget 为空时读取配置 AI_ANALYSIS.COMPREHENSIVE.TOKEN_BUDGET
+    """
     stock_code = stock_identity['code']
     stock_name = stock_identity.get('name', '')
     
@@ -773,7 +981,24 @@ def generate_comprehensive_analysis_report(
         user_opinion_section, user_opinion_sources = formatter.format_user_opinion_section(user_opinion, user_position)
         all_data_sources.extend(user_opinion_sources)
         
-        # 6. 格式化各部分内容
+        # 6. 按token预算压缩各部分
+        model_type = config.get('AI_ANALYSIS.COMPREHENSIVE.MODEL_TYPE', 'default')
+        model = config.get('LLM_OPENAI.INFERENCE_MODEL' if model_type == 'inference' else 'LLM_OPENAI.DEFAULT_MODEL')
+        packed, _ = pack_comprehensive_sections({
+            'basic_info': basic_info_section,
+            'historical': historical_analyses,
+            'market_ai': market_ai_analysis,
+            'user_profile': {'profile': user_profile_section, 'mistakes': user_mistakes_section},
+            'market_report': market_report_text,
+        }, token_budget=token_budget, config=config, model=model)
+        basic_info_section = packed['basic_info']
+        historical_analyses = packed['historical']
+        market_ai_analysis = packed['market_ai']
+        market_report_text = packed['market_report']
+        user_profile_section = packed['user_profile']['profile']
+        user_mistakes_section = packed['user_profile']['mistakes']
+        
+        # 7. 格式化各部分内容
         historical_summary = formatter.format_historical_summary(historical_analyses, truncate_data)
         market_summary = formatter.format_market_summary(market_report_text, market_ai_analysis, truncate_data)
         
@@ -833,16 +1058,13 @@ def generate_comprehensive_analysis_report(
 {user_mistakes_section}
 {user_opinion_section}"""
         
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ]
+        messages = build_messages(system_message, user_message)
         
         print(f'req length {len(user_message)}')
         
         # 使用统一的分析生成器
         generator = BaseAnalysisGenerator()
-        result = generator.generate_analysis("comprehensive", messages, stock_code)
+        result = generator.generate_analysis("comprehensive", messages, stock_code, on_delta=on_delta)
         result.data_sources = all_data_sources
         
         return result
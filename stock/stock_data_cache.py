@@ -1,11 +1,19 @@
 """
 股票数据缓存管理器
+
+缓存存储在SQLite（WAL模式）中，按缓存键读写单条记录：
+- cache_entries: 缓存键 -> 数据
+- cache_meta: 缓存键 -> 元数据（时间戳、过期时间等），用于过期检查
 """
 
 import json
 import os
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, List
+
+from utils.memory_cache import get_memory_cache
 
 
 class StockDataCache:
@@ -14,7 +22,8 @@ class StockDataCache:
     def __init__(self, cache_dir: str = "data/cache"):
         self.cache_dir = cache_dir
         project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.cache_file = os.path.join(project_dir, cache_dir, "stock_data.json")
+        self.cache_file = os.path.join(project_dir, cache_dir, "stock_data.db")
+        self.legacy_cache_file = os.path.join(project_dir, cache_dir, "stock_data.json")
         os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
         self.cache_configs = {
             'basic_info': {'expire_minutes': 5, 'description': '股票基本信息'},
@@ -33,6 +42,127 @@ class StockDataCache:
             # 保持向后兼容
             'ai_analysis': {'expire_minutes': 180, 'description': 'AI分析报告（通用）'},
         }
+        self._init_db()
+        self._migrate_legacy_json()
+    
+    @contextmanager
+    def _connect(self):
+        """每次操作使用独立连接，提交后关闭，可在多线程中安全使用"""
+        conn = sqlite3.connect(self.cache_file, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _init_db(self):
+        """初始化数据库结构"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    cache_key TEXT PRIMARY KEY,
+                    data_type TEXT,
+                    stock_code TEXT,
+                    analysis_type TEXT,
+                    timestamp TEXT,
+                    expire_minutes INTEGER,
+                    meta TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_meta_stock_code ON cache_meta(stock_code)")
+    
+    def _migrate_legacy_json(self):
+        """一次性将旧版 stock_data.json 导入数据库，导入后原文件重命名为 .migrated"""
+        if not os.path.exists(self.legacy_cache_file):
+            return
+        
+        try:
+            with open(self.legacy_cache_file, 'r', encoding='utf-8') as f:
+                legacy_data = json.load(f)
+            
+            with self._connect() as conn:
+                for cache_key, entry in legacy_data.items():
+                    if isinstance(entry, dict):
+                        self._write_entry(conn, cache_key, entry, replace=False)
+            
+            self._invalidate_memory()
+            os.replace(self.legacy_cache_file, f"{self.legacy_cache_file}.migrated")
+            print(f"✅ 已迁移股票数据缓存: {len(legacy_data)}项 -> {self.cache_file}")
+        except Exception as e:
+            print(f"❌ 迁移股票数据缓存失败: {e}")
+    
+    def _write_entry(self, conn, cache_key: str, entry: Dict, replace: bool = True):
+        """写入单条缓存（数据和元数据在同一事务中）"""
+        safe_entry = self._make_json_safe(entry)
+        cache_meta = safe_entry.get('cache_meta', {}) or {}
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        conn.execute(
+            f"{verb} INTO cache_entries (cache_key, data) VALUES (?, ?)",
+            (cache_key, json.dumps(safe_entry.get('data', {}), ensure_ascii=False))
+        )
+        conn.execute(
+            f"{verb} INTO cache_meta (cache_key, data_type, stock_code, analysis_type, timestamp, expire_minutes, meta) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cache_key, cache_meta.get('data_type'), cache_meta.get('stock_code'), cache_meta.get('analysis_type'),
+             cache_meta.get('timestamp'), cache_meta.get('expire_minutes'), json.dumps(cache_meta, ensure_ascii=False))
+        )
+    
+    def _delete_keys(self, cache_keys: List[str]):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM cache_entries WHERE cache_key = ?", [(k,) for k in cache_keys])
+            conn.executemany("DELETE FROM cache_meta WHERE cache_key = ?", [(k,) for k in cache_keys])
+        self._invalidate_memory()
+    
+    def _memory_key(self, cache_key: str) -> str:
+        return f"{self.cache_file}::{cache_key}"
+    
+    def _invalidate_memory(self):
+        """本进程写入后清除内存层中该数据库的所有缓存项"""
+        get_memory_cache().invalidate(prefix=f"{self.cache_file}::")
+    
+    def _list_keys(self) -> List[str]:
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT cache_key FROM cache_meta")]
+    
+    def get_cache_meta(self, cache_key: str) -> Optional[Dict]:
+        """读取单条缓存的元数据"""
+        entry = self.get_cache_entry(cache_key)
+        return entry['cache_meta'] if entry else None
+    
+    def get_cache_entry(self, cache_key: str) -> Optional[Dict]:
+        """读取单条缓存，格式为 {'cache_meta': ..., 'data': ...}（数据库文件未变化时直接使用内存中的结果）"""
+        return get_memory_cache().get(
+            self._memory_key(cache_key),
+            lambda: self._read_entry(cache_key),
+            paths=[self.cache_file, f"{self.cache_file}-wal"]
+        )
+    
+    def _read_entry(self, cache_key: str) -> Optional[Dict]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT m.meta, e.data FROM cache_meta m JOIN cache_entries e ON m.cache_key = e.cache_key "
+                    "WHERE m.cache_key = ?", (cache_key,)
+                ).fetchone()
+            if not row:
+                return None
+            return {'cache_meta': json.loads(row[0]), 'data': json.loads(row[1])}
+        except Exception:
+            return None
+    
+    def save_cache_entry(self, cache_key: str, entry: Dict):
+        """写入单条缓存，格式为 {'cache_meta': ..., 'data': ...}"""
+        with self._connect() as conn:
+            self._write_entry(conn, cache_key, entry)
+        self._invalidate_memory()
     
     def _get_expire_minutes(self, data_type: str, cache_meta: Dict = None) -> int:
         """动态获取过期时间配置"""
@@ -85,23 +215,28 @@ class StockDataCache:
             return obj
     
     def load_cache(self) -> Dict:
-        """加载缓存文件"""
+        """加载全部缓存（兼容旧接口，单条读取请使用 get_cache_entry）"""
         try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT m.cache_key, m.meta, e.data FROM cache_meta m JOIN cache_entries e ON m.cache_key = e.cache_key"
+                ).fetchall()
+            return {key: {'cache_meta': json.loads(meta), 'data': json.loads(data)} for key, meta, data in rows}
         except Exception:
             return {}
     
     def save_cache(self, cache_data: Dict):
-        """保存缓存文件"""
+        """整体替换缓存（兼容旧接口，单条写入请使用 save_cache_entry）"""
         try:
-            safe_cache_data = self._make_json_safe(cache_data)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(safe_cache_data, f, ensure_ascii=False, indent=2)
+            with self._connect() as conn:
+                conn.execute("DELETE FROM cache_entries")
+                conn.execute("DELETE FROM cache_meta")
+                for cache_key, entry in cache_data.items():
+                    self._write_entry(conn, cache_key, entry)
         except Exception as e:
             print(f"❌ 保存股票数据缓存失败: {e}")
+        finally:
+            self._invalidate_memory()
     
     def get_cache_key(self, data_type: str, stock_code: str, analysis_type: str = None) -> str:
         """生成缓存键"""
@@ -112,11 +247,10 @@ class StockDataCache:
     def is_cache_valid(self, data_type: str, stock_code: str, analysis_type: str = None) -> bool:
         """检查缓存是否有效"""
         try:
-            cache_data = self.load_cache()
             cache_key = self.get_cache_key(data_type, stock_code, analysis_type)
-            if cache_key not in cache_data:
+            cache_meta = self.get_cache_meta(cache_key)
+            if cache_meta is None:
                 return False
-            cache_meta = cache_data[cache_key].get('cache_meta', {})
             cache_time = datetime.fromisoformat(cache_meta['timestamp'])
             
             # 动态获取过期时间配置
@@ -129,22 +263,25 @@ class StockDataCache:
     def get_cached_data(self, data_type: str, stock_code: str, analysis_type: str = None) -> Dict:
         """获取缓存数据"""
         try:
-            cache_data = self.load_cache()
             cache_key = self.get_cache_key(data_type, stock_code, analysis_type)
-            return cache_data.get(cache_key, {}).get('data', {})
+            entry = self.get_cache_entry(cache_key)
+            if not entry:
+                return {}
+            # 内存层中的对象是共享的，返回浅拷贝，调用方可直接补充字段
+            data = entry['data']
+            return dict(data) if isinstance(data, dict) else data
         except Exception:
             return {}
     
     def save_cached_data(self, data_type: str, stock_code: str, data: Dict, analysis_type: str = None):
         """保存数据到缓存"""
         try:
-            cache_data = self.load_cache()
             cache_key = self.get_cache_key(data_type, stock_code, analysis_type)
             
             # 动态获取过期时间配置
             expire_minutes = self._get_expire_minutes(data_type, {'analysis_type': analysis_type})
             
-            cache_data[cache_key] = {
+            self.save_cache_entry(cache_key, {
                 'cache_meta': {
                     'timestamp': datetime.now().isoformat(),
                     'data_type': data_type,
@@ -153,8 +290,7 @@ class StockDataCache:
                     'expire_minutes': expire_minutes
                 },
                 'data': data
-            }
-            self.save_cache(cache_data)
+            })
             
             # 获取描述信息
             description = self._get_cache_description(data_type, analysis_type)
@@ -179,54 +315,43 @@ class StockDataCache:
     def clear_cache(self, stock_code: Optional[str] = None, data_type: Optional[str] = None):
         """清理缓存"""
         try:
-            cache_data = self.load_cache()
-            cache_cleared = False
-            
             if stock_code and data_type:
                 # 清理特定股票的特定数据类型
                 cache_key = self.get_cache_key(data_type, stock_code)
-                if cache_key in cache_data:
-                    del cache_data[cache_key]
-                    self.save_cache(cache_data)
-                    cache_cleared = True
+                if self.get_cache_meta(cache_key) is not None:
+                    self._delete_keys([cache_key])
                     print(f"✅ 已清理 {stock_code} {self.cache_configs.get(data_type, {}).get('description', data_type)} 缓存")
                 else:
                     print(f"ℹ️  {stock_code} {data_type} 缓存不存在")
                     
             elif stock_code:
                 # 清理特定股票的所有缓存
-                keys_to_remove = [key for key in cache_data.keys() if key.endswith(f"_{stock_code}")]
-                for key in keys_to_remove:
-                    del cache_data[key]
+                keys_to_remove = [key for key in self._list_keys() if key.endswith(f"_{stock_code}")]
                 if keys_to_remove:
-                    self.save_cache(cache_data)
-                    cache_cleared = True
+                    self._delete_keys(keys_to_remove)
                     print(f"✅ 已清理 {stock_code} 所有缓存 ({len(keys_to_remove)}项)")
                 else:
                     print(f"ℹ️  {stock_code} 无缓存数据")
                     
             elif data_type:
                 # 清理特定数据类型的所有缓存
-                keys_to_remove = [key for key in cache_data.keys() if key.startswith(f"{data_type}_")]
-                for key in keys_to_remove:
-                    del cache_data[key]
+                keys_to_remove = [key for key in self._list_keys() if key.startswith(f"{data_type}_")]
                 if keys_to_remove:
-                    self.save_cache(cache_data)
-                    cache_cleared = True
+                    self._delete_keys(keys_to_remove)
                     print(f"✅ 已清理所有 {self.cache_configs.get(data_type, {}).get('description', data_type)} 缓存 ({len(keys_to_remove)}项)")
                 else:
                     print(f"ℹ️  无 {data_type} 缓存数据")
                     
             else:
-                if os.path.exists(self.cache_file):
-                    os.remove(self.cache_file)
-                    cache_cleared = True
+                keys_to_remove = self._list_keys()
+                if keys_to_remove:
+                    with self._connect() as conn:
+                        conn.execute("DELETE FROM cache_entries")
+                        conn.execute("DELETE FROM cache_meta")
+                    self._invalidate_memory()
                     print("✅ 已清理所有股票数据缓存")
                 else:
                     print("ℹ️  缓存文件不存在")
-            
-            if cache_cleared:
-                self.load_cache()
                     
         except Exception as e:
             print(f"❌ 清理缓存失败: {e}")
@@ -235,11 +360,18 @@ class StockDataCache:
         """获取缓存状态"""
         status = {}
         current_time = datetime.now()
-        cache_data = self.load_cache()
+        try:
+            with self._connect() as conn:
+                if stock_code:
+                    rows = conn.execute("SELECT cache_key, meta FROM cache_meta WHERE stock_code = ?", (stock_code,)).fetchall()
+                else:
+                    rows = conn.execute("SELECT cache_key, meta FROM cache_meta").fetchall()
+        except Exception:
+            rows = []
         
-        for cache_key, cache_info in cache_data.items():
+        for cache_key, meta in rows:
             try:
-                cache_meta = cache_info.get('cache_meta', {})
+                cache_meta = json.loads(meta)
                 cached_stock_code = cache_meta.get('stock_code', '')
                 data_type = cache_meta.get('data_type', '')
                 analysis_type = cache_meta.get('analysis_type', '')
@@ -297,7 +429,11 @@ class StockDataCache:
         
         try:
             if os.path.exists(self.cache_file):
+                # WAL模式下未合并的写入在 -wal 文件中
+                wal_file = f"{self.cache_file}-wal"
                 file_size = os.path.getsize(self.cache_file) / 1024  # KB
+                if os.path.exists(wal_file):
+                    file_size += os.path.getsize(wal_file) / 1024
                 print(f"💾 缓存文件大小: {file_size:.1f} KB")
             else:
                 print("💾 缓存文件: 不存在")
@@ -3,13 +3,25 @@
 """
 
 import time
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
-from utils.kline_cache import cache_manager, KLineData, KLineType
+from utils.kline_cache import cache_manager, KLineData, KLineType, frame_to_kline_data
+from utils.trading_calendar import get_trading_calendar
 import akshare as ak
 import pandas as pd
 
+# 全市场行情快照的缓存时间（秒）：交易时段内只缓存几秒，休市时价格不变可缓存更久
+QUOTE_SNAPSHOT_TTL_TRADING = 5
+QUOTE_SNAPSHOT_TTL_CLOSED = 300
+
+
+def _is_trading_time(now: Optional[datetime] = None) -> bool:
+    """是否处于A股交易时段（含集合竞价），节假日按交易日历判断"""
+    return get_trading_calendar().is_trading_time(now)
+
+
 @dataclass
 class RealTimeQuote:
     """实时行情数据结构"""
@@ -60,23 +72,17 @@ class StockDataFetcher:
             KLineType.WEEK: 102,
             KLineType.MONTH: 103,
         }
+        # 全市场行情快照：代码 -> RealTimeQuote
+        self._quote_snapshot: Dict[str, RealTimeQuote] = {}
+        self._snapshot_time = 0.0
+        self._snapshot_lock = threading.Lock()
+        # 失败和查不到的结果同样短暂缓存，接口异常或停牌时不会每次调用都重新请求
+        self._snapshot_error_time: Optional[float] = None
+        self._quote_misses: Dict[str, float] = {}  # 代码 -> 查询无结果的时间
     
     def _get_previous_trading_day(self) -> str:
-        """计算前一个交易日"""
-        today = datetime.now()
-        weekday = today.weekday()  # 0=Monday, 1=Tuesday, ..., 6=Sunday
-        
-        if weekday == 0:
-            # 周一，前一个交易日是上周五
-            prev_trading_day = today - timedelta(days=3)
-        elif weekday == 6:
-            # 周日，前一个交易日是上周五
-            prev_trading_day = today - timedelta(days=2)
-        else:
-            # 周二到周六，前一个交易日是前一天
-            prev_trading_day = today - timedelta(days=1)
-        
-        return prev_trading_day.strftime("%Y-%m-%d")
+        """计算前一个交易日（按交易日历，跳过周末和节假日）"""
+        return get_trading_calendar().previous_trading_day().strftime("%Y-%m-%d")
     
     def initialize(self) -> bool:
         """初始化 efinance 模块"""
@@ -101,6 +107,25 @@ class StockDataFetcher:
         
         formatted_symbol = self.format_symbol(symbol)
         
+        # 行情快照仍在有效期内时直接使用，无需单独请求
+        snapshot = self._get_fresh_snapshot()
+        if snapshot and formatted_symbol in snapshot:
+            return snapshot[formatted_symbol]
+        if self._is_recent_miss(formatted_symbol):
+            return None
+        
+        quote = self._fetch_single_quote(symbol, formatted_symbol, max_retry)
+        if quote is None:
+            self._record_misses([formatted_symbol])
+        elif snapshot:
+            # 快照中没有的代码（如停牌、ETF）单独查询后并入快照，有效期内不再单独请求
+            with self._snapshot_lock:
+                if self._quote_snapshot is snapshot:
+                    self._quote_snapshot[formatted_symbol] = quote
+        return quote
+    
+    def _fetch_single_quote(self, symbol: str, formatted_symbol: str, max_retry: int) -> Optional[RealTimeQuote]:
+        """单独请求一只股票的实时行情"""
         for attempt in range(1, max_retry + 1):
             try:
                 quotes_df = self._ef.stock.get_latest_quote(formatted_symbol)
@@ -132,11 +157,166 @@ class StockDataFetcher:
         
         return None
     
+    def _snapshot_ttl(self) -> float:
+        return QUOTE_SNAPSHOT_TTL_TRADING if _is_trading_time() else QUOTE_SNAPSHOT_TTL_CLOSED
+    
+    def _is_recent_miss(self, formatted_symbol: str) -> bool:
+        """该代码在有效期内查询过且没有结果"""
+        ttl = self._snapshot_ttl()  # 可能加载交易日历，不在锁内计算
+        with self._snapshot_lock:
+            miss_time = self._quote_misses.get(formatted_symbol)
+            if miss_time is None:
+                return False
+            if time.monotonic() - miss_time < ttl:
+                return True
+            del self._quote_misses[formatted_symbol]
+            return False
+    
+    def _record_misses(self, formatted_symbols: List[str]):
+        now = time.monotonic()
+        with self._snapshot_lock:
+            for formatted_symbol in formatted_symbols:
+                self._quote_misses[formatted_symbol] = now
+    
+    def _get_fresh_snapshot(self) -> Optional[Dict[str, RealTimeQuote]]:
+        """返回仍在有效期内的行情快照，过期或不存在时返回None"""
+        ttl = self._snapshot_ttl()
+        with self._snapshot_lock:
+            if self._quote_snapshot and time.monotonic() - self._snapshot_time < ttl:
+                return self._quote_snapshot
+        return None
+    
+    def refresh_quote_snapshot(self) -> Dict[str, RealTimeQuote]:
+        """一次请求拉取沪深京A股全市场行情快照，按代码索引后缓存"""
+        if not self._is_initialized:
+            raise DataFetcherNotAvailableError("efinance 未初始化")
+        
+        # 上次拉取失败仍在有效期内时不再重试，直接返回已有的（可能过期的）快照
+        ttl = self._snapshot_ttl()
+        with self._snapshot_lock:
+            if (self._snapshot_error_time is not None and
+                    time.monotonic() - self._snapshot_error_time < ttl):
+                return self._quote_snapshot
+        
+        try:
+            quotes_df = self._ef.stock.get_realtime_quotes()
+            snapshot = self._build_quote_index(quotes_df)
+        except Exception as e:
+            print(f"❌ 获取全市场行情快照失败: {e}")
+            with self._snapshot_lock:
+                self._snapshot_error_time = time.monotonic()
+                return self._quote_snapshot
+        
+        with self._snapshot_lock:
+            self._quote_snapshot = snapshot
+            self._snapshot_time = time.monotonic()
+            self._snapshot_error_time = None
+            # 存入新快照时清理已过期的无结果记录
+            self._quote_misses = {code: miss_time for code, miss_time in self._quote_misses.items()
+                                  if self._snapshot_time - miss_time < ttl}
+        return snapshot
+    
+    def get_realtime_quotes(self, symbols: Optional[List[str]] = None) -> Dict[str, RealTimeQuote]:
+        """
+        批量获取实时行情（适用于自选股、选股列表）
+        
+        优先使用全市场行情快照（一次请求，短暂缓存）；快照中没有的代码（如ETF）再批量补充查询。
+        
+        Args:
+            symbols: 股票代码列表，为None时返回全市场快照
+            
+        Returns:
+            Dict[str, RealTimeQuote]: 代码 -> 实时行情，获取失败的代码不在结果中
+        """
+        if not self._is_initialized:
+            raise DataFetcherNotAvailableError("efinance 未初始化")
+        
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            snapshot = self.refresh_quote_snapshot()
+        
+        if symbols is None:
+            return dict(snapshot)
+        
+        quotes = {}
+        missing = []
+        for symbol in symbols:
+            formatted_symbol = self.format_symbol(symbol)
+            if formatted_symbol in snapshot:
+                quotes[symbol] = snapshot[formatted_symbol]
+            elif not self._is_recent_miss(formatted_symbol):
+                missing.append(symbol)
+        
+        if missing:
+            formatted_missing = [self.format_symbol(s) for s in missing]
+            try:
+                quotes_df = self._ef.stock.get_latest_quote(formatted_missing)
+                extra = self._build_quote_index(quotes_df)
+                for symbol in missing:
+                    if self.format_symbol(symbol) in extra:
+                        quotes[symbol] = extra[self.format_symbol(symbol)]
+                # 补充查询的结果并入快照，快照有效期内的单只查询也能命中
+                with self._snapshot_lock:
+                    if self._quote_snapshot is snapshot:
+                        self._quote_snapshot.update(extra)
+                self._record_misses([s for s in formatted_missing if s not in extra])
+            except Exception as e:
+                print(f"❌ 批量获取行情失败({len(missing)}只): {e}")
+                self._record_misses(formatted_missing)
+        
+        return quotes
+    
+    def _build_quote_index(self, quotes_df: pd.DataFrame) -> Dict[str, RealTimeQuote]:
+        """将efinance返回的多行行情整体转换为 代码 -> RealTimeQuote，跳过停牌等无效行"""
+        if quotes_df is None or quotes_df.empty:
+            return {}
+        
+        def pick(*names, numeric=True):
+            for name in names:
+                if name in quotes_df.columns:
+                    column = quotes_df[name]
+                    return pd.to_numeric(column, errors='coerce') if numeric else column.astype(str)
+            return pd.Series(0 if numeric else '', index=quotes_df.index)
+        
+        codes = pick('股票代码', '代码', 'code', numeric=False)
+        names = pick('股票名称', '名称', 'name', numeric=False)
+        price = pick('最新价', 'current_price')
+        change = pick('涨跌额', 'change').fillna(0)
+        change_percent = pick('涨跌幅', 'change_percent').fillna(0)
+        volume = pick('成交量', 'volume').fillna(0)
+        amount = pick('成交额', 'amount').fillna(0)
+        high = pick('最高', 'high').fillna(0)
+        low = pick('最低', 'low').fillna(0)
+        open_ = pick('今开', 'open').fillna(0)
+        prev_close = pick('昨收', '昨日收盘', 'prev_close').fillna(0)
+        
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        valid = price.notna().to_numpy()
+        index = {}
+        for i, row in enumerate(zip(codes, names, price, change, change_percent, volume, amount, high, low, open_, prev_close)):
+            if not valid[i]:
+                continue
+            code, name, p, c, cp, v, a, h, l, o, pc = row
+            index[code] = RealTimeQuote(
+                symbol=code, name=name, current_price=float(p), change=float(c), change_percent=float(cp),
+                volume=int(v), amount=float(a), high=float(h), low=float(l), open=float(o),
+                prev_close=float(pc), timestamp=timestamp
+            )
+        return index
+    
     def get_kline_data(self, 
                       symbol: str, 
                       kline_type: KLineType = KLineType.DAY, 
                       count: int = 30) -> List[KLineData]:
         """获取K线数据（支持缓存）"""
+        kline_df = self.get_kline_frame(symbol, kline_type, count)
+        return frame_to_kline_data(kline_df)
+    
+    def get_kline_frame(self, 
+                        symbol: str, 
+                        kline_type: KLineType = KLineType.DAY, 
+                        count: int = 30) -> pd.DataFrame:
+        """获取K线数据（支持缓存），直接返回DataFrame，列与KLineData字段一致"""
         if not self._is_initialized:
             raise DataFetcherNotAvailableError("efinance 未初始化")
         
@@ -145,82 +325,82 @@ class StockDataFetcher:
         
         symbol = symbol.upper().strip()
         
-        cached_data = cache_manager.get_cached_kline(symbol, kline_type, count)
-        if cached_data:
+        cached_df = cache_manager.get_cached_kline_frame(symbol, kline_type, count)
+        if cached_df is not None:
             # 检查是否包含前一个交易日的数据
             previous_trading_day = self._get_previous_trading_day()
-            has_previous_trading_day_data = any(
-                kline.datetime.startswith(previous_trading_day) for kline in cached_data
-            )
+            has_previous_trading_day_data = cached_df['datetime'].str.startswith(previous_trading_day).any()
             
             if not has_previous_trading_day_data:
                 print(f"⚠️  缓存不包含前一个交易日数据，需要重新拉取: {symbol} {kline_type.value}")
             else:
-                print(f"📦 从缓存获取K线数据: {symbol} {kline_type.value} {len(cached_data)}条")
-                return cached_data
+                print(f"📦 从缓存获取K线数据: {symbol} {kline_type.value} {len(cached_df)}条")
+                return cached_df
 
-        # 从数据源获取数据
+        # 从数据源获取数据：只请求缓存中缺失的时间范围，合并到已有缓存
         try:
-            formatted_symbol = self.format_symbol(symbol)
-            klt = self._kline_type_mapping[kline_type]
+            missing_ranges = cache_manager.analyze_missing_ranges(symbol, kline_type, count)
+            if missing_ranges is None:
+                # 无法判断缺失范围时按无缓存处理，重新拉取完整窗口
+                print(f"⚠️  无法分析缓存缺失范围，重新拉取: {symbol} {kline_type.value}")
+                missing_ranges = [cache_manager.full_window_range(kline_type, count)]
+            elif not missing_ranges:
+                return cached_df if cached_df is not None else pd.DataFrame()
             
-            kline_df = self._ef.stock.get_quote_history(formatted_symbol, klt=klt)
-
-            if kline_df is not None and not kline_df.empty:
-                kline_list = []
-                if hasattr(kline_df, "to_dict"):
-                    records = kline_df.to_dict(orient="records")
-                    for record in records:
-                        kline_data = self._convert_to_kline_data(record, symbol)
-                        if kline_data:
-                            kline_list.append(kline_data)
-                
-                if kline_list:
-                    # 判断是否保存当日K线数据：仅对日K线应用16:30收盘判断
-                    now = datetime.now()
-                    today = now.strftime("%Y-%m-%d")
-                    
-                    if kline_type == KLineType.DAY:
-                        # 日K线：判断是否过了16:30收盘时间
-                        market_close_time = now.replace(hour=16, minute=30, second=0, microsecond=0)
-                        
-                        if now >= market_close_time:
-                            # 已收盘，保存包含当日在内的所有数据
-                            filtered_kline_list = kline_list
-                            log_message = f"🔄 从数据源获取K线数据: {symbol} {kline_type.value} {len(filtered_kline_list)}条 (已收盘，包含当日数据)"
-                        else:
-                            # 未收盘，去掉当日数据，避免保存盘中价格
-                            filtered_kline_list = [
-                                kline for kline in kline_list 
-                                if not kline.datetime.startswith(today)
-                            ]
-                            log_message = f"🔄 从数据源获取K线数据: {symbol} {kline_type.value} {len(filtered_kline_list)}条 (未收盘，已去除当日数据)"
-                    else:
-                        # 分钟级K线：直接去掉当日数据（实时数据变化频繁）
-                        filtered_kline_list = [
-                            kline for kline in kline_list 
-                            if not kline.datetime.startswith(today)
-                        ]
-                        log_message = f"🔄 从数据源获取K线数据: {symbol} {kline_type.value} {len(filtered_kline_list)}条 (分钟线，已去除当日数据)"
-                    
-                    # 保留最近count条记录
-                    if len(filtered_kline_list) > count:
-                        filtered_kline_list = filtered_kline_list[-count:]
-                    
-                    cache_manager.cache_kline(symbol, kline_type, count, filtered_kline_list)
-                    print(log_message)
-                    
-                    return filtered_kline_list
+            kline_df = self._fetch_kline_ranges(symbol, kline_type, missing_ranges)
             
-            return []
+            if not kline_df.empty:
+                filtered_df, note = self._drop_unclosed_bars(kline_df, kline_type)
+                cache_manager.update_kline_frame(symbol, kline_type, filtered_df)
+                ranges_text = ", ".join(f"{beg}~{end}" for beg, end in missing_ranges)
+                print(f"🔄 从数据源增量获取K线数据: {symbol} {kline_type.value} {len(filtered_df)}条 [{ranges_text}] ({note})")
+            
+            merged_df = cache_manager.get_cached_kline_frame(symbol, kline_type, count)
+            if merged_df is not None:
+                return merged_df
+            return pd.DataFrame()
             
         except Exception as e:
             print(f"获取K线数据失败: {e}")
             # 如果拉取失败且有缓存数据，返回缓存数据
-            if cached_data:
-                print(f"⚠️  拉取失败，返回缓存数据: {symbol} {kline_type.value} {len(cached_data)}条")
-                return cached_data
-            return []
+            if cached_df is not None:
+                print(f"⚠️  拉取失败，返回缓存数据: {symbol} {kline_type.value} {len(cached_df)}条")
+                return cached_df
+            return pd.DataFrame()
+    
+    def _fetch_kline_ranges(self, symbol: str, kline_type: KLineType, ranges) -> pd.DataFrame:
+        """按 beg/end 请求各缺失范围的K线并合并"""
+        formatted_symbol = self.format_symbol(symbol)
+        klt = self._kline_type_mapping[kline_type]
+        
+        frames = []
+        for beg, end in ranges:
+            raw_df = self._ef.stock.get_quote_history(
+                formatted_symbol, beg=beg[:10].replace('-', ''), end=end[:10].replace('-', ''), klt=klt)
+            if raw_df is not None and not raw_df.empty:
+                frames.append(self._convert_to_kline_frame(raw_df, symbol))
+        
+        if not frames:
+            return pd.DataFrame()
+        kline_df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return kline_df.drop_duplicates(subset='datetime', keep='last').sort_values('datetime').reset_index(drop=True)
+    
+    def _drop_unclosed_bars(self, kline_df: pd.DataFrame, kline_type: KLineType):
+        """去掉未收盘的当日K线，避免缓存盘中价格；返回 (过滤后的数据, 说明)"""
+        now = datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        not_today = ~kline_df['datetime'].str.startswith(today)
+        
+        if kline_type == KLineType.DAY:
+            # 日K线：判断当日收盘数据是否已更新（16:30）
+            if get_trading_calendar().is_session_settled(now, now):
+                # 已收盘，保存包含当日在内的所有数据
+                return kline_df, "已收盘，包含当日数据"
+            # 未收盘，去掉当日数据，避免保存盘中价格
+            return kline_df[not_today].reset_index(drop=True), "未收盘，已去除当日数据"
+        
+        # 分钟级K线：直接去掉当日数据（实时数据变化频繁）
+        return kline_df[not_today].reset_index(drop=True), "分钟线，已去除当日数据"
     
     def fetch_stock_info(self, symbol: str, detail = True, include_dividend = True):
         """获取股票基本信息"""
@@ -391,22 +571,38 @@ class StockDataFetcher:
         except (ValueError, KeyError) as e:
             raise DataFetcherError(f"数据转换失败: {e}")
     
-    def _convert_to_kline_data(self, data: Dict[str, Any], symbol: str) -> Optional[KLineData]:
-        """将efinance返回的K线数据转换为标准格式"""
-        try:
-            return KLineData(
-                symbol=symbol,
-                datetime=str(data.get('日期', data.get('date', ''))),
-                open=float(data.get('开盘', data.get('open', 0))),
-                high=float(data.get('最高', data.get('high', 0))),
-                low=float(data.get('最低', data.get('low', 0))),
-                close=float(data.get('收盘', data.get('close', 0))),
-                volume=int(data.get('成交量', data.get('volume', 0))),
-                amount=data.get('成交额', data.get('amount'))
-            )
-        except (ValueError, KeyError) as e:
-            print(f"K线数据转换失败: {e}")
-            return None
+    def _convert_to_kline_frame(self, raw_df: pd.DataFrame, symbol: str) -> pd.DataFrame:
+        """将efinance返回的K线DataFrame整体转换为标准列格式，丢弃不合理的K线"""
+        def pick(chinese_name, english_name, default=0):
+            if chinese_name in raw_df.columns:
+                return raw_df[chinese_name]
+            if english_name in raw_df.columns:
+                return raw_df[english_name]
+            return pd.Series(default, index=raw_df.index)
+        
+        kline_df = pd.DataFrame({
+            'symbol': symbol,
+            'datetime': pick('日期', 'date').astype(str),
+            'open': pd.to_numeric(pick('开盘', 'open'), errors='coerce').astype(float),
+            'high': pd.to_numeric(pick('最高', 'high'), errors='coerce').astype(float),
+            'low': pd.to_numeric(pick('最低', 'low'), errors='coerce').astype(float),
+            'close': pd.to_numeric(pick('收盘', 'close'), errors='coerce').astype(float),
+            'volume': pd.to_numeric(pick('成交量', 'volume'), errors='coerce'),
+            'amount': pd.to_numeric(pick('成交额', 'amount', None), errors='coerce'),
+        })
+        
+        # 与KLineData的校验规则保持一致：最高价>=开收盘价，最低价<=开收盘价
+        valid = kline_df[['open', 'high', 'low', 'close', 'volume']].notna().all(axis=1)
+        valid &= kline_df['high'] >= kline_df[['open', 'close']].max(axis=1)
+        valid &= kline_df['low'] <= kline_df[['open', 'close']].min(axis=1)
+        if not valid.all():
+            print(f"K线数据转换失败: 丢弃{int((~valid).sum())}条不合理数据")
+        
+        kline_df = kline_df[valid].reset_index(drop=True)
+        kline_df['volume'] = kline_df['volume'].astype('int64')
+        kline_df['fetch_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        kline_df['data_type'] = 'stock'
+        return kline_df
     
     def format_symbol(self, symbol: str) -> str:
         """格式化股票代码为数据源要求的格式"""
@@ -7,7 +7,7 @@ import os
 import warnings
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any
 
 # 添加路径以便导入
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -24,13 +24,14 @@ from stock.stock_utils import (
 from stock.stock_data_fetcher import data_manager, KLineType
 from stock.stock_data_cache import get_cache_manager
 from utils.format_utils import judge_rsi_level
+from utils.single_flight import get_single_flight
 
 # 导入AI分析模块
 try:
     from stock.stock_ai_analysis import (
         generate_fundamental_analysis_report, generate_tech_analysis_report, 
         generate_news_analysis_report, generate_chip_analysis_report,
-        generate_company_analysis_report
+        generate_company_analysis_report, generate_section_analysis_reports
     )
     AI_ANALYSIS_AVAILABLE = True
 except ImportError:
@@ -44,10 +45,18 @@ class StockTools:
     def __init__(self):
         """初始化股票工具"""
         self.cache_manager = get_cache_manager()
+        # 多个会话同时获取同一数据时只发出一次请求
+        self.single_flight = get_single_flight()
 
     def get_basic_info(self, stock_identity: Dict, use_cache: bool = True, force_refresh: bool = False, 
-                       include_ai_analysis: bool = False, include_company_analysis: bool = True, debug: bool = True) -> Dict:
-        """获取股票基本信息（加锁防止并发重复拉取）"""
+                       include_ai_analysis: bool = False, include_company_analysis: bool = True, debug: bool = True,
+                       on_delta: Optional[Callable[[str], None]] = None) -> Dict:
+        """
+        获取股票基本信息（并发的相同请求合并为一次拉取）
+        
+        Args:
+            on_delta: AI分析流式输出回调，用于基本面分析；未生成基本面分析时用于公司分析
+        """
         
         data_type = 'basic_info'
         stock_code = stock_identity['code']
@@ -58,12 +67,16 @@ class StockTools:
             basic_data = self.cache_manager.get_cached_data(data_type, stock_code)
         else:
             print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
+            def fetch():
+                data = fetch_stock_basic_info(stock_code)
+                if data is not None and 'error' not in data:
+                    if "current_price" in data and data["current_price"] > 0:
+                        print(f"📈 {stock_code} 当前价格: {data['current_price']}")
+                        self.cache_manager.save_cached_data(data_type, stock_code, data)
+                return data
+            
             try:
-                basic_data = fetch_stock_basic_info(stock_code)
-                if basic_data is not None and 'error' not in basic_data:
-                    if "current_price" in basic_data and basic_data["current_price"] > 0:
-                        print(f"📈 {stock_code} 当前价格: {basic_data['current_price']}")
-                        self.cache_manager.save_cached_data(data_type, stock_code, basic_data)
+                basic_data = self.single_flight.do((data_type, stock_code), fetch)
             except Exception as e:
                 print(f"❌ 获取股票基本信息失败: {e}")
                 basic_data = self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
@@ -74,7 +87,8 @@ class StockTools:
                     stock_identity=stock_identity,
                     fundamental_data=basic_data,
                     use_cache=use_cache,
-                    force_refresh=force_refresh
+                    force_refresh=force_refresh,
+                    on_delta=on_delta
                 )
 
                 basic_data['ai_analysis'] = {
@@ -95,7 +109,8 @@ class StockTools:
                     stock_identity=stock_identity,
                     fundamental_data=basic_data,
                     use_cache=use_cache,
-                    force_refresh=force_refresh
+                    force_refresh=force_refresh,
+                    on_delta=None if include_ai_analysis else on_delta
                 )
 
                 basic_data['company_analysis'] = {
@@ -120,28 +135,30 @@ class StockTools:
             return self.cache_manager.get_cached_data(data_type, stock_code)
         
         print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
-        try:
+        def fetch():
             data = fetch_stock_technical_indicators(stock_code, period)
             if data is not None and 'error' not in data:
                 self.cache_manager.save_cached_data(data_type, stock_code, data)
             return data
+        
+        try:
+            return self.single_flight.do((data_type, f"{stock_code}:{period}"), fetch)
         except Exception as e:
             print(f"❌ 获取技术指标失败: {e}")
             return self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
 
-    def get_stock_kline_data(self, stock_identity: Dict, period: int = 160, use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False) -> Dict:
+    def get_stock_kline_data(self, stock_identity: Dict, period: int = 160, use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False,
+                             on_delta: Optional[Callable[[str], None]] = None) -> Dict:
         """获取股票K线数据（实时获取，不缓存K线数据本身，但返回包含技术指标的完整信息）"""
         stock_code = stock_identity['code']
 
         try:
-            kline_data = data_manager.get_kline_data(
-                stock_code, 
-                KLineType.DAY, 
-                period
+            df = self.single_flight.do(
+                ('kline_day', f"{stock_code}:{period}"),
+                lambda: data_manager.get_kline_frame(stock_code, KLineType.DAY, period)
             )
             
-            if kline_data and len(kline_data) > 0:
-                df = pd.DataFrame([k.__dict__ for k in kline_data])
+            if not df.empty:
                 df = df.sort_values('datetime')
                 
                 df['MA5'] = df['close'].rolling(window=5).mean()
@@ -166,7 +183,8 @@ class StockTools:
                             stock_identity,
                             kline_info=result,
                             use_cache=use_cache,
-                            force_refresh=force_refresh
+                            force_refresh=force_refresh,
+                            on_delta=on_delta
                         )
                         
                         result['ai_analysis'] = {
@@ -188,7 +206,8 @@ class StockTools:
         except Exception as e:
             return {'error': str(e)}
 
-    def get_stock_news_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False) -> Dict:
+    def get_stock_news_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False,
+                            on_delta: Optional[Callable[[str], None]] = None) -> Dict:
         """获取股票新闻数据"""
         data_type = 'news_data'
         stock_code = stock_identity['code']
@@ -198,10 +217,14 @@ class StockTools:
             news_data = self.cache_manager.get_cached_data(data_type, stock_code)
         else:
             print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
+            def fetch():
+                data = fetch_stock_news_data(stock_code)
+                if data is not None and 'error' not in data:
+                    self.cache_manager.save_cached_data(data_type, stock_code, data)
+                return data
+            
             try:
-                news_data = fetch_stock_news_data(stock_code)
-                if news_data is not None and 'error' not in news_data:
-                    self.cache_manager.save_cached_data(data_type, stock_code, news_data)
+                news_data = self.single_flight.do((data_type, stock_code), fetch)
             except Exception as e:
                 print(f"❌ 获取新闻数据失败: {e}")
                 news_data = self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
@@ -213,7 +236,8 @@ class StockTools:
                     stock_identity=stock_identity,
                     news_data=news_data.get('news_data', []),
                     use_cache=use_cache,
-                    force_refresh=force_refresh
+                    force_refresh=force_refresh,
+                    on_delta=on_delta
                 )
                 
                 news_data['ai_analysis'] = {
@@ -230,7 +254,8 @@ class StockTools:
         
         return news_data
 
-    def get_stock_chip_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False) -> Dict:
+    def get_stock_chip_data(self, stock_identity: Dict[str, Any], use_cache: bool = True, force_refresh: bool = False, include_ai_analysis: bool = False,
+                            on_delta: Optional[Callable[[str], None]] = None) -> Dict:
         """获取股票筹码数据"""
         data_type = 'chip_data'
         stock_code = stock_identity['code']
@@ -240,10 +265,14 @@ class StockTools:
             chip_data = self.cache_manager.get_cached_data(data_type, stock_code)
         else:
             print(f"📡 获取 {stock_code} {self.cache_manager.cache_configs[data_type]['description']}...")
+            def fetch():
+                data = fetch_stock_chip_data(stock_code)
+                if data is not None and 'error' not in data:
+                    self.cache_manager.save_cached_data(data_type, stock_code, data)
+                return data
+            
             try:
-                chip_data = fetch_stock_chip_data(stock_code)
-                if chip_data is not None and 'error' not in chip_data:
-                    self.cache_manager.save_cached_data(data_type, stock_code, chip_data)
+                chip_data = self.single_flight.do((data_type, stock_code), fetch)
             except Exception as e:
                 print(f"⚠️ 暂不支持拉取筹码数据: {e}")
                 chip_data = self.cache_manager.get_cached_data(data_type, stock_code) if use_cache else {'error': str(e)}
@@ -255,7 +284,8 @@ class StockTools:
                     stock_identity=stock_identity,
                     chip_data=chip_data,
                     use_cache=use_cache,
-                    force_refresh=force_refresh
+                    force_refresh=force_refresh,
+                    on_delta=on_delta
                 )
                 
                 chip_data['ai_analysis'] = {
@@ -281,9 +311,9 @@ class StockTools:
         
         if use_cache:
             try:
-                cache_data = self.cache_manager.load_cache()
-                if cache_key in cache_data:
-                    cache_meta = cache_data[cache_key].get('cache_meta', {})
+                cache_entry = self.cache_manager.get_cache_entry(cache_key)
+                if cache_entry:
+                    cache_meta = cache_entry.get('cache_meta', {})
                     cache_time = datetime.fromisoformat(cache_meta['timestamp'])
                     
                     # 使用动态过期时间配置
@@ -292,7 +322,7 @@ class StockTools:
                     
                     if datetime.now() < expire_time:
                         print(f"📋 使用缓存的 {stock_code} {analysis_type} AI分析 (缓存有效期: {expire_minutes}分钟)")
-                        return cache_data[cache_key].get('data', {})
+                        return cache_entry.get('data', {})
             except Exception:
                 pass
         
@@ -315,7 +345,8 @@ class StockTools:
     # =========================
 
     def generate_fundamental_analysis_with_cache(self, stock_identity: Dict = None, fundamental_data: Dict = None,
-                                                use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
+                                                use_cache: bool = True, force_refresh: bool = False,
+                                                on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
         """生成基本面分析报告（带缓存）"""
         analysis_type = "fundamental"
         stock_code = stock_identity['code']
@@ -333,7 +364,8 @@ class StockTools:
         try:
             result = generate_fundamental_analysis_report(
                 stock_identity=stock_identity,
-                fundamental_data=fundamental_data or {}
+                fundamental_data=fundamental_data or {},
+                on_delta=on_delta
             )
             
             if result.success:
@@ -354,7 +386,8 @@ class StockTools:
             return error_msg, timestamp
 
     def generate_tech_analysis_with_cache(self, stock_identity: Dict, kline_info: Dict = None,
-                                         use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
+                                         use_cache: bool = True, force_refresh: bool = False,
+                                         on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
         """生成股票技术分析报告（带缓存）"""
         analysis_type = "technical"
         stock_code = stock_identity['code']
@@ -373,6 +406,7 @@ class StockTools:
             result = generate_tech_analysis_report(
                 stock_identity=stock_identity,
                 kline_info=kline_info,
+                on_delta=on_delta
             )
             
             if result.success:
@@ -391,7 +425,8 @@ class StockTools:
             return error_msg, timestamp
 
     def generate_news_analysis_with_cache(self, stock_identity: Dict[str, Any], news_data: List = None,
-                                        use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
+                                        use_cache: bool = True, force_refresh: bool = False,
+                                        on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
         """生成新闻分析报告（带缓存）"""
         analysis_type = "news"
         stock_code = stock_identity['code']
@@ -416,7 +451,8 @@ class StockTools:
             
             result = generate_news_analysis_report(
                 stock_identity=stock_identity,
-                news_data=news_data
+                news_data=news_data,
+                on_delta=on_delta
             )
             
             if result.success:
@@ -436,7 +472,8 @@ class StockTools:
     
     def generate_chip_analysis_with_cache(self, stock_identity: Dict[str, Any],
                                         chip_data: Dict = None,
-                                        use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
+                                        use_cache: bool = True, force_refresh: bool = False,
+                                        on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
         """生成筹码分析报告（带缓存）"""
         analysis_type = "chip"
         stock_code = stock_identity['code']
@@ -457,7 +494,8 @@ class StockTools:
             
             result = generate_chip_analysis_report(
                 stock_identity=stock_identity,
-                chip_data=chip_data
+                chip_data=chip_data,
+                on_delta=on_delta
             )
             
             if result.success:
@@ -476,7 +514,8 @@ class StockTools:
             return error_msg, timestamp
 
     def generate_company_analysis_with_cache(self, stock_identity: Dict = None, fundamental_data: Dict = None,
-                                            use_cache: bool = True, force_refresh: bool = False) -> Tuple[str, str]:
+                                            use_cache: bool = True, force_refresh: bool = False,
+                                            on_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, str]:
         """生成公司分析报告（带缓存）"""
         analysis_type = "company"
         stock_code = stock_identity['code']
@@ -494,7 +533,8 @@ class StockTools:
         try:
             result = generate_company_analysis_report(
                 stock_identity=stock_identity,
-                fundamental_data=fundamental_data or {}
+                fundamental_data=fundamental_data or {},
+                on_delta=on_delta
             )
             
             if result.success:
@@ -514,9 +554,61 @@ class StockTools:
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             return error_msg, timestamp
 
+    def generate_ai_analyses(self, stock_identity: Dict[str, Any], section_data: Dict[str, Any],
+                             use_cache: bool = True, force_refresh: bool = False) -> Dict[str, Dict]:
+        """
+        同时生成多个专项AI分析（带缓存），缓存未命中的分析一次性并发请求
+        
+        Args:
+            section_data: {分析类型: 该分析所需的数据}，例如 {'technical': kline_info, 'news': 新闻列表}
+            
+        Returns:
+            {分析类型: {'report': 报告, 'timestamp': 时间}}
+        """
+        stock_code = stock_identity['code']
+        stock_name = stock_identity.get('name', '')
+        analyses = {}
+        pending = {}
+        
+        for analysis_type, data in section_data.items():
+            if use_cache and not force_refresh:
+                cached_data = self.get_cached_ai_analysis(stock_code, analysis_type, use_cache=True)
+                if cached_data and 'report' in cached_data:
+                    analyses[analysis_type] = {'report': cached_data['report'], 'timestamp': cached_data.get('timestamp', '')}
+                    continue
+            pending[analysis_type] = data
+        
+        if pending:
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if not AI_ANALYSIS_AVAILABLE:
+                error_msg = "AI分析模块不可用，请检查依赖是否正确安装"
+                analyses.update({t: {'report': error_msg, 'timestamp': timestamp} for t in pending})
+            else:
+                try:
+                    results = generate_section_analysis_reports(stock_identity, pending)
+                    for analysis_type, result in results.items():
+                        if result.success:
+                            self.set_ai_analysis(stock_code, analysis_type, {
+                                'report': result.report,
+                                'timestamp': result.timestamp,
+                                'stock_name': stock_name
+                            })
+                        analyses[analysis_type] = {'report': result.report, 'timestamp': result.timestamp}
+                except Exception as e:
+                    print(f"❌ 并发生成AI分析失败: {e}")
+                    analyses.update({t: {'report': f"AI分析失败: {str(e)}", 'timestamp': timestamp} for t in pending})
+        
+        return {analysis_type: analyses[analysis_type] for analysis_type in section_data}
+    
     def get_comprehensive_ai_analysis(self, stock_identity: Dict[str, Any], user_opinion: str = "", user_position: str="不确定",
-                                     use_cache: bool = True, force_refresh: bool = False) -> Dict:
-        """获取综合AI分析数据"""
+                                     use_cache: bool = True, force_refresh: bool = False,
+                                     on_delta: Optional[Callable[[str], None]] = None) -> Dict:
+        """
+        获取综合AI分析数据
+        
+        Args:
+            on_delta: 综合分析流式输出回调
+        """
         data_type = 'ai_analysis'
         analysis_type = 'comprehensive'
         stock_code = stock_identity['code']
@@ -526,9 +618,9 @@ class StockTools:
         # 检查缓存（需要同时检查时间有效性和用户观点是否变化）
         if use_cache and not force_refresh:
             try:
-                cache_data = self.cache_manager.load_cache()
-                if cache_key in cache_data:
-                    cache_meta = cache_data[cache_key].get('cache_meta', {})
+                cache_entry = self.cache_manager.get_cache_entry(cache_key)
+                if cache_entry:
+                    cache_meta = cache_entry.get('cache_meta', {})
                     cache_time = datetime.fromisoformat(cache_meta['timestamp'])
                     expire_time = cache_time + timedelta(minutes=self.cache_manager.cache_configs[data_type]['expire_minutes'])
                     
@@ -539,7 +631,7 @@ class StockTools:
                     # 只有在缓存未过期且用户观点相同时才使用缓存
                     if datetime.now() < expire_time and cached_user_opinion == current_user_opinion:
                         print(f"📋 使用缓存的 {stock_code} 综合分析 (用户观点: {'有' if current_user_opinion else '无'})")
-                        return cache_data[cache_key].get('data', {})
+                        return cache_entry.get('data', {})
                     elif cached_user_opinion != current_user_opinion:
                         print(f"🔄 用户观点已变化，重新生成 {stock_code} 综合分析")
             except Exception:
@@ -565,7 +657,8 @@ class StockTools:
                 user_opinion=user_opinion,
                 user_position=user_position,
                 stock_tools=self,
-                market_tools=market_tools
+                market_tools=market_tools,
+                on_delta=on_delta
             )
             
             if result.success:
@@ -592,8 +685,7 @@ class StockTools:
                 }
             
             try:
-                cache_data = self.cache_manager.load_cache()
-                cache_data[cache_key] = {
+                self.cache_manager.save_cache_entry(cache_key, {
                     'cache_meta': {
                         'timestamp': datetime.now().isoformat(),
                         'data_type': data_type,
@@ -604,8 +696,7 @@ class StockTools:
                         'user_position': user_position
                     },
                     'data': analysis_data
-                }
-                self.cache_manager.save_cache(cache_data)
+                })
                 print(f"💾 {stock_code} 综合分析已缓存 (用户观点: {'有' if user_opinion.strip() else '无'})")
             except Exception as e:
                 print(f"❌ 缓存综合分析失败: {e}")
@@ -1,7 +1,7 @@
 import sys
 import os
 import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if project_root not in sys.path:
@@ -11,59 +11,123 @@ from stock.stock_data_tools import get_stock_tools
 from utils.report_utils import generate_pdf_report, generate_docx_report, generate_markdown_file, generate_html_report
 from utils.data_formatters import get_stock_formatter
 from version import get_version, get_full_version
+from utils.task_runner import run_tasks
+
+
+# 并行收集报告数据的默认配置
+REPORT_MAX_WORKERS = 4
+REPORT_SECTION_TIMEOUT = 180  # 单个部分（含AI分析）的超时时间（秒）
+
+
+def _collect_section(fetch: Callable[[], Dict]) -> Tuple[Optional[Dict], Optional[str]]:
+    """获取单个报告部分，返回 (数据, 异常信息)，保证单个部分失败不影响整体报告"""
+    try:
+        return fetch(), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _run_sections(sections: List[Tuple[str, Callable[[], Dict]]], parallel: bool,
+                  max_workers: int, section_timeout: float) -> Dict[str, Tuple[Optional[Dict], Optional[str]]]:
+    """执行各报告部分，返回 {部分名称: (数据, 异常信息)}；并行模式下超时的部分记为异常"""
+    if not parallel or len(sections) <= 1:
+        return {name: _collect_section(fetch) for name, fetch in sections}
+
+    # 每个部分从开始执行起单独计时；超时的部分在后台继续执行，完成后仍会写入缓存
+    outcomes = run_tasks([(name, lambda fetch=fetch: _collect_section(fetch)) for name, fetch in sections],
+                         max_workers=max_workers, timeout=section_timeout, thread_name_prefix="stock-report")
+    results = {}
+    for name, outcome in outcomes.items():
+        if outcome.done:
+            results[name] = outcome.result
+        else:
+            print(f"⏰ 报告部分 {name} {outcome.error}，已跳过")
+            results[name] = (None, outcome.error)
+    return results
+
+
+def collect_report_data(stock_identity: Dict[str, Any],
+                        has_fundamental_ai=False, has_market_ai=False,
+                        has_news_ai=False, has_chip_ai=False,
+                        has_company_ai=False, has_comprehensive_ai=False,
+                        parallel=True, max_workers=REPORT_MAX_WORKERS,
+                        section_timeout=REPORT_SECTION_TIMEOUT) -> Dict[str, Any]:
+    """
+    收集报告数据
+    
+    基本信息、行情、新闻、筹码各部分互不依赖，并行模式下同时获取；
+    数据就绪后，需要的各项AI分析一次性并发请求（见 StockTools.generate_ai_analyses）；
+    综合分析需要读取各部分的AI分析缓存，在其余部分完成后再执行。
+    无论各部分完成顺序如何，返回的 report_data 结构保持一致。
+    """
+    stock_tools = get_stock_tools()
+
+    sections = [
+        ('basic_info', lambda: stock_tools.get_basic_info(stock_identity, use_cache=True, include_ai_analysis=False, include_company_analysis=False)),
+        ('kline_info', lambda: stock_tools.get_stock_kline_data(stock_identity, period=160, use_cache=True, include_ai_analysis=False)),
+        ('news_data', lambda: stock_tools.get_stock_news_data(stock_identity, use_cache=True, include_ai_analysis=False)),
+    ]
+    # 筹码数据仅A股和基金
+    if stock_identity.get('market_name', "") != '港股':
+        sections.append(('chip_data', lambda: stock_tools.get_stock_chip_data(stock_identity, use_cache=True, include_ai_analysis=False)))
+
+    results = _run_sections(sections, parallel, max_workers, section_timeout)
+
+    report_data = {}
+    for name, _ in sections:
+        data, error = results[name]
+        if error is not None:
+            report_data[name] = {'error': error}
+        elif 'error' not in data and data:
+            report_data[name] = data
+
+    # 同时生成各部分的AI分析
+    requested = {
+        'fundamental': ('basic_info', 'ai_analysis', has_fundamental_ai),
+        'company': ('basic_info', 'company_analysis', has_company_ai),
+        'technical': ('kline_info', 'ai_analysis', has_market_ai),
+        'news': ('news_data', 'ai_analysis', has_news_ai),
+        'chip': ('chip_data', 'ai_analysis', has_chip_ai),
+    }
+    targets = {analysis_type: (section, key) for analysis_type, (section, key, enabled) in requested.items()
+               if enabled and section in report_data and 'error' not in report_data[section]}
+    if targets:
+        section_data = {}
+        for analysis_type, (section, _) in targets.items():
+            data = report_data[section]
+            section_data[analysis_type] = data.get('news_data', []) if section == 'news_data' else data
+        analyses, error = _collect_section(lambda: stock_tools.generate_ai_analyses(stock_identity, section_data, use_cache=True))
+        if error is not None:
+            print(f"❌ 生成AI分析失败: {error}")
+        else:
+            for analysis_type, (section, key) in targets.items():
+                report_data[section][key] = analyses[analysis_type]
+
+    # 收集综合分析
+    if has_comprehensive_ai:
+        comprehensive_analysis, error = _collect_section(lambda: stock_tools.get_comprehensive_ai_analysis(stock_identity, use_cache=True))
+        if error is None and 'error' not in comprehensive_analysis:
+            report_data['comprehensive_analysis'] = comprehensive_analysis
+
+    return report_data
 
 
 def generate_stock_report(stock_identity: Dict[str, Any], 
                           format_type="pdf",
                           has_fundamental_ai=False, has_market_ai=False,
                           has_news_ai=False, has_chip_ai=False,
-                          has_company_ai=False, has_comprehensive_ai=False):
+                          has_company_ai=False, has_comprehensive_ai=False,
+                          parallel=True, max_workers=REPORT_MAX_WORKERS,
+                          section_timeout=REPORT_SECTION_TIMEOUT):
     """生成完整的股票分析报告（安全版本，完全独立于Streamlit）"""
     try:
-        stock_tools = get_stock_tools()
-        report_data = {}
-        
-        # 收集基本信息
-        try:
-            basic_info = stock_tools.get_basic_info(stock_identity, use_cache=True, include_ai_analysis=has_fundamental_ai, include_company_analysis=has_company_ai)
-            if 'error' not in basic_info and basic_info:
-                report_data['basic_info'] = basic_info
-        except Exception as e:
-            report_data['basic_info'] = {'error': str(e)}
-        
-        # 收集行情数据
-        try:
-            kline_info = stock_tools.get_stock_kline_data(stock_identity, period=160, use_cache=True, include_ai_analysis=has_market_ai)
-            if 'error' not in kline_info and kline_info:
-                report_data['kline_info'] = kline_info
-        except Exception as e:
-            report_data['kline_info'] = {'error': str(e)}
-        
-        # 收集新闻数据
-        try:
-            news_info = stock_tools.get_stock_news_data(stock_identity, use_cache=True, include_ai_analysis=has_news_ai)
-            if 'error' not in news_info and news_info:
-                report_data['news_data'] = news_info
-        except Exception as e:
-            report_data['news_data'] = {'error': str(e)}
-        
-        # 收集筹码数据（仅A股和基金）
-        if stock_identity.get('market_name', "") != '港股':
-            try:
-                chip_data = stock_tools.get_stock_chip_data(stock_identity, use_cache=True, include_ai_analysis=has_chip_ai)
-                if 'error' not in chip_data and chip_data:
-                    report_data['chip_data'] = chip_data
-            except Exception as e:
-                report_data['chip_data'] = {'error': str(e)}
-        
-        # 收集综合分析
-        if has_comprehensive_ai:
-            try:
-                comprehensive_analysis = stock_tools.get_comprehensive_ai_analysis(stock_identity, use_cache=True)
-                if 'error' not in comprehensive_analysis:
-                    report_data['comprehensive_analysis'] = comprehensive_analysis
-            except Exception as e:
-                pass
+        report_data = collect_report_data(
+            stock_identity,
+            has_fundamental_ai=has_fundamental_ai, has_market_ai=has_market_ai,
+            has_news_ai=has_news_ai, has_chip_ai=has_chip_ai,
+            has_company_ai=has_company_ai, has_comprehensive_ai=has_comprehensive_ai,
+            parallel=parallel, max_workers=max_workers, section_timeout=section_timeout
+        )
                 
         final_ai_reports = {}
         
@@ -1,8 +1,8 @@
 import akshare as ak
 import pandas as pd
 from datetime import datetime
-from typing import Dict
-from stockstats import wrap
+from typing import Any, Dict, Optional, Tuple
+from utils.indicator_engine import INDICATOR_MIN_LENGTH, compute_indicators, compute_indicators_incremental
 
 def get_chip_analysis_data(stock_code):
     """获取股票筹码分析数据"""
@@ -68,13 +68,13 @@ def get_chip_analysis_data(stock_code):
         print(f"获取筹码数据失败: {str(e)}")
         return {"error": f"该股票暂不支持获取筹码数据"}
 
-def _judge_ma_trend(stock_data) -> str:
+def _judge_ma_trend(values: Dict) -> str:
     """判断移动平均线趋势"""
     try:
-        ma5 = stock_data['close_5_sma'].iloc[-1]
-        ma10 = stock_data['close_10_sma'].iloc[-1]
-        ma20 = stock_data['close_20_sma'].iloc[-1]
-        current_price = stock_data['close'].iloc[-1]
+        ma5, ma10, ma20 = values['ma_5'], values['ma_10'], values['ma_20']
+        current_price = values['close']
+        if pd.isna(current_price):
+            return "无法判断"
         
         if current_price > ma5 > ma10 > ma20:
             return "多头排列"
@@ -85,12 +85,14 @@ def _judge_ma_trend(stock_data) -> str:
     except:
         return "无法判断"
 
-def _judge_macd_trend(stock_data) -> str:
+def _judge_macd_trend(values: Dict) -> str:
     """判断MACD趋势"""
     try:
-        macd = stock_data['macd'].iloc[-1]
-        macd_signal = stock_data['macds'].iloc[-1]
-        macd_hist = stock_data['macdh'].iloc[-1]
+        macd = values['macd']
+        macd_signal = values['macd_signal']
+        macd_hist = values['macd_histogram']
+        if pd.isna(macd):
+            return "无法判断"
         
         if macd > macd_signal and macd_hist > 0:
             return "金叉向上"
@@ -102,51 +104,34 @@ def _judge_macd_trend(stock_data) -> str:
         return "无法判断"
     
 
-def get_indicators(df):
-    """使用stockstats计算技术指标"""
-    stock = wrap(df)
-    stock_len = len(stock)
+def get_indicators(df, last_only: bool = True, state_key: Optional[Tuple[str, Any]] = None):
+    """
+    计算技术指标（NumPy指标引擎，结果与stockstats一致）
+    
+    Args:
+        df: K线数据，按时间升序
+        last_only: 只计算各指标最新值，False时计算完整序列后取最后一个值
+        state_key: (代码, K线类型)，指定时使用K线缓存旁保存的增量指标状态，只计算新增K线
+    """
+    values = None
+    if state_key is not None and last_only and len(df) > 0:
+        try:
+            values = compute_indicators_incremental(df, *state_key)
+        except Exception as e:
+            print(f"⚠️  增量指标计算失败，改为完整计算: {e}")
+    if values is None:
+        values = compute_indicators(df, last_only=last_only)
+    stock_len = len(df)
     
     indicators = {
-        # 移动平均线
-        'ma_5': stock['close_5_sma'].iloc[-1] if stock_len > 5 else None,
-        'ma_10': stock['close_10_sma'].iloc[-1] if stock_len > 10 else None,
-        'ma_20': stock['close_20_sma'].iloc[-1] if stock_len > 20 else None,
-        'ma_60': stock['close_60_sma'].iloc[-1] if stock_len > 60 else None,
-        
-        # 指数移动平均
-        'ema_12': stock['close_12_ema'].iloc[-1] if stock_len > 12 else None,
-        'ema_26': stock['close_26_ema'].iloc[-1] if stock_len > 26 else None,
-        
-        # MACD指标
-        'macd': stock['macd'].iloc[-1] if stock_len > 26 else None,
-        'macd_signal': stock['macds'].iloc[-1] if stock_len > 26 else None,
-        'macd_histogram': stock['macdh'].iloc[-1] if stock_len > 26 else None,
-        
-        # KDJ指标
-        'kdj_k': stock['kdjk'].iloc[-1] if stock_len > 9 else None,
-        'kdj_d': stock['kdjd'].iloc[-1] if stock_len > 9 else None,
-        'kdj_j': stock['kdjj'].iloc[-1] if stock_len > 9 else None,
-        
-        # RSI指标
-        'rsi_14': stock['rsi_14'].iloc[-1] if stock_len > 14 else None,
-        
-        # 布林带
-        'boll_upper': stock['boll_ub'].iloc[-1] if stock_len > 20 else None,
-        'boll_middle': stock['boll'].iloc[-1] if stock_len > 20 else None,
-        'boll_lower': stock['boll_lb'].iloc[-1] if stock_len > 20 else None,
-        
-        # 威廉指标
-        'wr_14': stock['wr_14'].iloc[-1] if stock_len > 14 else None,
-        
-        # CCI指标
-        'cci_14': stock['cci_14'].iloc[-1] if stock_len > 14 else None,
-                
-        # 趋势判断
-        'ma_trend': _judge_ma_trend(stock),
-        'macd_trend': _judge_macd_trend(stock),
+        name: values[name] if stock_len > min_length else None
+        for name, min_length in INDICATOR_MIN_LENGTH.items()
     }
     
+    # 趋势判断
+    indicators['ma_trend'] = _judge_ma_trend(values)
+    indicators['macd_trend'] = _judge_macd_trend(values)
+    
     return indicators
 
 def fetch_stock_basic_info(stock_code: str) -> Dict:
@@ -193,18 +178,18 @@ def fetch_stock_technical_indicators(stock_code: str, period: int = 160) -> Dict
     indicators_info = {}
     
     try:
-        kline_data = data_manager.get_kline_data(stock_code, KLineType.DAY, period)
+        df = data_manager.get_kline_frame(stock_code, KLineType.DAY, period)
         
-        if not kline_data:
+        if df.empty:
             indicators_info['error'] = f"未获取到股票 {stock_code} 的K线数据"
         else:
-            df = pd.DataFrame([k.__dict__ for k in kline_data]).sort_values('datetime')
+            df = df.sort_values('datetime')
             
             # 计算移动平均线
             for period in [5, 10, 20]:
                 df[f'MA{period}'] = df['close'].rolling(window=period).mean()
             
-            indicators = get_indicators(df)
+            indicators = get_indicators(df, state_key=(stock_code, KLineType.DAY))
             
             # 风险指标计算
             risk_metrics = {}
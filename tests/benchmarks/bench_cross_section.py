@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+截面查询性能对比：长格式DataFrame上 groupby 计算后筛选 vs 价格仓库上的截面查询
+查询：peTTM > 0 and peTTM < 15 and momentum(20) > 0.05 and isST == 0，按 momentum(20) 取前50只
+
+运行方式：
+    python tests/benchmarks/bench_cross_section.py [股票数量] [交易日数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from backtesting.cross_section import CrossSectionEngine
+from backtesting.warehouse import build_warehouse
+
+FIELDS = ('close', 'peTTM', 'isST')
+WHERE = 'peTTM > 0 and peTTM < 15 and momentum(20) > 0.05 and isST == 0'
+QUERIES = 20
+
+
+def build_universe(n_symbols, n_days):
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2020-01-01', periods=n_days).strftime('%Y-%m-%d')
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_days, n_symbols)), axis=0))
+    pe = rng.uniform(-10, 40, n_symbols) * np.exp(np.cumsum(rng.normal(0, 0.01, (n_days, n_symbols)), axis=0))
+    st = (rng.random(n_symbols) < 0.05).astype(float)
+    return {f'{600000 + j:06d}': pd.DataFrame({'date': dates, 'close': close[:, j], 'peTTM': pe[:, j],
+                                               'isST': st[j]})
+            for j in range(n_symbols)}
+
+
+def pandas_query(long_df, date):
+    """常见写法：截取到查询日期，按股票分组算动量，再取当日截面筛选排序"""
+    hist = long_df[long_df['date'] <= date]
+    momentum = hist.groupby('symbol')['close'].pct_change(20)
+    day = hist.assign(momentum=momentum)
+    day = day[day['date'] == day['date'].max()]
+    day = day[(day['peTTM'] > 0) & (day['peTTM'] < 15) & (day['momentum'] > 0.05) & (day['isST'] == 0)]
+    return day.nlargest(50, 'momentum')
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    frames = build_universe(n_symbols, n_days)
+    print(f"{n_symbols} 只股票 × {n_days} 个交易日")
+
+    long_df = pd.concat([df.assign(symbol=s) for s, df in frames.items()], ignore_index=True)
+    long_df['date'] = pd.to_datetime(long_df['date'])
+    query_dates = pd.to_datetime(frames[next(iter(frames))]['date']).iloc[-QUERIES:].tolist()
+
+    start = time.perf_counter()
+    expected = [pandas_query(long_df, d) for d in query_dates[:3]]
+    t_pandas = (time.perf_counter() - start) / 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        warehouse = build_warehouse(os.path.join(tmp, 'warehouse'), frames=frames, fields=FIELDS)
+        t_build = time.perf_counter() - start
+
+        engine = CrossSectionEngine(warehouse)
+        start = time.perf_counter()
+        results = [engine.query(d, where=WHERE, rank_by='momentum(20)', top=50) for d in query_dates]
+        t_engine = (time.perf_counter() - start) / QUERIES
+
+        for ref, got in zip(expected, results):
+            assert list(ref['symbol']) == list(got.index), "查询结果与pandas参考实现不一致"
+
+    print(f"pandas长表查询: {t_pandas * 1000:.1f}ms/次")
+    print(f"仓库截面查询: {t_engine * 1000:.2f}ms/次（一次性构建仓库 {t_build:.2f}s）"
+          f" | 加速比 {t_pandas / t_engine:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+技术指标计算性能对比：stockstats vs NumPy指标引擎，以及增量状态追加新K线的耗时
+
+运行方式：
+    python tests/benchmarks/bench_indicator_engine.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from stockstats import wrap
+from tests.fixtures.data_generator import generate_stock_kline_data
+from utils.indicator_engine import IndicatorEngine, IndicatorState, SERIES_TO_INDICATOR
+
+
+def stockstats_indicators(df):
+    """原 get_indicators 的计算方式：包装整个DataFrame，逐列计算后取最后一个值"""
+    stock = wrap(df.copy())
+    return {name: stock[column].iloc[-1] for column, name in SERIES_TO_INDICATOR.items()}
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    np.random.seed(0)
+    print(f"{'K线数量':>8} | {'stockstats':>12} | {'引擎(完整序列)':>14} | {'引擎(仅最新值)':>14} | {'加速比':>8}")
+    print("-" * 72)
+    for days in (160, 1000, 5000):
+        df = generate_stock_kline_data(days=days)
+        df['amount'] = df['close'] * df['volume']
+        repeat = 20 if days <= 1000 else 5
+
+        t_stockstats = _best_of(lambda: stockstats_indicators(df), repeat)
+        t_series = _best_of(lambda: IndicatorEngine(df).compute(last_only=False), repeat)
+        t_latest = _best_of(lambda: IndicatorEngine(df).compute(last_only=True), repeat)
+
+        print(f"{days:>8} | {t_stockstats * 1000:>10.2f}ms | {t_series * 1000:>12.2f}ms | "
+              f"{t_latest * 1000:>12.2f}ms | {t_stockstats / t_latest:>7.1f}x")
+
+    # 增量更新：已有状态上追加一根新K线（含状态反序列化和取值）
+    print()
+    df = generate_stock_kline_data(days=250)
+    engine = IndicatorEngine(df)
+    saved = IndicatorState.from_engine(IndicatorEngine(df.iloc[:-1])).to_dict()
+
+    def incremental():
+        state = IndicatorState.from_dict(saved)
+        state.update(engine.close[-1], engine.high[-1], engine.low[-1], engine.tp[-1])
+        return state.values()
+
+    t_incremental = _best_of(incremental, 50)
+    t_recompute = _best_of(lambda: IndicatorEngine(df).compute(last_only=True), 50)
+    print(f"追加1根K线（{len(df)}根历史）: 增量 {t_incremental * 1000:.3f}ms | 重新计算 {t_recompute * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+多股票指标计算性能对比：逐只调用 get_indicators + calculate_portfolio_risk_summary vs 面板一次计算
+
+运行方式：
+    python tests/benchmarks/bench_indicator_panel.py [股票数量]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from stock.stock_utils import get_indicators
+from utils.indicator_panel import KLinePanel, compute_panel
+from utils.risk_metrics import calculate_portfolio_risk_summary
+
+BARS = 250
+LOOP_SAMPLE = 100
+
+
+def build_universe(n_symbols):
+    np.random.seed(0)
+    template = generate_stock_kline_data(days=350).tail(BARS).reset_index(drop=True)
+    frames = []
+    for i in range(n_symbols):
+        df = template.copy()
+        scale = np.exp(np.cumsum(np.random.normal(0, 0.02, BARS)))
+        for col in ('open', 'high', 'low', 'close'):
+            df[col] = df[col] * scale
+        df['symbol'] = f'{i:06d}'
+        frames.append(df)
+    return frames
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    frames = build_universe(n_symbols)
+    long = pd.concat(frames, ignore_index=True)
+    print(f"{n_symbols} 只股票 × {BARS} 根K线")
+
+    start = time.perf_counter()
+    for df in frames[:LOOP_SAMPLE]:
+        get_indicators(df)
+        calculate_portfolio_risk_summary(df)
+    t_loop = (time.perf_counter() - start) / LOOP_SAMPLE * n_symbols
+
+    start = time.perf_counter()
+    panel = KLinePanel.from_long_frame(long)
+    t_build = time.perf_counter() - start
+    start = time.perf_counter()
+    compute_panel(panel)
+    t_panel = time.perf_counter() - start
+
+    print(f"逐只计算（按{LOOP_SAMPLE}只外推）: {t_loop:.2f}s")
+    print(f"面板计算: 构建 {t_build:.2f}s + 指标 {t_panel:.2f}s | 加速比 {t_loop / (t_build + t_panel):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+回测性能对比：SimpleBacktest 逐行回测 vs 向量化回测（同一均线交叉策略）
+
+运行方式：
+    python tests/benchmarks/bench_vectorized_backtest.py [股票数量]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from backtesting.backtest import SimpleBacktest
+from backtesting.vectorized import run_vectorized_backtest, simulate_signals
+
+YEARS = 20
+
+
+def ma_cross_signals(close, short=5, long=20):
+    """均线交叉信号：短均线上穿买入、下穿卖出"""
+    kernel_short, kernel_long = np.ones(short) / short, np.ones(long) / long
+    ma_short = np.convolve(close, kernel_short)[:len(close)]
+    ma_long = np.convolve(close, kernel_long)[:len(close)]
+    above = ma_short > ma_long
+    above[:long - 1] = False
+    prev = np.concatenate([[False], above[:-1]])
+    return np.where(above & ~prev, 1, np.where(~above & prev, -1, 0))
+
+
+def row_loop(df, signals):
+    actions = np.where(signals > 0, 'buy', np.where(signals < 0, 'sell', 'hold'))
+
+    def strategy(i, row, backtest, data):
+        return actions[i]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SimpleBacktest().run_backtest(df, strategy)
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    np.random.seed(0)
+    df = generate_stock_kline_data(days=int(YEARS * 365)).rename(columns={'datetime': 'date'}).reset_index(drop=True)
+    close = df['close'].to_numpy()
+    signals = ma_cross_signals(close)
+    print(f"{YEARS}年日线（{len(df)} 根K线），{int((signals != 0).sum())} 个信号")
+
+    start = time.perf_counter()
+    expected = row_loop(df, signals)
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = run_vectorized_backtest(df, signals)
+    t_vec = time.perf_counter() - start
+    assert np.isclose(actual['final_value'], expected['final_value'])
+
+    start = time.perf_counter()
+    for _ in range(n_symbols):
+        simulate_signals(close, signals)
+    t_sim = (time.perf_counter() - start) / n_symbols
+
+    print(f"逐行回测: {t_loop * 1000:.1f}ms | 向量化（含结果表）: {t_vec * 1000:.1f}ms | "
+          f"仅模拟: {t_sim * 1000:.2f}ms | 加速比 {t_loop / t_vec:.0f}x")
+    print(f"{n_symbols} 只股票: 逐行约 {t_loop * n_symbols:.1f}s | 向量化模拟 {t_sim * n_symbols:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
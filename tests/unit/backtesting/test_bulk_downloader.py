@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试可断点续传的批量下载 get_stock_data.BulkDownloader（使用本地桩数据源）
+"""
+import os
+import sys
+import json
+from functools import partial
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from backtesting.get_stock_data import BulkDownloader
+
+CODES = ['sh.600000', 'sh.600036', 'sz.000001']
+
+
+class StubSource:
+    """按日期生成确定数据的桩数据源，登录和查询记录写入 log_dir"""
+
+    def __init__(self, log_dir, fail_codes=()):
+        self.log_dir = log_dir
+        self.fail_codes = set(fail_codes)
+
+    def _log(self, event):
+        with open(os.path.join(self.log_dir, f'{event}-{os.getpid()}'), 'a') as f:
+            f.write('1\n')
+
+    def login(self):
+        self._log('login')
+
+    def logout(self):
+        self._log('logout')
+
+    def query_all_stock(self, date):
+        return pd.DataFrame({'code': CODES, 'code_name': ['浦发银行', '招商银行', '平安银行']})
+
+    def query_history(self, code, fields, start_date, end_date):
+        if code in self.fail_codes:
+            raise RuntimeError('network error')
+        with open(os.path.join(self.log_dir, 'queries.log'), 'a') as f:
+            f.write(f'{code},{start_date},{end_date}\n')
+        dates = pd.bdate_range(start_date, end_date)
+        base = float(int(code[-3:]) + 10)
+        rows = {name: ['0'] * len(dates) for name in fields.split(',')}
+        rows.update({'date': dates.strftime('%Y-%m-%d'), 'code': [code] * len(dates),
+                     'close': [f'{base + i * 0.1:.2f}' for i in range(len(dates))],
+                     'volume': [str(1000 + i) for i in range(len(dates))], 'peTTM': ['12.5'] * len(dates)})
+        return pd.DataFrame(rows)
+
+
+def _queries(log_dir):
+    path = os.path.join(log_dir, 'queries.log')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [tuple(line.strip().split(',')) for line in f]
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    path = tmp_path / 'log'
+    path.mkdir()
+    return str(path)
+
+
+class TestBulkDownloader:
+    """测试批量下载"""
+
+    @pytest.mark.unit
+    def test_resume_after_failure_and_incremental_append(self, tmp_path, log_dir):
+        dataset = str(tmp_path / 'dataset')
+        failing = partial(StubSource, log_dir, fail_codes=['sh.600036'])
+        stats = BulkDownloader(dataset, '2024-01-01', '2024-01-31', max_workers=1, source_factory=failing).run()
+        assert stats['downloaded'] == 2 and list(stats['failed']) == ['sh.600036']
+
+        # 重新运行：只补下载失败的股票
+        source = partial(StubSource, log_dir)
+        stats = BulkDownloader(dataset, '2024-01-01', '2024-01-31', max_workers=1, source_factory=source).run()
+        assert stats['downloaded'] == 1 and stats['skipped'] == 2
+        assert _queries(log_dir)[-1] == ('sh.600036', '2024-01-01', '2024-01-31')
+
+        # 延长结束日期：只下载最后日期之后的新数据
+        downloader = BulkDownloader(dataset, '2024-01-01', '2024-02-09', max_workers=1, source_factory=source)
+        stats = downloader.run()
+        assert {q[1] for q in _queries(log_dir)[-3:]} == {'2024-02-01'}
+        assert stats['rows'] == 3 * 7
+
+        df = downloader.read('sh.600000')
+        assert len(df) == 23 + 7 and df['date'].is_monotonic_increasing
+        assert df['volume'].dtype == 'int64' and df['peTTM'].iloc[0] == 12.5
+        with open(os.path.join(dataset, 'manifest.json'), encoding='utf-8') as f:
+            assert json.load(f)['codes']['sz.000001']['last_date'] == '2024-02-09'
+
+    @pytest.mark.unit
+    def test_worker_processes_login_separately(self, tmp_path, log_dir):
+        dataset = str(tmp_path / 'dataset')
+        source = partial(StubSource, log_dir)
+        stats = BulkDownloader(dataset, '2024-01-01', '2024-01-31', max_workers=2, source_factory=source).run()
+
+        assert stats['downloaded'] == 3
+        worker_logins = [f for f in os.listdir(log_dir) if f.startswith('login-') and f != f'login-{os.getpid()}']
+        assert 1 <= len(worker_logins) <= 2
+        assert all(os.path.exists(os.path.join(log_dir, f.replace('login', 'logout'))) for f in worker_logins)
+        reference = BulkDownloader(str(tmp_path / 'serial'), '2024-01-01', '2024-01-31', max_workers=1,
+                                   source_factory=source)
+        reference.run()
+        for code in CODES:
+            pd.testing.assert_frame_equal(reference.read(code), BulkDownloader(
+                dataset, source_factory=source).read(code))
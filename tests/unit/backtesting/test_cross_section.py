@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+测试截面查询 cross_section.py
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from backtesting.cross_section import CrossSectionEngine, field, mean, momentum, parse_expression
+from backtesting.warehouse import build_warehouse
+
+
+def _universe_frames(n_symbols=40, days=180):
+    """多只股票：估值、ST标记各不相同，部分股票晚上市"""
+    rng = np.random.default_rng(20)
+    np.random.seed(20)
+    frames = {}
+    for k in range(n_symbols):
+        code = f'sh.{600000 + k}'
+        df = generate_stock_kline_data(days=days, start_price=float(rng.uniform(5, 50)))
+        if k % 7 == 3:
+            df = df.iloc[60:]
+        frames[code] = pd.DataFrame({
+            'date': df['datetime'].dt.strftime('%Y-%m-%d'), 'code': code,
+            'close': df['close'], 'volume': df['volume'],
+            'turn': rng.uniform(0.5, 5, len(df)),
+            'peTTM': rng.uniform(-10, 40) + np.zeros(len(df)),
+            'isST': int(k % 11 == 0),
+        }).reset_index(drop=True)
+    return frames
+
+
+def _long_frame(frames):
+    return pd.concat(frames.values(), ignore_index=True).assign(date=lambda d: pd.to_datetime(d['date']))
+
+
+@pytest.fixture(scope='module')
+def frames():
+    return _universe_frames()
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory, frames):
+    root = tmp_path_factory.mktemp('cross_section') / 'warehouse'
+    warehouse = build_warehouse(str(root), frames=frames, fields=('close', 'volume', 'turn', 'peTTM', 'isST'))
+    return CrossSectionEngine(warehouse)
+
+
+def _reference_momentum(long_df, date, window):
+    """pandas参考实现：按全体交易日对齐后的 window 日涨跌幅"""
+    wide = long_df.pivot(index='date', columns='code', values='close').sort_index()
+    wide = wide.loc[:date]
+    return wide.iloc[-1] / wide.iloc[-1 - window] - 1
+
+
+class TestCrossSectionQuery:
+    """测试截面筛选和排序"""
+
+    @pytest.mark.unit
+    def test_filter_and_top_k_matches_pandas(self, engine, frames):
+        long_df = _long_frame(frames)
+        date = long_df['date'].sort_values().unique()[-10]
+        result = engine.query(date, where='peTTM > 0 and peTTM < 15 and momentum(20) > -0.05 and isST == 0',
+                              rank_by='momentum(20)', top=5, columns=['close', 'peTTM'])
+
+        day = long_df[long_df['date'] == date].set_index('code')
+        mom = _reference_momentum(long_df, date, 20)
+        expected = day[(day['peTTM'] > 0) & (day['peTTM'] < 15) & (day['isST'] == 0)].copy()
+        expected['score'] = mom.reindex(expected.index)
+        expected = expected[expected['score'] > -0.05].sort_values('score', ascending=False).head(5)
+
+        assert list(result.index) == list(expected.index)
+        np.testing.assert_allclose(result['score'], expected['score'])
+        np.testing.assert_allclose(result['peTTM'], expected['peTTM'])
+        assert list(result['rank']) == list(range(1, len(expected) + 1))
+        assert (result['date'] == pd.Timestamp(date)).all()
+
+    @pytest.mark.unit
+    def test_ascending_rank_and_full_universe(self, engine, frames):
+        date = _long_frame(frames)['date'].max()
+        result = engine.query(date, rank_by='peTTM', ascending=True)
+        assert len(result) == len(frames)
+        assert result['score'].is_monotonic_increasing
+
+    @pytest.mark.unit
+    def test_point_in_time_uses_previous_trading_day(self, engine, frames):
+        dates = np.sort(_long_frame(frames)['date'].unique())
+        saturday = next(d for d in pd.date_range(dates[50], dates[60]) if d.dayofweek == 5)
+        friday = saturday - pd.Timedelta(days=1)
+        result = engine.query(saturday, where='isST == 0')
+        assert (result['date'] == friday).all()
+        with pytest.raises(KeyError):
+            engine.query(pd.Timestamp(dates[0]) - pd.Timedelta(days=7))
+
+    @pytest.mark.unit
+    def test_unlisted_stocks_are_excluded(self, engine, frames):
+        dates = np.sort(_long_frame(frames)['date'].unique())
+        result = engine.query(dates[10])
+        late = [code for k, code in enumerate(frames) if k % 7 == 3]
+        assert not set(late) & set(result.index)
+        assert len(result) == len(frames) - len(late)
+
+    @pytest.mark.unit
+    def test_expression_objects_match_strings(self, engine, frames):
+        date = _long_frame(frames)['date'].max()
+        by_string = engine.query(date, where='(close > mean(close, 10)) & (turn > 1)', rank_by='turn * 2')
+        by_expr = engine.query(date, where=(field('close') > mean('close', 10)) & (field('turn') > 1),
+                               rank_by=field('turn') * 2)
+        pd.testing.assert_frame_equal(by_string, by_expr)
+
+        long_df = _long_frame(frames)
+        wide = long_df.pivot(index='date', columns='code', values='close').sort_index()
+        expected = wide.iloc[-10:].mean()
+        values = engine.evaluate(mean('close', 10), date)
+        np.testing.assert_allclose(values.to_numpy(), expected.reindex(values.index).to_numpy())
+
+    @pytest.mark.unit
+    def test_rank_and_zscore_are_cross_sectional(self, engine, frames):
+        date = _long_frame(frames)['date'].max()
+        ranks = engine.evaluate('rank(turn)', date)
+        assert ranks.max() == 1.0
+        zs = engine.evaluate(momentum(5).zscore(), date)
+        assert abs(np.nanmean(zs)) < 1e-9
+
+
+class TestParseExpression:
+    """测试表达式解析"""
+
+    @pytest.mark.unit
+    def test_chained_compare(self):
+        assert repr(parse_expression('0 < peTTM < 15')) == '((0 < peTTM) & (peTTM < 15))'
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('text', ['__import__("os")', 'close.real', 'close[0]', 'lambda: 1', 'close >'])
+    def test_rejects_unsupported_syntax(self, text):
+        with pytest.raises(ValueError):
+            parse_expression(text)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试回测记录表 ledger.py 与 SimpleBacktest 的结果汇总
+"""
+import os
+import sys
+from collections import deque
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from backtesting.backtest import SimpleBacktest
+from backtesting.ledger import HISTORY_SCHEMA, ArrayLedger, TradeLedger, fifo_win_rate, match_trades_fifo
+
+
+def _fifo_reference(trades):
+    """逐笔循环的先进先出匹配"""
+    lots, segments = deque(), []
+    for is_buy, price, volume in trades:
+        if is_buy:
+            lots.append([price, volume])
+            continue
+        while volume > 0 and lots:
+            lot = lots[0]
+            qty = min(lot[1], volume)
+            segments.append((lot[0], price, qty))
+            lot[1] -= qty
+            volume -= qty
+            if lot[1] == 0:
+                lots.popleft()
+    return segments
+
+
+class TestLedger:
+    """测试列式记录表"""
+
+    @pytest.mark.unit
+    def test_grows_past_capacity_and_caches_frame(self):
+        ledger = ArrayLedger(HISTORY_SCHEMA, capacity=2)
+        for i in range(5):
+            ledger.append(f'd{i}', 100.0 - i, i, 10.0, 100.0, 0.0)
+
+        assert len(ledger) == 5 and ledger.capacity >= 5
+        assert ledger[-1] == {'date': 'd4', 'cash': 96.0, 'position': 4, 'current_price': 10.0,
+                              'total_value': 100.0, 'drawdown': 0.0}
+        frame = ledger.to_frame()
+        assert ledger.to_frame() is frame
+        ledger.append('d5', 0.0, 0, 0.0, 0.0, 0.0)
+        assert len(ledger.to_frame()) == 6
+
+    @pytest.mark.unit
+    def test_trade_records_keep_dict_layout(self):
+        ledger = TradeLedger()
+        ledger.append('2024-01-02', False, 11.0, 100)
+        ledger.append('2024-01-03', True, 10.0, 50)
+
+        assert ledger[0] == {'date': '2024-01-02', 'action': 'sell', 'price': 11.0, 'volume': 100,
+                             'revenue': 1100.0}
+        expected = pd.DataFrame([ledger[0], ledger[1]])
+        pd.testing.assert_frame_equal(ledger.to_frame(), expected)
+
+    @pytest.mark.unit
+    def test_fifo_matches_reference(self):
+        rng = np.random.default_rng(0)
+        trades, position = [], 0
+        for _ in range(300):
+            if position == 0 or rng.random() < 0.5:
+                volume = int(rng.integers(1, 500))
+                position += volume
+                trades.append((True, float(rng.uniform(5, 15)), volume))
+            else:
+                volume = int(rng.integers(1, position + 1))
+                position -= volume
+                trades.append((False, float(rng.uniform(5, 15)), volume))
+        is_buy, prices, volumes = (np.array(col) for col in zip(*trades))
+
+        buy_prices, sell_prices, quantities = match_trades_fifo(is_buy, prices, volumes)
+        reference = _fifo_reference(trades)
+
+        assert len(quantities) == len(reference)
+        np.testing.assert_array_equal(np.column_stack([buy_prices, sell_prices, quantities]), np.array(reference))
+        total, win_rate = fifo_win_rate(is_buy, prices, volumes)
+        assert total == len(reference)
+        assert win_rate == pytest.approx(np.mean([s > b for b, s, _ in reference]))
+
+
+class TestSimpleBacktestResults:
+    """测试 SimpleBacktest 使用记录表后的结果"""
+
+    @pytest.mark.unit
+    def test_partial_sells_use_fifo_win_rate(self):
+        bt = SimpleBacktest(initial_cash=10000, capacity=2)
+        bt.buy(10.0, 100, 'd1')
+        bt.update_value(10.0, 'd1')
+        bt.buy(20.0, 100, 'd2')
+        bt.update_value(20.0, 'd2')
+        bt.sell(15.0, 150, 'd3')
+        bt.update_value(15.0, 'd3')
+
+        results = bt.get_results()
+
+        # 卖出150股：100股对应10元买入（盈利），50股对应20元买入（亏损）
+        assert results['total_trades'] == 2
+        assert results['win_rate'] == 0.5
+        assert results['history']['position'].tolist() == [100, 200, 50]
+        assert list(results['trades'].columns) == ['date', 'action', 'price', 'volume', 'cost', 'revenue']
+        assert bt.history[-1]['total_value'] == pytest.approx(results['final_value'])
+
+        bt.reset()
+        assert not bt.history and bt.get_results() == {}
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+测试参数扫描 sweep.py
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from backtesting.sweep import SharedPriceArrays, expand_param_grid, run_parameter_sweep, run_strategy_sweep
+from backtesting.vectorized import run_vectorized_backtest
+
+
+def ma_cross(bars, short=5, long=20):
+    close = pd.Series(bars['close'])
+    above = close.rolling(short).mean() > close.rolling(long).mean()
+    prev = above.shift(1, fill_value=False)
+    return np.where(above & ~prev, 1, np.where(~above & prev, -1, 0))
+
+
+def breakout(bars, window=20):
+    high = pd.Series(bars['high']).rolling(window).max().shift(1)
+    return np.where(bars['close'] > high, 1, np.where(bars['close'] < high * 0.9, -1, 0)), 0.5
+
+
+def broken(bars):
+    raise RuntimeError('bad strategy')
+
+
+@pytest.fixture
+def universe():
+    np.random.seed(5)
+    return {f'S{i}': generate_stock_kline_data(days=200 + 50 * i).rename(columns={'datetime': 'date'})
+            for i in range(3)}
+
+
+class TestSweep:
+    """测试参数扫描"""
+
+    @pytest.mark.unit
+    def test_expand_param_grid(self):
+        assert expand_param_grid(None) == [{}]
+        assert expand_param_grid({'a': [1, 2], 'b': [3]}) == [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+
+    @pytest.mark.unit
+    def test_shared_arrays_keep_each_symbol(self, universe):
+        with SharedPriceArrays(universe, fields=('close', 'high')) as prices:
+            assert prices.symbols == ['S0', 'S1', 'S2']
+            bars = prices.bars(2)
+            np.testing.assert_array_equal(bars['close'], universe['S2']['close'].to_numpy())
+            assert len(prices.bars(0)['high']) == len(universe['S0'])
+
+    @pytest.mark.unit
+    def test_summary_matches_single_backtest(self, universe):
+        summary = run_parameter_sweep(universe, ma_cross, {'short': [5, 10], 'long': [30]}, max_workers=1)
+
+        assert len(summary) == 6
+        row = summary[(summary['symbol'] == 'S1') & (summary['params'] == 'short=10, long=30')].iloc[0]
+        df = universe['S1']
+        expected = run_vectorized_backtest(df, ma_cross({'close': df['close'].to_numpy()}, 10, 30))
+        for key in ('total_return', 'annual_return', 'sharpe_ratio', 'max_drawdown', 'total_trades', 'win_rate'):
+            assert row[key] == pytest.approx(expected[key], rel=1e-12), key
+
+    @pytest.mark.unit
+    def test_process_pool_matches_serial(self, universe):
+        strategies = {'均线': (ma_cross, {'short': [5, 10]}), '突破': (breakout, {'window': [10, 20]}),
+                      '异常': (broken, None)}
+        kwargs = dict(symbols=['S0', 'S2'], fields=('high',))
+
+        serial = run_strategy_sweep(universe, strategies, max_workers=1, **kwargs)
+        streamed = []
+        parallel = run_strategy_sweep(universe, strategies, max_workers=2, on_result=streamed.append, **kwargs)
+
+        assert len(streamed) == len(parallel) == 10
+        pd.testing.assert_frame_equal(serial, parallel)
+        assert parallel.loc[parallel['strategy'] == '异常', 'error'].eq('bad strategy').all()
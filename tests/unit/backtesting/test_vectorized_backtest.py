@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+测试向量化回测 vectorized.py（与 SimpleBacktest 逐行回测结果一致）
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from backtesting.backtest import SimpleBacktest
+from backtesting.vectorized import run_vectorized_backtest, simulate_signals
+
+
+def _data(days=400, seed=11):
+    np.random.seed(seed)
+    df = generate_stock_kline_data(days=days).rename(columns={'datetime': 'date'}).reset_index(drop=True)
+    df['ma5'] = df['close'].rolling(5).mean()
+    df['ma20'] = df['close'].rolling(20).mean()
+    return df
+
+
+def _signals(df):
+    """均线交叉：上穿分批买入，下穿分批卖出"""
+    above = df['ma5'] > df['ma20']
+    cross_up = above & ~above.shift(1, fill_value=False)
+    cross_down = ~above & above.shift(1, fill_value=False) & df['ma20'].notna()
+    signals = np.where(cross_up, 'buy', np.where(cross_down, 'sell', 'hold'))
+    ratios = np.where(cross_up, 0.6, 0.5)
+    return signals, ratios
+
+
+def _row_loop(df, signals, ratios):
+    def strategy(i, row, backtest, data):
+        return {'action': signals[i], 'ratio': ratios[i]}
+    return SimpleBacktest(initial_cash=100000).run_backtest(df, strategy)
+
+
+class TestVectorizedBacktest:
+    """测试向量化回测"""
+
+    @pytest.mark.unit
+    def test_matches_row_loop(self):
+        df = _data()
+        signals, ratios = _signals(df)
+
+        expected = _row_loop(df, signals, ratios)
+        actual = run_vectorized_backtest(df, signals, ratios, initial_cash=100000)
+
+        assert expected['total_trades'] > 2
+        for key in ('final_value', 'total_return', 'annual_return', 'max_drawdown', 'sharpe_ratio',
+                    'total_trades', 'win_rate'):
+            assert actual[key] == pytest.approx(expected[key], rel=1e-12), key
+        pd.testing.assert_frame_equal(actual['history'], expected['history'])
+        pd.testing.assert_frame_equal(actual['trades'], expected['trades'])
+
+    @pytest.mark.unit
+    def test_numeric_signals_and_ignored_orders(self):
+        close = np.array([10.0, 11.0, 12.0, 9.0, 10.0])
+        # 第二次买入时现金不足一股、空仓时卖出，都不会成交
+        sim = simulate_signals(close, [1, 1, -1, -1, 0], initial_cash=25)
+
+        assert sim['trade_bars'].tolist() == [0, 2]
+        assert sim['position'].tolist() == [2, 2, 0, 0, 0]
+        assert sim['total_value'].tolist() == [25.0, 27.0, 29.0, 29.0, 29.0]
+        assert sim['max_drawdown'] == 0.0
+
+    @pytest.mark.unit
+    def test_rejects_mismatched_signals(self):
+        with pytest.raises(ValueError):
+            simulate_signals(np.ones(3), [1, 0])
+        assert run_vectorized_backtest(pd.DataFrame(columns=['date', 'close']), []) == {}
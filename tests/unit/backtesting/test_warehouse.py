@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试内存映射价格仓库 warehouse.py
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from backtesting.warehouse import PriceWarehouse, _restore_previous, build_warehouse
+from backtesting.vectorized import run_vectorized_backtest
+from stock.stock_utils import get_indicators
+from utils.indicator_panel import compute_panel_indicators
+
+
+def _baostock_frames():
+    """三只股票：上市时间不同，其中一只中间停牌（缺少若干日期）"""
+    np.random.seed(9)
+    frames = {}
+    for code, days, skip in (('sh.600000', 200, 0), ('sh.600036', 120, 0), ('sz.000001', 160, 40)):
+        df = generate_stock_kline_data(days=days, start_price=10.0)
+        df = df.tail(len(df) - skip // 2) if skip else df
+        if code == 'sz.000001':
+            df = df.drop(df.index[30:35])
+        out = pd.DataFrame({'date': df['datetime'].dt.strftime('%Y-%m-%d'), 'code': code,
+                            'open': df['open'], 'high': df['high'], 'low': df['low'], 'close': df['close'],
+                            'volume': df['volume'], 'amount': df['close'] * df['volume'],
+                            'turn': 1.5, 'peTTM': np.linspace(8, 20, len(df)), 'pbMRQ': 1.2, 'isST': 0})
+        frames[code] = out.round(4).reset_index(drop=True)
+    return frames
+
+
+@pytest.fixture
+def frames():
+    return _baostock_frames()
+
+
+@pytest.fixture
+def warehouse(tmp_path, frames):
+    csv_dir = tmp_path / 'stockdata'
+    csv_dir.mkdir()
+    names = {'sh.600000': '浦发银行', 'sh.600036': '招商银行', 'sz.000001': '平安银行'}
+    for code, df in frames.items():
+        df.to_csv(csv_dir / f'{code}.{names[code]}.csv', index=False)
+    build_warehouse(str(tmp_path / 'warehouse'), csv_dir=str(csv_dir))
+    return PriceWarehouse(str(tmp_path / 'warehouse'))
+
+
+class TestPriceWarehouse:
+    """测试价格仓库"""
+
+    @pytest.mark.unit
+    def test_history_is_zero_copy_view(self, warehouse, frames):
+        assert warehouse.symbols == ['sh.600000', 'sh.600036', 'sz.000001']
+        history = warehouse.history('sh.600036')
+
+        np.testing.assert_array_equal(history['close'], frames['sh.600036']['close'])
+        assert np.shares_memory(history['close'], warehouse.array('close'))
+        assert isinstance(warehouse.array('close'), np.memmap)
+        assert str(history['date'][0]) == frames['sh.600036']['date'].iloc[0]
+
+    @pytest.mark.unit
+    def test_cross_section_as_of_date(self, warehouse, frames):
+        saturday = pd.Timestamp(frames['sh.600000']['date'].iloc[-1]) + pd.offsets.Week(weekday=5)
+        section = warehouse.cross_section(saturday, fields=['close', 'peTTM'])
+
+        assert np.shares_memory(section['close'], warehouse.array('close'))
+        expected = [frames[s]['close'].iloc[-1] for s in warehouse.symbols]
+        np.testing.assert_array_equal(section['close'], expected)
+        with pytest.raises(KeyError):
+            warehouse.date_index(saturday, asof=False)
+        with pytest.raises(KeyError):
+            warehouse.cross_section('1990-01-01')
+
+    @pytest.mark.unit
+    def test_frame_feeds_backtest_and_indicators(self, warehouse, frames):
+        df = warehouse.frame('sz.000001')
+        source = frames['sz.000001']
+
+        assert len(df) == len(source)
+        assert get_indicators(df) == pytest.approx(get_indicators(source[['close', 'high', 'low', 'volume', 'amount']]))
+        signals = np.where(df.index % 20 == 0, 1, np.where(df.index % 20 == 10, -1, 0))
+        results = run_vectorized_backtest(df, signals)
+        assert results['total_trades'] > 0
+
+    @pytest.mark.unit
+    def test_panel_matches_per_symbol_indicators(self, warehouse):
+        end = warehouse.dates[-10]
+        result = compute_panel_indicators(warehouse.panel(end=end))
+
+        for symbol in warehouse.symbols:
+            df = warehouse.frame(symbol, end=end)
+            expected = get_indicators(df)
+            assert result.loc[symbol, 'bars'] == len(df)
+            assert result.loc[symbol, 'last_date'] == df['date'].iloc[-1]
+            for name in ('ma_20', 'macd', 'rsi_14', 'cci_14'):
+                assert result.loc[symbol, name] == pytest.approx(expected[name], rel=1e-9), name
+
+    @pytest.mark.unit
+    def test_build_from_dataset(self, tmp_path, frames, warehouse):
+        from backtesting.get_stock_data import BAOSTOCK_COLUMNS, DATASET_KLINE_TYPE
+        from utils.kline_store import PartitionedKLineStore
+
+        store = PartitionedKLineStore(str(tmp_path / 'dataset'), columns=BAOSTOCK_COLUMNS, date_col='date')
+        for code, df in frames.items():
+            store.write(DATASET_KLINE_TYPE, code, df)
+
+        from_dataset = build_warehouse(str(tmp_path / 'wh2'), dataset_dir=str(tmp_path / 'dataset'))
+        np.testing.assert_array_equal(from_dataset.array('close'), warehouse.array('close'))
+        np.testing.assert_array_equal(from_dataset.dates, warehouse.dates)
+
+    @pytest.mark.unit
+    def test_rebuild_replaces_previous_warehouse(self, tmp_path, frames, warehouse):
+        output_dir = str(tmp_path / 'warehouse')
+        rebuilt = build_warehouse(output_dir, frames={'sh.600000': frames['sh.600000']})
+
+        assert rebuilt.symbols == ['sh.600000']
+        assert sorted(os.listdir(tmp_path)) == ['stockdata', 'warehouse']
+
+    @pytest.mark.unit
+    def test_interrupted_swap_is_recovered(self, tmp_path, warehouse):
+        output_dir = str(tmp_path / 'warehouse')
+        # 模拟在两次改名之间中断：旧仓库已移到 .old，新目录还未换入
+        os.replace(output_dir, output_dir + '.old')
+
+        _restore_previous(output_dir)
+
+        assert PriceWarehouse(output_dir).symbols == warehouse.symbols
+        assert not os.path.exists(output_dir + '.old')
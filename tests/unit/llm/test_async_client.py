@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+测试异步LLM客户端 AsyncOpenAIClient（并发上限、单请求超时、取消、缓存）
+使用本地HTTP服务模拟 OpenAI 接口
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from llm.openai_client import AsyncOpenAIClient, BaseLLMClient, OpenAIClient
+from llm.response_cache import ResponseCache
+from llm.usage_logger import UsageLogger
+
+
+class _MockOpenAIServer(ThreadingHTTPServer):
+    """模拟 /v1/chat/completions，消息内容为 "sleep:<秒数>" 时延迟相应时间再回复"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        content = body['messages'][-1]['content']
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            delay = float(content.split(':', 1)[1]) if content.startswith('sleep:') else 0.05
+            time.sleep(delay)
+            payload = json.dumps({
+                'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': f"回复:{content}"}}],
+                'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = _MockOpenAIServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def usage_logger(tmp_path):
+    return UsageLogger(str(tmp_path / 'usage.csv'))
+
+
+@pytest.fixture
+def make_client(server, usage_logger):
+    def make(response_cache=None, **kwargs):
+        kwargs.setdefault('max_concurrency', 5)
+        client = AsyncOpenAIClient(api_key='sk-test', base_url=server.url, usage_logger=usage_logger, **kwargs)
+        # 不使用配置中的响应缓存
+        client.response_cache = response_cache
+        return client
+    server.max_in_flight = 0
+    return make
+
+
+def _request(content):
+    return {'messages': [{'role': 'user', 'content': content}], 'temperature': 0.5, 'use_cache': False}
+
+
+class TestAsyncOpenAIClient:
+    """测试异步客户端"""
+
+    @pytest.mark.unit
+    def test_gather_returns_results_in_order(self, make_client):
+        client = make_client()
+        results = client.gather([_request('sleep:0.2'), _request('sleep:0'), _request('sleep:0.1')])
+        assert results == ['回复:sleep:0.2', '回复:sleep:0', '回复:sleep:0.1']
+
+    @pytest.mark.unit
+    def test_requests_run_concurrently(self, make_client, usage_logger, server):
+        client = make_client()
+        results = client.gather([_request('sleep:0.3') for _ in range(5)])
+
+        assert all(r == '回复:sleep:0.3' for r in results)
+        assert server.max_in_flight == 5
+        stats = usage_logger.get_usage_stats()
+        assert stats['total_requests'] == 5
+        assert stats['success_rate'] == 1.0
+
+    @pytest.mark.unit
+    def test_concurrency_bound(self, make_client, server):
+        client = make_client(max_concurrency=2)
+        results = client.gather([_request('sleep:0.15') for _ in range(6)])
+        assert len(results) == 6
+        assert server.max_in_flight == 2
+
+    @pytest.mark.unit
+    def test_timeout_fails_only_that_request(self, make_client, usage_logger):
+        client = make_client()
+        results = client.gather([_request('sleep:0'), dict(_request('sleep:2'), timeout=0.2)])
+
+        assert results[0] == '回复:sleep:0'
+        assert isinstance(results[1], asyncio.TimeoutError)
+        stats = usage_logger.get_usage_stats()
+        assert stats['total_requests'] == 2
+        assert stats['success_rate'] == 0.5
+
+    @pytest.mark.unit
+    def test_timeout_excludes_queueing(self, make_client, usage_logger):
+        # 单并发依次执行，排在后面的请求等待的时间不计入其超时
+        client = make_client(max_concurrency=1)
+        results = client.gather([_request('sleep:0.3') for _ in range(3)], timeout=0.5)
+
+        assert results == ['回复:sleep:0.3'] * 3
+        assert usage_logger.get_usage_stats()['success_rate'] == 1.0
+
+    @pytest.mark.unit
+    def test_cancellation_propagates(self, make_client, usage_logger):
+        client = make_client()
+
+        async def run():
+            task = asyncio.ensure_future(client.ask_many([_request('sleep:2'), _request('sleep:2')]))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            try:
+                await task
+            finally:
+                await client.aclose()
+
+        start = time.perf_counter()
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(run())
+        assert time.perf_counter() - start < 1.5
+        stats = usage_logger.get_usage_stats()
+        assert stats['total_requests'] == 2
+        assert stats['success_rate'] == 0.0
+
+    @pytest.mark.unit
+    def test_gather_inside_running_loop(self, make_client):
+        client = make_client()
+
+        async def run():
+            return client.gather([_request('a'), _request('b')])
+
+        assert asyncio.run(run()) == ['回复:a', '回复:b']
+
+    @pytest.mark.unit
+    def test_cached_requests_skip_api(self, make_client, server, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'cache'), ttl=3600)
+        client = make_client(response_cache=cache)
+        request = dict(_request('缓存'), use_cache=True)
+
+        client.gather([request])
+        before = server.requests
+        assert client.gather([request, request]) == ['回复:缓存', '回复:缓存']
+        assert server.requests == before
+
+    @pytest.mark.unit
+    def test_sync_client_with_base_url(self, server, usage_logger):
+        client = OpenAIClient(api_key='sk-test', base_url=server.url, usage_logger=usage_logger)
+        client.response_cache = None
+        assert client.ask('同步') == '回复:同步'
+
+    @pytest.mark.unit
+    def test_async_client_is_not_a_sync_client(self, make_client):
+        client = make_client()
+        assert not isinstance(client, OpenAIClient)
+        assert isinstance(client, BaseLLMClient)
+        assert asyncio.iscoroutinefunction(client.ask)
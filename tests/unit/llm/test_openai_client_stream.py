@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+测试 OpenAIClient 流式输出（逐段产出、用量记录、缓存、中断）
+"""
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+from openai import BadRequestError
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import llm.token_budget as token_budget
+from llm.openai_client import OpenAIClient
+from llm.response_cache import ResponseCache
+from llm.usage_logger import UsageLogger
+from stock.stock_ai_analysis import BaseAnalysisGenerator
+
+USAGE = {'prompt_tokens': 30, 'completion_tokens': 12, 'total_tokens': 42}
+
+
+class _Stream:
+    """模拟 openai 的流式响应：内容块之后是只带用量的最后一块"""
+
+    def __init__(self, deltas, usage=USAGE, error=None):
+        self.deltas = deltas
+        self.usage = usage
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        if self.error:
+            raise self.error
+        if self.usage:
+            usage = Mock()
+            usage.model_dump.return_value = dict(self.usage)
+            yield SimpleNamespace(usage=usage, choices=[])
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def usage_logger(tmp_path):
+    return UsageLogger(str(tmp_path / 'usage.csv'))
+
+
+@pytest.fixture
+def client(usage_logger):
+    client = OpenAIClient(api_key='sk-test', usage_logger=usage_logger)
+    # 不使用配置中的响应缓存
+    client.response_cache = None
+    client.client = Mock()
+    return client
+
+
+class TestStreaming:
+    """测试流式输出"""
+
+    @pytest.mark.unit
+    def test_yields_deltas_and_logs_usage(self, client, usage_logger):
+        stream = _Stream(['上涨', None, '趋势', '明确'])
+        client.client.chat.completions.create.return_value = stream
+
+        deltas = list(client.ask('分析000001', stream=True))
+
+        assert deltas == ['上涨', '趋势', '明确']
+        kwargs = client.client.chat.completions.create.call_args.kwargs
+        assert kwargs['stream'] is True
+        assert kwargs['stream_options'] == {'include_usage': True}
+        assert stream.closed
+        stats = usage_logger.get_usage_stats()
+        assert stats['total_requests'] == 1
+        assert stats['success_rate'] == 1.0
+        assert stats['total_tokens'] == USAGE['total_tokens']
+
+    @pytest.mark.unit
+    def test_request_sent_on_iteration(self, client):
+        client.client.chat.completions.create.return_value = _Stream(['a'])
+        generator = client.chat([{'role': 'user', 'content': 'x'}], stream=True)
+        client.client.chat.completions.create.assert_not_called()
+        assert next(generator) == 'a'
+
+    @pytest.mark.unit
+    def test_stopping_early_closes_and_logs_failure(self, client, usage_logger):
+        stream = _Stream(['第一段', '第二段'])
+        client.client.chat.completions.create.return_value = stream
+
+        generator = client.ask('分析', stream=True)
+        assert next(generator) == '第一段'
+        generator.close()
+
+        assert stream.closed
+        stats = usage_logger.get_usage_stats()
+        assert stats['total_requests'] == 1
+        assert stats['success_rate'] == 0.0
+
+    @pytest.mark.unit
+    def test_error_mid_stream_is_raised_and_logged(self, client, usage_logger):
+        client.client.chat.completions.create.return_value = _Stream(['部分'], error=RuntimeError('连接断开'))
+
+        with pytest.raises(RuntimeError):
+            list(client.ask('分析', stream=True))
+        assert usage_logger.get_usage_stats()['success_rate'] == 0.0
+
+    @pytest.mark.unit
+    def test_stream_result_is_cached(self, client, tmp_path):
+        client.response_cache = ResponseCache(str(tmp_path / 'cache'))
+        client.client.chat.completions.create.return_value = _Stream(['完整', '回复'])
+
+        assert ''.join(client.ask('分析', stream=True)) == '完整回复'
+        assert list(client.ask('分析', stream=True)) == ['完整回复']
+        assert client.ask('分析') == '完整回复'
+        assert client.client.chat.completions.create.call_count == 1
+
+    @pytest.mark.unit
+    def test_falls_back_when_stream_options_rejected(self, client, usage_logger, monkeypatch):
+        monkeypatch.setattr(token_budget, '_get_encoding', lambda model=None: None)
+        rejected = BadRequestError("unknown field: stream_options",
+                                   response=Mock(status_code=400, headers={}), body=None)
+        create = client.client.chat.completions.create
+        create.side_effect = [rejected, _Stream(['上涨', '趋势'], usage=None), _Stream(['回复'], usage=None)]
+
+        assert ''.join(client.ask('分析000001', stream=True, use_cache=False)) == '上涨趋势'
+        assert ''.join(client.ask('分析600519', stream=True, use_cache=False)) == '回复'
+
+        assert 'stream_options' in create.call_args_list[0].kwargs
+        assert 'stream_options' not in create.call_args_list[1].kwargs
+        # 被拒绝一次后不再发送 stream_options
+        assert 'stream_options' not in create.call_args_list[2].kwargs
+        stats = usage_logger.get_usage_stats()
+        assert stats['success_rate'] == 1.0
+        assert stats['total_tokens'] == sum(
+            token_budget.count_tokens(text) for text in ('分析000001', '上涨趋势', '分析600519', '回复'))
+
+
+class TestGenerateAnalysisStreaming:
+    """测试分析生成器的流式回调"""
+
+    @pytest.mark.unit
+    def test_on_delta_receives_chunks(self, client, monkeypatch):
+        monkeypatch.setattr('stock.stock_ai_analysis._save_request_to_cache', lambda *args: None)
+        client.client.chat.completions.create.return_value = _Stream(['## 结论', '\n看多'])
+        generator = BaseAnalysisGenerator()
+        generator.client = client
+        received = []
+
+        result = generator.generate_analysis('technical', [{'role': 'system', 'content': 's'},
+                                                           {'role': 'user', 'content': 'u'}],
+                                             '000001', on_delta=received.append)
+
+        assert received == ['## 结论', '\n看多']
+        assert result.success
+        assert result.report == '## 结论\n看多'
+
+    @pytest.mark.unit
+    def test_on_delta_failure_returns_error_result(self, client, monkeypatch):
+        monkeypatch.setattr('stock.stock_ai_analysis._save_request_to_cache', lambda *args: None)
+        client.client.chat.completions.create.return_value = _Stream(['部分'], error=RuntimeError('连接断开'))
+        generator = BaseAnalysisGenerator()
+        generator.client = client
+
+        result = generator.generate_analysis('news', [{'role': 'user', 'content': 'u'}], on_delta=lambda d: None)
+
+        assert not result.success
+        assert '连接断开' in result.error_message
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试提示词前缀指纹 prompt_layout.py 及使用记录中的服务商提示词缓存统计
+"""
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from llm.openai_client import OpenAIClient
+from llm.prompt_layout import build_messages, prefix_fingerprint
+from llm.usage_logger import UsageLogger, get_cached_tokens
+
+
+@pytest.fixture
+def usage_logger(tmp_path):
+    return UsageLogger(str(tmp_path / 'usage.csv'))
+
+
+class TestPrefixFingerprint:
+    """测试前缀指纹"""
+
+    @pytest.mark.unit
+    def test_depends_only_on_system_prefix(self):
+        first = build_messages("你是技术分析师", "分析000001")
+        second = build_messages("你是技术分析师", "分析600519")
+        other = build_messages("你是新闻分析师", "分析000001")
+
+        assert prefix_fingerprint(first) == prefix_fingerprint(second)
+        assert prefix_fingerprint(first) != prefix_fingerprint(other)
+        assert len(prefix_fingerprint(first)) == 12
+        assert prefix_fingerprint([{"role": "user", "content": "x"}]) == ""
+        assert prefix_fingerprint(None) == ""
+
+
+class TestPromptCacheUsage:
+    """测试服务商提示词缓存的用量记录"""
+
+    @pytest.mark.unit
+    def test_cached_tokens_from_payload(self):
+        assert get_cached_tokens({'prompt_tokens_details': {'cached_tokens': 640}}) == 640
+        assert get_cached_tokens({'prompt_cache_hit_tokens': 128, 'prompt_cache_miss_tokens': 50}) == 128
+        assert get_cached_tokens({'prompt_tokens_details': None}) == 0
+        assert get_cached_tokens({}) == 0
+
+    @pytest.mark.unit
+    def test_stats_by_prefix(self, usage_logger):
+        usage_logger.log_usage('deepseek-chat', {'prompt_tokens': 1000, 'completion_tokens': 100, 'total_tokens': 1100,
+                                                 'prompt_cache_hit_tokens': 0}, 'a', 'b', 1.0,
+                               prompt_fingerprint='aaa')
+        usage_logger.log_usage('deepseek-chat', {'prompt_tokens': 1000, 'completion_tokens': 100, 'total_tokens': 1100,
+                                                 'prompt_cache_hit_tokens': 800}, 'a', 'b', 1.0,
+                               prompt_fingerprint='aaa')
+        usage_logger.log_usage('gpt-4o', {'prompt_tokens': 2000, 'completion_tokens': 100, 'total_tokens': 2100,
+                                          'prompt_tokens_details': {'cached_tokens': 1200}}, 'a', 'b', 1.0,
+                               prompt_fingerprint='bbb')
+
+        stats = usage_logger.get_usage_stats()
+
+        assert stats['cached_tokens'] == 2000
+        assert stats['prompt_cache_rate'] == 0.5
+        assert stats['prefix_cache_stats']['aaa'] == {
+            'requests': 2, 'prompt_tokens': 2000, 'cached_tokens': 800, 'cache_rate': 0.4
+        }
+        assert stats['prefix_cache_stats']['bbb']['cache_rate'] == 0.6
+
+    @pytest.mark.unit
+    def test_old_log_file_gets_prompt_cache_columns(self, tmp_path):
+        log_file = tmp_path / 'old.csv'
+        pd.DataFrame([{
+            'timestamp': pd.Timestamp.now().isoformat(), 'model': 'deepseek-chat', 'prompt_tokens': 10,
+            'completion_tokens': 5, 'total_tokens': 15, 'cost_estimate': 0.0, 'temperature': 0.7,
+            'input_text': 'a', 'output_text': 'b', 'response_time': 1.0, 'success': True, 'error_message': '',
+            'cache_hit': False, 'saved_tokens': 0,
+        }]).to_csv(log_file, index=False)
+
+        logger = UsageLogger(str(log_file))
+        stats = logger.get_usage_stats()
+
+        assert stats['cached_tokens'] == 0
+        assert stats['prefix_cache_stats'] == {}
+        assert 'prompt_fingerprint' in pd.read_csv(log_file).columns
+
+    @pytest.mark.unit
+    def test_client_records_fingerprint_and_cached_tokens(self, usage_logger):
+        client = OpenAIClient(api_key='sk-test', usage_logger=usage_logger)
+        client.response_cache = None
+        usage = Mock(total_tokens=150)
+        usage.model_dump.return_value = {'prompt_tokens': 100, 'completion_tokens': 50, 'total_tokens': 150,
+                                         'prompt_cache_hit_tokens': 64}
+        client.client = Mock()
+        client.client.chat.completions.create.return_value = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content='回复'))], usage=usage)
+        messages = build_messages("你是技术分析师", "分析000001")
+
+        client.chat(messages)
+
+        record = pd.read_csv(usage_logger.log_file).iloc[-1]
+        assert record['cached_tokens'] == 64
+        assert record['prompt_fingerprint'] == prefix_fingerprint(messages)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+测试LLM响应缓存 response_cache.py 及其在 OpenAIClient 中的使用
+"""
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from llm.openai_client import OpenAIClient
+from llm.response_cache import ResponseCache
+from llm.usage_logger import UsageLogger
+
+MESSAGES = [{"role": "system", "content": "你是股票分析师"}, {"role": "user", "content": "分析000001"}]
+USAGE = {'prompt_tokens': 120, 'completion_tokens': 80, 'total_tokens': 200}
+
+
+def _completion(content):
+    usage = Mock(total_tokens=USAGE['total_tokens'])
+    usage.model_dump.return_value = dict(USAGE)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / 'cache'), ttl=3600, max_size_mb=1)
+
+
+@pytest.fixture
+def usage_logger(tmp_path):
+    return UsageLogger(str(tmp_path / 'usage.csv'))
+
+
+@pytest.fixture
+def client(cache, usage_logger):
+    client = OpenAIClient(api_key='sk-test', usage_logger=usage_logger, response_cache=cache)
+    client.client = Mock()
+    client.client.chat.completions.create.side_effect = lambda **kwargs: _completion('分析结果')
+    return client
+
+
+class TestResponseCache:
+    """测试响应缓存"""
+
+    @pytest.mark.unit
+    def test_key_depends_on_request_content(self):
+        key = ResponseCache.make_key('deepseek-chat', MESSAGES, 0.5, False)
+        assert key == ResponseCache.make_key('deepseek-chat', [dict(m) for m in MESSAGES], 0.5, False)
+        assert key != ResponseCache.make_key('deepseek-chat', MESSAGES, 0.7, False)
+        assert key != ResponseCache.make_key('deepseek-chat', MESSAGES, 0.5, True)
+        assert key != ResponseCache.make_key('deepseek-reasoner', MESSAGES, 0.5, False)
+        assert key != ResponseCache.make_key('deepseek-chat', MESSAGES[1:], 0.5, False)
+
+    @pytest.mark.unit
+    def test_set_get_and_ttl(self, cache):
+        key = ResponseCache.make_key('m', MESSAGES, 0.5)
+        assert cache.get(key) is None
+        cache.set(key, '回复', USAGE, 'm')
+        entry = cache.get(key)
+        assert entry['content'] == '回复'
+        assert entry['usage'] == USAGE
+
+        cache.ttl = 1
+        entry_path = cache._path(key)
+        old = time.time() - 10
+        data = json.loads(entry_path.read_text(encoding='utf-8'))
+        data['created_at'] = old
+        entry_path.write_text(json.dumps(data), encoding='utf-8')
+        assert cache.get(key) is None
+        assert not entry_path.exists()
+
+    @pytest.mark.unit
+    def test_size_eviction_removes_least_recently_used(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'small'), ttl=0, max_size_mb=0.01)
+        keys = [ResponseCache.make_key('m', [{"role": "user", "content": str(i)}], 0.5) for i in range(8)]
+        for i, key in enumerate(keys):
+            cache.set(key, 'x' * 2000, USAGE, 'm')
+            path = cache._path(key)
+            os.utime(path, (1000 + i, 1000 + i))
+            if i == 0:
+                continue
+            # 访问第一条，使其成为最近使用
+            cache.get(keys[0])
+        stats = cache.stats()
+        assert stats['size_mb'] <= 0.01
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[-1]) is not None
+
+    @pytest.mark.unit
+    def test_corrupt_entry_is_a_miss(self, cache):
+        key = ResponseCache.make_key('m', MESSAGES, 0.5)
+        path = cache._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('{broken', encoding='utf-8')
+        assert cache.get(key) is None
+
+
+class TestClientCaching:
+    """测试 OpenAIClient 透明使用缓存"""
+
+    @pytest.mark.unit
+    def test_identical_request_hits_cache(self, client, usage_logger):
+        first = client.chat([dict(m) for m in MESSAGES], temperature=0.5)
+        second = client.chat([dict(m) for m in MESSAGES], temperature=0.5)
+        assert first == second == '分析结果'
+        assert client.client.chat.completions.create.call_count == 1
+
+        stats = usage_logger.get_usage_stats()
+        assert stats['total_requests'] == 2
+        assert stats['cache_hits'] == 1
+        assert stats['cache_hit_rate'] == 0.5
+        assert stats['tokens_saved'] == USAGE['total_tokens']
+        assert stats['total_tokens'] == USAGE['total_tokens']
+
+    @pytest.mark.unit
+    def test_different_parameters_miss(self, client):
+        client.ask('分析000001', temperature=0.5)
+        client.ask('分析000001', temperature=0.5, json_mode=True)
+        client.ask('分析000002', temperature=0.5)
+        assert client.client.chat.completions.create.call_count == 3
+
+    @pytest.mark.unit
+    def test_use_cache_false_bypasses(self, client):
+        client.ask('连接测试', temperature=0.5)
+        client.ask('连接测试', temperature=0.5, use_cache=False)
+        assert client.client.chat.completions.create.call_count == 2
+
+    @pytest.mark.unit
+    def test_failures_are_not_cached(self, client):
+        client.client.chat.completions.create.side_effect = RuntimeError('timeout')
+        with pytest.raises(RuntimeError):
+            client.ask('分析000001', temperature=0.5)
+        client.client.chat.completions.create.side_effect = lambda **kwargs: _completion('恢复')
+        assert client.ask('分析000001', temperature=0.5) == '恢复'
+
+
+class TestUsageLoggerUpgrade:
+    """测试旧版使用记录文件补齐缓存列"""
+
+    @pytest.mark.unit
+    def test_old_log_file_gets_cache_columns(self, tmp_path):
+        log_file = tmp_path / 'old.csv'
+        pd.DataFrame([{
+            'timestamp': pd.Timestamp.now().isoformat(), 'model': 'deepseek-chat', 'prompt_tokens': 10,
+            'completion_tokens': 5, 'total_tokens': 15, 'cost_estimate': 0.0, 'temperature': 0.7,
+            'input_text': 'a', 'output_text': 'b', 'response_time': 1.0, 'success': True, 'error_message': '',
+        }]).to_csv(log_file, index=False)
+
+        logger = UsageLogger(str(log_file))
+        logger.log_usage('deepseek-chat', dict(USAGE), 'a', 'b', 0.01, cache_hit=True)
+
+        df = pd.read_csv(log_file)
+        assert list(df['cache_hit']) == [False, True]
+        stats = logger.get_usage_stats()
+        assert stats['tokens_saved'] == USAGE['total_tokens']
+        assert stats['total_tokens'] == 15
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+测试提示词token预算 token_budget.py
+"""
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import llm.token_budget as token_budget
+from llm.token_budget import PromptSection, TokenBudgetPacker, count_tokens, estimate_tokens
+
+REPORT = "\n\n".join(
+    f"## 第{i}部分\n该股近期走势偏强，成交量温和放大。均线多头排列，短期支撑位明确。资金持续流入，情绪改善。"
+    for i in range(20)
+)
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    """不下载tiktoken编码文件，统一按字符估算"""
+    monkeypatch.setattr(token_budget, '_get_encoding', lambda model=None: None)
+
+
+class TestCountTokens:
+    """测试token计数"""
+
+    @pytest.mark.unit
+    def test_estimate(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("你好世界") == 4
+        assert estimate_tokens("abcdefgh") == 2
+        assert count_tokens("股价 up") == estimate_tokens("股价 up")
+
+    @pytest.mark.unit
+    def test_uses_encoding_when_available(self, monkeypatch):
+        class FakeEncoding:
+            def encode(self, text, disallowed_special=()):
+                return list(text)
+
+        monkeypatch.setattr(token_budget, '_get_encoding', lambda model=None: FakeEncoding())
+        assert count_tokens("abcdefgh") == 8
+
+    @pytest.mark.unit
+    def test_encoding_load_failure_is_cached(self, monkeypatch):
+        monkeypatch.undo()
+        if not token_budget.TIKTOKEN_AVAILABLE:
+            pytest.skip("tiktoken 未安装")
+        calls = []
+
+        def fail(name):
+            calls.append(name)
+            raise ConnectionError("offline")
+
+        monkeypatch.setattr(token_budget, '_encodings', {})
+        monkeypatch.setattr(token_budget.tiktoken, 'get_encoding', fail)
+        assert count_tokens("abcdefgh", model='deepseek-chat') == 2
+        assert count_tokens("abcdefgh", model='deepseek-chat') == 2
+        assert calls == ['cl100k_base']
+
+
+class TestTokenBudgetPacker:
+    """测试预算分配与压缩"""
+
+    @pytest.mark.unit
+    def test_within_budget_unchanged(self):
+        packer = TokenBudgetPacker(10000)
+        result = packer.pack([PromptSection('a', REPORT, priority=1), PromptSection('b', '短文本')])
+        assert result.texts == {'a': REPORT, 'b': '短文本'}
+        assert result.total_after == result.total_before
+
+    @pytest.mark.unit
+    def test_section_cap_applied(self):
+        packer = TokenBudgetPacker(0)
+        result = packer.pack([PromptSection('a', REPORT, max_tokens=200)])
+        assert result.tokens_before['a'] > 200
+        assert result.tokens_after['a'] <= 200
+
+    @pytest.mark.unit
+    def test_low_priority_shrinks_first(self):
+        high = PromptSection('high', REPORT, priority=2)
+        low = PromptSection('low', REPORT, priority=0)
+        total = count_tokens(REPORT)
+        budget = total + total // 2
+
+        result = TokenBudgetPacker(budget).pack([high, low])
+
+        assert result.texts['high'] == REPORT
+        assert result.tokens_after['low'] <= total // 2
+        assert result.total_after <= budget
+
+    @pytest.mark.unit
+    def test_min_tokens_respected(self):
+        sections = [PromptSection('high', REPORT, priority=1, min_tokens=300),
+                    PromptSection('low', REPORT, priority=0)]
+        result = TokenBudgetPacker(300).pack(sections)
+        assert result.tokens_after['low'] == 0
+        assert 250 < result.tokens_after['high'] <= 300
+
+    @pytest.mark.unit
+    def test_equal_priority_shares_cut(self):
+        sections = [PromptSection('a', REPORT), PromptSection('b', REPORT)]
+        result = TokenBudgetPacker(count_tokens(REPORT)).pack(sections)
+        assert abs(result.tokens_after['a'] - result.tokens_after['b']) <= 5
+        assert result.total_after <= count_tokens(REPORT)
+
+    @pytest.mark.unit
+    def test_shrink_condenses_then_truncates(self):
+        packer = TokenBudgetPacker(0)
+        summary = packer.condense(REPORT)
+        assert count_tokens(summary) * 2 < count_tokens(REPORT)
+        assert packer.shrink(REPORT, count_tokens(summary)) == summary
+        assert '## 第19部分\n该股近期走势偏强，成交量温和放大。' in summary
+        assert '均线多头排列' not in summary
+
+        truncated = packer.shrink(REPORT, 60)
+        assert truncated.endswith(token_budget.TRUNCATION_MARK)
+        assert count_tokens(truncated) <= 60
+        assert packer.shrink(REPORT, 0) == ""
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+测试指数K线增量获取 kline_data_manager.py
+"""
+import os
+import sys
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from market.kline_data_manager import KLineDataManager
+from utils.kline_cache import KLineCacheManager, KLineType
+
+
+def _index_frame(start, days):
+    return pd.DataFrame({
+        'date': pd.date_range(start, periods=days).strftime('%Y-%m-%d'),
+        'open': 3000.0, 'high': 3010.0, 'low': 2990.0, 'close': 3005.0, 'volume': 1000, 'amount': 1e8,
+    })
+
+
+class TestIncrementalIndexKline:
+    """测试指数K线增量更新"""
+
+    @pytest.mark.unit
+    def test_update_requests_missing_window_only(self, tmp_path):
+        manager = KLineCacheManager(cache_dir=str(tmp_path))
+        today = datetime.now().date()
+        kline_manager = KLineDataManager()
+
+        with patch('market.kline_data_manager.cache_manager', manager), \
+             patch('market.kline_data_manager.ak') as ak_mock:
+            ak_mock.stock_zh_index_daily_em.return_value = _index_frame(today - timedelta(days=60), 50)
+            assert kline_manager.update_index_cache('上证指数', period=40)
+
+            ak_mock.stock_zh_index_daily_em.return_value = _index_frame(today - timedelta(days=10), 3)
+            assert kline_manager.fetch_index_kline_incremental('上证指数', period=40) == 3
+
+            call = ak_mock.stock_zh_index_daily_em.call_args.kwargs
+            assert call['symbol'] == 'sh000001'
+            assert call['start_date'] == (today - timedelta(days=10)).strftime('%Y%m%d')
+            ak_mock.stock_zh_index_daily.assert_not_called()
+
+        assert len(manager.store.read(KLineType.INDEX_DAY.value, '上证指数')) == 53
+
+    @pytest.mark.unit
+    def test_short_cache_after_empty_update_falls_back_to_full_fetch(self, tmp_path):
+        manager = KLineCacheManager(cache_dir=str(tmp_path))
+        today = datetime.now().date()
+        kline_manager = KLineDataManager()
+        manager.cache_kline_frame('上证指数', KLineType.INDEX_DAY, kline_manager.convert_to_cache_frame(
+            _index_frame(today - timedelta(days=10), 5), '上证指数'))
+
+        with patch('market.kline_data_manager.cache_manager', manager), \
+             patch('market.kline_data_manager.ak') as ak_mock:
+            # 增量请求没有新数据（如节假日），缓存仍只有5条
+            ak_mock.stock_zh_index_daily_em.return_value = pd.DataFrame()
+            ak_mock.stock_zh_index_daily.return_value = _index_frame(today - timedelta(days=60), 50)
+
+            df, from_cache = kline_manager.get_index_kline_data('上证指数', period=40)
+
+        ak_mock.stock_zh_index_daily.assert_called_once()
+        assert not from_cache
+        assert len(df) == 40
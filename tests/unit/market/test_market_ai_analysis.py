@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+测试指数分析提示词的固定前缀 market_ai_analysis.build_index_analysis_messages
+"""
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import market.market_ai_analysis as market_ai_analysis
+from llm.prompt_layout import prefix_fingerprint
+
+
+@pytest.fixture(autouse=True)
+def offline_data(monkeypatch, tmp_path):
+    (tmp_path / 'data' / 'cache').mkdir(parents=True)
+    monkeypatch.setattr(market_ai_analysis, 'project_dir', str(tmp_path))
+    monkeypatch.setattr(market_ai_analysis.MarketTextFormatter, 'format_data_for_ai_analysis',
+                        staticmethod(lambda data, name: f"{name} 指标数据"))
+
+
+class TestIndexPromptPrefix:
+    """测试指数分析的系统消息不含指数名称，各指数共用同一前缀"""
+
+    @pytest.mark.unit
+    def test_prefix_identical_across_indices(self):
+        first = market_ai_analysis.build_index_analysis_messages('000001', '上证指数', {})
+        second = market_ai_analysis.build_index_analysis_messages('399006', '创业板指', {}, '看好科技')
+
+        assert first[0]['content'] == second[0]['content']
+        assert prefix_fingerprint(first) == prefix_fingerprint(second)
+        assert '上证指数' not in first[0]['content']
+        assert '上证指数' in first[1]['content']
+        assert '看好科技' in second[1]['content']
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试市场数据并行刷新 refresh_executor.py
+"""
+import os
+import sys
+import time
+import threading
+import pytest
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from market.refresh_executor import RefreshExecutor
+from market.market_data_cache import MarketDataCache
+from market.market_data_tools import MarketTools
+
+
+def _slow(result, delay):
+    def fetch(*args, **kwargs):
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fetch
+
+
+def _together(barrier, result):
+    """所有数据源同时在执行时才能通过屏障，用于确认并行执行"""
+    def fetch(*args, **kwargs):
+        barrier.wait()
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fetch
+
+
+class TestRefreshExecutor:
+    """测试并行刷新执行器"""
+
+    @pytest.mark.unit
+    def test_runs_sources_concurrently(self):
+        barrier = threading.Barrier(5, timeout=5)
+        sources = [(f's{i}', _together(barrier, {'v': i})) for i in range(5)]
+
+        report = RefreshExecutor(max_workers=5, timeout=10).run(sources)
+
+        assert report.succeeded == ['s0', 's1', 's2', 's3', 's4']
+        assert list(report.results) == ['s0', 's1', 's2', 's3', 's4']
+        assert report.get_data('s3') == {'v': 3}
+
+    @pytest.mark.unit
+    def test_failures_and_timeouts_are_reported(self):
+        sources = [
+            ('ok', _slow({'v': 1}, 0.0)),
+            ('raises', _slow(RuntimeError('接口异常'), 0.0)),
+            ('error_data', _slow({'error': '无数据'}, 0.0)),
+            ('slow', _slow({'v': 2}, 1.0)),
+        ]
+
+        report = RefreshExecutor(max_workers=4, timeout=0.2).run(sources)
+
+        assert report.succeeded == ['ok']
+        assert report.results['raises'].error == '接口异常'
+        assert '超时' in report.results['slow'].error
+        assert report.get_data('slow', {}) == {}
+        assert report.to_dict()['sources']['ok']['success'] is True
+
+
+class TestParallelMarketRefresh:
+    """测试市场工具并行获取"""
+
+    @pytest.mark.unit
+    def test_concurrent_cache_writes_are_not_lost(self, tmp_path):
+        cache = MarketDataCache(cache_dir=str(tmp_path))
+        data_types = ['market_sentiment', 'valuation_indicators', 'money_flow_indicators',
+                      'margin_detail', 'current_indices', 'market_news']
+        threads = [threading.Thread(target=cache.save_cached_data, args=(t, {'t': t})) for t in data_types]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert set(cache.load_cache()) == set(data_types)
+
+    @pytest.mark.unit
+    def test_comprehensive_report_layout(self):
+        tools = MarketTools()
+        barrier = threading.Barrier(6, timeout=5)
+        with patch.object(tools, 'get_index_technical_indicators', side_effect=_together(barrier, {'ma': 1})), \
+             patch.object(tools, 'get_market_sentiment', side_effect=_together(barrier, {'score': 50})), \
+             patch.object(tools, 'get_valuation_data', side_effect=_together(barrier, {'pe': 12})), \
+             patch.object(tools, 'get_money_flow_data', side_effect=_together(barrier, RuntimeError('x'))), \
+             patch.object(tools, 'get_margin_data', side_effect=_together(barrier, {'m': 1})), \
+             patch.object(tools, 'get_market_news_data', side_effect=_together(barrier, {'n': []})), \
+             patch('market.market_data_tools.config.is_market_news_enabled', return_value=True):
+            report = tools.get_comprehensive_market_report(max_workers=6, timeout=10)
+
+        assert report['technical_indicators'] == {'ma': 1}
+        assert report['money_flow_indicators'] == {}
+        assert report['market_news_data'] == {'n': []}
+        assert list(report)[:4] == ['report_time', 'focus_index', 'technical_indicators', 'sentiment_indicators']
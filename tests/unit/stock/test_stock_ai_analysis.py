@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+测试综合分析提示词按token预算压缩 stock_ai_analysis.pack_comprehensive_sections
+及各分析提示词的固定前缀
+"""
+import os
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import llm.token_budget as token_budget
+from llm.token_budget import count_tokens
+import stock.stock_ai_analysis as stock_ai_analysis
+from llm.prompt_layout import prefix_fingerprint
+from stock.stock_ai_analysis import pack_comprehensive_sections
+
+PARAGRAPH = "该股近期走势偏强，成交量温和放大。均线多头排列，短期支撑位明确。资金持续流入，情绪改善。"
+
+
+def _report(paragraphs):
+    return "\n\n".join(f"## 第{i}部分\n{PARAGRAPH}" for i in range(paragraphs))
+
+
+class _Config:
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    monkeypatch.setattr(token_budget, '_get_encoding', lambda model=None: None)
+
+
+def _sections():
+    return {
+        'basic_info': _report(5),
+        'historical': {'technical': _report(40), 'news': _report(40)},
+        'market_ai': _report(10),
+        'user_profile': {'profile': '稳健型投资者', 'mistakes': ''},
+        'market_report': _report(60),
+    }
+
+
+class TestPackComprehensiveSections:
+    """测试综合分析提示词预算"""
+
+    @pytest.mark.unit
+    def test_fits_budget_and_keeps_structure(self):
+        packed, result = pack_comprehensive_sections(_sections(), token_budget=3000)
+
+        assert result.total_before > 3000
+        assert result.total_after <= 3000
+        assert set(packed['historical']) == {'technical', 'news'}
+        assert packed['basic_info'] == _report(5)
+        assert packed['user_profile'] == {'profile': '稳健型投资者', 'mistakes': ''}
+        # 市场综合报告优先级最低，先被压缩
+        assert result.tokens_after['market_report'] < result.tokens_after['historical.technical']
+
+    @pytest.mark.unit
+    def test_section_limits_from_config(self):
+        config = _Config({'AI_ANALYSIS.COMPREHENSIVE.TOKEN_BUDGET': 0,
+                          'AI_ANALYSIS.COMPREHENSIVE.HISTORY_TOKENS': 600,
+                          'AI_ANALYSIS.COMPREHENSIVE.MARKET_REPORT_TOKENS': 100})
+
+        packed, result = pack_comprehensive_sections(_sections(), config=config)
+
+        assert count_tokens(packed['historical']['technical']) <= 300
+        assert count_tokens(packed['historical']['news']) <= 300
+        assert result.tokens_after['market_report'] <= 100
+        assert packed['market_ai'] == _report(10)
+
+
+class TestPromptPrefix:
+    """测试各分析提示词的系统消息不含可变内容，以便命中服务商的提示词缓存"""
+
+    STOCKS = [
+        {'code': '000001', 'name': '平安银行', 'market_name': 'A股'},
+        {'code': '600519', 'name': '贵州茅台', 'market_name': 'A股'},
+    ]
+
+    @pytest.fixture(autouse=True)
+    def offline_data(self, monkeypatch):
+        monkeypatch.setattr(stock_ai_analysis, 'get_stock_info', lambda stock_identity: {})
+        formatter = Mock()
+        formatter.format_stock_overview.side_effect = lambda identity, info: f"概况 {identity['name']}"
+        monkeypatch.setattr(stock_ai_analysis, 'get_stock_formatter', lambda: formatter)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('build', [
+        lambda identity: stock_ai_analysis.build_tech_analysis_messages(identity, {}),
+        lambda identity: stock_ai_analysis.build_news_analysis_messages(identity, []),
+        lambda identity: stock_ai_analysis.build_chip_analysis_messages(identity, {}),
+        lambda identity: stock_ai_analysis.build_company_analysis_messages(identity, {'name': identity['name']}),
+    ])
+    def test_prefix_identical_across_stocks(self, build):
+        first, second = (build(identity) for identity in self.STOCKS)
+
+        assert first[0]['role'] == 'system'
+        assert first[0]['content'] == second[0]['content']
+        assert prefix_fingerprint(first) == prefix_fingerprint(second)
+        assert first[1]['content'] != second[1]['content']
+        for identity in self.STOCKS:
+            assert identity['name'] not in first[0]['content']
+
+    @pytest.mark.unit
+    def test_company_and_etf_key_points(self):
+        company = stock_ai_analysis.build_company_analysis_messages(self.STOCKS[0], {'name': '平安银行'})
+        etf = stock_ai_analysis.build_company_analysis_messages(
+            {'code': '510300', 'name': '沪深300ETF', 'market_name': 'ETF'}, {'name': '沪深300ETF'})
+
+        assert company[0]['content'].endswith("主营业务、市场需求、核心优势、产业地位、竞争格局、盈利模式、风险挑战")
+        # ETF 按产品要点分析，不再沿用公司分析的要点
+        assert etf[0]['content'].endswith("产品功能、投资价值、产品优势、市场地位、替代产品、费用收益、投资风险")
+        assert "主营业务" not in etf[0]['content']
+        assert "请严格按照以下要点进行分析" not in etf[1]['content']
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试股票数据缓存 stock_data_cache.py
+"""
+import os
+import sys
+import json
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from stock.stock_data_cache import StockDataCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # cache_dir 为绝对路径时 os.path.join 会忽略项目目录
+    return StockDataCache(cache_dir=str(tmp_path))
+
+
+class TestStockDataCache:
+    """测试SQLite股票数据缓存"""
+
+    @pytest.mark.unit
+    def test_save_and_get_single_entry(self, cache):
+        cache.save_cached_data('basic_info', '000001', {'price': np.float64(10.5), 'name': '平安银行'})
+
+        assert cache.is_cache_valid('basic_info', '000001')
+        assert cache.get_cached_data('basic_info', '000001') == {'price': 10.5, 'name': '平安银行'}
+        assert not cache.is_cache_valid('basic_info', '600519')
+        assert cache.get_cached_data('basic_info', '600519') == {}
+
+    @pytest.mark.unit
+    def test_expired_entry_is_invalid(self, cache):
+        cache.save_cache_entry('basic_info_000001', {
+            'cache_meta': {'timestamp': (datetime.now() - timedelta(minutes=10)).isoformat(),
+                           'data_type': 'basic_info', 'stock_code': '000001', 'expire_minutes': 5},
+            'data': {'price': 1}
+        })
+
+        assert not cache.is_cache_valid('basic_info', '000001')
+        assert cache.get_cache_status()['basic_info_000001']['valid'] is False
+
+    @pytest.mark.unit
+    def test_ai_analysis_and_extra_meta(self, cache):
+        cache.set_ai_analysis_cache('000001', 'news', {'report': 'ok'})
+        cache.save_cache_entry('ai_analysis_comprehensive_000001', {
+            'cache_meta': {'timestamp': datetime.now().isoformat(), 'data_type': 'ai_analysis',
+                           'stock_code': '000001', 'analysis_type': 'comprehensive', 'user_opinion': '看多'},
+            'data': {'report': 'all'}
+        })
+
+        assert cache.get_ai_analysis_cache('000001', 'news') == {'report': 'ok'}
+        entry = cache.get_cache_entry('ai_analysis_comprehensive_000001')
+        assert entry['cache_meta']['user_opinion'] == '看多'
+        assert entry['data'] == {'report': 'all'}
+
+    @pytest.mark.unit
+    def test_clear_cache_filters(self, cache):
+        cache.save_cached_data('basic_info', '000001', {'a': 1})
+        cache.save_cached_data('news_data', '000001', {'b': 2})
+        cache.save_cached_data('basic_info', '600519', {'c': 3})
+
+        cache.clear_cache(stock_code='000001', data_type='news_data')
+        assert set(cache.load_cache()) == {'basic_info_000001', 'basic_info_600519'}
+
+        cache.clear_cache(data_type='basic_info')
+        assert cache.load_cache() == {}
+
+    @pytest.mark.unit
+    def test_migrates_legacy_json(self, tmp_path):
+        legacy = {
+            'basic_info_000001': {
+                'cache_meta': {'timestamp': datetime.now().isoformat(), 'data_type': 'basic_info',
+                               'stock_code': '000001', 'analysis_type': None, 'expire_minutes': 5},
+                'data': {'price': 10}
+            }
+        }
+        with open(os.path.join(str(tmp_path), 'stock_data.json'), 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+
+        cache = StockDataCache(cache_dir=str(tmp_path))
+
+        assert os.path.exists(os.path.join(str(tmp_path), 'stock_data.json.migrated'))
+        assert cache.get_cached_data('basic_info', '000001') == {'price': 10}
+        assert list(cache.get_cache_status('000001')) == ['basic_info_000001']
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+测试批量实时行情 stock_data_fetcher.py
+"""
+import os
+import sys
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from stock.stock_data_fetcher import StockDataFetcher, _is_trading_time
+from datetime import datetime
+
+
+SNAPSHOT = pd.DataFrame({
+    '股票代码': ['600519', '000001', '000002'],
+    '股票名称': ['贵州茅台', '平安银行', '万科A'],
+    '最新价': [1500.0, 10.5, '-'],  # 停牌股票最新价为 '-'
+    '涨跌额': [10.0, 0.1, '-'],
+    '涨跌幅': [0.67, 0.96, '-'],
+    '成交量': [1000, 200000, '-'],
+    '成交额': [1.5e9, 2.1e8, '-'],
+    '最高': [1510.0, 10.6, '-'],
+    '最低': [1490.0, 10.3, '-'],
+    '今开': [1495.0, 10.4, '-'],
+    '昨日收盘': [1490.0, 10.4, 8.0],
+})
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = StockDataFetcher()
+    fetcher._ef = MagicMock()
+    fetcher._ef.stock.get_realtime_quotes.return_value = SNAPSHOT
+    fetcher._ef.stock.get_latest_quote.return_value = pd.DataFrame({
+        '代码': ['510300'], '名称': ['沪深300ETF'], '最新价': [4.0], '昨日收盘': [3.9]})
+    fetcher._is_initialized = True
+    return fetcher
+
+
+class TestRealtimeQuotes:
+    """测试批量行情快照"""
+
+    @pytest.mark.unit
+    def test_batch_quotes_from_one_snapshot(self, fetcher):
+        quotes = fetcher.get_realtime_quotes(['600519', '000001', '000002', '510300'])
+
+        assert quotes['600519'].current_price == 1500.0
+        assert quotes['000001'].prev_close == 10.4
+        assert '000002' not in quotes
+        assert quotes['510300'].name == '沪深300ETF'
+        fetcher._ef.stock.get_realtime_quotes.assert_called_once()
+        fetcher._ef.stock.get_latest_quote.assert_called_once_with(['000002', '510300'])
+
+    @pytest.mark.unit
+    def test_single_quote_served_from_fresh_snapshot(self, fetcher):
+        fetcher.get_realtime_quotes(['600519'])
+
+        quote = fetcher.get_realtime_quote('000001')
+        etf_quote = fetcher.get_realtime_quotes(['600519', '510300'])['510300']
+
+        assert quote.name == '平安银行'
+        assert etf_quote.current_price == 4.0
+        assert fetcher.get_realtime_quote('510300').current_price == 4.0
+        assert fetcher._ef.stock.get_realtime_quotes.call_count == 1
+
+    @pytest.mark.unit
+    def test_expired_snapshot_is_refreshed(self, fetcher):
+        fetcher.get_realtime_quotes()
+        fetcher._snapshot_time -= 3600
+
+        with patch.object(fetcher._ef.stock, 'get_latest_quote', return_value=SNAPSHOT.head(1)) as single:
+            fetcher.get_realtime_quote('600519')
+            single.assert_called_once()
+
+        assert len(fetcher.get_realtime_quotes()) == 2
+        assert fetcher._ef.stock.get_realtime_quotes.call_count == 2
+
+    @pytest.mark.unit
+    def test_failed_snapshot_is_not_retried_within_ttl(self, fetcher):
+        fetcher._ef.stock.get_realtime_quotes.side_effect = ConnectionError('接口异常')
+
+        assert fetcher.get_realtime_quotes(['600519']) == {}
+        assert fetcher.get_realtime_quotes(['600519']) == {}
+        assert fetcher._ef.stock.get_realtime_quotes.call_count == 1
+
+        fetcher._snapshot_error_time -= 3600
+        fetcher._ef.stock.get_realtime_quotes.side_effect = None
+        assert fetcher.get_realtime_quotes(['600519'])['600519'].current_price == 1500.0
+        assert fetcher._ef.stock.get_realtime_quotes.call_count == 2
+
+    @pytest.mark.unit
+    def test_missing_symbols_are_not_refetched_within_ttl(self, fetcher):
+        fetcher._ef.stock.get_latest_quote.return_value = pd.DataFrame()
+        fetcher.get_realtime_quotes(['600519'])
+
+        # 停牌股票不在快照中，单独查询也没有结果
+        assert fetcher.get_realtime_quote('000002', max_retry=1) is None
+        assert fetcher.get_realtime_quote('000002', max_retry=1) is None
+        assert '000002' not in fetcher.get_realtime_quotes(['000002'])
+        fetcher._ef.stock.get_latest_quote.assert_called_once_with('000002')
+
+        fetcher._quote_misses['000002'] -= 3600
+        fetcher.get_realtime_quote('000002', max_retry=1)
+        assert fetcher._ef.stock.get_latest_quote.call_count == 2
+
+    @pytest.mark.unit
+    def test_expired_misses_are_dropped(self, fetcher):
+        fetcher._quote_misses = {'000002': 0.0, '000003': 0.0, '000004': float('inf')}
+
+        assert not fetcher._is_recent_miss('000002')
+        assert '000002' not in fetcher._quote_misses
+
+        fetcher.refresh_quote_snapshot()
+        assert list(fetcher._quote_misses) == ['000004']
+
+    @pytest.mark.unit
+    def test_ttl_is_computed_outside_lock(self, fetcher, monkeypatch):
+        # 计算有效期可能加载交易日历，不能持有快照锁
+        def snapshot_ttl():
+            assert not fetcher._snapshot_lock.locked()
+            return 5
+
+        monkeypatch.setattr(fetcher, '_snapshot_ttl', snapshot_ttl)
+        fetcher._ef.stock.get_realtime_quotes.side_effect = ConnectionError('接口异常')
+        fetcher.get_realtime_quotes(['600519'])
+        fetcher.get_realtime_quotes(['600519'])
+        fetcher._ef.stock.get_latest_quote.return_value = pd.DataFrame()
+        assert fetcher.get_realtime_quote('000002', max_retry=1) is None
+        assert fetcher.get_realtime_quote('000002', max_retry=1) is None
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('now, expected', [
+        (datetime(2024, 6, 3, 10, 0), True),
+        (datetime(2024, 6, 3, 12, 0), False),
+        (datetime(2024, 6, 3, 15, 30), False),
+        (datetime(2024, 6, 1, 10, 0), False),  # 周六
+    ])
+    def test_is_trading_time(self, now, expected):
+        assert _is_trading_time(now) is expected
+
+
+class TestIncrementalKline:
+    """测试K线增量获取"""
+
+    @pytest.mark.unit
+    def test_fetches_only_bars_after_cache(self, fetcher, tmp_path):
+        from datetime import timedelta
+        from utils.kline_cache import KLineCacheManager, KLineType
+
+        manager = KLineCacheManager(cache_dir=str(tmp_path))
+        today = datetime.now().date()
+        old_dates = pd.date_range(today - timedelta(days=40), periods=30).strftime('%Y-%m-%d')
+        manager.cache_kline_frame('600519', KLineType.DAY, pd.DataFrame({
+            'symbol': '600519', 'datetime': old_dates, 'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5,
+            'volume': 100, 'fetch_time': (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')}))
+
+        new_dates = pd.date_range(today - timedelta(days=10), periods=5).strftime('%Y-%m-%d')
+        fetcher._ef.stock.get_quote_history.return_value = pd.DataFrame({
+            '日期': new_dates, '开盘': 20.0, '最高': 21.0, '最低': 19.0, '收盘': 20.5, '成交量': 200})
+
+        with patch('stock.stock_data_fetcher.cache_manager', manager):
+            df = fetcher.get_kline_frame('600519', KLineType.DAY, 20)
+
+        kwargs = fetcher._ef.stock.get_quote_history.call_args.kwargs
+        assert kwargs['beg'] == (today - timedelta(days=10)).strftime('%Y%m%d')
+        assert kwargs['end'] == today.strftime('%Y%m%d')
+        assert len(df) == 20
+        assert df['datetime'].iloc[-1] == new_dates[-1]
+        assert len(manager.store.read(KLineType.DAY.value, '600519')) == 35
+
+    @pytest.mark.unit
+    def test_unparseable_cache_falls_back_to_full_window(self, fetcher, tmp_path):
+        from datetime import timedelta
+        from utils.kline_cache import KLineCacheManager, KLineType
+
+        manager = KLineCacheManager(cache_dir=str(tmp_path))
+        manager.cache_kline_frame('600519', KLineType.DAY, pd.DataFrame({
+            'symbol': '600519', 'datetime': ['2024/01/05'], 'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5,
+            'volume': 100}))
+
+        today = datetime.now().date()
+        new_dates = pd.date_range(today - timedelta(days=10), periods=5).strftime('%Y-%m-%d')
+        fetcher._ef.stock.get_quote_history.return_value = pd.DataFrame({
+            '日期': new_dates, '开盘': 20.0, '最高': 21.0, '最低': 19.0, '收盘': 20.5, '成交量': 200})
+
+        with patch('stock.stock_data_fetcher.cache_manager', manager):
+            df = fetcher.get_kline_frame('600519', KLineType.DAY, 20)
+
+        beg, end = manager.full_window_range(KLineType.DAY, 20)
+        kwargs = fetcher._ef.stock.get_quote_history.call_args.kwargs
+        assert kwargs['beg'] == beg.replace('-', '')
+        assert kwargs['end'] == end.replace('-', '')
+        assert df['datetime'].iloc[-1] == new_dates[-1]
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试股票报告数据并行收集 stock_report.py
+"""
+import os
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from stock.stock_report import collect_report_data
+
+
+STOCK_IDENTITY = {'code': '000001', 'name': '平安银行', 'market_name': 'A股'}
+
+
+def _slow(result, delay):
+    def fetch(*args, **kwargs):
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fetch
+
+
+@pytest.fixture
+def stock_tools():
+    tools = MagicMock()
+    tools.get_basic_info.side_effect = _slow({'name': '平安银行', 'ai_analysis': {'report': 'a'}}, 0.15)
+    tools.get_stock_kline_data.side_effect = _slow({'kline_data': [1, 2]}, 0.05)
+    tools.get_stock_news_data.side_effect = _slow({'news_data': []}, 0.1)
+    tools.get_stock_chip_data.side_effect = _slow({'chip': 1}, 0.0)
+    tools.get_comprehensive_ai_analysis.return_value = {'report': 'all'}
+    with patch('stock.stock_report.get_stock_tools', return_value=tools):
+        yield tools
+
+
+class TestCollectReportData:
+    """测试报告数据收集"""
+
+    @pytest.mark.unit
+    def test_parallel_matches_serial(self, stock_tools):
+        serial = collect_report_data(STOCK_IDENTITY, has_comprehensive_ai=True, parallel=False)
+
+        # 四个部分同时在执行时才能通过屏障，串行执行会因屏障超时而失败
+        barrier = threading.Barrier(4, timeout=5)
+        for method in ('get_basic_info', 'get_stock_kline_data', 'get_stock_news_data', 'get_stock_chip_data'):
+            mock = getattr(stock_tools, method)
+            mock.side_effect = lambda *args, _fetch=mock.side_effect, **kwargs: (barrier.wait(), _fetch())[1]
+        parallel = collect_report_data(STOCK_IDENTITY, has_comprehensive_ai=True, parallel=True)
+
+        assert parallel == serial
+        assert list(parallel) == ['basic_info', 'kline_info', 'news_data', 'chip_data', 'comprehensive_analysis']
+
+    @pytest.mark.unit
+    def test_failed_section_is_isolated(self, stock_tools):
+        stock_tools.get_stock_news_data.side_effect = _slow(RuntimeError('接口异常'), 0.0)
+        stock_tools.get_stock_chip_data.side_effect = _slow({'error': '无数据'}, 0.0)
+
+        report_data = collect_report_data(STOCK_IDENTITY)
+
+        assert report_data['news_data'] == {'error': '接口异常'}
+        assert 'chip_data' not in report_data
+        assert report_data['kline_info'] == {'kline_data': [1, 2]}
+
+    @pytest.mark.unit
+    def test_section_timeout(self, stock_tools):
+        stock_tools.get_basic_info.side_effect = _slow({'name': 'x'}, 1.0)
+
+        report_data = collect_report_data(STOCK_IDENTITY, section_timeout=0.3)
+
+        assert 'error' in report_data['basic_info']
+        assert report_data['news_data'] == {'news_data': []}
+
+    @pytest.mark.unit
+    def test_hk_stock_skips_chip(self, stock_tools):
+        report_data = collect_report_data(dict(STOCK_IDENTITY, market_name='港股'))
+        assert 'chip_data' not in report_data
+        stock_tools.get_stock_chip_data.assert_not_called()
+
+    @pytest.mark.unit
+    def test_section_analyses_requested_in_one_batch(self, stock_tools):
+        stock_tools.generate_ai_analyses.side_effect = lambda identity, section_data, use_cache=True: {
+            analysis_type: {'report': f'{analysis_type}报告', 'timestamp': 't'} for analysis_type in section_data
+        }
+
+        report_data = collect_report_data(STOCK_IDENTITY, has_fundamental_ai=True, has_market_ai=True,
+                                          has_news_ai=True, has_chip_ai=True, has_company_ai=True)
+
+        stock_tools.generate_ai_analyses.assert_called_once()
+        section_data = stock_tools.generate_ai_analyses.call_args[0][1]
+        assert set(section_data) == {'fundamental', 'company', 'technical', 'news', 'chip'}
+        assert section_data['news'] == []
+        assert report_data['basic_info']['ai_analysis'] == {'report': 'fundamental报告', 'timestamp': 't'}
+        assert report_data['basic_info']['company_analysis']['report'] == 'company报告'
+        assert report_data['kline_info']['ai_analysis']['report'] == 'technical报告'
+        assert report_data['news_data']['ai_analysis']['report'] == 'news报告'
+        assert report_data['chip_data']['ai_analysis']['report'] == 'chip报告'
+        stock_tools.get_basic_info.assert_called_with(STOCK_IDENTITY, use_cache=True,
+                                                      include_ai_analysis=False, include_company_analysis=False)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+测试NumPy技术指标引擎 indicator_engine.py（与stockstats数值一致）
+"""
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+import utils.kline_cache as kline_cache_module
+from utils.indicator_engine import (IndicatorEngine, IndicatorState, SERIES_TO_INDICATOR,
+                                    compute_indicators_incremental, linear_recurrence)
+from utils.kline_cache import KLineCacheManager, KLineType
+from stock.stock_utils import get_indicators
+
+stockstats = pytest.importorskip('stockstats')
+
+
+def _kline(days, with_amount=False, seed=7):
+    np.random.seed(seed)
+    df = generate_stock_kline_data(days=days)
+    if with_amount:
+        df['amount'] = df['close'] * df['volume'] * 1.002
+    return df.reset_index(drop=True)
+
+
+class TestIndicatorEngine:
+    """测试指标引擎"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('days,with_amount', [(8, False), (30, False), (160, False), (160, True), (800, True)])
+    def test_series_match_stockstats(self, days, with_amount):
+        df = _kline(days, with_amount)
+        series = IndicatorEngine(df).compute_series()
+        reference = stockstats.wrap(df.copy())
+
+        for column in SERIES_TO_INDICATOR:
+            np.testing.assert_allclose(series[column], reference[column].to_numpy(dtype=float),
+                                       rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column)
+
+    @pytest.mark.unit
+    def test_series_match_stockstats_with_missing_values(self):
+        df = _kline(200)
+        df.loc[[5, 50, 51], 'close'] = np.nan
+        df.loc[7, 'high'] = np.nan
+        series = IndicatorEngine(df).compute_series()
+        reference = stockstats.wrap(df.copy())
+
+        for column in SERIES_TO_INDICATOR:
+            np.testing.assert_allclose(series[column], reference[column].to_numpy(dtype=float),
+                                       rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('days', [1, 10, 27, 160])
+    def test_last_only_matches_full_series(self, days):
+        engine = IndicatorEngine(_kline(days + 10, with_amount=True).tail(days))
+        latest, full = engine.compute(last_only=True), engine.compute(last_only=False)
+
+        assert latest.keys() == full.keys()
+        for name in full:
+            assert np.isclose(latest[name], full[name], rtol=1e-9, atol=1e-9, equal_nan=True), name
+
+    @pytest.mark.unit
+    def test_linear_recurrence_across_blocks(self):
+        x = np.random.RandomState(0).normal(size=1000)
+        expected, y = [], 5.0
+        for value in x:
+            y = 0.5 * y + value
+            expected.append(y)
+        np.testing.assert_allclose(linear_recurrence(x, 0.5, init=5.0), expected, rtol=1e-10)
+
+
+def _assert_values_close(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        assert np.isclose(actual[name], expected[name], rtol=1e-9, atol=1e-9, equal_nan=True), name
+
+
+class TestIndicatorState:
+    """测试增量指标状态"""
+
+    @pytest.mark.unit
+    def test_update_matches_batch(self):
+        df = _kline(120, with_amount=True)
+        engine = IndicatorEngine(df)
+        state = IndicatorState.from_engine(IndicatorEngine(df.iloc[:30]))
+        for i in range(30, len(df)):
+            state.update(engine.close[i], engine.high[i], engine.low[i], engine.tp[i])
+            if i in (30, 31, 75, len(df) - 1):
+                _assert_values_close(state.values(), IndicatorEngine(df.iloc[:i + 1]).compute_latest())
+
+    @pytest.mark.unit
+    def test_update_from_empty_state(self):
+        df = _kline(40)
+        engine = IndicatorEngine(df)
+        state = IndicatorState(use_amount=engine.use_amount)
+        for i in range(len(df)):
+            state.update(engine.close[i], engine.high[i], engine.low[i], engine.tp[i])
+        _assert_values_close(state.values(), engine.compute_latest())
+
+    @pytest.mark.unit
+    def test_json_round_trip(self):
+        df = _kline(80)
+        state = IndicatorState.from_engine(IndicatorEngine(df), df['datetime'].astype(str).tolist())
+        restored = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+        _assert_values_close(restored.values(), state.values())
+        assert restored.last_datetime == state.last_datetime
+
+
+class TestIncrementalIndicators:
+    """测试保存在K线缓存旁的增量计算"""
+
+    @pytest.fixture
+    def cache(self, tmp_path, monkeypatch):
+        manager = KLineCacheManager(cache_dir=str(tmp_path))
+        monkeypatch.setattr(kline_cache_module, 'cache_manager', manager)
+        return manager
+
+    @pytest.mark.unit
+    def test_appends_only_new_bars(self, cache):
+        df = _kline(300).assign(datetime=lambda d: d['datetime'].astype(str))
+        assert len(df) > 161
+        first = compute_indicators_incremental(df.iloc[:160], '000001', KLineType.DAY)
+        _assert_values_close(first, IndicatorEngine(df.iloc[:160]).compute_latest())
+
+        # 窗口向后滑动一根：只更新新增的K线，结果等同于从第一根K线开始计算
+        second = compute_indicators_incremental(df.iloc[1:161], '000001', KLineType.DAY)
+        _assert_values_close(second, IndicatorEngine(df.iloc[:161]).compute_latest())
+        assert cache.load_indicator_state('000001', KLineType.DAY)['count'] == 161
+
+    @pytest.mark.unit
+    def test_revised_history_recomputes(self, cache):
+        df = _kline(100).assign(datetime=lambda d: d['datetime'].astype(str))
+        compute_indicators_incremental(df, '000001', KLineType.DAY)
+
+        adjusted = df.assign(close=df['close'] * 0.9, high=df['high'] * 0.9, low=df['low'] * 0.9)
+        values = compute_indicators_incremental(adjusted, '000001', KLineType.DAY)
+
+        _assert_values_close(values, IndicatorEngine(adjusted).compute_latest())
+        assert cache.load_indicator_state('000001', KLineType.DAY)['count'] == len(adjusted)
+
+    @pytest.mark.unit
+    def test_clear_cache_removes_state(self, cache):
+        df = _kline(30).assign(datetime=lambda d: d['datetime'].astype(str))
+        compute_indicators_incremental(df, '000001', KLineType.DAY)
+        cache.clear_cache('000001')
+        assert cache.load_indicator_state('000001', KLineType.DAY) is None
+
+
+class TestGetIndicators:
+    """测试 get_indicators 输出格式"""
+
+    @pytest.mark.unit
+    def test_keys_and_availability(self):
+        df = _kline(40)
+        indicators = get_indicators(df)
+
+        assert indicators['ma_20'] is not None and indicators['ma_60'] is None
+        assert indicators['macd_trend'] in ('金叉向上', '死叉向下', '震荡调整')
+        assert indicators['ma_trend'] in ('多头排列', '空头排列', '震荡整理')
+        reference = stockstats.wrap(df.copy())
+        assert indicators['rsi_14'] == pytest.approx(reference['rsi_14'].iloc[-1], rel=1e-9)
+
+    @pytest.mark.unit
+    def test_empty_frame(self):
+        indicators = get_indicators(pd.DataFrame(columns=['close', 'high', 'low', 'volume']))
+        assert indicators['ma_5'] is None
+        assert indicators['ma_trend'] == '无法判断'
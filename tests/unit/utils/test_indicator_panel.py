@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+测试多股票面板指标计算 indicator_panel.py（与逐只股票计算结果一致）
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from utils.indicator_panel import KLinePanel, compute_panel, compute_panel_indicators, compute_panel_risk
+from utils.risk_metrics import calculate_portfolio_risk_summary
+from stock.stock_utils import get_indicators
+
+
+def _frames(lengths=(2, 5, 8, 15, 30, 45, 90, 200, 400), seed=1):
+    """生成长度不同的多只股票K线，奇数编号的股票带成交额"""
+    np.random.seed(seed)
+    frames = []
+    for i, days in enumerate(lengths):
+        df = generate_stock_kline_data(days=days, symbol=f'S{i:02d}')
+        if i % 2:
+            df['amount'] = df['close'] * df['volume']
+        if len(df):
+            frames.append(df.reset_index(drop=True))
+    return frames
+
+
+def _assert_same(expected, actual, label):
+    if isinstance(expected, str):
+        assert expected == actual, label
+    elif expected is None:
+        assert pd.isna(actual), label
+    else:
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12, err_msg=label)
+
+
+class TestIndicatorPanel:
+    """测试面板计算"""
+
+    @pytest.fixture
+    def frames(self):
+        return _frames()
+
+    @pytest.fixture
+    def result(self, frames):
+        long = pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0)
+        return compute_panel(long)
+
+    @pytest.mark.unit
+    def test_indicators_match_get_indicators(self, frames, result):
+        assert list(result.index) == [df['symbol'].iloc[0] for df in frames]
+        for df in frames:
+            symbol = df['symbol'].iloc[0]
+            row = result.loc[symbol]
+            assert row['bars'] == len(df)
+            assert row['last_date'] == df['datetime'].iloc[-1]
+            for name, value in get_indicators(df).items():
+                _assert_same(value, row[name], f'{symbol} {name}')
+
+    @pytest.mark.unit
+    def test_risk_matches_portfolio_summary(self, frames, result):
+        for df in frames:
+            symbol = df['symbol'].iloc[0]
+            row = result.loc[symbol]
+            if len(df) < 5:
+                assert row[['annual_volatility', 'max_drawdown']].isna().all()
+                continue
+            summary = calculate_portfolio_risk_summary(df)
+            expected = {**summary['volatility_analysis'], **summary['risk_metrics'], **summary['return_statistics'],
+                        'price_change_pct': summary['period_analysis']['price_change_pct'],
+                        'risk_level': summary['risk_assessment']['risk_level']}
+            for name, value in expected.items():
+                if name in row:
+                    _assert_same(value, row[name], f'{symbol} {name}')
+
+    @pytest.mark.unit
+    def test_from_arrays_matches_long_frame(self, frames):
+        width = max(len(df) for df in frames)
+        close = np.full((len(frames), width), np.nan)
+        high, low = close.copy(), close.copy()
+        for i, df in enumerate(frames):
+            close[i, :len(df)] = df['close']
+            high[i, :len(df)] = df['high']
+            low[i, :len(df)] = df['low']
+        symbols = [df['symbol'].iloc[0] for df in frames]
+
+        from_arrays = compute_panel_indicators(KLinePanel.from_arrays(close, high, low, symbols=symbols))
+        from_frame = compute_panel_indicators(KLinePanel.from_long_frame(
+            pd.concat([df.drop(columns='amount', errors='ignore') for df in frames])))
+
+        assert from_arrays['bars'].tolist() == [len(df) for df in frames]
+        pd.testing.assert_frame_equal(from_arrays, from_frame.drop(columns='last_date'))
+
+    @pytest.mark.unit
+    def test_risk_respects_min_prices(self):
+        panel = KLinePanel.from_arrays(np.array([[10.0, 10.5, 10.2, np.nan, np.nan],
+                                                 [10.0, 10.5, 10.2, 10.8, 11.0]]))
+        risk = compute_panel_risk(panel, min_prices=5)
+        assert risk.iloc[0].isna().all()
+        assert risk.iloc[1]['price_change_pct'] == pytest.approx(10.0)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+测试K线分区缓存 kline_cache.py / kline_store.py
+"""
+import os
+import sys
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.kline_cache import KLineCacheManager, KLineData, KLineType
+from utils.kline_store import PartitionedKLineStore
+
+
+def _make_klines(symbol, start='2024-01-01', days=10, data_type='stock'):
+    dates = pd.date_range(start, periods=days)
+    fetch_time = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        KLineData(symbol=symbol, datetime=d.strftime('%Y-%m-%d'), open=10.0 + i, high=11.0 + i,
+                  low=9.0 + i, close=10.5 + i, volume=1000 + i, amount=None,
+                  fetch_time=fetch_time, data_type=data_type)
+        for i, d in enumerate(dates)
+    ]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return KLineCacheManager(cache_dir=str(tmp_path))
+
+
+class TestPartitionedKLineStore:
+    """测试分区存储"""
+
+    @pytest.mark.unit
+    def test_append_creates_segments_and_dedupes(self, tmp_path):
+        store = PartitionedKLineStore(str(tmp_path))
+        base = pd.DataFrame({'symbol': ['A'] * 2, 'datetime': ['2024-01-01', '2024-01-02'],
+                             'open': [1, 2], 'high': [1, 2], 'low': [1, 2], 'close': [1, 2], 'volume': [1, 2]})
+        store.write('1d', 'A', base)
+        store.append('1d', 'A', base.assign(datetime=['2024-01-02', '2024-01-03'], close=[5, 6]))
+
+        df = store.read('1d', 'A')
+        assert df['datetime'].tolist() == ['2024-01-01', '2024-01-02', '2024-01-03']
+        assert df['close'].tolist() == [1.0, 5.0, 6.0]
+        assert df['volume'].dtype == 'int64'
+
+    @pytest.mark.unit
+    def test_compaction_after_many_appends(self, tmp_path):
+        store = PartitionedKLineStore(str(tmp_path))
+        for i in range(12):
+            store.append('1d', 'A', pd.DataFrame({'symbol': ['A'], 'datetime': [f'2024-01-{i + 1:02d}'],
+                                                  'open': [1], 'high': [1], 'low': [1], 'close': [1], 'volume': [1]}))
+        partition_dir = os.path.join(str(tmp_path), '1d', 'A')
+        assert len(os.listdir(partition_dir)) <= 9
+        assert len(store.read('1d', 'A')) == 12
+
+    @pytest.mark.unit
+    def test_last_datetime_from_partition_meta(self, tmp_path, monkeypatch):
+        store = PartitionedKLineStore(str(tmp_path))
+        row = {'symbol': ['A'], 'open': [1], 'high': [1], 'low': [1], 'close': [1], 'volume': [1]}
+        store.write('1d', 'A', pd.DataFrame(dict(row, datetime=['2024-01-02'])))
+        store.append('1d', 'A', pd.DataFrame(dict(row, datetime=['2024-01-05'])))
+        store.append('1d', 'A', pd.DataFrame(dict(row, datetime=['2024-01-03'])))
+
+        def fail_read(*args):
+            raise AssertionError("不应读取数据段")
+
+        monkeypatch.setattr(store, 'read', fail_read)
+        assert store.last_datetime('1d', 'A') == '2024-01-05'
+        assert store.last_datetime('1d', 'B') is None
+
+    @pytest.mark.unit
+    def test_last_datetime_backfills_meta_for_old_partition(self, tmp_path):
+        store = PartitionedKLineStore(str(tmp_path))
+        row = {'symbol': ['A'], 'open': [1], 'high': [1], 'low': [1], 'close': [1], 'volume': [1]}
+        store.write('1d', 'A', pd.DataFrame(dict(row, datetime=['2024-01-02'])))
+        os.remove(os.path.join(str(tmp_path), '1d', 'A', '_meta.json'))
+
+        assert store.last_datetime('1d', 'A') == '2024-01-02'
+        assert os.path.exists(os.path.join(str(tmp_path), '1d', 'A', '_meta.json'))
+
+
+class TestKLineCacheManager:
+    """测试K线缓存管理器"""
+
+    @pytest.mark.unit
+    def test_cache_and_get_only_touches_symbol_partition(self, manager):
+        manager.cache_kline('000001', KLineType.DAY, 10, _make_klines('000001'))
+        manager.cache_kline('600519', KLineType.DAY, 10, _make_klines('600519', days=5))
+
+        cached = manager.get_cached_kline('000001', KLineType.DAY, 3)
+        assert [k.datetime for k in cached] == ['2024-01-08', '2024-01-09', '2024-01-10']
+        assert manager.store.list_symbols(KLineType.DAY.value) == ['000001', '600519']
+
+    @pytest.mark.unit
+    def test_update_appends_and_merges(self, manager):
+        manager.cache_kline('000001', KLineType.DAY, 10, _make_klines('000001', days=5))
+        manager.update_kline_data('000001', KLineType.DAY, _make_klines('000001', start='2024-01-04', days=4))
+
+        cached = manager.get_cached_kline('000001', KLineType.DAY, 100)
+        assert len(cached) == 7
+        assert cached[-1].datetime == '2024-01-07'
+
+    @pytest.mark.unit
+    def test_migrates_legacy_csv_once(self, tmp_path):
+        legacy = pd.DataFrame([k.__dict__ for k in _make_klines('000001') + _make_klines('600519', days=3)])
+        legacy.to_csv(os.path.join(str(tmp_path), 'kline_1d.csv'), index=False)
+
+        manager = KLineCacheManager(cache_dir=str(tmp_path))
+
+        assert not os.path.exists(os.path.join(str(tmp_path), 'kline_1d.csv'))
+        assert os.path.exists(os.path.join(str(tmp_path), 'kline_1d.csv.migrated'))
+        assert len(manager.get_cached_kline('600519', KLineType.DAY, 100)) == 3
+        assert manager.get_cache_stats()['total_records'] == 13
+
+    @pytest.mark.unit
+    def test_clear_cache_by_symbol(self, manager):
+        manager.cache_kline('000001', KLineType.DAY, 10, _make_klines('000001'))
+        manager.cache_index_kline('上证指数', _make_klines('上证指数', data_type='index'))
+
+        manager.clear_cache('000001')
+
+        assert manager.get_cached_kline('000001', KLineType.DAY, 10) is None
+        assert len(manager.get_cached_index_kline('上证指数', 10)) == 10
+
+    @pytest.fixture
+    def frozen_now(self, monkeypatch):
+        """固定当前时间为 2024-10-09(周三) 10:00，前一个交易日为 2024-10-08"""
+        import utils.kline_cache as kline_cache_module
+        from utils.trading_calendar import TradingCalendar
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls(2024, 10, 9, 10, 0)
+
+        calendar = TradingCalendar(['2024-09-30'] + [f'2024-10-{d:02d}' for d in range(8, 12)])
+        monkeypatch.setattr(kline_cache_module, 'datetime', FrozenDatetime)
+        monkeypatch.setattr(kline_cache_module, 'get_trading_calendar', lambda: calendar)
+
+    @pytest.mark.unit
+    def test_fresh_mask_daily(self, manager, frozen_now):
+        df = pd.DataFrame([
+            {'datetime': '2024-09-30', 'fetch_time': '2024-09-30 14:00:00'},  # 前一个交易日之前的历史数据
+            {'datetime': '2024-10-08', 'fetch_time': '2024-10-08 14:00:00'},  # 盘中拉取且已超过有效期
+            {'datetime': '2024-10-08', 'fetch_time': '2024-10-08 17:00:00'},  # 收盘数据更新后拉取
+            {'datetime': '2024-10-08', 'fetch_time': '2024-10-09 09:00:00'},  # 次日拉取
+            {'datetime': '2024-10-09', 'fetch_time': '2024-10-09 08:00:00'},  # 当日数据，有效期内
+            {'datetime': '2024-10-09', 'fetch_time': '2024-10-09 05:00:00'},  # 当日数据，已过期
+            {'datetime': 'bad', 'fetch_time': '2024-10-09 09:00:00'},
+            {'datetime': '2024-10-09', 'fetch_time': 'bad'},
+            {'datetime': '2024-10-09', 'fetch_time': None},                    # 无拉取时间视为有效
+        ])
+
+        assert manager._fresh_mask(df, KLineType.DAY).tolist() == [True, False, True, True, True, False,
+                                                                   False, False, True]
+
+    @pytest.mark.unit
+    def test_fresh_mask_intraday(self, manager, frozen_now):
+        df = pd.DataFrame([
+            {'datetime': '2024-10-09 08:30:00', 'fetch_time': '2024-10-09 08:31:00'},  # 1小时之前的数据
+            {'datetime': '2024-10-09 09:30:00', 'fetch_time': '2024-10-09 08:00:00'},  # 拉取时间相差超过1小时
+            {'datetime': '2024-10-09 09:55:00', 'fetch_time': '2024-10-09 09:57:00'},  # 有效期内
+            {'datetime': '2024-10-09 09:40:00', 'fetch_time': '2024-10-09 09:41:00'},  # 已过期
+            {'datetime': '2024-10-09', 'fetch_time': '2024-10-09 09:57:00'},           # 时间格式不符
+        ])
+
+        assert manager._fresh_mask(df, KLineType.MIN_5).tolist() == [True, True, True, False, False]
+
+    @pytest.mark.unit
+    def test_intraday_bar_before_holiday_is_refetched(self, manager, monkeypatch):
+        import utils.kline_cache as kline_cache_module
+        from utils.trading_calendar import TradingCalendar
+
+        # 最近4天休市，前一个交易日是5天前
+        today = datetime.now().date()
+        last_session = today - timedelta(days=5)
+        calendar = TradingCalendar([last_session - timedelta(days=i) for i in range(10)] +
+                                   [today + timedelta(days=i) for i in range(1, 5)])
+        monkeypatch.setattr(kline_cache_module, 'get_trading_calendar', lambda: calendar)
+
+        bar_date = last_session.strftime('%Y-%m-%d')
+        df = pd.DataFrame([
+            {'datetime': bar_date, 'fetch_time': f'{bar_date} 14:00:00'},  # 盘中拉取
+            {'datetime': bar_date, 'fetch_time': f'{bar_date} 17:00:00'},  # 收盘后拉取
+        ])
+        assert manager._fresh_mask(df, KLineType.DAY).tolist() == [False, True]
+
+    @pytest.mark.unit
+    def test_get_cached_kline_frame(self, manager):
+        manager.cache_kline('000001', KLineType.DAY, 10, _make_klines('000001'))
+
+        df = manager.get_cached_kline_frame('000001', KLineType.DAY, 4)
+
+        assert list(df.columns) == list(KLineData.__dataclass_fields__.keys())
+        assert df['datetime'].tolist() == ['2024-01-07', '2024-01-08', '2024-01-09', '2024-01-10']
+        assert df['amount'].isna().all()
+        assert manager.get_cached_kline_frame('999999', KLineType.DAY, 4) is None
+
+    @pytest.mark.unit
+    def test_analyze_missing_ranges(self, manager):
+        today = datetime.now().date()
+        assert len(manager.analyze_missing_ranges('000001', KLineType.DAY, 100)) == 1
+
+        # 缓存足够但最新一根K线是10天前：只需补充之后的新K线
+        start = (today - timedelta(days=39)).strftime('%Y-%m-%d')
+        manager.cache_kline('000001', KLineType.DAY, 30, _make_klines('000001', start=start, days=30))
+        ranges = manager.analyze_missing_ranges('000001', KLineType.DAY, 20)
+        assert ranges == [((today - timedelta(days=9)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))]
+
+        # 缓存不足：先补充更早的历史K线
+        ranges = manager.analyze_missing_ranges('000001', KLineType.DAY, 50)
+        assert len(ranges) == 2
+        assert ranges[0][1] == (today - timedelta(days=40)).strftime('%Y-%m-%d')
+
+    @pytest.mark.unit
+    def test_analyze_missing_ranges_failure_returns_none(self, manager):
+        # 缓存时间格式无法解析：返回None，与“缓存已是最新”的空列表区分
+        manager.cache_kline_frame('000001', KLineType.DAY, pd.DataFrame({
+            'symbol': '000001', 'datetime': ['2024/01/05'], 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0,
+            'volume': 1}))
+
+        assert manager.analyze_missing_ranges('000001', KLineType.DAY, 5) is None
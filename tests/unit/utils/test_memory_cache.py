@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试缓存内存层 memory_cache.py
+"""
+import os
+import sys
+import json
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.memory_cache import FileMemoryCache, get_memory_cache
+from market.market_data_cache import MarketDataCache
+from stock.chip_data_cache import ChipDataCache
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+class TestFileMemoryCache:
+    """测试按文件签名失效的LRU缓存"""
+
+    @pytest.mark.unit
+    def test_reload_only_when_file_changes(self, tmp_path):
+        path = str(tmp_path / 'a.json')
+        _write_json(path, {'v': 1})
+        cache = FileMemoryCache()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+
+        assert cache.get(path, loader) == {'v': 1}
+        assert cache.get(path, loader) == {'v': 1}
+        _write_json(path, {'v': 22})
+        assert cache.get(path, loader) == {'v': 22}
+
+        assert len(loads) == 2
+        stats = cache.get_stats()
+        assert (stats['hits'], stats['misses']) == (1, 2)
+
+    @pytest.mark.unit
+    def test_lru_eviction(self, tmp_path):
+        cache = FileMemoryCache(max_entries=2)
+        for name in ('a', 'b'):
+            cache.get(name, lambda: name, paths=[])
+        cache.get('a', lambda: 'a', paths=[])  # a 变为最近使用
+        cache.get('c', lambda: 'c', paths=[])
+
+        assert cache.get_stats()['evictions'] == 1
+        cache.reset_stats()
+        cache.get('a', lambda: 'a', paths=[])
+        cache.get('b', lambda: 'b', paths=[])
+        assert (cache.get_stats()['hits'], cache.get_stats()['misses']) == (1, 1)
+
+    @pytest.mark.unit
+    def test_invalidate_prefix(self):
+        cache = FileMemoryCache()
+        for key in ('db::x', 'db::y', 'other'):
+            cache.get(key, lambda: key, paths=[])
+        cache.invalidate(prefix='db::')
+        assert cache.get_stats()['entries'] == 1
+
+
+class TestCacheManagersUseMemoryTier:
+    """测试缓存管理器通过内存层读取"""
+
+    @pytest.mark.unit
+    def test_market_cache_parses_once(self, tmp_path):
+        market_cache = MarketDataCache(cache_dir=str(tmp_path))
+        market_cache.save_cached_data('market_news', {'items': [1, 2]})
+        memory = get_memory_cache()
+        memory.reset_stats()
+
+        for _ in range(3):
+            assert market_cache.is_cache_valid('market_news')
+            data = market_cache.get_cached_data('market_news')
+            data['extra'] = True  # 修改返回值不影响缓存
+
+        assert market_cache.get_cached_data('market_news') == {'items': [1, 2]}
+        assert memory.get_stats()['misses'] == 1  # 保存后仅首次读取解析文件
+
+    @pytest.mark.unit
+    def test_chip_cache_sees_external_write(self, tmp_path):
+        chip_cache = ChipDataCache(cache_dir=str(tmp_path))
+        chip_cache.save_raw_data('000001', [{'price': 1}])
+        assert chip_cache.get_cached_raw_data('000001') == [{'price': 1}]
+
+        cache_data = chip_cache.load_cache()
+        cache_data['000001'] = dict(cache_data['000001'], raw_data=[{'price': 1}, {'price': 2}])
+        _write_json(chip_cache.cache_file, cache_data)
+
+        assert len(chip_cache.get_cached_raw_data('000001')) == 2
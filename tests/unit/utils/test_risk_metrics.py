@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+测试风险指标计算 risk_metrics.py
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from tests.fixtures.data_generator import generate_stock_kline_data
+from utils.risk_metrics import ReturnMoments, RiskCalculator, calculate_portfolio_risk_summary
+
+
+@pytest.fixture
+def prices():
+    np.random.seed(3)
+    return generate_stock_kline_data(days=200)['close'].reset_index(drop=True)
+
+
+@pytest.fixture
+def calculator():
+    return RiskCalculator()
+
+
+class TestReturnMoments:
+    """测试共享统计量与 pandas 计算结果一致"""
+
+    @pytest.mark.unit
+    def test_moments_match_pandas(self, prices, calculator):
+        returns = prices.pct_change().dropna()
+        moments = calculator.moments(prices)
+
+        assert moments.mean == pytest.approx(returns.mean(), rel=1e-12)
+        assert moments.std == pytest.approx(returns.std(), rel=1e-12)
+        assert moments.skew == pytest.approx(returns.skew(), rel=1e-9)
+        assert moments.max_drawdown == pytest.approx(calculator.max_drawdown(returns), rel=1e-12)
+        var = calculator.value_at_risk(returns)
+        assert moments.percentile(5) == var
+        assert moments.tail_mean(var) == pytest.approx(calculator.conditional_var(returns), rel=1e-12)
+
+    @pytest.mark.unit
+    def test_short_and_constant_returns(self):
+        assert np.isnan(ReturnMoments.from_returns(pd.Series([0.01, 0.02])).skew)
+        assert ReturnMoments.from_returns(pd.Series([0.01] * 5)).skew == 0.0
+
+    @pytest.mark.unit
+    def test_all_metrics_match_individual_methods(self, prices, calculator):
+        returns = calculator.calculate_returns(prices)
+        metrics = calculator.calculate_all_metrics(prices, risk_free_rate=0.03)
+
+        assert metrics['annual_volatility'] == pytest.approx(calculator.annual_volatility(returns), rel=1e-12)
+        assert metrics['sharpe_ratio'] == pytest.approx(calculator.sharpe_ratio(returns, 0.03), rel=1e-9)
+        with pytest.raises(ValueError):
+            calculator.calculate_all_metrics(pd.Series([1.0]))
+
+    @pytest.mark.unit
+    def test_summary_computes_moments_once(self, prices, calculator, monkeypatch):
+        calls = []
+        original = ReturnMoments.from_returns.__func__
+        monkeypatch.setattr(ReturnMoments, 'from_returns',
+                            classmethod(lambda cls, r: calls.append(1) or original(cls, r)))
+
+        summary = calculate_portfolio_risk_summary(pd.DataFrame({'close': prices}))
+
+        assert len(calls) == 1
+        assert summary['risk_assessment']['stability'] in ('stable', 'moderate', 'unstable')
+        assert len(summary['summary_table']) == 5
+
+
+class TestRollingMetrics:
+    """测试滚动窗口指标与逐窗口计算一致"""
+
+    @pytest.mark.unit
+    def test_rolling_volatility_and_sharpe(self, prices, calculator):
+        returns = calculator.calculate_returns(prices)
+        window = 20
+
+        vol = calculator.rolling_volatility(returns, window)
+        expected_vol = returns.rolling(window).std() * np.sqrt(252)
+        pd.testing.assert_series_equal(vol, expected_vol, check_names=False, rtol=1e-9)
+
+        sharpe = calculator.rolling_sharpe(returns, window, risk_free_rate=0.03)
+        for end in (window, 57, len(returns)):
+            chunk = returns.iloc[end - window:end]
+            assert sharpe.iloc[end - 1] == pytest.approx(calculator.sharpe_ratio(chunk, 0.03), rel=1e-9)
+        assert sharpe.iloc[:window - 1].isna().all()
+
+    @pytest.mark.unit
+    def test_rolling_max_drawdown(self, prices, calculator):
+        returns = calculator.calculate_returns(prices)
+        window = 30
+
+        drawdown = calculator.rolling_max_drawdown(returns, window)
+
+        assert drawdown.index.equals(returns.index)
+        for end in range(window, len(returns) + 1, 17):
+            chunk = returns.iloc[end - window:end]
+            assert drawdown.iloc[end - 1] == pytest.approx(calculator.max_drawdown(chunk), rel=1e-12)
+
+    @pytest.mark.unit
+    def test_window_longer_than_series(self, calculator):
+        returns = pd.Series([0.01, -0.02, 0.03])
+        assert calculator.rolling_volatility(returns, 5).isna().all()
+        assert len(calculator.rolling_max_drawdown(returns, 5)) == 3
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+测试请求合并 single_flight.py
+"""
+import os
+import sys
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.single_flight import SingleFlight
+
+
+def _run_concurrently(func, n):
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        try:
+            results[i] = func()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class TestSingleFlight:
+    """测试按键合并并发请求"""
+
+    @pytest.mark.unit
+    def test_concurrent_calls_share_one_fetch(self):
+        flight = SingleFlight()
+        executions = []
+
+        def fetch():
+            executions.append(1)
+            time.sleep(0.2)
+            return {'price': 10}
+
+        results, errors = _run_concurrently(lambda: flight.do(('basic_info', '000001'), fetch), 8)
+
+        assert len(executions) == 1
+        assert all(r == {'price': 10} for r in results)
+        # 每个调用方拿到独立的拷贝
+        results[0]['ai_analysis'] = 'x'
+        assert 'ai_analysis' not in results[1]
+        stats = flight.get_stats()
+        assert (stats['calls'], stats['executions'], stats['coalesced']) == (8, 1, 7)
+        assert stats['by_type']['basic_info']['coalesced'] == 7
+        assert flight.in_flight() == 0
+
+    @pytest.mark.unit
+    def test_error_is_shared_and_next_call_retries(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError('接口异常')
+
+        _, errors = _run_concurrently(lambda: flight.do(('news_data', '000001'), failing), 4)
+        assert all(isinstance(e, RuntimeError) for e in errors)
+
+        assert flight.do(('news_data', '000001'), lambda: {'ok': 1}) == {'ok': 1}
+        assert flight.get_stats()['executions'] == 2
+
+    @pytest.mark.unit
+    def test_different_keys_do_not_coalesce(self):
+        flight = SingleFlight()
+        codes = ['000001', '600519', '000002']
+        barrier = threading.Barrier(len(codes))
+
+        def fetch_for(code):
+            barrier.wait(timeout=2)
+            return code
+
+        threads = [threading.Thread(target=flight.do, args=(('basic_info', c), lambda c=c: fetch_for(c)))
+                   for c in codes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert flight.get_stats()['coalesced'] == 0
+
+    @pytest.mark.unit
+    def test_stock_tools_coalesce_basic_info(self):
+        from stock.stock_data_tools import StockTools
+
+        tools = StockTools()
+        tools.single_flight = SingleFlight()
+        calls = []
+
+        def fake_fetch(code):
+            calls.append(code)
+            time.sleep(0.2)
+            return {'current_price': 0, 'name': 'x'}
+
+        with patch('stock.stock_data_tools.fetch_stock_basic_info', side_effect=fake_fetch):
+            results, _ = _run_concurrently(
+                lambda: tools.get_basic_info({'code': '999999'}, use_cache=False, include_company_analysis=False), 5)
+
+        assert calls == ['999999']
+        assert all(r['name'] == 'x' for r in results)
+
+    @pytest.mark.unit
+    def test_stock_tools_technical_indicators_keyed_by_period(self):
+        from stock.stock_data_tools import StockTools
+
+        tools = StockTools()
+        tools.single_flight = SingleFlight()
+        tools.cache_manager = MagicMock()
+        # 两个周期的获取同时进行才能通过屏障，被合并为一次获取时会因屏障超时而失败
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fake_fetch(code, period):
+            barrier.wait()
+            return {'period': period}
+
+        with patch('stock.stock_data_tools.fetch_stock_technical_indicators', side_effect=fake_fetch):
+            periods = iter([60, 160])
+            lock = threading.Lock()
+
+            def call():
+                with lock:
+                    period = next(periods)
+                return period, tools.get_stock_technical_indicators('999999', period, use_cache=False)
+
+            results, errors = _run_concurrently(call, 2)
+
+        assert errors == [None, None]
+        assert all(result == {'period': period} for period, result in results)
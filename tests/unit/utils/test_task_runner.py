@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+测试带单任务超时的并行执行 task_runner.py
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.task_runner import STATUS_CANCELLED, STATUS_DONE, STATUS_TIMEOUT, run_tasks
+
+
+def _sleep(result, delay):
+    def fn():
+        time.sleep(delay)
+        return result
+    return fn
+
+
+class TestRunTasks:
+    """测试并行执行与超时"""
+
+    @pytest.mark.unit
+    def test_tasks_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def together(i):
+            return lambda: (barrier.wait(), i)[1]
+
+        outcomes = run_tasks([(f't{i}', together(i)) for i in range(3)], max_workers=3, timeout=10)
+
+        assert list(outcomes) == ['t0', 't1', 't2']
+        assert [o.result for o in outcomes.values()] == [0, 1, 2]
+
+    @pytest.mark.unit
+    def test_exception_is_captured(self):
+        def boom():
+            raise RuntimeError('接口异常')
+
+        outcome = run_tasks([('a', boom), ('b', _sleep(1, 0))], max_workers=2, timeout=5)['a']
+
+        assert outcome.status == STATUS_DONE
+        assert outcome.error == '接口异常'
+
+    @pytest.mark.unit
+    def test_timeout_measured_from_start(self):
+        # 单线程依次执行，b 排队等待 a 的时间不计入 b 的超时
+        outcomes = run_tasks([('a', _sleep('a', 0.3)), ('b', _sleep('b', 0.3))], max_workers=1, timeout=1.0)
+
+        assert outcomes['a'].result == 'a'
+        assert outcomes['b'].result == 'b'
+
+    @pytest.mark.unit
+    def test_slow_task_times_out_without_blocking_others(self):
+        outcomes = run_tasks([('slow', _sleep('x', 1.0)), ('fast', _sleep('y', 0))], max_workers=2, timeout=0.2)
+
+        assert outcomes['slow'].status == STATUS_TIMEOUT
+        assert '超时' in outcomes['slow'].error
+        assert outcomes['slow'].elapsed >= 0.2
+        assert outcomes['fast'].result == 'y'
+
+    @pytest.mark.unit
+    def test_queued_task_behind_hung_task_is_cancelled(self):
+        ran = []
+
+        outcomes = run_tasks([('hung', _sleep('x', 1.0)), ('queued', lambda: ran.append(1))],
+                             max_workers=1, timeout=0.2)
+        time.sleep(1.0)
+
+        assert outcomes['hung'].status == STATUS_TIMEOUT
+        assert outcomes['queued'].status == STATUS_CANCELLED
+        assert '取消' in outcomes['queued'].error
+        assert ran == []
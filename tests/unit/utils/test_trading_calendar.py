@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+测试交易日历 trading_calendar.py
+"""
+import os
+import sys
+import json
+import pytest
+from datetime import date, datetime, timedelta
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import market.market_data_cache as market_data_cache_module
+from utils.trading_calendar import TradingCalendar
+
+
+# 2024年9-10月交易日：国庆假期 10月1日-7日休市
+HOLIDAYS = {date(2024, 10, d) for d in range(1, 8)}
+
+
+def _trading_days():
+    days, day = [], date(2024, 9, 2)
+    while day <= date(2024, 10, 31):
+        if day.weekday() < 5 and day not in HOLIDAYS:
+            days.append(day.strftime('%Y-%m-%d'))
+        day += timedelta(days=1)
+    return days
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    return TradingCalendar(_trading_days(), cache_file=str(tmp_path / 'trade_calendar.json'))
+
+
+class TestTradingCalendar:
+    """测试交易日查询"""
+
+    @pytest.mark.unit
+    def test_is_trading_day_skips_weekend_and_holiday(self, calendar):
+        assert calendar.is_trading_day('2024-09-30')
+        assert not calendar.is_trading_day('2024-10-01')
+        assert not calendar.is_trading_day(date(2024, 10, 5))
+        assert calendar.is_trading_day(datetime(2024, 10, 8, 10, 0))
+
+    @pytest.mark.unit
+    def test_previous_and_next_trading_day(self, calendar):
+        assert calendar.previous_trading_day('2024-10-08') == date(2024, 9, 30)
+        assert calendar.previous_trading_day('2024-10-05') == date(2024, 9, 30)
+        assert calendar.previous_trading_day('2024-09-30') == date(2024, 9, 27)
+        assert calendar.last_trading_day('2024-10-06') == date(2024, 9, 30)
+        assert calendar.next_trading_day('2024-09-30') == date(2024, 10, 8)
+
+    @pytest.mark.unit
+    def test_sessions_between_is_inclusive(self, calendar):
+        sessions = calendar.sessions_between('2024-09-27', '2024-10-08')
+        assert sessions == [date(2024, 9, 27), date(2024, 9, 30), date(2024, 10, 8)]
+        assert calendar.sessions_between('2024-10-01', '2024-10-07') == []
+        assert calendar.sessions_between('2024-10-08', '2024-10-01') == []
+
+    @pytest.mark.unit
+    def test_next_close(self, calendar):
+        assert calendar.next_close(datetime(2024, 9, 30, 10, 0)) == datetime(2024, 9, 30, 15, 0)
+        assert calendar.next_close(datetime(2024, 9, 30, 15, 30)) == datetime(2024, 10, 8, 15, 0)
+        assert calendar.next_close(datetime(2024, 10, 3, 12, 0)) == datetime(2024, 10, 8, 15, 0)
+
+    @pytest.mark.unit
+    def test_trading_time_and_unchanged_data(self, calendar):
+        assert calendar.is_trading_time(datetime(2024, 9, 30, 10, 0))
+        assert not calendar.is_trading_time(datetime(2024, 10, 2, 10, 0))
+        assert not calendar.is_trading_time(datetime(2024, 9, 30, 12, 0))
+
+        fetched_after_close = datetime(2024, 9, 30, 17, 0)
+        assert calendar.data_unchanged_since(fetched_after_close, datetime(2024, 10, 6, 20, 0))
+        assert calendar.data_unchanged_since(fetched_after_close, datetime(2024, 10, 8, 9, 0))
+        assert not calendar.data_unchanged_since(fetched_after_close, datetime(2024, 10, 8, 10, 0))
+        assert not calendar.data_unchanged_since(datetime(2024, 9, 30, 14, 0), datetime(2024, 10, 3, 12, 0))
+
+    @pytest.mark.unit
+    def test_out_of_range_falls_back_to_weekdays(self, calendar):
+        assert calendar.is_trading_day('2025-01-06')
+        assert not calendar.is_trading_day('2025-01-04')
+        assert calendar.last_trading_day('2025-01-05') == date(2025, 1, 3)
+
+    @pytest.mark.unit
+    def test_loads_local_calendar_without_network(self, tmp_path):
+        cache_file = tmp_path / 'trade_calendar.json'
+        future = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'days': _trading_days() + [future]}, f)
+
+        calendar = TradingCalendar(cache_file=str(cache_file))
+        assert not calendar.is_trading_day('2024-10-02')
+        assert calendar.source == 'local'
+
+    @pytest.mark.unit
+    def test_weekday_fallback_is_reloaded_later(self, tmp_path, monkeypatch):
+        import pandas as pd
+        from types import SimpleNamespace
+
+        responses = [RuntimeError('接口不可用'), pd.DataFrame({'trade_date': _trading_days()})]
+
+        def tool_trade_date_hist_sina():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        monkeypatch.setitem(sys.modules, 'akshare', SimpleNamespace(tool_trade_date_hist_sina=tool_trade_date_hist_sina))
+        calendar = TradingCalendar(cache_file=str(tmp_path / 'trade_calendar.json'))
+
+        assert calendar.is_trading_day('2024-10-02')
+        assert calendar.source == 'weekday'
+
+        # 重试间隔内不再请求接口，之后重新加载
+        assert calendar.is_trading_day('2024-10-02')
+        assert len(responses) == 1
+        calendar._retry_after -= timedelta(hours=1)
+        assert not calendar.is_trading_day('2024-10-02')
+        assert calendar.source == 'sina'
+        assert calendar._retry_after is None
+
+
+class TestSessionBoundMarketCache:
+    """测试行情类大盘数据在休市期间保持有效"""
+
+    @pytest.fixture
+    def market_cache(self, tmp_path, calendar, monkeypatch):
+        cache = market_data_cache_module.MarketDataCache(cache_dir=str(tmp_path))
+        cache.cache_file = str(tmp_path / 'market_data.json')
+        monkeypatch.setattr(market_data_cache_module, 'get_trading_calendar', lambda: calendar)
+        return cache
+
+    def _save_at(self, cache, data_type, when):
+        cache.save_cached_data(data_type, {'value': 1})
+        data = cache.load_cache()
+        data[data_type]['cache_meta']['timestamp'] = when.isoformat()
+        cache.save_cache(data)
+
+    def _valid_at(self, cache, data_type, now, monkeypatch):
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+        monkeypatch.setattr(market_data_cache_module, 'datetime', FrozenDatetime)
+        return cache.is_cache_valid(data_type)
+
+    @pytest.mark.unit
+    def test_sentiment_valid_through_holiday(self, market_cache, monkeypatch):
+        self._save_at(market_cache, 'market_sentiment', datetime(2024, 9, 30, 17, 0))
+        assert self._valid_at(market_cache, 'market_sentiment', datetime(2024, 10, 4, 12, 0), monkeypatch)
+        assert not self._valid_at(market_cache, 'market_sentiment', datetime(2024, 10, 8, 9, 30), monkeypatch)
+
+    @pytest.mark.unit
+    def test_news_still_expires_by_ttl(self, market_cache, monkeypatch):
+        self._save_at(market_cache, 'market_news', datetime(2024, 9, 30, 17, 0))
+        assert not self._valid_at(market_cache, 'market_news', datetime(2024, 10, 4, 12, 0), monkeypatch)
@@ -103,6 +103,26 @@ def main():
             if st.button("取消", key="cancel_clear_all_cache"):
                 st.session_state['show_clear_all_confirm'] = False
     
+    st.markdown("---")
+    st.subheader("📊 运行统计")
+
+    col5, col6 = st.columns(2)
+
+    with col5:
+        from utils.memory_cache import get_memory_cache
+        memory_stats = get_memory_cache().get_stats()
+        st.metric("内存缓存命中率", f"{memory_stats['hit_rate']:.0%}",
+                  help="缓存文件未变化时直接使用内存中的数据，无需重新解析")
+        st.caption(f"命中 {memory_stats['hits']} 次 · 未命中 {memory_stats['misses']} 次 · "
+                   f"缓存项 {memory_stats['entries']}/{memory_stats['max_entries']}")
+
+    with col6:
+        from utils.single_flight import get_single_flight
+        flight_stats = get_single_flight().get_stats()
+        st.metric("合并的重复请求", flight_stats['coalesced'],
+                  help="多个会话同时获取同一数据时，只发出一次网络请求，其余请求共享结果")
+        st.caption(f"请求 {flight_stats['calls']} 次 · 实际拉取 {flight_stats['executions']} 次")
+
     st.markdown("---")
     st.subheader("ℹ️ 缓存说明")
     
@@ -1,7 +1,9 @@
 import streamlit as st
 import sys
 import os
+import time
 import datetime
+from contextlib import contextmanager
 import pandas as pd
 import plotly.graph_objects as go
 
@@ -13,6 +15,37 @@ from utils.format_utils import format_price
 from utils.data_formatters import format_risk_metrics
 from utils.string_utils import remove_markdown_format
 
+
+@contextmanager
+def ai_report_stream(title, min_interval=0.1):
+    """
+    AI报告流式显示区域
+    
+    返回接收回复片段的回调，传给支持 on_delta 的分析接口后，报告在生成过程中逐步显示；
+    离开上下文时清空该区域，由调用方按原方式显示完整报告。
+    
+    Args:
+        title: 显示区域标题
+        min_interval: 两次刷新之间的最短间隔（秒），避免每个片段都触发页面更新
+    """
+    placeholder = st.empty()
+    parts = []
+    last_render = [0.0]
+    
+    def on_delta(delta):
+        parts.append(delta)
+        now = time.monotonic()
+        if now - last_render[0] >= min_interval:
+            last_render[0] = now
+            with placeholder.container():
+                with st.expander(title, expanded=True):
+                    st.markdown(''.join(parts) + " ▌")
+    
+    try:
+        yield on_delta
+    finally:
+        placeholder.empty()
+
 def display_technical_indicators(tech_data):
     """显示技术指标分析卡片"""
 
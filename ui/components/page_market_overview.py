@@ -17,6 +17,7 @@ from utils.format_utils import format_large_number
 from market.market_data_tools import get_market_tools
 from market.market_report import write_market_report
 from ui.config import FOCUS_INDICES, FULL_VERSION
+from ui.components.page_common import ai_report_stream
 
 
 def display_valuation_analysis(index_name='沪深300', use_cache=True):
@@ -366,7 +367,7 @@ def handle_ai_analysis(index_name, use_cache=True):
     if st.session_state.get('run_ai_index', False):
         # 检查是否已经生成过AI报告
         stock_code_for_ai = index_name
-        with st.spinner(f"🤖 AI正在分析{stock_code_for_ai}数据..."):
+        with st.spinner(f"🤖 AI正在分析{stock_code_for_ai}数据..."), ai_report_stream(f"📊 AI{stock_code_for_ai}分析报告") as on_delta:
             try:
                 user_opinion = st.session_state.get('market_user_opinion', '')
                 market_tools = get_market_tools()
@@ -374,7 +375,8 @@ def handle_ai_analysis(index_name, use_cache=True):
                     use_cache=use_cache, 
                     index_name=stock_code_for_ai, 
                     force_regenerate=not use_cache,
-                    user_opinion=user_opinion
+                    user_opinion=user_opinion,
+                    on_delta=on_delta
                 )
                 
                 if "ai_index_report" not in st.session_state:
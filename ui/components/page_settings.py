@@ -98,6 +98,14 @@ def main():
                 value=int(config.get('LLM_CACHE.CACHE_TTL', 3600)),
                 help="缓存数据的有效期"
             )
+            
+            cache_size = st.number_input(
+                "缓存容量上限(MB)", 
+                min_value=10, 
+                max_value=10240, 
+                value=int(config.get('LLM_CACHE.MAX_SIZE_MB', 200)),
+                help="超出上限时淘汰最久未使用的缓存"
+            )
         
         # 保存按钮
         if st.button("💾 保存设置", type="primary"):
@@ -113,6 +121,7 @@ def main():
                 
                 save_config('LLM_CACHE', 'ENABLE_CACHE', enable_cache)
                 save_config('LLM_CACHE', 'CACHE_TTL', cache_ttl)
+                save_config('LLM_CACHE', 'MAX_SIZE_MB', cache_size)
                 
                 st.success("设置已保存！")
             except Exception as e:
@@ -126,7 +135,7 @@ def main():
                 from llm.openai_client import OpenAIClient
                 
                 client = OpenAIClient(api_key=api_key)
-                response = client.ask("这是一个API连接测试，请回复'连接成功'", model_type="inference")
+                response = client.ask("这是一个API连接测试，请回复'连接成功'", model_type="inference", use_cache=False)
                 
                 if "连接成功" in response:
                     st.success(f"API连接测试成功！响应：{response}")
@@ -16,6 +16,7 @@ from utils.format_utils import format_volume, format_market_value, format_price,
 from utils.data_formatters import get_stock_formatter
 from stock.stock_data_tools import get_stock_tools
 from stock.stock_report import generate_stock_report
+from ui.components.page_common import ai_report_stream
 
 stock_tools = get_stock_tools()
 formatter = get_stock_formatter()
@@ -442,8 +443,8 @@ def display_fundamental_analysis(stock_identity):
                              stock_code not in st.session_state.get('ai_fundamental_report', {}))
         
         if include_ai_analysis:
-            with st.spinner("🤖 AI正在进行基本面分析，请稍候..."):
-                fundamental_data = stock_tools.get_basic_info(stock_identity, use_cache=use_cache, force_refresh=force_refresh, include_ai_analysis=True)
+            with st.spinner("🤖 AI正在进行基本面分析，请稍候..."), ai_report_stream("🤖 AI 基本面分析报告") as on_delta:
+                fundamental_data = stock_tools.get_basic_info(stock_identity, use_cache=use_cache, force_refresh=force_refresh, include_ai_analysis=True, on_delta=on_delta)
         else:
             fundamental_data = stock_tools.get_basic_info(stock_identity, use_cache=use_cache, force_refresh=force_refresh)
         
@@ -504,13 +505,14 @@ def display_technical_analysis(stock_identity):
         
         # 获取K线数据
         if include_ai_analysis:
-            with st.spinner("🤖 AI正在分析股票行情，请稍候..."):
+            with st.spinner("🤖 AI正在分析股票行情，请稍候..."), ai_report_stream("🤖 AI 行情分析报告") as on_delta:
                 kline_info = stock_tools.get_stock_kline_data(
                     stock_identity, 
                     period=160, 
                     use_cache=use_cache, 
                     force_refresh=force_refresh, 
-                    include_ai_analysis=True
+                    include_ai_analysis=True,
+                    on_delta=on_delta
                 )
         else:
             kline_info = stock_tools.get_stock_kline_data(
@@ -564,8 +566,8 @@ def display_news_analysis(stock_identity):
                              stock_code not in st.session_state.get('ai_news_report', {}))
         
         if include_ai_analysis:
-            with st.spinner("🤖 AI正在分析相关新闻，请稍候..."):
-                news_info = stock_tools.get_stock_news_data(stock_identity=stock_identity, use_cache=use_cache, force_refresh=force_refresh, include_ai_analysis=True)
+            with st.spinner("🤖 AI正在分析相关新闻，请稍候..."), ai_report_stream("🤖 AI 新闻分析报告") as on_delta:
+                news_info = stock_tools.get_stock_news_data(stock_identity=stock_identity, use_cache=use_cache, force_refresh=force_refresh, include_ai_analysis=True, on_delta=on_delta)
         else:
             news_info = stock_tools.get_stock_news_data(stock_identity=stock_identity, use_cache=use_cache, force_refresh=force_refresh)
 
@@ -630,8 +632,8 @@ def display_chips_analysis(stock_identity):
                              stock_code not in st.session_state.get('ai_chip_report', {}))
         
         if include_ai_analysis:
-            with st.spinner("🤖 AI正在分析筹码分布，请稍候..."):
-                chip_data = stock_tools.get_stock_chip_data(stock_identity, use_cache=use_cache, force_refresh=force_refresh, include_ai_analysis=True)
+            with st.spinner("🤖 AI正在分析筹码分布，请稍候..."), ai_report_stream("🤖 AI 筹码分析报告") as on_delta:
+                chip_data = stock_tools.get_stock_chip_data(stock_identity, use_cache=use_cache, force_refresh=force_refresh, include_ai_analysis=True, on_delta=on_delta)
         else:
             chip_data = stock_tools.get_stock_chip_data(stock_identity, use_cache=use_cache, force_refresh=force_refresh)
         
@@ -808,13 +810,13 @@ def display_comprehensive_analysis(stock_identity):
             st.code(str(e), language="text")
 
 def run_comprehensive_analysis(stock_identity, force_refresh):
-    with st.spinner("🤖 AI正在进行综合分析..."):    
+    with st.spinner("🤖 AI正在进行综合分析..."), ai_report_stream("🤖 AI 综合分析报告") as on_delta:
         try:
             use_cache = st.session_state.get('use_cache', True)
             user_opinion = st.session_state.get('user_opinion', '')
             user_position = st.session_state.get('user_position', '不确定')
 
-            analysis_data = stock_tools.get_comprehensive_ai_analysis(stock_identity, user_opinion, user_position, use_cache=use_cache, force_refresh=force_refresh)
+            analysis_data = stock_tools.get_comprehensive_ai_analysis(stock_identity, user_opinion, user_position, use_cache=use_cache, force_refresh=force_refresh, on_delta=on_delta)
             
             if 'error' in analysis_data:
                 st.error(f"获取综合分析失败: {analysis_data['error']}")
@@ -846,12 +848,13 @@ def display_company_analysis(stock_identity):
                                    stock_code not in st.session_state.get('ai_company_report', {}))
         
         if include_company_analysis:
-            with st.spinner("🤖 AI正在进行公司分析，请稍候..."):
+            with st.spinner("🤖 AI正在进行公司分析，请稍候..."), ai_report_stream("🤖 AI 公司分析报告") as on_delta:
                 basic_info_data = stock_tools.get_basic_info(
                     stock_identity, 
                     use_cache=use_cache, 
                     force_refresh=force_refresh, 
-                    include_company_analysis=True
+                    include_company_analysis=True,
+                    on_delta=on_delta
                 )
         else:
             basic_info_data = stock_tools.get_basic_info(stock_identity, use_cache=use_cache, force_refresh=force_refresh)
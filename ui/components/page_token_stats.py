@@ -47,6 +47,45 @@ def show_usage_overview(days=30):
         avg_response_time = stats.get('avg_response_time', 0)
         st.metric("平均响应时间", f"{avg_response_time:.2f}秒")
     
+    # 响应缓存指标
+    col4, col5 = st.columns(2)
+
+    with col4:
+        st.metric("缓存命中率", f"{stats.get('cache_hit_rate', 0) * 100:.1f}%",
+                  help=f"命中 {stats.get('cache_hits', 0)} 次")
+
+    with col5:
+        st.metric("缓存节省Token数", f"{stats.get('tokens_saved', 0):,}")
+    
+    # 服务商提示词缓存指标
+    col6, col7 = st.columns(2)
+    
+    with col6:
+        st.metric("提示词缓存命中率", f"{stats.get('prompt_cache_rate', 0) * 100:.1f}%",
+                  help="输入token中命中服务商提示词缓存的比例")
+    
+    with col7:
+        st.metric("提示词缓存命中Token数", f"{stats.get('cached_tokens', 0):,}")
+    
+    prefix_stats = stats.get('prefix_cache_stats', {})
+    if prefix_stats:
+        with st.expander("按提示词前缀统计缓存命中", expanded=False):
+            prefix_df = pd.DataFrame([
+                {'fingerprint': fingerprint, **values} for fingerprint, values in prefix_stats.items()
+            ]).sort_values('prompt_tokens', ascending=False)
+            st.dataframe(
+                prefix_df,
+                width='stretch',
+                hide_index=True,
+                column_config={
+                    'fingerprint': st.column_config.TextColumn('前缀指纹'),
+                    'requests': st.column_config.NumberColumn('请求数'),
+                    'prompt_tokens': st.column_config.NumberColumn('输入Token'),
+                    'cached_tokens': st.column_config.NumberColumn('命中缓存Token'),
+                    'cache_rate': st.column_config.ProgressColumn('命中率', min_value=0, max_value=1, format="%.2f")
+                }
+            )
+
     # 成功率指标
     success_rate = stats.get('success_rate', 0) * 100
     st.progress(success_rate / 100, text=f"成功率: {success_rate:.1f}%")
@@ -100,7 +139,7 @@ def show_detailed_logs():
         
         # 显示表格
         display_cols = [
-            'timestamp', 'model', 'prompt_tokens', 
+            'timestamp', 'model', 'prompt_tokens', 'cached_tokens',
             'completion_tokens', 'total_tokens', 
             #'cost_estimate', 
             'response_time', 'success'
@@ -113,6 +152,7 @@ def show_detailed_logs():
                 'timestamp': st.column_config.DatetimeColumn('时间'),
                 'model': st.column_config.TextColumn('模型'),
                 'prompt_tokens': st.column_config.NumberColumn('输入Token'),
+                'cached_tokens': st.column_config.NumberColumn('命中缓存Token'),
                 'completion_tokens': st.column_config.NumberColumn('输出Token'),
                 'total_tokens': st.column_config.NumberColumn('总Token'),
                 'cost_estimate': st.column_config.NumberColumn('成本($)', format="$%.4f"),
@@ -137,6 +177,7 @@ def show_detailed_logs():
                 st.write("**时间:**", record['timestamp'])
                 st.write("**模型:**", record['model'])
                 st.write("**输入Token:**", record['prompt_tokens'])
+                st.write("**命中提示词缓存Token:**", record['cached_tokens'])
                 st.write("**输出Token:**", record['completion_tokens'])
                 st.write("**总Token:**", record['total_tokens'])
                 
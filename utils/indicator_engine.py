@@ -0,0 +1,566 @@
+"""
+技术指标计算引擎（NumPy）
+
+一次性从K线数据中取出连续的float64数组，在数组上计算整套指标
+（SMA、EMA、MACD、KDJ、RSI、BOLL、WR、CCI），公式与 stockstats 保持一致：
+- 滚动窗口类指标 min_periods=1，跳过缺失值
+- EMA/SMMA 为 adjust=True 的指数加权平均
+- KDJ 初始值为50，平滑系数 2/3、1/3
+
+last_only 模式只计算最新值：滚动窗口类指标只取最后 window 根K线（O(window)），
+指数加权类指标用权重向量点积代替整列递推，MACD/KDJ 的信号线仍需要完整序列。
+
+IndicatorState 保存继续计算所需的全部状态（EMA加权和、RSI平滑均值、KDJ的K/D值、
+最近的K线窗口），新增一根K线时只需常数时间更新，可序列化后保存在K线缓存旁。
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+MA_WINDOWS = (5, 10, 20, 60)
+EMA_WINDOWS = (12, 26)
+MACD_PARAMS = (12, 26, 9)
+KDJ_WINDOW = 9
+KDJ_PARAM = (2.0 / 3.0, 1.0 / 3.0)
+RSI_WINDOW = 14
+BOLL_WINDOW = 20
+BOLL_STD_TIMES = 2
+WR_WINDOW = 14
+CCI_WINDOW = 14
+
+# 完整序列的列名（与 stockstats 一致） -> get_indicators 中的指标名
+SERIES_TO_INDICATOR = {
+    **{f'close_{w}_sma': f'ma_{w}' for w in MA_WINDOWS},
+    **{f'close_{w}_ema': f'ema_{w}' for w in EMA_WINDOWS},
+    'macd': 'macd',
+    'macds': 'macd_signal',
+    'macdh': 'macd_histogram',
+    'kdjk': 'kdj_k',
+    'kdjd': 'kdj_d',
+    'kdjj': 'kdj_j',
+    f'rsi_{RSI_WINDOW}': f'rsi_{RSI_WINDOW}',
+    'boll_ub': 'boll_upper',
+    'boll': 'boll_middle',
+    'boll_lb': 'boll_lower',
+    f'wr_{WR_WINDOW}': f'wr_{WR_WINDOW}',
+    f'cci_{CCI_WINDOW}': f'cci_{CCI_WINDOW}',
+}
+
+# 各指标需要的最少K线数量（超过该数量才输出）
+INDICATOR_MIN_LENGTH = {
+    'ma_5': 5, 'ma_10': 10, 'ma_20': 20, 'ma_60': 60,
+    'ema_12': 12, 'ema_26': 26,
+    'macd': 26, 'macd_signal': 26, 'macd_histogram': 26,
+    'kdj_k': 9, 'kdj_d': 9, 'kdj_j': 9,
+    'rsi_14': 14,
+    'boll_upper': 20, 'boll_middle': 20, 'boll_lower': 20,
+    'wr_14': 14,
+    'cci_14': 14,
+}
+
+
+# ----------------------------------------------------------------------
+# 基础数组运算
+# ----------------------------------------------------------------------
+def _windows(x: np.ndarray, window: int) -> np.ndarray:
+    """沿最后一维前补NaN后的滑动窗口视图，[..., i, :] 是以 x[..., i] 结尾的窗口"""
+    pad = np.full(x.shape[:-1] + (window - 1,), np.nan)
+    padded = np.concatenate([pad, x], axis=-1)
+    return sliding_window_view(padded, window, axis=-1)
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """滚动均值（min_periods=1，跳过NaN），沿最后一维计算"""
+    sw = _windows(x, window)
+    valid = ~np.isnan(sw)
+    count = valid.sum(axis=-1)
+    total = np.where(valid, sw, 0.0).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """滚动样本标准差（ddof=1，min_periods=1，跳过NaN），沿最后一维计算"""
+    sw = _windows(x, window)
+    valid = ~np.isnan(sw)
+    count = valid.sum(axis=-1)
+    mean = rolling_mean(x, window)
+    sq = np.where(valid, (sw - mean[..., None]) ** 2, 0.0).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 1, np.sqrt(sq / (count - 1)), np.nan)
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    return np.fmin.reduce(_windows(x, window), axis=-1)
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    return np.fmax.reduce(_windows(x, window), axis=-1)
+
+
+def rolling_mad(x: np.ndarray, window: int) -> np.ndarray:
+    """滚动平均绝对偏差：不足一个窗口时为0，数据总长度小于窗口时全部为NaN"""
+    n = x.shape[-1]
+    if window > n:
+        return np.full(x.shape, np.nan)
+    sw = sliding_window_view(x, window, axis=-1)
+    out = np.zeros(x.shape)
+    out[..., window - 1:] = np.abs(sw - sw.mean(axis=-1, keepdims=True)).mean(axis=-1)
+    return out
+
+
+def _tail_mean(tail: np.ndarray) -> float:
+    """窗口最后一个位置的滚动均值（跳过NaN）"""
+    valid = tail[~np.isnan(tail)]
+    return valid.mean() if len(valid) else np.nan
+
+
+def _tail_std(tail: np.ndarray) -> float:
+    """窗口最后一个位置的滚动样本标准差（ddof=1，跳过NaN）"""
+    valid = tail[~np.isnan(tail)]
+    if len(valid) < 2:
+        return np.nan
+    return np.sqrt(((valid - valid.mean()) ** 2).sum() / (len(valid) - 1))
+
+
+def linear_recurrence(x: np.ndarray, beta: float, init: float = 0.0) -> np.ndarray:
+    """
+    沿最后一维求解 y[t] = beta * y[t-1] + x[t]，y[-1] = init
+
+    按块向量化：块内 y[s+k] = beta^k * (beta * y[s-1] + Σ x[s+j] * beta^-j)，
+    块长保证 beta^-k 不溢出，Python 层循环次数为 n / 块长。
+    """
+    n = x.shape[-1]
+    out = np.empty(x.shape)
+    block = max(1, int(30.0 / -np.log(beta)))
+    powers = beta ** np.arange(block)
+    inv_powers = 1.0 / powers
+    carry = np.full(x.shape[:-1], init, dtype=float)
+    for start in range(0, n, block):
+        seg = x[..., start:start + block]
+        m = seg.shape[-1]
+        y = powers[:m] * (beta * carry[..., None] + np.cumsum(seg * inv_powers[:m], axis=-1))
+        out[..., start:start + m] = y
+        carry = y[..., -1]
+    return out
+
+
+def _ewm_beta(span: Optional[int] = None, alpha: Optional[float] = None) -> float:
+    return 1.0 - (alpha if alpha is not None else 2.0 / (span + 1))
+
+
+def ewm_mean(x: np.ndarray, beta: float) -> np.ndarray:
+    """adjust=True 的指数加权平均（ignore_na=False，min_periods=1）"""
+    valid = ~np.isnan(x)
+    num = linear_recurrence(np.where(valid, x, 0.0), beta)
+    den = linear_recurrence(valid.astype(float), beta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def ewm_mean_last(x: np.ndarray, beta: float) -> float:
+    """adjust=True 的指数加权平均的最新值：一次权重点积，不生成整列"""
+    if len(x) == 0:
+        return np.nan
+    valid = ~np.isnan(x)
+    weights = beta ** np.arange(len(x) - 1, -1, -1, dtype=float)
+    den = weights @ valid
+    return float(weights @ np.where(valid, x, 0.0) / den) if den > 0 else np.nan
+
+
+def _safe_divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """除数为0时结果为0，NaN/inf 按 nan_to_num 处理（与 stockstats 一致）"""
+    out = np.zeros_like(a, dtype=float)
+    np.divide(a, b, out=out, where=b != 0)
+    np.nan_to_num(out, copy=False)
+    return out
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    return np.ascontiguousarray(pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float, na_value=np.nan))
+
+
+class IndicatorEngine:
+    """在K线数组上计算整套技术指标"""
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Args:
+            df: 包含 close/high/low 列的K线数据（可选 volume/amount），按时间升序
+        """
+        self.close = _column(df, 'close')
+        self.high = _column(df, 'high')
+        self.low = _column(df, 'low')
+        # 典型价格：与 stockstats 一致，有成交额列时为 成交额/成交量，否则为 (高+低+收)/3
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if 'amount' in df.columns and 'volume' in df.columns:
+                tp = _column(df, 'amount') / _column(df, 'volume')
+            else:
+                tp = (self.close + self.high + self.low) / 3.0
+        self.tp = np.where(np.isnan(tp), 0.0, tp)
+        self.use_amount = 'amount' in df.columns and 'volume' in df.columns
+
+    def __len__(self):
+        return len(self.close)
+
+    def _rsv(self) -> np.ndarray:
+        low_min = rolling_min(self.low, KDJ_WINDOW)
+        high_max = rolling_max(self.high, KDJ_WINDOW)
+        return _safe_divide(self.close - low_min, high_max - low_min) * 100
+
+    def _rsi_parts(self):
+        diff = np.zeros_like(self.close)
+        diff[1:] = np.diff(self.close)
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+        return up, down
+
+    @staticmethod
+    def _rsi_value(up_sma, down_sma):
+        total = up_sma + down_sma
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total != 0, 100 * (up_sma / total), 50.0)
+
+    def compute_series(self) -> Dict[str, np.ndarray]:
+        """计算完整指标序列，键名与 stockstats 列名一致"""
+        result = {}
+        close = self.close
+        for w in MA_WINDOWS:
+            result[f'close_{w}_sma'] = rolling_mean(close, w)
+        for w in EMA_WINDOWS:
+            result[f'close_{w}_ema'] = ewm_mean(close, _ewm_beta(span=w))
+
+        short_w, long_w, signal_w = MACD_PARAMS
+        macd = result[f'close_{short_w}_ema'] - result[f'close_{long_w}_ema']
+        macds = ewm_mean(macd, _ewm_beta(span=signal_w))
+        result.update({'macd': macd, 'macds': macds, 'macdh': macd - macds})
+
+        smooth, weight = KDJ_PARAM
+        kdjk = linear_recurrence(weight * self._rsv(), smooth, init=50.0)
+        kdjd = linear_recurrence(weight * kdjk, smooth, init=50.0)
+        result.update({'kdjk': kdjk, 'kdjd': kdjd, 'kdjj': 3 * kdjk - 2 * kdjd})
+
+        if len(close):
+            up, down = self._rsi_parts()
+            beta = _ewm_beta(alpha=1.0 / RSI_WINDOW)
+            rsi = self._rsi_value(ewm_mean(up, beta), ewm_mean(down, beta))
+            rsi[0] = 50.0
+            result[f'rsi_{RSI_WINDOW}'] = np.nan_to_num(rsi, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        else:
+            result[f'rsi_{RSI_WINDOW}'] = np.empty(0)
+
+        boll = rolling_mean(close, BOLL_WINDOW)
+        width = BOLL_STD_TIMES * rolling_std(close, BOLL_WINDOW)
+        result.update({'boll': boll, 'boll_ub': boll + width, 'boll_lb': boll - width})
+
+        ln = rolling_min(self.low, WR_WINDOW)
+        hn = rolling_max(self.high, WR_WINDOW)
+        hn_ln = hn - ln
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[f'wr_{WR_WINDOW}'] = np.where(hn_ln != 0, (hn - close) / hn_ln, 0.0) * -100
+
+        divisor = 0.015 * rolling_mad(self.tp, CCI_WINDOW)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[f'cci_{CCI_WINDOW}'] = np.where(
+                divisor != 0, (self.tp - rolling_mean(self.tp, CCI_WINDOW)) / divisor, 0.0)
+        return result
+
+    def compute_latest(self) -> Dict[str, float]:
+        """只计算各指标的最新值，键名与 get_indicators 一致"""
+        return IndicatorState.from_engine(self).values()
+
+    def compute(self, last_only: bool = True) -> Dict[str, float]:
+        """
+        计算指标最新值
+
+        Args:
+            last_only: True 时只计算最新值；False 时计算完整序列后取最后一个值
+        """
+        if last_only:
+            return self.compute_latest()
+        series = self.compute_series()
+        latest = {name: float(series[col][-1]) if len(self) else np.nan
+                  for col, name in SERIES_TO_INDICATOR.items()}
+        latest['close'] = float(self.close[-1]) if len(self) else np.nan
+        return latest
+
+
+def compute_indicators(df: pd.DataFrame, last_only: bool = True) -> Dict[str, float]:
+    """计算K线数据的技术指标最新值"""
+    return IndicatorEngine(df).compute(last_only=last_only)
+
+
+# ----------------------------------------------------------------------
+# 增量指标状态
+# ----------------------------------------------------------------------
+STATE_VERSION = 1
+CLOSE_WINDOW = max(MA_WINDOWS + (BOLL_WINDOW,))
+HIGH_LOW_WINDOW = max(KDJ_WINDOW, WR_WINDOW)
+
+
+def _ewm_pair(x: np.ndarray, beta: float) -> List[float]:
+    """adjust=True 指数加权平均的 [加权和, 权重和]"""
+    valid = ~np.isnan(x)
+    weights = beta ** np.arange(len(x) - 1, -1, -1, dtype=float)
+    return [float(weights @ np.where(valid, x, 0.0)), float(weights @ valid)]
+
+
+def _ewm_step(pair: List[float], beta: float, value: float):
+    valid = not np.isnan(value)
+    pair[0] = beta * pair[0] + (value if valid else 0.0)
+    pair[1] = beta * pair[1] + (1.0 if valid else 0.0)
+
+
+def _pair_mean(pair: List[float]) -> float:
+    return pair[0] / pair[1] if pair[1] > 0 else np.nan
+
+
+class IndicatorState:
+    """可增量更新的指标状态，values() 与 IndicatorEngine.compute_latest() 结果一致"""
+
+    def __init__(self, use_amount: bool = False):
+        self.use_amount = use_amount
+        self.count = 0
+        self.first_datetime: Optional[str] = None
+        self.last_datetime: Optional[str] = None
+        self.ema = {w: [0.0, 0.0] for w in EMA_WINDOWS}
+        self.macds = [0.0, 0.0]
+        self.kdj = [50.0, 50.0]
+        self.rsi = [0.0, 0.0, 0.0]  # 上涨加权和、下跌加权和、权重和
+        self.prev_close = np.nan
+        self.closes = deque(maxlen=CLOSE_WINDOW)
+        self.highs = deque(maxlen=HIGH_LOW_WINDOW)
+        self.lows = deque(maxlen=HIGH_LOW_WINDOW)
+        self.tps = deque(maxlen=CCI_WINDOW)
+
+    @classmethod
+    def from_engine(cls, engine: IndicatorEngine, datetimes: Optional[List[str]] = None) -> 'IndicatorState':
+        """从完整K线数组一次性（向量化）构建状态"""
+        state = cls(use_amount=engine.use_amount)
+        n = len(engine)
+        if n == 0:
+            return state
+
+        close = engine.close
+        state.count = n
+        if datetimes:
+            state.first_datetime, state.last_datetime = datetimes[0], datetimes[-1]
+
+        short_w, long_w, signal_w = MACD_PARAMS
+        ema = {w: ewm_mean(close, _ewm_beta(span=w)) for w in (short_w, long_w)}
+        for w in EMA_WINDOWS:
+            state.ema[w] = _ewm_pair(close, _ewm_beta(span=w))
+        state.macds = _ewm_pair(ema[short_w] - ema[long_w], _ewm_beta(span=signal_w))
+
+        smooth, weight = KDJ_PARAM
+        kdjk = linear_recurrence(weight * engine._rsv(), smooth, init=50.0)
+        # D = 50 * smooth^n + Σ smooth^(n-1-i) * weight * K[i]
+        kdjd = 50.0 * smooth ** n + (smooth ** np.arange(n - 1, -1, -1, dtype=float)) @ (weight * kdjk)
+        state.kdj = [float(kdjk[-1]), float(kdjd)]
+
+        up, down = engine._rsi_parts()
+        beta = _ewm_beta(alpha=1.0 / RSI_WINDOW)
+        up_pair, down_pair = _ewm_pair(up, beta), _ewm_pair(down, beta)
+        state.rsi = [up_pair[0], down_pair[0], up_pair[1]]
+
+        state.prev_close = float(close[-1])
+        state.closes.extend(close[-CLOSE_WINDOW:].tolist())
+        state.highs.extend(engine.high[-HIGH_LOW_WINDOW:].tolist())
+        state.lows.extend(engine.low[-HIGH_LOW_WINDOW:].tolist())
+        state.tps.extend(engine.tp[-CCI_WINDOW:].tolist())
+        return state
+
+    def update(self, close: float, high: float, low: float, tp: float, dt: Optional[str] = None):
+        """追加一根K线，常数时间更新所有指标状态"""
+        self.closes.append(close)
+        self.highs.append(high)
+        self.lows.append(low)
+        self.tps.append(0.0 if np.isnan(tp) else tp)
+
+        for w in EMA_WINDOWS:
+            _ewm_step(self.ema[w], _ewm_beta(span=w), close)
+        short_w, long_w, signal_w = MACD_PARAMS
+        _ewm_step(self.macds, _ewm_beta(span=signal_w), _pair_mean(self.ema[short_w]) - _pair_mean(self.ema[long_w]))
+
+        low_min = np.fmin.reduce(list(self.lows)[-KDJ_WINDOW:])
+        high_max = np.fmax.reduce(list(self.highs)[-KDJ_WINDOW:])
+        rsv = _safe_divide(np.array([close - low_min]), np.array([high_max - low_min]))[0] * 100
+        smooth, weight = KDJ_PARAM
+        k = smooth * self.kdj[0] + weight * rsv
+        self.kdj = [k, smooth * self.kdj[1] + weight * k]
+
+        diff = close - self.prev_close if self.count > 0 else 0.0
+        beta = _ewm_beta(alpha=1.0 / RSI_WINDOW)
+        self.rsi = [beta * self.rsi[0] + (diff if diff > 0 else 0.0),
+                    beta * self.rsi[1] + (-diff if diff < 0 else 0.0),
+                    beta * self.rsi[2] + 1.0]
+
+        self.prev_close = close
+        self.count += 1
+        self.last_datetime = dt
+        if self.first_datetime is None:
+            self.first_datetime = dt
+
+    def values(self) -> Dict[str, float]:
+        """各指标最新值，键名与 get_indicators 一致"""
+        if self.count == 0:
+            return {name: np.nan for name in list(SERIES_TO_INDICATOR.values()) + ['close']}
+
+        closes = np.array(self.closes, dtype=float)
+        highs = np.array(self.highs, dtype=float)
+        lows = np.array(self.lows, dtype=float)
+        tps = np.array(self.tps, dtype=float)
+        latest = {}
+
+        # 滚动窗口类：只需最后 window 根K线
+        for w in MA_WINDOWS:
+            latest[f'ma_{w}'] = _tail_mean(closes[-w:])
+
+        for w in EMA_WINDOWS:
+            latest[f'ema_{w}'] = _pair_mean(self.ema[w])
+        short_w, long_w, _ = MACD_PARAMS
+        macd = _pair_mean(self.ema[short_w]) - _pair_mean(self.ema[long_w])
+        macds = _pair_mean(self.macds)
+        latest.update({'macd': macd, 'macd_signal': macds, 'macd_histogram': macd - macds})
+
+        k, d = self.kdj
+        latest.update({'kdj_k': k, 'kdj_d': d, 'kdj_j': 3 * k - 2 * d})
+
+        if self.count == 1:
+            latest[f'rsi_{RSI_WINDOW}'] = 50.0
+        else:
+            rsi = self._rsi_value_of(self.rsi)
+            latest[f'rsi_{RSI_WINDOW}'] = 0.0 if np.isnan(rsi) else rsi
+
+        tail = closes[-BOLL_WINDOW:]
+        boll = _tail_mean(tail)
+        width = BOLL_STD_TIMES * _tail_std(tail)
+        latest.update({'boll_upper': boll + width, 'boll_middle': boll, 'boll_lower': boll - width})
+
+        hn = np.fmax.reduce(highs[-WR_WINDOW:])
+        ln = np.fmin.reduce(lows[-WR_WINDOW:])
+        hn_ln = hn - ln
+        latest[f'wr_{WR_WINDOW}'] = ((hn - closes[-1]) / hn_ln if hn_ln != 0 else 0.0) * -100
+
+        if self.count < CCI_WINDOW:
+            latest[f'cci_{CCI_WINDOW}'] = np.nan
+        else:
+            tp_sma = tps.mean()
+            divisor = 0.015 * np.abs(tps - tp_sma).mean()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                latest[f'cci_{CCI_WINDOW}'] = (tps[-1] - tp_sma) / divisor if divisor != 0 else 0.0
+
+        latest['close'] = closes[-1]
+        return {key: float(value) for key, value in latest.items()}
+
+    @staticmethod
+    def _rsi_value_of(rsi_state: List[float]) -> float:
+        up_sum, down_sum, weight_sum = rsi_state
+        return float(IndicatorEngine._rsi_value(up_sum / weight_sum, down_sum / weight_sum))
+
+    def resume_position(self, engine: IndicatorEngine, datetimes: List[str]) -> Optional[int]:
+        """
+        状态能否在给定K线上继续更新
+
+        Returns:
+            第一根新增K线的位置；状态的最后一根K线不在数据中，或最近的K线与状态不一致
+            （历史数据被修订，如复权）时返回None，需要从头重算
+        """
+        if self.count == 0 or self.last_datetime is None or engine.use_amount != self.use_amount:
+            return None
+        for idx in range(len(datetimes) - 1, -1, -1):
+            if datetimes[idx] == self.last_datetime:
+                break
+        else:
+            return None
+
+        for saved, current in ((self.closes, engine.close), (self.highs, engine.high),
+                               (self.lows, engine.low), (self.tps, engine.tp)):
+            m = min(len(saved), idx + 1)
+            if not np.allclose(np.array(saved, dtype=float)[-m:], current[idx + 1 - m:idx + 1],
+                               rtol=1e-9, atol=1e-12, equal_nan=True):
+                return None
+        return idx + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': STATE_VERSION,
+            'use_amount': self.use_amount,
+            'count': self.count,
+            'first_datetime': self.first_datetime,
+            'last_datetime': self.last_datetime,
+            'ema': {str(w): pair for w, pair in self.ema.items()},
+            'macds': self.macds,
+            'kdj': self.kdj,
+            'rsi': self.rsi,
+            'prev_close': self.prev_close,
+            'closes': list(self.closes),
+            'highs': list(self.highs),
+            'lows': list(self.lows),
+            'tps': list(self.tps),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IndicatorState':
+        if data.get('version') != STATE_VERSION:
+            raise ValueError(f"指标状态版本不兼容: {data.get('version')}")
+        state = cls(use_amount=data['use_amount'])
+        state.count = data['count']
+        state.first_datetime = data['first_datetime']
+        state.last_datetime = data['last_datetime']
+        state.ema = {int(w): list(pair) for w, pair in data['ema'].items()}
+        state.macds = list(data['macds'])
+        state.kdj = list(data['kdj'])
+        state.rsi = list(data['rsi'])
+        state.prev_close = data['prev_close']
+        state.closes.extend(data['closes'])
+        state.highs.extend(data['highs'])
+        state.lows.extend(data['lows'])
+        state.tps.extend(data['tps'])
+        return state
+
+
+def compute_indicators_incremental(df: pd.DataFrame, symbol: str, kline_type) -> Dict[str, float]:
+    """
+    增量计算指标最新值：从K线缓存旁保存的状态继续，只处理新增的K线
+
+    状态从首次计算时的第一根K线开始累积，之后窗口滑动不会重置状态，
+    因此指数加权类指标（EMA/MACD/RSI/KDJ）包含更长的历史，与只用当前窗口
+    重新计算的结果有极小差异（权重衰减到 1e-5 以下的部分）。
+    数据中找不到状态的最后一根K线，或最近的K线与状态不一致时，从头重算。
+
+    Args:
+        df: 包含 datetime 列、按时间升序的K线数据
+        symbol: 股票代码或指数名称
+        kline_type: K线类型（KLineType）
+    """
+    from utils.kline_cache import cache_manager
+
+    engine = IndicatorEngine(df)
+    datetimes = df['datetime'].astype(str).tolist()
+
+    state = None
+    saved = cache_manager.load_indicator_state(symbol, kline_type)
+    if saved:
+        try:
+            state = IndicatorState.from_dict(saved)
+        except Exception as e:
+            print(f"⚠️  指标状态无法读取，重新计算: {symbol} {e}")
+
+    start = state.resume_position(engine, datetimes) if state is not None else None
+    if start is None:
+        state = IndicatorState.from_engine(engine, datetimes)
+        changed = True
+    else:
+        for i in range(start, len(datetimes)):
+            state.update(engine.close[i], engine.high[i], engine.low[i], engine.tp[i], datetimes[i])
+        changed = start < len(datetimes)
+
+    if changed:
+        cache_manager.save_indicator_state(symbol, kline_type, state.to_dict())
+    return state.values()
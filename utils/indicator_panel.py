@@ -0,0 +1,292 @@
+"""
+多股票面板指标计算
+
+把多只股票的K线整理成 (股票数 × K线数) 的二维数组，每只股票的K线从第0列开始
+左对齐，不足的位置为NaN。技术指标和风险指标按行向量化计算，一次得到全部股票的结果，
+结果与逐只调用 get_indicators / calculate_portfolio_risk_summary 一致。
+
+- 指数加权类指标（EMA/MACD/KDJ/RSI）在整个二维数组上递推，再取每行最后一根K线
+- 滚动窗口类指标（MA/BOLL/WR/CCI）只取每行最后 window 根K线
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.indicator_engine import (
+    BOLL_STD_TIMES, BOLL_WINDOW, CCI_WINDOW, INDICATOR_MIN_LENGTH, KDJ_PARAM, KDJ_WINDOW, MA_WINDOWS,
+    MACD_PARAMS, RSI_WINDOW, WR_WINDOW, EMA_WINDOWS, _ewm_beta, _safe_divide, ewm_mean, linear_recurrence,
+    rolling_max, rolling_min,
+)
+
+TRADING_DAYS_PER_YEAR = 252
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+
+@dataclass
+class KLinePanel:
+    """左对齐的多股票K线面板"""
+    symbols: np.ndarray
+    lengths: np.ndarray                  # 每只股票的K线数量
+    fields: Dict[str, np.ndarray]        # 字段名 -> (股票数, K线数) 数组
+    last_dates: Optional[np.ndarray] = None
+
+    @property
+    def shape(self):
+        return self.fields['close'].shape
+
+    @classmethod
+    def from_long_frame(cls, df: pd.DataFrame, symbol_col: str = 'symbol', date_col: str = 'datetime',
+                        fields: Sequence[str] = PANEL_FIELDS) -> 'KLinePanel':
+        """
+        从长格式（每行一只股票的一根K线）构建面板
+
+        Args:
+            df: 包含 symbol_col、date_col 和 OHLCV 列的DataFrame
+        """
+        ordered = df.sort_values([symbol_col, date_col], kind='stable')
+        codes, symbols = pd.factorize(ordered[symbol_col], sort=True)
+        positions = ordered.groupby(codes, sort=False).cumcount().to_numpy()
+        lengths = np.bincount(codes, minlength=len(symbols))
+        shape = (len(symbols), int(lengths.max()) if len(lengths) else 0)
+
+        arrays = {}
+        for name in fields:
+            if name not in ordered.columns:
+                continue
+            arr = np.full(shape, np.nan)
+            arr[codes, positions] = pd.to_numeric(ordered[name], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            arrays[name] = arr
+
+        last_dates = ordered.groupby(codes, sort=True)[date_col].last().to_numpy()
+        return cls(symbols=np.asarray(symbols), lengths=lengths, fields=arrays, last_dates=last_dates)
+
+    @classmethod
+    def from_arrays(cls, close: np.ndarray, high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None,
+                    volume: Optional[np.ndarray] = None, amount: Optional[np.ndarray] = None,
+                    symbols: Optional[Sequence[str]] = None) -> 'KLinePanel':
+        """
+        从二维数组构建面板：每行一只股票、按时间升序左对齐，末尾不足部分为NaN
+        未提供 high/low 时使用收盘价
+        """
+        close = np.asarray(close, dtype=float)
+        has_value = ~np.isnan(close)
+        lengths = np.where(has_value.any(axis=1), close.shape[1] - np.argmax(has_value[:, ::-1], axis=1), 0)
+        arrays = {'close': close,
+                  'high': np.asarray(high, dtype=float) if high is not None else close,
+                  'low': np.asarray(low, dtype=float) if low is not None else close}
+        if volume is not None:
+            arrays['volume'] = np.asarray(volume, dtype=float)
+        if amount is not None:
+            arrays['amount'] = np.asarray(amount, dtype=float)
+        if symbols is None:
+            symbols = [str(i) for i in range(close.shape[0])]
+        return cls(symbols=np.asarray(symbols), lengths=lengths, fields=arrays)
+
+
+def _last(arr: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """取每行最后一根有效K线位置的值"""
+    idx = np.clip(lengths - 1, 0, None)
+    out = arr[np.arange(arr.shape[0]), idx]
+    return np.where(lengths > 0, out, np.nan)
+
+
+def _tails(arr: np.ndarray, lengths: np.ndarray, window: int) -> np.ndarray:
+    """取每行最后 window 根K线，不足的位置为NaN，形状 (股票数, window)"""
+    idx = lengths[:, None] - window + np.arange(window)
+    values = np.take_along_axis(arr, np.clip(idx, 0, max(arr.shape[1] - 1, 0)), axis=1)
+    return np.where(idx >= 0, values, np.nan)
+
+
+def _nan_mean(tails: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(tails)
+    count = valid.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 0, np.where(valid, tails, 0.0).sum(axis=1) / count, np.nan)
+
+
+def _nan_std(tails: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(tails)
+    count = valid.sum(axis=1)
+    dev = np.where(valid, tails - _nan_mean(tails)[:, None], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count > 1, np.sqrt((dev ** 2).sum(axis=1) / (count - 1)), np.nan)
+
+
+def compute_panel_indicators(panel: KLinePanel) -> pd.DataFrame:
+    """计算面板中所有股票的技术指标最新值，列名与 get_indicators 一致"""
+    close, high, low = panel.fields['close'], panel.fields['high'], panel.fields['low']
+    lengths = panel.lengths
+    out: Dict[str, np.ndarray] = {}
+
+    for w in MA_WINDOWS:
+        out[f'ma_{w}'] = _nan_mean(_tails(close, lengths, w))
+
+    short_w, long_w, signal_w = MACD_PARAMS
+    ema = {w: ewm_mean(close, _ewm_beta(span=w)) for w in set(EMA_WINDOWS) | {short_w, long_w}}
+    for w in EMA_WINDOWS:
+        out[f'ema_{w}'] = _last(ema[w], lengths)
+    macd = ema[short_w] - ema[long_w]
+    macds = ewm_mean(macd, _ewm_beta(span=signal_w))
+    out['macd'] = _last(macd, lengths)
+    out['macd_signal'] = _last(macds, lengths)
+    out['macd_histogram'] = out['macd'] - out['macd_signal']
+
+    smooth, weight = KDJ_PARAM
+    low_min = rolling_min(low, KDJ_WINDOW)
+    high_max = rolling_max(high, KDJ_WINDOW)
+    rsv = _safe_divide(close - low_min, high_max - low_min) * 100
+    kdjk = linear_recurrence(weight * rsv, smooth, init=50.0)
+    kdjd = linear_recurrence(weight * kdjk, smooth, init=50.0)
+    out['kdj_k'] = _last(kdjk, lengths)
+    out['kdj_d'] = _last(kdjd, lengths)
+    out['kdj_j'] = 3 * out['kdj_k'] - 2 * out['kdj_d']
+
+    diff = np.zeros_like(close)
+    diff[:, 1:] = np.diff(close, axis=1)
+    beta = _ewm_beta(alpha=1.0 / RSI_WINDOW)
+    up = _last(ewm_mean(np.where(diff > 0, diff, 0.0), beta), lengths)
+    down = _last(ewm_mean(np.where(diff < 0, -diff, 0.0), beta), lengths)
+    total = up + down
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(total != 0, 100 * (up / total), 50.0)
+    rsi = np.where(lengths == 1, 50.0, rsi)
+    out[f'rsi_{RSI_WINDOW}'] = np.where(np.isnan(rsi), 0.0, rsi)
+
+    boll_tail = _tails(close, lengths, BOLL_WINDOW)
+    boll = _nan_mean(boll_tail)
+    width = BOLL_STD_TIMES * _nan_std(boll_tail)
+    out.update({'boll_upper': boll + width, 'boll_middle': boll, 'boll_lower': boll - width})
+
+    hn = np.fmax.reduce(_tails(high, lengths, WR_WINDOW), axis=1)
+    ln = np.fmin.reduce(_tails(low, lengths, WR_WINDOW), axis=1)
+    last_close = _last(close, lengths)
+    hn_ln = hn - ln
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[f'wr_{WR_WINDOW}'] = np.where(hn_ln != 0, (hn - last_close) / hn_ln, 0.0) * -100
+
+    # 典型价格：与单只股票的计算一致，有成交额时为 成交额/成交量；
+    # 长格式数据中没有成交额的股票（整行为NaN）使用 (高+低+收)/3
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tp = (close + high + low) / 3.0
+        if 'amount' in panel.fields and 'volume' in panel.fields:
+            has_amount = (~np.isnan(panel.fields['amount'])).any(axis=1)
+            tp = np.where(has_amount[:, None], panel.fields['amount'] / panel.fields['volume'], tp)
+    tp_tail = np.nan_to_num(_tails(np.where(np.isnan(tp), 0.0, tp), lengths, CCI_WINDOW), nan=0.0)
+    tp_sma = tp_tail.mean(axis=1)
+    divisor = 0.015 * np.abs(tp_tail - tp_sma[:, None]).mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cci = np.where(divisor != 0, (tp_tail[:, -1] - tp_sma) / divisor, 0.0)
+    out[f'cci_{CCI_WINDOW}'] = np.where(lengths >= CCI_WINDOW, cci, np.nan)
+
+    result = pd.DataFrame(index=pd.Index(panel.symbols, name='symbol'))
+    result['bars'] = lengths
+    if panel.last_dates is not None:
+        result['last_date'] = panel.last_dates
+    result['close'] = last_close
+    for name, min_length in INDICATOR_MIN_LENGTH.items():
+        result[name] = np.where(lengths > min_length, out[name], np.nan)
+
+    # 趋势判断（与 get_indicators 一致，使用不受长度限制的原始值）
+    ma5, ma10, ma20 = out['ma_5'], out['ma_10'], out['ma_20']
+    result['ma_trend'] = np.select(
+        [np.isnan(last_close), (last_close > ma5) & (ma5 > ma10) & (ma10 > ma20),
+         (last_close < ma5) & (ma5 < ma10) & (ma10 < ma20)],
+        ['无法判断', '多头排列', '空头排列'], default='震荡整理')
+    m, s, h = out['macd'], out['macd_signal'], out['macd_histogram']
+    result['macd_trend'] = np.select(
+        [np.isnan(m), (m > s) & (h > 0), (m < s) & (h < 0)],
+        ['无法判断', '金叉向上', '死叉向下'], default='震荡调整')
+    return result
+
+
+def _compact_valid(arr: np.ndarray) -> np.ndarray:
+    """把每行的非NaN值移到左侧（保持顺序），相当于逐行 dropna"""
+    order = np.argsort(np.isnan(arr), axis=1, kind='stable')
+    return np.take_along_axis(arr, order, axis=1)
+
+
+def compute_panel_risk(panel: KLinePanel, confidence_level: float = 0.05,
+                       risk_free_rate: float = 0.03, min_prices: int = 5) -> pd.DataFrame:
+    """
+    计算面板中所有股票的风险指标，与 calculate_portfolio_risk_summary 的统计口径一致
+    价格数据少于 min_prices 个的股票结果为NaN
+    """
+    prices = _compact_valid(panel.fields['close'])
+    n_prices = (~np.isnan(prices)).sum(axis=1)
+    annual = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[:, 1:] / prices[:, :-1] - 1
+    n_returns = np.clip(n_prices - 1, 0, None)
+    valid = np.arange(returns.shape[1])[None, :] < n_returns[:, None]
+    returns = np.where(valid, returns, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = valid.sum(axis=1)
+        mean = np.where(count > 0, np.where(valid, returns, 0.0).sum(axis=1) / count, np.nan)
+        dev = np.where(valid, returns - mean[:, None], 0.0)
+        std = np.where(count > 1, np.sqrt((dev ** 2).sum(axis=1) / (count - 1)), np.nan)
+
+        # 最大回撤：累计净值相对历史最高点的最大跌幅
+        growth = np.cumprod(np.where(valid, 1 + returns, 1.0), axis=1)
+        drawdown = growth / np.maximum.accumulate(growth, axis=1) - 1
+        max_drawdown = np.where(count > 0, np.where(valid, drawdown, np.inf).min(axis=1), np.nan)
+
+        var = np.full(len(count), np.nan)
+        has_returns = count > 0
+        if has_returns.any():
+            var[has_returns] = np.nanpercentile(returns[has_returns], confidence_level * 100, axis=1)
+        tail = valid & (returns <= var[:, None])
+        cvar = np.where(tail.any(axis=1), np.where(tail, returns, 0.0).sum(axis=1) / tail.sum(axis=1), np.nan)
+
+        recent = _tails(returns, n_returns, 20)
+        recent_std = np.where(count >= 20, _nan_std(recent), std)
+
+        first, last = prices[:, 0], _last(prices, n_prices)
+        price_change = (last - first) / first
+        annual_volatility = std * annual
+        sharpe = (mean - risk_free_rate / TRADING_DAYS_PER_YEAR) / std * annual
+        positive_ratio = np.where(count > 0, (np.where(valid, returns, 0.0) > 0).sum(axis=1) / count, np.nan)
+
+    result = pd.DataFrame({
+        'price_change_pct': price_change * 100,
+        'annual_volatility': annual_volatility,
+        'recent_volatility': recent_std * annual,
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe,
+        'var_5pct': var,
+        'cvar_5pct': cvar,
+        'daily_return_mean': mean,
+        'daily_return_std': std,
+        'positive_days_ratio': positive_ratio,
+        'max_single_day_gain': np.where(count > 0, np.fmax.reduce(returns, axis=1), np.nan),
+        'max_single_day_loss': np.where(count > 0, np.fmin.reduce(returns, axis=1), np.nan),
+    }, index=pd.Index(panel.symbols, name='symbol'))
+
+    result['risk_level'] = np.select(
+        [(annual_volatility > 0.3) | (np.abs(max_drawdown) > 0.2),
+         (annual_volatility > 0.2) | (np.abs(max_drawdown) > 0.1)],
+        ['high', 'medium'], default='low')
+
+    insufficient = n_prices < min_prices
+    result.loc[insufficient, :] = np.nan
+    return result
+
+
+def compute_panel(data, symbol_col: str = 'symbol', date_col: str = 'datetime',
+                  include_risk: bool = True, **risk_kwargs) -> pd.DataFrame:
+    """
+    一次计算多只股票的技术指标和风险指标，返回每只股票一行的结果表
+
+    Args:
+        data: 长格式K线DataFrame（symbol, datetime, OHLCV）或 KLinePanel
+        include_risk: 是否同时计算风险指标
+    """
+    panel = data if isinstance(data, KLinePanel) else KLinePanel.from_long_frame(data, symbol_col, date_col)
+    result = compute_panel_indicators(panel)
+    if include_risk:
+        result = result.join(compute_panel_risk(panel, **risk_kwargs))
+    return result
@@ -1,12 +1,17 @@
-"""基于CSV的K线数据缓存管理器，支持智能缓存策略：历史数据永久保存，近期数据智能过期"""
+"""K线数据缓存管理器，按股票分区的列式存储，支持智能缓存策略：历史数据永久保存，近期数据智能过期"""
 
 import os
+import json
+import shutil
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from utils.kline_store import PartitionedKLineStore
+from utils.trading_calendar import get_trading_calendar, SETTLE_TIME
+
 
 class KLineType(Enum):
     MIN_1 = "1m"
@@ -43,8 +48,41 @@ class KLineData:
             self.fetch_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
 
+def frame_to_kline_data(df: pd.DataFrame) -> List[KLineData]:
+    """将K线DataFrame转换为KLineData列表（兼容旧接口）"""
+    return [KLineData(
+        symbol=row.symbol,
+        datetime=row.datetime,
+        open=float(row.open),
+        high=float(row.high),
+        low=float(row.low),
+        close=float(row.close),
+        volume=int(row.volume),
+        amount=float(row.amount) if pd.notna(row.amount) else None,
+        fetch_time=row.fetch_time if pd.notna(row.fetch_time) else None,
+        data_type=row.data_type if pd.notna(row.data_type) else 'stock'
+    ) for row in df.itertuples(index=False)]
+
+
+# 当日/当前K线数据的有效期（距拉取时间）
+FRESHNESS_TTL = {
+    KLineType.DAY: timedelta(hours=4),
+    KLineType.INDEX_DAY: timedelta(hours=4),
+    KLineType.MIN_1: timedelta(minutes=1),
+    KLineType.MIN_5: timedelta(minutes=5),
+    KLineType.MIN_15: timedelta(minutes=15),
+    KLineType.MIN_30: timedelta(minutes=30),
+    KLineType.MIN_60: timedelta(hours=1),
+    KLineType.HOUR_1: timedelta(hours=1),
+    KLineType.WEEK: timedelta(days=1),
+    KLineType.MONTH: timedelta(days=1),
+}
+
+DAILY_KLINE_TYPES = (KLineType.DAY, KLineType.INDEX_DAY)
+
+
 class KLineCacheManager:
-    """基于CSV的K线数据缓存管理器"""
+    """K线数据缓存管理器，数据按(K线类型, 股票代码)分区存储"""
     
     def __init__(self, cache_dir: str = None):
         if cache_dir is None:
@@ -54,177 +92,148 @@ class KLineCacheManager:
             self.cache_dir = cache_dir
         
         os.makedirs(self.cache_dir, exist_ok=True)
-        print(f"✅ CSV缓存目录: {self.cache_dir}")
+        self.store = PartitionedKLineStore(os.path.join(self.cache_dir, "kline_store"))
+        self.indicator_state_dir = os.path.join(self.cache_dir, "indicator_state")
+        self.migrate_legacy_csv()
+        print(f"✅ K线缓存目录: {self.cache_dir} ({self.store.file_ext.lstrip('.')}分区存储)")
     
     def _get_csv_path(self, kline_type: KLineType) -> str:
+        """旧版单文件CSV缓存路径（仅用于迁移）"""
         filename = f"kline_{kline_type.value}.csv"
         return os.path.join(self.cache_dir, filename)
     
-    def _is_data_fresh(self, stock_data_time: str, fetch_time: str, kline_type: KLineType) -> bool:
-        """判断数据是否需要更新"""
-        try:
-            if kline_type in [KLineType.DAY, KLineType.INDEX_DAY]:
-                data_date = datetime.strptime(stock_data_time.split()[0], '%Y-%m-%d').date()
-                fetch_datetime = datetime.strptime(fetch_time, '%Y-%m-%d %H:%M:%S')
-            else:
-                data_datetime = datetime.strptime(stock_data_time, '%Y-%m-%d %H:%M:%S')
-                fetch_datetime = datetime.strptime(fetch_time, '%Y-%m-%d %H:%M:%S')
-            
-            now = datetime.now()
-            
-            # 历史数据判断：T-2之前的数据永久有效
-            if kline_type in [KLineType.DAY, KLineType.INDEX_DAY]:
-                if data_date < (now - timedelta(days=2)).date():
-                    return True
-                
-                if data_date != fetch_datetime.date():
-                    return True  # 不在同一天拉取的，认为有效
-            else:
-                # 分钟线：1小时之前的数据永久有效
-                if data_datetime < now - timedelta(hours=1):
-                    return True
-                
-                time_diff = abs((data_datetime - fetch_datetime).total_seconds())
-                if time_diff > 3600:  # 如果拉取时间和数据时间差距超过1小时，认为有效
-                    return True
-            
-            # 当日/当前数据过期判断
-            time_since_fetch = now - fetch_datetime
-            
-            if kline_type in [KLineType.DAY, KLineType.INDEX_DAY]:
-                return time_since_fetch < timedelta(hours=4)
-            elif kline_type == KLineType.MIN_1:
-                return time_since_fetch < timedelta(minutes=1)
-            elif kline_type == KLineType.MIN_5:
-                return time_since_fetch < timedelta(minutes=5)
-            elif kline_type == KLineType.MIN_15:
-                return time_since_fetch < timedelta(minutes=15)
-            elif kline_type == KLineType.MIN_30:
-                return time_since_fetch < timedelta(minutes=30)
-            elif kline_type in [KLineType.MIN_60, KLineType.HOUR_1]:
-                return time_since_fetch < timedelta(hours=1)
-            elif kline_type == KLineType.WEEK:
-                return time_since_fetch < timedelta(days=1)
-            elif kline_type == KLineType.MONTH:
-                return time_since_fetch < timedelta(days=1)
-            else:
-                return time_since_fetch < timedelta(hours=1)
-                
-        except Exception as e:
-            print(f"判断数据新鲜度失败: {e}")
-            return False
+    def migrate_legacy_csv(self) -> int:
+        """一次性迁移旧版 kline_{type}.csv 到分区存储，迁移后原文件重命名为 .migrated"""
+        migrated = 0
+        for kline_type in KLineType:
+            csv_path = self._get_csv_path(kline_type)
+            if not os.path.exists(csv_path):
+                continue
+            
+            try:
+                df = pd.read_csv(csv_path, dtype={'symbol': str})
+                if not df.empty:
+                    for symbol, symbol_df in df.groupby('symbol'):
+                        existing_df = self.store.read(kline_type.value, symbol)
+                        if not existing_df.empty:
+                            # 分区中已有的数据更新，保留分区数据
+                            symbol_df = pd.concat([symbol_df, existing_df], ignore_index=True)
+                            symbol_df = symbol_df.drop_duplicates(subset='datetime', keep='last')
+                        self.store.write(kline_type.value, symbol, symbol_df)
+                        migrated += 1
+                os.replace(csv_path, f"{csv_path}.migrated")
+                print(f"✅ 迁移K线缓存: {os.path.basename(csv_path)} -> 分区存储 ({len(df)}条)")
+            except Exception as e:
+                print(f"迁移K线缓存失败 {csv_path}: {e}")
+        
+        return migrated
     
-    def _load_all_data(self, kline_type: KLineType) -> pd.DataFrame:
-        csv_path = self._get_csv_path(kline_type)
+    def _fresh_mask(self, df: pd.DataFrame, kline_type: KLineType) -> pd.Series:
+        """
+        向量化的新鲜度判断，返回每行是否仍然有效
         
-        if not os.path.exists(csv_path):
-            return pd.DataFrame()
+        - 日线：前一个交易日之前的数据、非当日拉取或收盘数据更新后拉取的数据永久有效
+        - 分钟线：1小时之前的数据、拉取时间与数据时间相差超过1小时的数据永久有效
+        - 其余当日/当前数据在 FRESHNESS_TTL 有效期内有效；时间无法解析的视为过期，没有拉取时间的视为有效
+        """
+        now = pd.Timestamp(datetime.now())
+        has_fetch_time = df['fetch_time'].notna()
+        fetch_datetime = pd.to_datetime(df['fetch_time'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        
+        if kline_type in DAILY_KLINE_TYPES:
+            data_time = pd.to_datetime(df['datetime'].str.split().str[0], format='%Y-%m-%d', errors='coerce')
+            # 历史数据判断：前一个交易日之前的数据永久有效（跨周末、节假日仍然有效）
+            is_history = data_time < pd.Timestamp(get_trading_calendar().previous_trading_day(now))
+            # 不在同一天拉取的，或收盘数据更新后拉取的，认为有效
+            settle_offset = timedelta(hours=SETTLE_TIME.hour, minutes=SETTLE_TIME.minute)
+            is_settled = (data_time != fetch_datetime.dt.normalize()) | (fetch_datetime >= data_time + settle_offset)
+        else:
+            data_time = pd.to_datetime(df['datetime'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+            # 分钟线：1小时之前的数据永久有效
+            is_history = data_time < now - timedelta(hours=1)
+            # 拉取时间和数据时间差距超过1小时，认为有效
+            is_settled = (data_time - fetch_datetime).abs() > timedelta(hours=1)
+        
+        is_recent = (now - fetch_datetime) < FRESHNESS_TTL.get(kline_type, timedelta(hours=1))
+        parsed = data_time.notna() & fetch_datetime.notna()
         
+        fresh = parsed & (is_history | is_settled | is_recent)
+        return (~has_fetch_time | fresh).to_numpy()
+    
+    def _load_symbol_data(self, symbol: str, kline_type: KLineType) -> pd.DataFrame:
         try:
-            df = pd.read_csv(csv_path, dtype={'symbol': str})
-            return df
+            return self.store.read(kline_type.value, symbol)
         except Exception as e:
-            print(f"加载数据失败 {csv_path}: {e}")
+            print(f"加载数据失败 {symbol} {kline_type.value}: {e}")
             return pd.DataFrame()
     
-    def _save_all_data(self, kline_type: KLineType, df: pd.DataFrame):
-        csv_path = self._get_csv_path(kline_type)
-        
-        try:
-            df.to_csv(csv_path, index=False, encoding='utf-8')
-        except Exception as e:
-            print(f"保存数据失败 {csv_path}: {e}")
+    @staticmethod
+    def _to_records(kline_data: List[KLineData]) -> pd.DataFrame:
+        return pd.DataFrame([{
+            'symbol': kdata.symbol,
+            'datetime': kdata.datetime,
+            'open': kdata.open,
+            'high': kdata.high,
+            'low': kdata.low,
+            'close': kdata.close,
+            'volume': kdata.volume,
+            'amount': kdata.amount,
+            'fetch_time': kdata.fetch_time,
+            'data_type': kdata.data_type
+        } for kdata in kline_data])
     
-    def get_cached_kline(self, symbol: str, kline_type: KLineType, count: int) -> Optional[List[KLineData]]:
-        """获取缓存的K线数据"""
+    def get_cached_kline_frame(self, symbol: str, kline_type: KLineType, count: int) -> Optional[pd.DataFrame]:
+        """获取缓存的K线数据（DataFrame形式，列与KLineData字段一致）"""
         try:
-            df = self._load_all_data(kline_type)
-            
-            if df.empty:
-                return None
-            
-            symbol_df = df[df['symbol'] == symbol].copy()
+            symbol_df = self._load_symbol_data(symbol, kline_type)
             
             if symbol_df.empty:
                 return None
             
-            symbol_df = symbol_df.sort_values('datetime')
-            
             # 检查数据新鲜度，过滤掉过期的数据
-            fresh_data = []
-            for _, row in symbol_df.iterrows():
-                if pd.notna(row.get('fetch_time')):
-                    if self._is_data_fresh(row['datetime'], row['fetch_time'], kline_type):
-                        fresh_data.append(row)
-                else:
-                    fresh_data.append(row)
+            fresh_df = symbol_df[self._fresh_mask(symbol_df, kline_type)]
             
-            if not fresh_data:
+            if fresh_df.empty:
                 return None
             
-            fresh_df = pd.DataFrame(fresh_data).tail(count)
-            
-            kline_data = []
-            for _, row in fresh_df.iterrows():
-                kline_data.append(KLineData(
-                    symbol=row['symbol'],
-                    datetime=row['datetime'],
-                    open=float(row['open']),
-                    high=float(row['high']),
-                    low=float(row['low']),
-                    close=float(row['close']),
-                    volume=int(row['volume']),
-                    amount=float(row['amount']) if pd.notna(row['amount']) else None,
-                    fetch_time=row.get('fetch_time'),
-                    data_type=row.get('data_type', 'stock')
-                ))
+            fresh_df = fresh_df.tail(count).reset_index(drop=True)
+            for column in ('symbol', 'datetime', 'fetch_time', 'data_type'):
+                fresh_df[column] = fresh_df[column].astype(object).where(fresh_df[column].notna(), None)
+            fresh_df['data_type'] = fresh_df['data_type'].fillna('stock')
             
-            return kline_data
+            return fresh_df
             
         except Exception as e:
             print(f"获取缓存数据失败: {e}")
             return None
     
+    def get_cached_kline(self, symbol: str, kline_type: KLineType, count: int) -> Optional[List[KLineData]]:
+        """获取缓存的K线数据"""
+        fresh_df = self.get_cached_kline_frame(symbol, kline_type, count)
+        if fresh_df is None:
+            return None
+        
+        try:
+            return frame_to_kline_data(fresh_df)
+        except Exception as e:
+            print(f"获取缓存数据失败: {e}")
+            return None
+    
     def cache_kline(self, symbol: str, kline_type: KLineType, count: int, kline_data: List[KLineData]):
         """缓存K线数据（替换指定股票的所有数据）"""
         if not kline_data:
             return
         
+        self.cache_kline_frame(symbol, kline_type, self._to_records(kline_data))
+    
+    def cache_kline_frame(self, symbol: str, kline_type: KLineType, df: pd.DataFrame):
+        """缓存DataFrame形式的K线数据（替换指定股票的所有数据）"""
+        if df is None or df.empty:
+            return
+        
         try:
-            df = self._load_all_data(kline_type)
-            
-            if not df.empty:
-                df = df[df['symbol'] != symbol]
-            else:
-                df = pd.DataFrame()
-            
-            new_data_list = []
-            for kdata in kline_data:
-                new_data_list.append({
-                    'symbol': kdata.symbol,
-                    'datetime': kdata.datetime,
-                    'open': kdata.open,
-                    'high': kdata.high,
-                    'low': kdata.low,
-                    'close': kdata.close,
-                    'volume': kdata.volume,
-                    'amount': kdata.amount,
-                    'fetch_time': kdata.fetch_time,
-                    'data_type': kdata.data_type
-                })
-            
-            new_df = pd.DataFrame(new_data_list)
-            
-            if not df.empty:
-                df = pd.concat([df, new_df], ignore_index=True)
-            else:
-                df = new_df
-            
-            df = df.sort_values(['symbol', 'datetime'])
-            
-            self._save_all_data(kline_type, df)
-            
-            print(f"✅ 缓存K线数据: {symbol} {kline_type.value} {len(kline_data)}条")
+            self.store.write(kline_type.value, symbol, df)
+            print(f"✅ 缓存K线数据: {symbol} {kline_type.value} {len(df)}条")
             
         except Exception as e:
             print(f"缓存K线数据失败: {e}")
@@ -236,124 +245,160 @@ class KLineCacheManager:
         if not new_data:
             return
         
+        self.update_kline_frame(symbol, kline_type, self._to_records(new_data))
+    
+    def update_kline_frame(self, symbol: str, kline_type: KLineType, new_df: pd.DataFrame):
+        """增量更新DataFrame形式的K线数据：新K线追加写入，与已有K线重叠时合并（以新数据为准）"""
+        if new_df is None or new_df.empty:
+            return
+        
         try:
-            df = self._load_all_data(kline_type)
+            last_datetime = self.store.last_datetime(kline_type.value, symbol)
             
-            existing_symbol_df = df[df['symbol'] == symbol].copy() if not df.empty else pd.DataFrame()
-            other_symbols_df = df[df['symbol'] != symbol].copy() if not df.empty else pd.DataFrame()
-            
-            existing_data = {}
-            if not existing_symbol_df.empty:
-                for _, row in existing_symbol_df.iterrows():
-                    existing_data[row['datetime']] = row.to_dict()
-            
-            for new_item in new_data:
-                existing_data[new_item.datetime] = {
-                    'symbol': new_item.symbol,
-                    'datetime': new_item.datetime,
-                    'open': new_item.open,
-                    'high': new_item.high,
-                    'low': new_item.low,
-                    'close': new_item.close,
-                    'volume': new_item.volume,
-                    'amount': new_item.amount,
-                    'fetch_time': new_item.fetch_time,
-                    'data_type': new_item.data_type
-                }
-            
-            updated_symbol_df = pd.DataFrame(list(existing_data.values()))
-            
-            if not other_symbols_df.empty:
-                df = pd.concat([other_symbols_df, updated_symbol_df], ignore_index=True)
+            if last_datetime is None or new_df['datetime'].min() > last_datetime:
+                # 全部是新K线，走追加路径，不重写已有数据
+                self.store.append(kline_type.value, symbol, new_df)
             else:
-                df = updated_symbol_df
-            
-            df = df.sort_values(['symbol', 'datetime'])
-            
-            self._save_all_data(kline_type, df)
+                existing_df = self._load_symbol_data(symbol, kline_type)
+                merged_df = pd.concat([existing_df, self.store.normalize_frame(new_df)], ignore_index=True)
+                merged_df = merged_df.drop_duplicates(subset='datetime', keep='last')
+                self.store.write(kline_type.value, symbol, merged_df)
             
-            print(f"✅ 更新K线数据: {symbol} {kline_type.value} 新增/更新 {len(new_data)}条")
+            print(f"✅ 更新K线数据: {symbol} {kline_type.value} 新增/更新 {len(new_df)}条")
             
         except Exception as e:
             print(f"更新K线数据失败: {e}")
     
-    def analyze_missing_ranges(self, symbol: str, kline_type: KLineType, count: int) -> List[Tuple[str, str]]:
-        """分析缺失的时间范围"""
+    @staticmethod
+    def _estimate_span(kline_type: KLineType, count: int) -> timedelta:
+        """估算 count 根K线覆盖的自然时间跨度（日线按每周5个交易日并预留节假日）"""
+        if kline_type in DAILY_KLINE_TYPES:
+            return timedelta(days=int(count * 7 / 5) + 15)
+        if kline_type == KLineType.WEEK:
+            return timedelta(weeks=count + 2)
+        if kline_type == KLineType.MONTH:
+            return timedelta(days=31 * (count + 1))
+        minutes = {
+            KLineType.MIN_1: 1, KLineType.MIN_5: 5, KLineType.MIN_15: 15,
+            KLineType.MIN_30: 30, KLineType.MIN_60: 60, KLineType.HOUR_1: 60,
+        }.get(kline_type, 60)
+        return timedelta(minutes=count * minutes)
+    
+    @staticmethod
+    def _range_format(kline_type: KLineType) -> str:
+        daily = kline_type in DAILY_KLINE_TYPES or kline_type in (KLineType.WEEK, KLineType.MONTH)
+        return '%Y-%m-%d' if daily else '%Y-%m-%d %H:%M:%S'
+    
+    def full_window_range(self, kline_type: KLineType, count: int) -> Tuple[str, str]:
+        """覆盖最近 count 根K线的时间范围，格式与 analyze_missing_ranges 一致"""
+        fmt = self._range_format(kline_type)
+        end_time = datetime.now()
+        start_time = end_time - self._estimate_span(kline_type, count)
+        return start_time.strftime(fmt), end_time.strftime(fmt)
+    
+    def analyze_missing_ranges(self, symbol: str, kline_type: KLineType, count: int) -> Optional[List[Tuple[str, str]]]:
+        """
+        分析缺失的时间范围
+        
+        - 无缓存：返回覆盖最近 count 根K线的时间范围
+        - 最新缓存K线之后到当前时间：需要补充的新K线
+        - 缓存不足 count 根：需要补充的更早的历史K线
+        
+        日线返回 'YYYY-MM-DD'，分钟线返回 'YYYY-MM-DD HH:MM:SS'，按时间先后排列。
+        返回空列表表示缓存已是最新；分析失败（如缓存时间无法解析）时返回None。
+        """
         try:
-            cached_data = self.get_cached_kline(symbol, kline_type, count * 2)
+            fmt = self._range_format(kline_type)
+            daily = fmt == '%Y-%m-%d'
+            end_time = datetime.now()
+            cached_df = self.get_cached_kline_frame(symbol, kline_type, count * 2)
             
-            if not cached_data:
-                end_time = datetime.now()
-                if kline_type == KLineType.DAY:
-                    start_time = end_time - timedelta(days=count + 10)
-                    return [(start_time.strftime('%Y-%m-%d'), end_time.strftime('%Y-%m-%d'))]
-                else:
-                    if kline_type == KLineType.MIN_1:
-                        start_time = end_time - timedelta(minutes=count)
-                    elif kline_type == KLineType.MIN_5:
-                        start_time = end_time - timedelta(minutes=count * 5)
-                    elif kline_type == KLineType.MIN_15:
-                        start_time = end_time - timedelta(minutes=count * 15)
-                    elif kline_type == KLineType.MIN_30:
-                        start_time = end_time - timedelta(minutes=count * 30)
-                    else:
-                        start_time = end_time - timedelta(hours=count)
-                    
-                    return [(start_time.strftime('%Y-%m-%d %H:%M:%S'), 
-                            end_time.strftime('%Y-%m-%d %H:%M:%S'))]
+            if cached_df is None:
+                return [self.full_window_range(kline_type, count)]
             
-            if len(cached_data) >= count:
-                return []
+            missing_ranges = []
             
-            # 数据不足，计算需要补充的范围
-            latest_time = cached_data[-1].datetime
-            end_time = datetime.now()
+            # 缓存不足，补充更早的历史数据
+            if len(cached_df) < count:
+                earliest = datetime.strptime(cached_df['datetime'].iloc[0].split()[0] if daily else cached_df['datetime'].iloc[0], fmt)
+                head_end = earliest - (timedelta(days=1) if daily else timedelta(seconds=1))
+                head_start = earliest - self._estimate_span(kline_type, count - len(cached_df))
+                missing_ranges.append((head_start.strftime(fmt), head_end.strftime(fmt)))
             
-            missing_ranges = []
-            if kline_type == KLineType.DAY:
+            # 最新缓存K线之后的新数据
+            latest_time = cached_df['datetime'].iloc[-1]
+            if daily:
                 latest_date = datetime.strptime(latest_time.split()[0], '%Y-%m-%d')
                 if latest_date.date() < end_time.date():
                     next_day = latest_date + timedelta(days=1)
-                    missing_ranges.append((next_day.strftime('%Y-%m-%d'), 
-                                         end_time.strftime('%Y-%m-%d')))
+                    missing_ranges.append((next_day.strftime(fmt), end_time.strftime(fmt)))
             else:
-                latest_datetime = datetime.strptime(latest_time, '%Y-%m-%d %H:%M:%S')
+                latest_datetime = datetime.strptime(latest_time, fmt)
                 if latest_datetime < end_time:
-                    missing_ranges.append((latest_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                                         end_time.strftime('%Y-%m-%d %H:%M:%S')))
+                    missing_ranges.append((latest_datetime.strftime(fmt), end_time.strftime(fmt)))
             
             return missing_ranges
             
         except Exception as e:
             print(f"分析缺失范围失败: {e}")
-            return []
+            return None
+    
+    def _indicator_state_path(self, symbol: str, kline_type: KLineType) -> str:
+        return os.path.join(self.indicator_state_dir, kline_type.value, f"{symbol}.json")
+    
+    def load_indicator_state(self, symbol: str, kline_type: KLineType) -> Optional[Dict[str, Any]]:
+        """读取保存在K线缓存旁的增量指标状态"""
+        path = self._indicator_state_path(symbol, kline_type)
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"读取指标状态失败 {symbol} {kline_type.value}: {e}")
+        return None
+    
+    def save_indicator_state(self, symbol: str, kline_type: KLineType, state: Dict[str, Any]):
+        """保存增量指标状态"""
+        path = self._indicator_state_path(symbol, kline_type)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"保存指标状态失败 {symbol} {kline_type.value}: {e}")
+    
+    def clear_indicator_state(self, symbol: Optional[str] = None, kline_type: Optional[KLineType] = None):
+        """删除增量指标状态，下次计算时从头重算"""
+        if not os.path.isdir(self.indicator_state_dir):
+            return
+        type_dirs = [kline_type.value] if kline_type else os.listdir(self.indicator_state_dir)
+        for type_dir in type_dirs:
+            if symbol:
+                path = os.path.join(self.indicator_state_dir, type_dir, f"{symbol}.json")
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                shutil.rmtree(os.path.join(self.indicator_state_dir, type_dir), ignore_errors=True)
     
     def clear_cache(self, symbol: Optional[str] = None, kline_type: Optional[KLineType] = None):
         """清理缓存"""
         try:
+            self.store.delete(kline_type.value if kline_type else None, symbol)
+            self.clear_indicator_state(symbol, kline_type)
+            
             if kline_type:
                 if symbol:
-                    df = self._load_all_data(kline_type)
-                    if not df.empty:
-                        df = df[df['symbol'] != symbol]
-                        self._save_all_data(kline_type, df)
                     print(f"✅ 清理股票 {symbol} 的 {kline_type.value} 缓存数据")
                 else:
-                    csv_path = self._get_csv_path(kline_type)
-                    if os.path.exists(csv_path):
-                        os.remove(csv_path)
                     print(f"✅ 清理所有 {kline_type.value} 缓存文件")
             else:
                 if symbol:
-                    for ktype in KLineType:
-                        df = self._load_all_data(ktype)
-                        if not df.empty:
-                            df = df[df['symbol'] != symbol]
-                            self._save_all_data(ktype, df)
                     print(f"✅ 清理股票 {symbol} 的所有缓存数据")
                 else:
                     for file in os.listdir(self.cache_dir):
-                        if file.startswith('kline_') and file.endswith('.csv'):
+                        if file.startswith('kline_') and (file.endswith('.csv') or file.endswith('.csv.migrated')):
                             os.remove(os.path.join(self.cache_dir, file))
                     print("✅ 清理所有缓存文件")
                 
@@ -366,29 +411,19 @@ class KLineCacheManager:
             expired_count = 0
             
             for kline_type in KLineType:
-                df = self._load_all_data(kline_type)
-                if df.empty:
-                    continue
-                
-                fresh_data = []
-                for _, row in df.iterrows():
-                    if pd.notna(row.get('fetch_time')):
-                        if self._is_data_fresh(row['datetime'], row['fetch_time'], kline_type):
-                            fresh_data.append(row)
+                for symbol in self.store.list_symbols(kline_type.value):
+                    df = self._load_symbol_data(symbol, kline_type)
+                    if df.empty:
+                        continue
+                    
+                    fresh_df = df[self._fresh_mask(df, kline_type)]
+                    expired_count += len(df) - len(fresh_df)
+                    
+                    if len(fresh_df) != len(df):
+                        if not fresh_df.empty:
+                            self.store.write(kline_type.value, symbol, fresh_df)
                         else:
-                            expired_count += 1
-                    else:
-                        # 没有fetch_time的数据保留
-                        fresh_data.append(row)
-                
-                if len(fresh_data) != len(df):
-                    if fresh_data:
-                        fresh_df = pd.DataFrame(fresh_data)
-                        self._save_all_data(kline_type, fresh_df)
-                    else:
-                        csv_path = self._get_csv_path(kline_type)
-                        if os.path.exists(csv_path):
-                            os.remove(csv_path)
+                            self.store.delete(kline_type.value, symbol)
             
             if expired_count > 0:
                 print(f"✅ 清理过期缓存数据: {expired_count}条")
@@ -419,11 +454,11 @@ class KLineCacheManager:
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
         try:
-            csv_files = [f for f in os.listdir(self.cache_dir) if f.startswith('kline_') and f.endswith('.csv')]
+            kline_types = self.store.list_kline_types()
             
             stats = {
                 "cache_dir": self.cache_dir,
-                "total_files": len(csv_files),
+                "total_files": len(kline_types),
                 "files": []
             }
             
@@ -431,33 +466,23 @@ class KLineCacheManager:
             symbol_stats = {}
             total_records = 0
             
-            for file in csv_files:
-                file_path = os.path.join(self.cache_dir, file)
-                file_size = os.path.getsize(file_path)
-                total_size += file_size
+            for kline_type, symbol_counts in self.store.get_stats().items():
+                type_size = self.store.partition_size(kline_type)
+                total_size += type_size
                 
-                kline_type = file.replace('kline_', '').replace('.csv', '')
-                
-                df = pd.read_csv(file_path)
-                record_count = len(df)
+                record_count = sum(symbol_counts.values())
                 total_records += record_count
                 
-                if not df.empty:
-                    symbols = df['symbol'].nunique()
-                    for symbol in df['symbol'].unique():
-                        if symbol not in symbol_stats:
-                            symbol_stats[symbol] = {}
-                        symbol_stats[symbol][kline_type] = len(df[df['symbol'] == symbol])
-                else:
-                    symbols = 0
+                for symbol, count in symbol_counts.items():
+                    symbol_stats.setdefault(symbol, {})[kline_type] = count
                 
                 stats["files"].append({
-                    "filename": file,
+                    "filename": os.path.join("kline_store", kline_type),
                     "kline_type": kline_type,
-                    "size_bytes": file_size,
-                    "size_kb": round(file_size / 1024, 2),
+                    "size_bytes": type_size,
+                    "size_kb": round(type_size / 1024, 2),
                     "record_count": record_count,
-                    "symbol_count": symbols
+                    "symbol_count": len(symbol_counts)
                 })
             
             stats["total_size_bytes"] = total_size
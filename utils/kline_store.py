@@ -0,0 +1,233 @@
+"""按(K线类型, 股票代码)分区的列式K线存储，支持追加写入新K线"""
+
+import os
+import glob
+import json
+import time
+import shutil
+import pandas as pd
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+# 分区内统一的列及类型，保证读写后的数据类型稳定
+KLINE_COLUMNS = {
+    'symbol': 'string',
+    'datetime': 'string',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'int64',
+    'amount': 'float64',
+    'fetch_time': 'string',
+    'data_type': 'string',
+}
+
+BASE_SEGMENT = "base"
+APPEND_PREFIX = "append-"
+MAX_APPEND_SEGMENTS = 8  # 追加段超过该数量时自动合并
+META_FILE = "_meta.json"  # 分区元数据：最新一根K线的时间，判断能否追加时不必读取全部数据段
+
+
+class PartitionedKLineStore:
+    """分区K线存储：每个(K线类型, 股票代码)一个目录，由基础段和若干追加段组成"""
+
+    def __init__(self, root_dir: str, use_parquet: Optional[bool] = None,
+                 columns: Optional[Dict[str, str]] = None, date_col: str = 'datetime'):
+        """
+        Args:
+            root_dir: 存储根目录
+            use_parquet: 是否使用parquet格式，默认在pyarrow可用时使用
+            columns: 分区内的列及类型，默认 KLINE_COLUMNS
+            date_col: 排序和去重使用的时间列
+        """
+        self.root_dir = root_dir
+        self.columns = columns or KLINE_COLUMNS
+        self.date_col = date_col
+        if use_parquet is None:
+            use_parquet = PARQUET_AVAILABLE
+        self.file_ext = ".parquet" if use_parquet else ".csv"
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @staticmethod
+    def _safe_name(name: str) -> str:
+        return str(name).replace(os.sep, "_").replace("/", "_").strip()
+
+    def _type_dir(self, kline_type: str) -> str:
+        return os.path.join(self.root_dir, self._safe_name(kline_type))
+
+    def _partition_dir(self, kline_type: str, symbol: str) -> str:
+        return os.path.join(self._type_dir(kline_type), self._safe_name(symbol))
+
+    def _segment_files(self, partition_dir: str) -> List[str]:
+        """返回分区内的数据段，基础段在前，追加段按写入顺序排列"""
+        if not os.path.isdir(partition_dir):
+            return []
+        files = [f for f in os.listdir(partition_dir) if f.endswith(('.parquet', '.csv'))]
+        base = [f for f in files if f.startswith(BASE_SEGMENT)]
+        appends = sorted(f for f in files if f.startswith(APPEND_PREFIX))
+        return [os.path.join(partition_dir, f) for f in base + appends]
+
+    def normalize_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """补齐缺失列并统一列类型"""
+        df = df.copy()
+        for column, dtype in self.columns.items():
+            if column not in df.columns:
+                df[column] = None
+            if dtype == 'int64':
+                df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+            elif dtype == 'float64':
+                df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+            else:
+                df[column] = df[column].astype('string')
+        return df[list(self.columns.keys())]
+
+    def _read_file(self, path: str) -> pd.DataFrame:
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path)
+        return pd.read_csv(path, dtype={c: str for c, dtype in self.columns.items() if dtype == 'string'})
+
+    def _write_file(self, df: pd.DataFrame, path: str):
+        """先写临时文件再替换，避免写入中断留下损坏的分区"""
+        tmp_path = f"{path}.tmp"
+        if path.endswith('.parquet'):
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def read(self, kline_type: str, symbol: str) -> pd.DataFrame:
+        """读取单只股票的K线数据，按时间列排序，同一时间以最后写入的为准"""
+        segments = self._segment_files(self._partition_dir(kline_type, symbol))
+        if not segments:
+            return pd.DataFrame()
+
+        frames = [self._read_file(path) for path in segments]
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        if df.empty:
+            return pd.DataFrame()
+
+        df = self.normalize_frame(df)
+        if len(frames) > 1:
+            df = df.drop_duplicates(subset=self.date_col, keep='last')
+        return df.sort_values(self.date_col, kind='stable').reset_index(drop=True)
+
+    def _read_meta(self, partition_dir: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(partition_dir, META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, partition_dir: str, last: Optional[str]):
+        path = os.path.join(partition_dir, META_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_datetime': last}, f)
+        os.replace(tmp_path, path)
+
+    def last_datetime(self, kline_type: str, symbol: str) -> Optional[str]:
+        """获取分区中最新一根K线的时间，优先读取分区元数据"""
+        partition_dir = self._partition_dir(kline_type, symbol)
+        if not os.path.isdir(partition_dir):
+            return None
+        meta = self._read_meta(partition_dir)
+        if meta is not None:
+            return meta.get('last_datetime')
+
+        # 没有元数据的旧分区读取一次全部数据段，并补写元数据
+        df = self.read(kline_type, symbol)
+        if df.empty:
+            return None
+        last = str(df[self.date_col].iloc[-1])
+        self._write_meta(partition_dir, last)
+        return last
+
+    def write(self, kline_type: str, symbol: str, df: pd.DataFrame):
+        """整体替换单只股票的K线数据"""
+        partition_dir = self._partition_dir(kline_type, symbol)
+        if df is None or df.empty:
+            self.delete(kline_type, symbol)
+            return
+
+        os.makedirs(partition_dir, exist_ok=True)
+        df = self.normalize_frame(df).sort_values(self.date_col, kind='stable').reset_index(drop=True)
+        base_path = os.path.join(partition_dir, f"{BASE_SEGMENT}{self.file_ext}")
+        self._write_file(df, base_path)
+
+        for path in self._segment_files(partition_dir):
+            if path != base_path:
+                os.remove(path)
+        self._write_meta(partition_dir, str(df[self.date_col].iloc[-1]))
+
+    def append(self, kline_type: str, symbol: str, df: pd.DataFrame):
+        """追加新K线：只写入一个新的数据段，不重写已有数据"""
+        if df is None or df.empty:
+            return
+
+        partition_dir = self._partition_dir(kline_type, symbol)
+        if not self._segment_files(partition_dir):
+            self.write(kline_type, symbol, df)
+            return
+
+        last = self.last_datetime(kline_type, symbol)
+        df = self.normalize_frame(df).sort_values(self.date_col, kind='stable').reset_index(drop=True)
+        segment_path = os.path.join(partition_dir, f"{APPEND_PREFIX}{time.time_ns()}{self.file_ext}")
+        self._write_file(df, segment_path)
+        new_last = str(df[self.date_col].iloc[-1])
+        self._write_meta(partition_dir, new_last if last is None or new_last > last else last)
+
+        if len(self._segment_files(partition_dir)) - 1 > MAX_APPEND_SEGMENTS:
+            self.compact(kline_type, symbol)
+
+    def compact(self, kline_type: str, symbol: str):
+        """将追加段合并到基础段"""
+        df = self.read(kline_type, symbol)
+        if not df.empty:
+            self.write(kline_type, symbol, df)
+
+    def delete(self, kline_type: Optional[str] = None, symbol: Optional[str] = None):
+        """删除分区：指定类型和代码时删除单个分区，仅指定代码时删除该代码的所有类型"""
+        if kline_type and symbol:
+            targets = [self._partition_dir(kline_type, symbol)]
+        elif kline_type:
+            targets = [self._type_dir(kline_type)]
+        elif symbol:
+            targets = [self._partition_dir(t, symbol) for t in self.list_kline_types()]
+        else:
+            targets = [self._type_dir(t) for t in self.list_kline_types()]
+
+        for target in targets:
+            if os.path.isdir(target):
+                shutil.rmtree(target, ignore_errors=True)
+
+    def list_kline_types(self) -> List[str]:
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(d for d in os.listdir(self.root_dir) if os.path.isdir(os.path.join(self.root_dir, d)))
+
+    def list_symbols(self, kline_type: str) -> List[str]:
+        type_dir = self._type_dir(kline_type)
+        if not os.path.isdir(type_dir):
+            return []
+        return sorted(d for d in os.listdir(type_dir) if os.path.isdir(os.path.join(type_dir, d)))
+
+    def partition_size(self, kline_type: str, symbol: Optional[str] = None) -> int:
+        """分区（或整个K线类型）占用的字节数"""
+        target = self._partition_dir(kline_type, symbol) if symbol else self._type_dir(kline_type)
+        pattern = os.path.join(target, "**", "*")
+        return sum(os.path.getsize(p) for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """按K线类型统计每只股票的记录数"""
+        stats = {}
+        for kline_type in self.list_kline_types():
+            stats[kline_type] = {symbol: len(self.read(kline_type, symbol))
+                                 for symbol in self.list_symbols(kline_type)}
+        return stats
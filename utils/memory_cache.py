@@ -0,0 +1,116 @@
+"""
+进程内缓存内存层
+
+各缓存管理器（股票、市场、筹码）读取缓存文件前先查询内存层：
+文件的修改时间和大小未变化时直接返回上次解析的结果，变化后才重新读取。
+内存层容量有限，超出后按最近最少使用（LRU）淘汰，并统计命中/未命中次数。
+
+注意：返回的是共享对象，调用方应视为只读，修改前请先复制。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+class FileMemoryCache:
+    """按文件签名（mtime/size）失效的进程内LRU缓存"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Tuple, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def file_signature(paths: Iterable[str]) -> Tuple:
+        """计算一组文件的签名，文件不存在时记为None"""
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get(self, key: str, loader: Callable[[], Any], paths: Optional[Iterable[str]] = None) -> Any:
+        """
+        读取缓存项，签名变化或未缓存时调用loader重新加载
+
+        Args:
+            key: 缓存项键名，默认同时作为文件路径
+            loader: 未命中时的加载函数
+            paths: 决定缓存项是否失效的文件列表，默认为 [key]
+        """
+        signature = self.file_signature(paths if paths is not None else [key])
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # 在锁外加载，避免大文件解析阻塞其他读取
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = (signature, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, key: Optional[str] = None, prefix: Optional[str] = None):
+        """使缓存项失效：指定key删除单项，指定prefix删除匹配项，都不指定时清空"""
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            elif prefix is not None:
+                for cache_key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[cache_key]
+            else:
+                self._entries.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+# 全局内存缓存实例，由所有缓存管理器共享
+_memory_cache = None
+_memory_cache_lock = threading.Lock()
+
+
+def get_memory_cache() -> FileMemoryCache:
+    """获取全局内存缓存实例"""
+    global _memory_cache
+    if _memory_cache is None:
+        with _memory_cache_lock:
+            if _memory_cache is None:
+                _memory_cache = FileMemoryCache()
+    return _memory_cache
@@ -5,7 +5,65 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, Optional
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+@dataclass
+class ReturnMoments:
+    """
+    一次性计算的收益率统计量，供各项风险指标共享
+
+    收益率、均值、标准差、偏度、排序后的收益率（VaR/CVaR）和回撤路径都只计算一次
+    """
+    returns: pd.Series
+    mean: float
+    std: float
+    skew: float
+    sorted_returns: np.ndarray
+    drawdown: pd.Series
+
+    @classmethod
+    def from_returns(cls, returns: pd.Series) -> 'ReturnMoments':
+        values = returns.to_numpy(dtype=float)
+        n = len(values)
+        mean = float(values.mean()) if n else np.nan
+        dev = values - mean
+        m2 = float((dev ** 2).sum())
+        std = float(np.sqrt(m2 / (n - 1))) if n > 1 else np.nan
+
+        # 偏度：与 pandas Series.skew 相同的无偏估计
+        if n < 3:
+            skew = np.nan
+        else:
+            m2_ = m2 if abs(m2) >= 1e-14 else 0.0
+            m3 = float((dev ** 3).sum())
+            m3 = m3 if abs(m3) >= 1e-14 else 0.0
+            skew = 0.0 if m2_ == 0 else n * (n - 1) ** 0.5 / (n - 2) * (m3 / m2_ ** 1.5)
+
+        cumulative = np.cumprod(1 + values)
+        running_max = np.maximum.accumulate(cumulative) if n else cumulative
+        drawdown = pd.Series((cumulative - running_max) / running_max, index=returns.index)
+        return cls(returns=returns, mean=mean, std=std, skew=skew,
+                   sorted_returns=np.sort(values), drawdown=drawdown)
+
+    def __len__(self):
+        return len(self.returns)
+
+    @property
+    def max_drawdown(self) -> float:
+        return float(self.drawdown.min())
+
+    def percentile(self, q: float) -> float:
+        """线性插值分位数（与 np.percentile 一致），q 取值 0-100"""
+        return float(np.percentile(self.sorted_returns, q))
+
+    def tail_mean(self, threshold: float) -> float:
+        """不高于 threshold 的收益率均值"""
+        k = np.searchsorted(self.sorted_returns, threshold, side='right')
+        return float(self.sorted_returns[:k].mean()) if k else np.nan
+
 
 class RiskCalculator:
     """风险指标计算器"""
@@ -49,6 +107,28 @@ class RiskCalculator:
         var = self.value_at_risk(returns, confidence_level)
         return returns[returns <= var].mean()
         
+    def moments(self, prices: pd.Series) -> ReturnMoments:
+        """由价格序列计算共享的收益率统计量"""
+        return ReturnMoments.from_returns(self.calculate_returns(prices))
+
+    def metrics_from_moments(self,
+                             moments: ReturnMoments,
+                             confidence_level: float = 0.05,
+                             risk_free_rate: float = 0.03) -> Dict[str, float]:
+        """由已计算的统计量得到全部风险指标"""
+        if len(moments) == 0:
+            raise ValueError("价格序列太短，无法计算收益率")
+
+        var = moments.percentile(confidence_level * 100)
+        daily_risk_free = risk_free_rate / self.trading_days
+        return {
+            'annual_volatility': moments.std * np.sqrt(self.trading_days),
+            'max_drawdown': moments.max_drawdown,
+            'sharpe_ratio': (moments.mean - daily_risk_free) / moments.std * np.sqrt(self.trading_days),
+            'var_95': var,
+            'cvar_95': moments.tail_mean(var),
+        }
+
     def calculate_all_metrics(self, 
                             prices: pd.Series, 
                             confidence_level: float = 0.05,
@@ -64,25 +144,13 @@ class RiskCalculator:
         Returns:
             包含所有风险指标的字典
         """
-        returns = self.calculate_returns(prices)
-        
-        if len(returns) == 0:
-            raise ValueError("价格序列太短，无法计算收益率")
-        
-        metrics = {
-            'annual_volatility': self.annual_volatility(returns),
-            'max_drawdown': self.max_drawdown(returns),
-            'sharpe_ratio': self.sharpe_ratio(returns, risk_free_rate),
-            'var_95': self.value_at_risk(returns, confidence_level),
-            'cvar_95': self.conditional_var(returns, confidence_level),
-        }
-        
-        return metrics
-    
+        return self.metrics_from_moments(self.moments(prices), confidence_level, risk_free_rate)
+
     def get_risk_summary(self, 
                         prices: pd.Series,
                         confidence_level: float = 0.05,
-                        risk_free_rate: float = 0.03) -> pd.DataFrame:
+                        risk_free_rate: float = 0.03,
+                        metrics: Optional[Dict[str, float]] = None) -> pd.DataFrame:
         """
         获取风险指标汇总表
         
@@ -90,11 +158,13 @@ class RiskCalculator:
             prices: 价格序列
             confidence_level: VaR/CVaR置信水平
             risk_free_rate: 无风险利率
+            metrics: 已计算的风险指标，提供时不再重新计算
             
         Returns:
             风险指标汇总DataFrame
         """
-        metrics = self.calculate_all_metrics(prices, confidence_level, risk_free_rate)
+        if metrics is None:
+            metrics = self.calculate_all_metrics(prices, confidence_level, risk_free_rate)
         
         risk_df = pd.DataFrame({
             '风险指标': [
@@ -124,6 +194,44 @@ class RiskCalculator:
         
         return risk_df
 
+    def _return_windows(self, returns: pd.Series, window: int) -> np.ndarray:
+        """收益率的滑动窗口视图，形状 (窗口数, window)"""
+        if window < 1:
+            raise ValueError("窗口长度必须大于0")
+        values = returns.to_numpy(dtype=float)
+        if len(values) < window:
+            return np.empty((0, window))
+        return sliding_window_view(values, window)
+
+    def _rolling_series(self, returns: pd.Series, window: int, values: np.ndarray) -> pd.Series:
+        """把每个完整窗口的结果对齐到窗口末尾，前 window-1 个位置为NaN"""
+        out = np.full(len(returns), np.nan)
+        if len(values):
+            out[window - 1:] = values
+        return pd.Series(out, index=returns.index)
+
+    def rolling_volatility(self, returns: pd.Series, window: int = 20) -> pd.Series:
+        """滚动年化波动率"""
+        windows = self._return_windows(returns, window)
+        std = windows.std(axis=1, ddof=1) if window > 1 else np.full(len(windows), np.nan)
+        return self._rolling_series(returns, window, std * np.sqrt(self.trading_days))
+
+    def rolling_sharpe(self, returns: pd.Series, window: int = 60, risk_free_rate: float = 0.03) -> pd.Series:
+        """滚动夏普比率"""
+        windows = self._return_windows(returns, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = windows.std(axis=1, ddof=1) if window > 1 else np.full(len(windows), np.nan)
+            sharpe = (windows.mean(axis=1) - risk_free_rate / self.trading_days) / std * np.sqrt(self.trading_days)
+        return self._rolling_series(returns, window, sharpe)
+
+    def rolling_max_drawdown(self, returns: pd.Series, window: int = 60) -> pd.Series:
+        """滚动最大回撤：每个窗口内的净值从窗口内最高点的最大跌幅"""
+        windows = self._return_windows(returns, window)
+        cumulative = np.cumprod(1 + windows, axis=1)
+        running_max = np.maximum.accumulate(cumulative, axis=1)
+        drawdown = ((cumulative - running_max) / running_max).min(axis=1)
+        return self._rolling_series(returns, window, drawdown)
+
 
 def calculate_portfolio_risk_summary(df: pd.DataFrame, 
                                    price_col: str = 'close',
@@ -151,14 +259,15 @@ def calculate_portfolio_risk_summary(df: pd.DataFrame,
     if len(prices) < 5:
         raise ValueError("价格数据不足，至少需要5个数据点")
 
-    # 计算风险指标（只保留关键统计数据）
-    metrics = calculator.calculate_all_metrics(prices, confidence_level, risk_free_rate)
-    returns = calculator.calculate_returns(prices)
-    risk_summary = calculator.get_risk_summary(prices, confidence_level, risk_free_rate)
+    # 计算风险指标（只保留关键统计数据），收益率统计量只计算一次
+    moments = calculator.moments(prices)
+    returns = moments.returns
+    metrics = calculator.metrics_from_moments(moments, confidence_level, risk_free_rate)
+    risk_summary = calculator.get_risk_summary(prices, confidence_level, risk_free_rate, metrics=metrics)
     
     # 计算价格趋势
     price_change = (prices.iloc[-1] - prices.iloc[0]) / prices.iloc[0]
-    recent_volatility = returns.tail(20).std() * np.sqrt(252) if len(returns) >= 20 else returns.std() * np.sqrt(252)
+    recent_volatility = returns.tail(20).std() * np.sqrt(252) if len(returns) >= 20 else moments.std * np.sqrt(252)
     
     # 构建适合大模型分析的风险摘要
     risk_analysis = {
@@ -179,15 +288,15 @@ def calculate_portfolio_risk_summary(df: pd.DataFrame,
             'cvar_5pct': float(metrics['cvar_95']),
         },
         'return_statistics': {
-            'daily_return_mean': float(returns.mean()),
-            'daily_return_std': float(returns.std()),
+            'daily_return_mean': float(moments.mean),
+            'daily_return_std': float(moments.std),
             'positive_days_ratio': float((returns > 0).mean()),
             'max_single_day_gain': float(returns.max()),
             'max_single_day_loss': float(returns.min()),
         },
         'risk_assessment': {
             'risk_level': _assess_risk_level(metrics['annual_volatility'], metrics['max_drawdown']),
-            'stability': _assess_stability(returns),
+            'stability': _assess_stability(moments),
             'trend_strength': _assess_trend_strength(price_change, metrics['annual_volatility']),
         },
         'summary_table': risk_summary,
@@ -206,14 +315,14 @@ def _assess_risk_level(volatility: float, max_drawdown: float) -> str:
         return 'low'
 
 
-def _assess_stability(returns: pd.Series) -> str:
+def _assess_stability(moments: ReturnMoments) -> str:
     """评估稳定性"""
-    volatility = returns.std()
-    skewness = returns.skew()
+    volatility = moments.std
+    skewness = moments.skew
     
-    if abs(skewness) > 1 or volatility > returns.mean() * 3:
+    if abs(skewness) > 1 or volatility > moments.mean * 3:
         return 'unstable'
-    elif abs(skewness) > 0.5 or volatility > returns.mean() * 2:
+    elif abs(skewness) > 0.5 or volatility > moments.mean * 2:
         return 'moderate'
     else:
         return 'stable'
@@ -0,0 +1,114 @@
+"""
+进程内请求合并（single-flight）
+
+多个Streamlit会话同时打开同一只股票或市场页面时，各自的缓存检查都会未命中，
+进而发出完全相同的网络请求。通过 SingleFlight 按 (数据类型, 代码) 合并：
+同一时刻只有一个调用真正执行获取，其余调用等待并共享其结果（或异常）。
+"""
+
+import copy
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """一次正在进行的获取"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发的重复获取"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = defaultdict(lambda: {'calls': 0, 'executions': 0, 'coalesced': 0})
+
+    def do(self, key: Tuple[str, str], fn: Callable[[], Any]) -> Any:
+        """
+        执行获取：同一key已有进行中的获取时等待其完成并共享结果
+
+        Args:
+            key: (数据类型, 代码)
+            fn: 实际的获取函数
+
+        Returns:
+            获取结果的浅拷贝，调用方可以直接补充字段而不影响其他调用方。
+        """
+        data_type = key[0] if isinstance(key, tuple) and key else str(key)
+
+        with self._lock:
+            stats = self._stats[data_type]
+            stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.copy(call.result)
+
+        try:
+            call.result = fn()
+            # 执行方同样返回拷贝，保证等待方拿到的是未被修改的结果
+            return copy.copy(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """当前正在进行的获取数量"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计：按数据类型统计调用次数、实际执行次数和被合并次数"""
+        with self._lock:
+            by_type = {data_type: dict(stats) for data_type, stats in self._stats.items()}
+        calls = sum(s['calls'] for s in by_type.values())
+        coalesced = sum(s['coalesced'] for s in by_type.values())
+        return {
+            'calls': calls,
+            'executions': sum(s['executions'] for s in by_type.values()),
+            'coalesced': coalesced,
+            'coalesce_rate': coalesced / calls if calls else 0.0,
+            'by_type': by_type,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# 全局实例，由股票和市场工具共享
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """获取全局请求合并实例"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
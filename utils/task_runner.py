@@ -0,0 +1,118 @@
+"""
+带单任务超时的并行执行
+
+报告收集、市场数据刷新等场景需要在线程池中同时执行多个互不依赖的任务，
+并且每个任务单独计时：超时从任务真正开始执行时算起，排队等待线程的时间不计入。
+
+Python 线程无法强制中止，超时的任务会在后台继续执行（完成后仍会写入缓存），
+只是不再等待其结果。如果线程都被超时的任务占满，排队中的任务可能一直无法开始，
+因此排队任务设有总等待上限：超过 timeout × 批次数 仍未开始的任务会被取消，不再执行。
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+STATUS_DONE = 'done'
+STATUS_TIMEOUT = 'timeout'
+STATUS_CANCELLED = 'cancelled'
+
+
+@dataclass
+class TaskOutcome:
+    """单个任务的执行结果"""
+    name: str
+    status: str
+    result: Any = None
+    error: str = ""
+    elapsed: float = 0.0  # 从任务开始执行算起的耗时，未开始执行的任务为 0
+
+    @property
+    def done(self) -> bool:
+        return self.status == STATUS_DONE
+
+
+def run_tasks(tasks: List[Tuple[str, Callable[[], Any]]], max_workers: int, timeout: float,
+              thread_name_prefix: str = "task") -> Dict[str, TaskOutcome]:
+    """
+    并行执行任务，每个任务从开始执行起最多等待 timeout 秒
+
+    Args:
+        tasks: [(任务名称, 任务函数), ...]，结果按此顺序排列
+        max_workers: 线程数
+        timeout: 单个任务的超时时间（秒）
+        thread_name_prefix: 线程名前缀
+
+    Returns:
+        {任务名称: TaskOutcome}
+    """
+    max_workers = max(1, int(max_workers))
+    condition = threading.Condition()
+    started: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+
+    def notify(_future=None):
+        with condition:
+            condition.notify_all()
+
+    def run(name: str, fn: Callable[[], Any]) -> Any:
+        with condition:
+            started[name] = time.perf_counter()
+            condition.notify_all()
+        try:
+            return fn()
+        finally:
+            finished[name] = time.perf_counter()
+
+    # 每个任务都用满超时时间时，最后一批任务开始执行的时刻
+    queue_deadline = time.perf_counter() + timeout * math.ceil(len(tasks) / max_workers)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+    outcomes: Dict[str, TaskOutcome] = {}
+    try:
+        futures = {}
+        for name, fn in tasks:
+            futures[name] = executor.submit(run, name, fn)
+            futures[name].add_done_callback(notify)
+
+        with condition:
+            while True:
+                now = time.perf_counter()
+                deadlines = []
+                for name, future in futures.items():
+                    if name in outcomes:
+                        continue
+                    start = started.get(name)
+                    if future.done():
+                        outcomes[name] = _finished(name, future, finished.get(name, now) - (start or now))
+                    elif start is not None:
+                        if now >= start + timeout:
+                            outcomes[name] = TaskOutcome(name=name, status=STATUS_TIMEOUT, elapsed=now - start,
+                                                         error=f"超时（{timeout}秒）")
+                        else:
+                            deadlines.append(start + timeout)
+                    elif now < queue_deadline:
+                        deadlines.append(queue_deadline)
+                    elif future.cancel():
+                        outcomes[name] = TaskOutcome(name=name, status=STATUS_CANCELLED,
+                                                     error="排队等待超时，未开始执行，已取消")
+                    else:
+                        # 任务恰好开始执行，稍后读取其开始时间
+                        deadlines.append(now + 0.01)
+                if len(outcomes) == len(futures):
+                    break
+                condition.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+    finally:
+        # 不等待超时的任务，它们在后台继续执行，完成后仍会写入缓存
+        executor.shutdown(wait=False)
+
+    return {name: outcomes[name] for name, _ in tasks}
+
+
+def _finished(name: str, future, elapsed: float) -> TaskOutcome:
+    error = future.exception()
+    if error is not None:
+        return TaskOutcome(name=name, status=STATUS_DONE, error=str(error), elapsed=elapsed)
+    return TaskOutcome(name=name, status=STATUS_DONE, result=future.result(), elapsed=elapsed)
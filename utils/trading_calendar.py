@@ -0,0 +1,240 @@
+"""
+A股交易日历
+
+交易日历从新浪接口（akshare.tool_trade_date_hist_sina）加载一次并保存到本地，
+之后按日期预先建立索引，previous_trading_day / is_trading_day / sessions_between / next_close
+都是O(1)查表。接口不可用且本地无日历时，退化为按周一至周五判断（不含节假日），
+此时的日历是临时的，间隔一段时间后重新尝试加载。
+"""
+
+import os
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Union
+
+DateLike = Union[date, datetime, str, None]
+
+MARKET_OPEN_TIME = time(9, 15)         # 集合竞价开始
+MORNING_CLOSE_TIME = time(11, 30)
+AFTERNOON_OPEN_TIME = time(13, 0)
+MARKET_CLOSE_TIME = time(15, 0)
+SETTLE_TIME = time(16, 30)             # 收盘后数据源完成当日数据更新的时间
+RELOAD_RETRY_INTERVAL = timedelta(minutes=10)  # 接口获取失败后，间隔多久重新尝试加载
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CALENDAR_FILE = os.path.join(_PROJECT_DIR, "data", "cache", "trade_calendar.json")
+
+
+def _to_date(value: DateLike) -> date:
+    if value is None:
+        return datetime.now().date()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class TradingCalendar:
+    """交易日历：预先计算每个自然日对应的最近交易日位置，查询为O(1)"""
+
+    def __init__(self, trading_days: Optional[Iterable[DateLike]] = None, cache_file: str = DEFAULT_CALENDAR_FILE):
+        self.cache_file = cache_file
+        self.source = None
+        self._retry_after: Optional[datetime] = None  # 临时日历的重新加载时间
+        self._lock = threading.Lock()
+        self._days: List[date] = []
+        self._pos: Dict[date, int] = {}
+        self._floor_pos: Dict[date, int] = {}
+        if trading_days is not None:
+            self._build(trading_days, source="custom")
+
+    # ------------------------------------------------------------------
+    # 加载与索引
+    # ------------------------------------------------------------------
+    def _build(self, trading_days: Iterable[DateLike], source: str):
+        days = sorted({_to_date(d) for d in trading_days})
+        pos = {d: i for i, d in enumerate(days)}
+        floor_pos = {}
+        if days:
+            # 每个自然日 -> 当日或之前最近一个交易日的位置
+            current, i = days[0], 0
+            while current <= days[-1]:
+                if i + 1 < len(days) and days[i + 1] <= current:
+                    i += 1
+                floor_pos[current] = i
+                current += timedelta(days=1)
+        self._days, self._pos, self._floor_pos = days, pos, floor_pos
+        self.source = source
+        self._retry_after = None
+
+    def _is_loaded(self) -> bool:
+        if self.source is None:
+            return False
+        return self._retry_after is None or datetime.now() < self._retry_after
+
+    def _ensure_loaded(self):
+        if self._is_loaded():
+            return
+        with self._lock:
+            if self._is_loaded():
+                return
+            cached_days = self._read_local()
+            today = datetime.now().date()
+            if cached_days and _to_date(cached_days[-1]) >= today:
+                self._build(cached_days, source="local")
+                return
+
+            try:
+                import akshare as ak
+                df = ak.tool_trade_date_hist_sina()
+                days = [str(d)[:10] for d in df['trade_date']]
+                self._build(days, source="sina")
+                self._save_local(days)
+                print(f"✅ 交易日历已更新: {days[0]} ~ {days[-1]} ({len(days)}个交易日)")
+            except Exception as e:
+                if cached_days:
+                    # 本地日历已过期但仍可用，超出范围的日期按工作日判断
+                    self._build(cached_days, source="local")
+                else:
+                    print(f"⚠️  获取交易日历失败，按工作日判断交易日: {e}")
+                    self._build([], source="weekday")
+                # 临时使用，稍后重新尝试从接口加载
+                self._retry_after = datetime.now() + RELOAD_RETRY_INTERVAL
+
+    def _read_local(self) -> List[str]:
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f).get('days', [])
+        except Exception as e:
+            print(f"❌ 读取交易日历失败: {e}")
+        return []
+
+    def _save_local(self, days: List[str]):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'updated': datetime.now().isoformat(), 'source': 'sina', 'days': days}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"❌ 保存交易日历失败: {e}")
+
+    def _in_range(self, day: date) -> bool:
+        return day in self._floor_pos
+
+    # ------------------------------------------------------------------
+    # 交易日查询
+    # ------------------------------------------------------------------
+    def is_trading_day(self, day: DateLike = None) -> bool:
+        """是否为交易日"""
+        self._ensure_loaded()
+        day = _to_date(day)
+        if self._in_range(day):
+            return day in self._pos
+        return day.weekday() < 5
+
+    def last_trading_day(self, day: DateLike = None) -> date:
+        """当日或之前最近的交易日"""
+        self._ensure_loaded()
+        day = _to_date(day)
+        if self._in_range(day):
+            return self._days[self._floor_pos[day]]
+        if self._days and day > self._days[-1]:
+            # 超出日历范围：从日历末尾之后按工作日推算
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+            return day if day > self._days[-1] else self._days[-1]
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day: DateLike = None) -> date:
+        """之前（不含当日）最近的交易日"""
+        return self.last_trading_day(_to_date(day) - timedelta(days=1))
+
+    def next_trading_day(self, day: DateLike = None) -> date:
+        """之后（不含当日）最近的交易日"""
+        self._ensure_loaded()
+        day = _to_date(day)
+        if self._in_range(day):
+            i = self._floor_pos[day] + 1
+            if i < len(self._days):
+                return self._days[i]
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def sessions_between(self, start: DateLike, end: DateLike) -> List[date]:
+        """[start, end] 区间内的所有交易日"""
+        self._ensure_loaded()
+        start, end = _to_date(start), _to_date(end)
+        if start > end:
+            return []
+        if self._in_range(start) and self._in_range(end):
+            first = self._floor_pos[start] + (0 if start in self._pos else 1)
+            return self._days[first:self._floor_pos[end] + 1]
+        sessions, day = [], start
+        while day <= end:
+            if self.is_trading_day(day):
+                sessions.append(day)
+            day += timedelta(days=1)
+        return sessions
+
+    # ------------------------------------------------------------------
+    # 交易时段
+    # ------------------------------------------------------------------
+    def is_trading_time(self, now: Optional[datetime] = None) -> bool:
+        """是否处于交易时段（含集合竞价）"""
+        now = now or datetime.now()
+        if not self.is_trading_day(now):
+            return False
+        t = now.time()
+        return MARKET_OPEN_TIME <= t <= MORNING_CLOSE_TIME or AFTERNOON_OPEN_TIME <= t <= MARKET_CLOSE_TIME
+
+    def next_close(self, now: Optional[datetime] = None) -> datetime:
+        """下一次收盘时间：交易日收盘前为当日收盘，否则为下一个交易日收盘"""
+        now = now or datetime.now()
+        if self.is_trading_day(now) and now.time() < MARKET_CLOSE_TIME:
+            return datetime.combine(now.date(), MARKET_CLOSE_TIME)
+        return datetime.combine(self.next_trading_day(now), MARKET_CLOSE_TIME)
+
+    def last_settle(self, now: Optional[datetime] = None) -> datetime:
+        """最近一次完成收盘数据更新的时间（交易日 16:30）"""
+        now = now or datetime.now()
+        if self.is_trading_day(now) and now.time() >= SETTLE_TIME:
+            return datetime.combine(now.date(), SETTLE_TIME)
+        return datetime.combine(self.previous_trading_day(now), SETTLE_TIME)
+
+    def is_session_settled(self, day: DateLike, at: Optional[datetime] = None) -> bool:
+        """在 at 时刻，day 这个交易日的数据是否已收盘定型"""
+        at = at or datetime.now()
+        return at >= datetime.combine(_to_date(day), SETTLE_TIME)
+
+    def data_unchanged_since(self, since: datetime, now: Optional[datetime] = None) -> bool:
+        """
+        since 时刻获取的行情数据到 now 时是否仍然有效：
+        当前不在交易时段，且 since 在最近一次收盘数据更新之后（期间没有新的交易）
+        """
+        now = now or datetime.now()
+        if self.is_trading_time(now):
+            return False
+        return since >= self.last_settle(now)
+
+
+# 全局交易日历实例
+_trading_calendar = None
+_trading_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """获取全局交易日历实例（首次使用时加载）"""
+    global _trading_calendar
+    if _trading_calendar is None:
+        with _trading_calendar_lock:
+            if _trading_calendar is None:
+                _trading_calendar = TradingCalendar()
+    return _trading_calendar